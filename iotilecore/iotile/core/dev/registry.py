@@ -20,6 +20,10 @@ from .iotileobj import IOTile
 
 MISSING = object()
 
+# Only entry point groups with this prefix are stored in the extension index
+_INDEX_PREFIX = "iotile."
+_INDEX_FORMAT = 2
+
 
 class ComponentRegistry:
     """ComponentRegistry
@@ -27,14 +31,29 @@ class ComponentRegistry:
     A mapping of all of the installed components on this system that can
     be used as build dependencies and where they are located.  Also used
     to manage iotile plugins.
+
+    Finding extensions is expensive so the results are cached at three
+    levels.  Entry points of installed distributions are saved in an index
+    file next to the registry that is rebuilt automatically whenever the
+    installed distributions change.  The components that extensions are
+    loaded from are only reparsed when their module_settings.json files
+    change.  Finally, the result of each call to ``load_extensions`` is
+    cached in memory until the set of extensions may have changed, see
+    ``extension_generation``.
     """
 
     BackingType = SQLiteKVStore
     BackingFileName = 'component_registry.db'
+    IndexFileName = 'extension_index.json'
+    FrozenFileName = 'frozen_extensions.json'
 
     _registered_extensions = {}
     _component_overlays = {}
     _frozen_extensions = None
+    _extension_generation = 0
+    _extension_cache = {}
+    _extension_cache_generation = None
+    _component_cache = {}
 
     def __init__(self):
         self._kvstore = None
@@ -45,9 +64,23 @@ class ComponentRegistry:
     def frozen(self):
         """Return whether we have a cached list of all installed entry_points."""
 
-        frozen_path = os.path.join(_registry_folder(), 'frozen_extensions.json')
+        frozen_path = os.path.join(_registry_folder(), self.FrozenFileName)
         return os.path.isfile(frozen_path)
 
+    @property
+    def extension_generation(self):
+        """A counter that changes every time the set of extensions may have changed.
+
+        Code that caches the result of a call to load_extensions() can save
+        this value and compare it later to know when its cache is stale.
+        """
+
+        return ComponentRegistry._extension_generation
+
+    @classmethod
+    def _extensions_changed(cls):
+        ComponentRegistry._extension_generation += 1
+
     @property
     def kvstore(self):
         """Lazily load the underlying key-value store backing this registry."""
@@ -134,10 +167,56 @@ class ComponentRegistry:
             entry will be directly returned.
         """
 
+        components = None
+        if product_name is not None:
+            components = self._load_components()
+
+        key = (group, name_filter, comp_filter, class_filter, product_name)
+        found_extensions = self._cached_extensions(key, components)
+        if found_extensions is None:
+            found_extensions = self._find_extensions(group, name_filter, comp_filter, class_filter, product_name,
+                                                     components)
+            self._extension_cache[key] = (components, found_extensions)
+
+        found_extensions = list(found_extensions)
+
+        if unique is True:
+            if len(found_extensions) > 1:
+                raise ArgumentError("Extension %s should have had exactly one instance of class %s, found %d" % (group, class_filter.__name__, len(found_extensions)), classes=found_extensions)
+            elif len(found_extensions) == 0:
+                raise ArgumentError("Extension %s had no instances of class %s" % (group, class_filter.__name__))
+
+            return found_extensions[0]
+
+        return found_extensions
+
+    def _cached_extensions(self, key, components):
+        """Get the cached result of a previous call to load_extensions.
+
+        Returns:
+            list: The cached extensions or None if there is no valid cached value.
+        """
+
+        if ComponentRegistry._extension_cache_generation != ComponentRegistry._extension_generation:
+            ComponentRegistry._extension_cache = {}
+            ComponentRegistry._extension_cache_generation = ComponentRegistry._extension_generation
+            return None
+
+        cached = self._extension_cache.get(key)
+        if cached is None:
+            return None
+
+        cached_components, found_extensions = cached
+        if components is not None and [x[0] for x in cached_components] != [x[0] for x in components]:
+            return None
+
+        return found_extensions
+
+    def _find_extensions(self, group, name_filter, comp_filter, class_filter, product_name, components):
         found_extensions = []
 
         if product_name is not None:
-            for comp in self.iter_components():
+            for _stamp, comp in components:
                 if comp_filter is not None and comp.name != comp_filter:
                     continue
 
@@ -177,17 +256,40 @@ class ComponentRegistry:
 
             found_extensions.extend((name, x) for x in self._filter_subclasses(ext, class_filter))
 
-        found_extensions = [(name, x) for name, x in found_extensions if self._filter_nonextensions(x)]
+        return [(name, x) for name, x in found_extensions if self._filter_nonextensions(x)]
 
-        if unique is True:
-            if len(found_extensions) > 1:
-                raise ArgumentError("Extension %s should have had exactly one instance of class %s, found %d" % (group, class_filter.__name__, len(found_extensions)), classes=found_extensions)
-            elif len(found_extensions) == 0:
-                raise ArgumentError("Extension %s had no instances of class %s" % (group, class_filter.__name__))
+    def _load_components(self):
+        """Load all registered components, reusing unchanged IOTile objects.
 
-            return found_extensions[0]
+        The IOTile objects returned from this method are shared between calls
+        so they must not be modified.
 
-        return found_extensions
+        Returns:
+            list of (tuple, IOTile): The cache key of each component along
+            with the component itself.
+        """
+
+        components = []
+        for name in self.list_components():
+            if name in self._component_overlays:
+                path = self._component_overlays[name]
+            else:
+                try:
+                    path = self.kvstore.get(name)
+                except KeyError:
+                    continue
+
+            stamp = (path, _file_mtime(os.path.join(path, 'module_settings.json')),
+                     _file_mtime(os.path.join(path, 'build', 'output', 'module_settings.json')))
+
+            cached = self._component_cache.get(path)
+            if cached is None or cached[0] != stamp:
+                cached = (stamp, IOTile(path))
+                self._component_cache[path] = cached
+
+            components.append(cached)
+
+        return components
 
     def register_extension(self, group, name, extension):
         """Register an extension.
@@ -207,10 +309,13 @@ class ComponentRegistry:
             self._registered_extensions[group] = []
 
         self._registered_extensions[group].append((name, extension))
+        self._extensions_changed()
 
     def clear_extensions(self, group=None):
         """Clear all previously registered extensions."""
 
+        self._extensions_changed()
+
         if group is None:
             ComponentRegistry._registered_extensions = {}
             return
@@ -230,22 +335,30 @@ class ComponentRegistry:
         have been installed as entry_points.  Future calls to
         `load_extensions` will only search the one single file containing
         frozen extensions rather than enumerating all installed distributions.
+
+        The frozen file records the modification times of the installed
+        distributions and is automatically refrozen if they change.  Even
+        without freezing, an equivalent index file is maintained
+        automatically, so freezing is only needed to make sure the index is
+        stored in the virtual environment ahead of time.
         """
 
-        output_path = os.path.join(_registry_folder(), 'frozen_extensions.json')
+        output_path = os.path.join(_registry_folder(), self.FrozenFileName)
+        _save_extension_index(output_path, _distribution_signature(), self._dump_extensions())
 
-        with open(output_path, "w") as outfile:
-            json.dump(self._dump_extensions(), outfile)
+        ComponentRegistry._frozen_extensions = None
+        self._extensions_changed()
 
     def unfreeze_extensions(self):
         """Remove a previously frozen list of extensions."""
 
-        output_path = os.path.join(_registry_folder(), 'frozen_extensions.json')
+        output_path = os.path.join(_registry_folder(), self.FrozenFileName)
         if not os.path.isfile(output_path):
             raise ExternalError("There is no frozen extension list")
 
         os.remove(output_path)
         ComponentRegistry._frozen_extensions = None
+        self._extensions_changed()
 
     def load_extension(self, path, name_filter=None, class_filter=None, unique=False, component=None):
         """Load a single python module extension.
@@ -295,35 +408,57 @@ class ComponentRegistry:
 
         return found[0]
 
-    def _load_frozen_extensions(self):
-        self._logger.critical("Loading frozen extensions from file, new extensions will not be found")
+    def _load_entrypoint_index(self):
+        """Load the index of installed entry points, rebuilding it if it is stale."""
 
-        frozen_path = os.path.join(_registry_folder(), 'frozen_extensions.json')
-        with open(frozen_path, "r") as infile:
-            extensions = json.load(infile)
+        folder = _registry_folder()
+        signature = _distribution_signature()
 
-        ComponentRegistry._frozen_extensions = {}
-        for group in extensions:
-            ComponentRegistry._frozen_extensions[group] = []
+        frozen_path = os.path.join(folder, self.FrozenFileName)
+        if os.path.isfile(frozen_path):
+            saved_signature, extensions = _load_extension_index(frozen_path)
 
-            for ext_info in extensions.get(group, []):
-                name = ext_info['name']
-                obj_path = ext_info['object']
-                distro_info = ext_info['distribution']
+            if saved_signature is None:
+                self._logger.critical("Loading frozen extensions from file, new extensions will not be found")
+                return _parse_extension_index(extensions)
 
-                distro = None
-                if distro_info is not None:
-                    distro = entrypoints.Distribution(*distro_info)
+            if saved_signature == signature:
+                return _parse_extension_index(extensions)
 
-                entry = entrypoints.EntryPoint.from_string(obj_path, name, distro=distro)
-                ComponentRegistry._frozen_extensions[group].append(entry)
+            self._logger.info("Installed distributions have changed, refreezing extensions in %s", frozen_path)
+            extensions = self._dump_extensions()
+
+            try:
+                _save_extension_index(frozen_path, signature, extensions)
+            except OSError:
+                self._logger.warning("Could not refreeze extensions in %s", frozen_path, exc_info=True)
+
+            return _parse_extension_index(extensions)
+
+        index_path = os.path.join(folder, self.IndexFileName)
+        if os.path.isfile(index_path):
+            try:
+                saved_signature, extensions = _load_extension_index(index_path)
+                if saved_signature == signature:
+                    return _parse_extension_index(extensions)
+            except (ValueError, KeyError, TypeError):
+                self._logger.warning("Ignoring corrupt extension index %s", index_path)
+
+        extensions = self._dump_extensions()
+
+        try:
+            _save_extension_index(index_path, signature, extensions)
+        except OSError:
+            self._logger.debug("Could not save extension index to %s", index_path, exc_info=True)
+
+        return _parse_extension_index(extensions)
 
     def _iter_entrypoint_group(self, group):
-        if not self.frozen:
+        if not group.startswith(_INDEX_PREFIX):
             return entrypoints.get_group_all(group)
 
-        if self._frozen_extensions is None:
-            self._load_frozen_extensions()
+        if ComponentRegistry._frozen_extensions is None:
+            ComponentRegistry._frozen_extensions = self._load_entrypoint_index()
 
         return self._frozen_extensions.get(group, [])
 
@@ -351,7 +486,7 @@ class ComponentRegistry:
         return True
 
     @classmethod
-    def _dump_extensions(cls, prefix="iotile."):
+    def _dump_extensions(cls, prefix=_INDEX_PREFIX):
         extensions = {}
 
         for config, distro in entrypoints.iter_files_distros():
@@ -397,6 +532,8 @@ class ComponentRegistry:
         if backing not in ['json', 'sqlite', 'memory']:
             raise ArgumentError("Unknown backing store type that is not json or sqlite", backing=backing)
 
+        cls._extensions_changed()
+
         if backing == 'json':
             cls.BackingType = JSONKVStore
             cls.BackingFileName = 'component_registry.json'
@@ -435,6 +572,8 @@ class ComponentRegistry:
         else:
             self.kvstore.set(tile.name, value)
 
+        self._extensions_changed()
+
     def get_component(self, component):
         if component in self._component_overlays:
             return IOTile(self._component_overlays[component])
@@ -468,6 +607,7 @@ class ComponentRegistry:
         """Remove component from registry
         """
 
+        self._extensions_changed()
         return self.kvstore.remove(key)
 
     def clear_components(self):
@@ -475,6 +615,7 @@ class ComponentRegistry:
         """
 
         ComponentRegistry._component_overlays = {}
+        self._extensions_changed()
 
         for key in self.list_components():
             self.remove_component(key)
@@ -484,6 +625,7 @@ class ComponentRegistry:
         """
 
         self.kvstore.clear()
+        self._extensions_changed()
 
     def list_components(self):
         """List all of the registered component names.
@@ -579,6 +721,98 @@ def _registry_folder(folder=None):
     return folder
 
 
+def _file_mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _distribution_signature():
+    """Summarize the installed distributions that could provide entry points.
+
+    The signature contains the modification time of every directory on
+    sys.path, which changes whenever a distribution is installed or removed,
+    and of every entry_points.txt file in those directories, which changes
+    when a distribution is reinstalled in place, for example by
+    ``pip install -e``.  Only stat calls are needed to compute it.
+
+    Returns:
+        list: A json serializable signature.
+    """
+
+    signature = []
+
+    for path in sys.path:
+        path = os.path.abspath(path or '.')
+        mtime = _file_mtime(path)
+        if mtime is None:
+            continue
+
+        entry_points = []
+        if os.path.isdir(path):
+            try:
+                names = sorted(os.listdir(path))
+            except OSError:
+                names = []
+
+            for name in names:
+                if name.endswith(('.dist-info', '.egg-info')):
+                    entry_points.append([name, _file_mtime(os.path.join(path, name, 'entry_points.txt'))])
+
+        signature.append([path, mtime, entry_points])
+
+    return signature
+
+
+def _load_extension_index(path):
+    """Load a saved extension index.
+
+    Returns:
+        (list, dict): The saved distribution signature and the extensions.
+        The signature is None if the file is a frozen extension list from
+        before signatures were saved.
+    """
+
+    with open(path, "r") as infile:
+        data = json.load(infile)
+
+    if data.get('format') != _INDEX_FORMAT:
+        return None, data
+
+    return data['signature'], data['extensions']
+
+
+def _save_extension_index(path, signature, extensions):
+    tmp_path = path + '.tmp'
+
+    with open(tmp_path, "w") as outfile:
+        json.dump({'format': _INDEX_FORMAT, 'signature': signature, 'extensions': extensions}, outfile)
+
+    os.replace(tmp_path, path)
+
+
+def _parse_extension_index(extensions):
+    index = {}
+
+    for group in extensions:
+        index[group] = []
+
+        for ext_info in extensions.get(group, []):
+            name = ext_info['name']
+            obj_path = ext_info['object']
+            distro_info = ext_info['distribution']
+
+            distro = None
+            if distro_info is not None:
+                distro = entrypoints.Distribution(*distro_info)
+
+            entry = entrypoints.EntryPoint.from_string(obj_path, name, distro=distro)
+            index[group].append(entry)
+
+    return index
+
+
 def _check_registry_type(folder=None):
     """Check if the user has placed a registry_type.txt file to choose the registry type
 
@@ -1,5 +1,6 @@
 """An ordered list of authentication providers that are checked in turn to attempt a crypto operation"""
 
+import threading
 from iotile.core.exceptions import NotFoundError, ExternalError
 from iotile.core.dev import ComponentRegistry
 from .auth_provider import AuthProvider
@@ -17,33 +18,101 @@ class ChainedAuthProvider(AuthProvider):
     be tuples of (priority, auth_provider_class, arg_dict) where priority is an integer,
     auth_provider_class is an AuthProvider subclass and arg_dict is a dictionary of
     arguments passed to the constructor of auth_provider.
+
+    Finding the installed and default auth providers requires enumerating
+    extensions in the ComponentRegistry, which is slow compared with the
+    crypto operations themselves, so the resolved chain is cached for the
+    entire process.  The cache is automatically rebuilt when the registry's
+    extensions change and can be explicitly cleared with ClearCache().
+
+    Code that signs or verifies many reports should use the process wide
+    instance returned by Shared() rather than creating a new
+    ChainedAuthProvider for each report.
     """
 
+    _cache_lock = threading.Lock()
+    _cached_chain = None
+    _cached_factories = None
+    _cached_generation = None
+    _shared = None
+
     def __init__(self, args=None):
         super(ChainedAuthProvider, self).__init__(args)
 
         # FIXME: Allow overwriting default providers via args
-        self._load_installed_providers()
+        self._auth_factories, chain = self._load_default_chain()
+        self.providers = [(priority, factory(provider_args)) for priority, factory, provider_args in chain]
+
+    @classmethod
+    def Shared(cls):
+        """Get a process wide ChainedAuthProvider using the default providers.
+
+        The shared instance is recreated whenever the cached provider chain is
+        invalidated.
+
+        Returns:
+            ChainedAuthProvider: The shared auth provider.
+        """
+
+        shared = cls._shared
+        if shared is not None and cls._cached_generation == ComponentRegistry().extension_generation:
+            return shared
 
+        shared = ChainedAuthProvider()
+        ChainedAuthProvider._shared = shared
+        return shared
+
+    @classmethod
+    def ClearCache(cls):
+        """Forget the cached default provider chain.
+
+        The next ChainedAuthProvider created will search the ComponentRegistry
+        again for installed auth providers.
+        """
+
+        with cls._cache_lock:
+            ChainedAuthProvider._cached_chain = None
+            ChainedAuthProvider._cached_factories = None
+            ChainedAuthProvider._cached_generation = None
+            ChainedAuthProvider._shared = None
+
+    @classmethod
+    def _load_default_chain(cls):
         reg = ComponentRegistry()
+        generation = reg.extension_generation
+
+        with cls._cache_lock:
+            if cls._cached_chain is not None and cls._cached_generation == generation:
+                return cls._cached_factories, cls._cached_chain
+
+            factories = cls._load_installed_providers()
+
+            chain = []
+            for _, (priority, provider, provider_args) in reg.load_extensions('iotile.default_auth_providers'):
+                if provider not in factories:
+                    raise ExternalError("Default authentication provider list references unknown auth provider",
+                                        provider_name=provider, known_providers=factories.keys())
 
-        sub_providers = []
-        for _, (priority, provider, provider_args) in reg.load_extensions('iotile.default_auth_providers'):
-            if provider not in self._auth_factories:
-                raise ExternalError("Default authentication provider list references unknown auth provider",
-                                    provider_name=provider, known_providers=self._auth_factories.keys())
-            configured = self._auth_factories[provider](provider_args)
-            sub_providers.append((priority, configured))
+                chain.append((priority, factories[provider], provider_args))
 
-        sub_providers.sort(key=lambda x: x[0])
-        self.providers = sub_providers
+            chain.sort(key=lambda x: x[0])
 
-    def _load_installed_providers(self):
-        self._auth_factories = {}
+            ChainedAuthProvider._cached_factories = factories
+            ChainedAuthProvider._cached_chain = chain
+            ChainedAuthProvider._cached_generation = generation
+            ChainedAuthProvider._shared = None
+
+            return factories, chain
+
+    @classmethod
+    def _load_installed_providers(cls):
+        factories = {}
         reg = ComponentRegistry()
 
         for name, entry in reg.load_extensions('iotile.auth_provider'):
-            self._auth_factories[name] = entry
+            factories[name] = entry
+
+        return factories
 
     def encrypt_report(self, device_id, root, data, **kwargs):
         """Encrypt a buffer of report data on behalf of a device.
@@ -178,3 +247,43 @@ class ChainedAuthProvider(AuthProvider):
                 pass
 
         raise NotFoundError("verify_report method is not implemented in any sub_providers")
+
+    def verify_reports(self, reports):
+        """Verify many buffers of report data at once.
+
+        Each subprovider is given the whole batch of reports that no previous
+        subprovider was able to verify, so subproviders can batch their work.
+
+        Args:
+            reports (iterable of tuple): Each entry must be a tuple of
+                (device_id, root, data, signature, kwargs) where the first
+                four entries are passed to verify_report() and kwargs is a
+                dictionary of the additional keyword arguments needed by the
+                root key type, typically report_id and sent_timestamp.
+
+        Returns:
+            list of dict: The result of verify_report() for each report in the
+                same order as reports, or None for each report that no
+                subprovider was able to verify.
+        """
+
+        reports = list(reports)
+        results = [None] * len(reports)
+        pending = list(range(len(reports)))
+
+        for _priority, provider in self.providers:
+            if len(pending) == 0:
+                break
+
+            batch_results = provider.verify_reports([reports[i] for i in pending])
+
+            still_pending = []
+            for index, result in zip(pending, batch_results):
+                if result is None:
+                    still_pending.append(index)
+                else:
+                    results[index] = result
+
+            pending = still_pending
+
+        return results
@@ -190,3 +190,34 @@ class AuthProvider:
         """
 
         raise NotFoundError("verify method is not implemented")
+
+    def verify_reports(self, reports):
+        """Verify many buffers of report data at once.
+
+        This is equivalent to calling verify_report() for each entry in
+        reports except that entries this auth provider is not able to verify
+        produce None rather than raising NotFoundError.  Subclasses may
+        override this method if they can verify a batch of reports more
+        efficiently than one at a time.
+
+        Args:
+            reports (iterable of tuple): Each entry must be a tuple of
+                (device_id, root, data, signature, kwargs) where the first
+                four entries are passed to verify_report() and kwargs is a
+                dictionary of the additional keyword arguments needed by the
+                root key type, typically report_id and sent_timestamp.
+
+        Returns:
+            list of dict: The result of verify_report() for each report in the
+                same order as reports, or None for each report that could not
+                be verified by this auth provider.
+        """
+
+        results = []
+        for device_id, root, data, signature, kwargs in reports:
+            try:
+                results.append(self.verify_report(device_id, root, data, signature, **kwargs))
+            except NotFoundError:
+                results.append(None)
+
+        return results
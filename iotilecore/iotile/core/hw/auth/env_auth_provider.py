@@ -4,9 +4,17 @@ import hashlib
 import hmac
 import binascii
 import os
+import threading
+from collections import OrderedDict
 from iotile.core.exceptions import NotFoundError
 from .auth_provider import AuthProvider
 
+try:
+    from Crypto.Cipher import AES
+    import Crypto.Util.Counter
+except ImportError:
+    AES = None
+
 
 class EnvAuthProvider(AuthProvider):
     """Authentication provider that can sign and verify using user keys
@@ -17,20 +25,37 @@ class EnvAuthProvider(AuthProvider):
     for the environment variable USER_KEY_000000AB.
 
     The key must be a 64 character hex string that is decoded to create a 32 byte key.
+
+    Decoded root keys and the per report keys derived from them are kept in
+    bounded LRU caches so that verifying many reports from the same devices
+    only costs the HMAC of each report.  If the environment variable holding
+    a device's key changes, all cached keys for that device are discarded
+    automatically.  Cached keys can also be dropped explicitly by calling
+    invalidate_keys().
+
+    Args:
+        args (dict): An optional dictionary of settings.  The following keys are supported:
+            - root_key_cache_size (int): The maximum number of decoded root keys to cache.
+              Defaults to 256.
+            - report_key_cache_size (int): The maximum number of derived per report keys
+              to cache.  Defaults to 4096.  Pass 0 to disable caching of derived keys.
     """
 
-    @classmethod
-    def _get_key(cls, device_id):
-        """Attempt to get a user key from an environment variable
-        """
+    DEFAULT_ROOT_KEY_CACHE_SIZE = 256
+    DEFAULT_REPORT_KEY_CACHE_SIZE = 4096
 
-        var_name = "USER_KEY_{0:08X}".format(device_id)
+    def __init__(self, args=None):
+        super(EnvAuthProvider, self).__init__(args)
 
-        if var_name not in os.environ:
-            raise NotFoundError("No user key could be found for devices", device_id=device_id,
-                                expected_variable_name=var_name)
+        self._root_cache_size = self.args.get('root_key_cache_size', self.DEFAULT_ROOT_KEY_CACHE_SIZE)
+        self._report_cache_size = self.args.get('report_key_cache_size', self.DEFAULT_REPORT_KEY_CACHE_SIZE)
 
-        key_var = os.environ[var_name]
+        self._cache_lock = threading.Lock()
+        self._root_keys = OrderedDict()
+        self._report_keys = OrderedDict()
+
+    @classmethod
+    def _decode_key(cls, device_id, key_var):
         if len(key_var) != 64:
             raise NotFoundError("User key in variable is not the correct length, should be 64 hex characters",
                                 device_id=device_id, key_value=key_var)
@@ -47,8 +72,61 @@ class EnvAuthProvider(AuthProvider):
 
         return key
 
-    @classmethod
-    def _verify_derive_key(cls, device_id, root, **kwargs):
+    def invalidate_keys(self, device_id=None):
+        """Forget cached root and report keys.
+
+        This should be called whenever a device's user key is rotated by some
+        means other than changing its environment variable.
+
+        Args:
+            device_id (int): The device whose keys should be forgotten.  If not
+                passed, the keys for all devices are forgotten.
+        """
+
+        with self._cache_lock:
+            if device_id is None:
+                self._root_keys.clear()
+                self._report_keys.clear()
+                return
+
+            self._drop_device(device_id)
+
+    def _drop_device(self, device_id):
+        self._root_keys.pop(device_id, None)
+
+        stale = [key for key in self._report_keys if key[0] == device_id]
+        for key in stale:
+            del self._report_keys[key]
+
+    def _get_root_key(self, device_id):
+        var_name = "USER_KEY_{0:08X}".format(device_id)
+        key_var = os.environ.get(var_name)
+
+        with self._cache_lock:
+            cached = self._root_keys.get(device_id)
+
+            if cached is not None and key_var is not None and cached[0] == key_var:
+                self._root_keys.move_to_end(device_id)
+                return cached[1]
+
+            # The key was removed, rotated or evicted so nothing derived from it is valid anymore
+            self._drop_device(device_id)
+
+        if key_var is None:
+            raise NotFoundError("No user key could be found for devices", device_id=device_id,
+                                expected_variable_name=var_name)
+
+        key = self._decode_key(device_id, key_var)
+
+        with self._cache_lock:
+            self._root_keys[device_id] = (key_var, key)
+            while len(self._root_keys) > self._root_cache_size:
+                evicted, _cached = self._root_keys.popitem(last=False)
+                self._drop_device(evicted)
+
+        return key
+
+    def _verify_derive_key(self, device_id, root, **kwargs):
         report_id = kwargs.get('report_id', None)
         sent_timestamp = kwargs.get('sent_timestamp', None)
 
@@ -60,9 +138,25 @@ class EnvAuthProvider(AuthProvider):
         if root != AuthProvider.UserKey:
             raise NotFoundError('unsupported root key in EnvAuthProvider', root_key=root)
 
-        root_key = cls._get_key(device_id)
+        root_key = self._get_root_key(device_id)
+
+        # The root key is part of the cache key so that a report key derived by another
+        # thread from a root key that has since been replaced is never returned
+        cache_key = (device_id, report_id, sent_timestamp, root_key)
+        with self._cache_lock:
+            report_key = self._report_keys.get(cache_key)
+            if report_key is not None:
+                self._report_keys.move_to_end(cache_key)
+                return report_key
+
         report_key = AuthProvider.DeriveReportKey(root_key, report_id, sent_timestamp)
 
+        if self._report_cache_size > 0:
+            with self._cache_lock:
+                self._report_keys[cache_key] = report_key
+                while len(self._report_keys) > self._report_cache_size:
+                    self._report_keys.popitem(last=False)
+
         return report_key
 
     def sign_report(self, device_id, root, data, **kwargs):
@@ -171,11 +265,8 @@ class EnvAuthProvider(AuthProvider):
 
         report_key = self._verify_derive_key(device_id, root, **kwargs)
 
-        try:
-            from Crypto.Cipher import AES
-            import Crypto.Util.Counter
-        except ImportError:
-            raise NotFoundError
+        if AES is None:
+            raise NotFoundError("pycryptodome is required to decrypt or encrypt reports")
 
         ctr = Crypto.Util.Counter.new(128)
 
@@ -212,11 +303,8 @@ class EnvAuthProvider(AuthProvider):
 
         report_key = self._verify_derive_key(device_id, root, **kwargs)
 
-        try:
-            from Crypto.Cipher import AES
-            import Crypto.Util.Counter
-        except ImportError:
-            raise NotFoundError
+        if AES is None:
+            raise NotFoundError("pycryptodome is required to decrypt or encrypt reports")
 
         # We use AES-128 for encryption
         ctr = Crypto.Util.Counter.new(128)
@@ -10,6 +10,7 @@
 import time
 import binascii
 import logging
+import struct
 from queue import Empty
 from typedargs.annotate import annotated, param, return_type, finalizer, docannotate, context
 
@@ -18,6 +19,7 @@ from iotile.core.hw.exceptions import UnknownModuleTypeError
 from iotile.core.exceptions import ArgumentError, HardwareError, ValidationError, TimeoutExpiredError, ExternalError
 from iotile.core.dev.registry import ComponentRegistry
 from iotile.core.hw.transport.adapterstream import AdapterStream
+from iotile.core.hw.transport.stream_queue import ChunkBuffer
 from iotile.core.dev.config import ConfigManager
 from iotile.core.hw.debug import DebugManager
 from iotile.core.utilities.linebuffer_ui import LinebufferUI
@@ -46,13 +48,23 @@ class HardwareManager:
         jlink
         jlink:mux=ftdi
         virtual:...(e.g. simple)
+
+    Reports, traces and broadcasts are buffered in unbounded queues unless a
+    ``queue_size`` is passed, in which case ``queue_policy`` controls what
+    happens when a queue is full.  See :class:`AdapterStream`.
     """
 
     logger = logging.getLogger(__name__)
 
+    # The controller's TileManager subsystem can describe every registered tile at once
+    CONTROLLER_ADDRESS = 8
+    COUNT_TILES_RPC = 0x2a01
+    DESCRIBE_TILE_RPC = 0x2a02
+
     @param("port", "string", desc="transport method to use in the format transport[:port]")
-    @param("record", "path", desc="Optional file to record all RPC calls and responses made on this HardwareManager")
-    def __init__(self, port=None, record=None, adapter=None):
+    @param("record", "path", desc="Optional file to record all RPC calls and responses made on this HardwareManager, "
+                                  "files ending in .bin are recorded in a compact binary format")
+    def __init__(self, port=None, record=None, adapter=None, queue_size=0, queue_policy='oldest'):
         if port is None and adapter is None:
             try:
                 conf = ConfigManager()
@@ -71,25 +83,40 @@ class HardwareManager:
             self.port = arg
 
 
+        self._queue_size = queue_size
+        self._queue_policy = queue_policy
         self.stream = self._create_stream(adapter, record=record)
 
         self._stream_queue = None
         self._trace_queue = None
         self._broadcast_queue = None
-        self._trace_data = bytearray()
+        self._trace_data = ChunkBuffer()
 
         self._proxies = {'TileBusProxyObject': TileBusProxyObject}
         self._name_map = {TileBusProxyObject.ModuleName(): [TileBusProxyObject]}
+        self._proxy_index = {}
+
+        # Tile names and versions for the current connection, keyed by address
+        self._tile_cache = {}
+        self._tile_cache_generation = None
+        self._tile_cache_prefetched = False
 
         self._known_apps = {}
         self._named_apps = {}
 
-        self._setup_proxies()
-        self._setup_apps()
+        # Proxy and app modules are only imported the first time that they are needed
+        self._proxies_loaded = False
+        self._apps_loaded = False
 
     def _setup_proxies(self):
         """Load in proxy module objects for all of the registered components on this system."""
 
+        if self._proxies_loaded:
+            return
+
+        self._proxies_loaded = True
+        self._proxy_index = {}
+
         # Find all of the registered IOTile components and see if we need to add any proxies for them
         reg = ComponentRegistry()
         proxy_classes = reg.load_extensions('iotile.proxy', class_filter=TileBusProxyObject, product_name="proxy_module")
@@ -118,6 +145,11 @@ class HardwareManager:
     def _setup_apps(self):
         """Load in all iotile app objects for all registered or installed components on this system."""
 
+        if self._apps_loaded:
+            return
+
+        self._apps_loaded = True
+
         reg = ComponentRegistry()
         app_classes = reg.load_extensions('iotile.app', class_filter=IOTileApp, product_name="app_module")
 
@@ -162,13 +194,10 @@ class HardwareManager:
         if uuid is not None:
             self.connect(uuid)
 
-        tile = self._create_proxy('TileBusProxyObject', address)
-
         if basic:
-            return tile
+            return self._create_proxy('TileBusProxyObject', address)
 
-        name = tile.tile_name()
-        version = tile.tile_version()
+        name, version = self._describe_tile(address)
 
         if force is not None:
             name = force
@@ -184,6 +213,89 @@ class HardwareManager:
 
         return tile
 
+    def invalidate_tile_cache(self, address=None):
+        """Forget the cached name and version of one or all tiles.
+
+        The cache is cleared automatically whenever we connect, disconnect or
+        the connection is interrupted.  Proxy objects call this when they
+        reset their tile since its firmware could have changed.  Resetting
+        the controller clears the entire cache since it resets every tile.
+
+        Args:
+            address (int): The address of the tile to forget.  If this is
+                None or the controller's address, all tiles are forgotten.
+        """
+
+        if address is None or address == self.CONTROLLER_ADDRESS:
+            self._tile_cache = {}
+            self._tile_cache_prefetched = False
+        else:
+            self._tile_cache.pop(address, None)
+
+    def _describe_tile(self, address):
+        """Get the name and version of a tile, using cached information if possible.
+
+        The first time a tile is described on a connection, we ask the
+        controller's TileManager for the name and version of every
+        registered tile in a single batch of RPCs.  Tiles that the controller
+        does not know about, or any tile on a device whose controller does
+        not support the TileManager RPCs, are asked for their status directly.
+
+        Returns:
+            (str, tuple): The name and (major, minor, patch) version of the tile.
+        """
+
+        if self._tile_cache_generation != self.stream.connection_generation:
+            self._tile_cache_generation = self.stream.connection_generation
+            self._tile_cache = {}
+            self._tile_cache_prefetched = False
+
+        if address not in self._tile_cache and not self._tile_cache_prefetched:
+            self._tile_cache_prefetched = True
+            self._tile_cache.update(self._prefetch_tile_descriptors())
+
+        if address not in self._tile_cache:
+            status = self._create_proxy('TileBusProxyObject', address).status()
+            self._tile_cache[address] = (status['name'], status['version'])
+
+        return self._tile_cache[address]
+
+    def _prefetch_tile_descriptors(self):
+        """Ask the controller to describe all registered tiles in one batch.
+
+        Tiles are assigned an address based on the slot that they register
+        from.  The controller is always the first registered tile.
+
+        Returns:
+            dict: A map of tile address to (name, version) for every tile that
+            the controller described.  This is empty if the controller does
+            not support describing its tiles.
+        """
+
+        count, = self.send_rpcs([(self.CONTROLLER_ADDRESS, self.COUNT_TILES_RPC, b'')])
+        if isinstance(count, Exception) or len(count) != 2:
+            return {}
+
+        count, = struct.unpack("<H", count)
+        calls = [(self.CONTROLLER_ADDRESS, self.DESCRIBE_TILE_RPC, struct.pack("<H", i)) for i in range(0, count)]
+
+        tiles = {}
+        for i, response in enumerate(self.send_rpcs(calls)):
+            if isinstance(response, Exception) or len(response) != 20:
+                continue
+
+            hw_type, _api_major, _api_minor, name, fw_major, fw_minor, fw_patch, _exec_major, _exec_minor, \
+                _exec_patch, slot, _unique_id = struct.unpack("<3B6s6BBL", response)
+
+            # Unused entries in the tile table are returned as invalid tiles
+            if hw_type == 0:
+                continue
+
+            address = self.CONTROLLER_ADDRESS if i == 0 else 10 + slot
+            tiles[address] = (name.decode('utf-8'), (fw_major, fw_minor, fw_patch))
+
+        return tiles
+
     @docannotate
     def app(self, name=None, path=None, uuid=None):
         """Find the best IOTileApp for the device we are connected to.
@@ -212,6 +324,8 @@ class HardwareManager:
         if uuid is not None:
             self.connect(uuid)
 
+        self._setup_apps()
+
         # We perform all app matching by asking the device's controller for its app and os info
         tile = self._create_proxy('TileBusProxyObject', 8)
         device_id, os_info, app_info = tile.rpc(0x10, 0x08, result_format="L8xLL")
@@ -281,9 +395,30 @@ class HardwareManager:
 
         self._trace_queue = None
         self._stream_queue = None
+        self.invalidate_tile_cache()
 
         self.stream.disconnect()
 
+    def send_rpcs(self, rpcs, timeout=None):
+        """Send a batch of RPCs to the connected device.
+
+        This is much faster than sending the RPCs one at a time when there
+        are many of them since they are all queued at once and can be
+        pipelined by DeviceAdapters that support it.  See
+        :meth:`AdapterStream.send_rpcs`.
+
+        Args:
+            rpcs (list of (int, int, bytes)): The address, rpc_id and call
+                payload of each RPC to send.
+            timeout (float): The maximum number of seconds to wait for each
+                RPC to finish.
+
+        Returns:
+            list: For each RPC either its response payload or the exception it raised.
+        """
+
+        return self.stream.send_rpcs(rpcs, timeout=timeout)
+
     @param("connection_string", "string", desc="opaque connection string indicating which device")
     def debug(self, connection_string=None):
         """Prepare the device for debugging if supported.
@@ -560,10 +695,11 @@ class HardwareManager:
 
         self._accumulate_trace()
 
+        data = self._trace_data.peek()
         if encoding == 'raw':
-            return bytes(self._trace_data)
+            return data
 
-        return binascii.hexlify(self._trace_data).decode('utf-8')
+        return binascii.hexlify(data).decode('utf-8')
 
     def wait_trace(self, size, timeout=None, drop_before=False, progress_callback=None):
         """Wait for a specific amount of tracing data to be received.
@@ -574,6 +710,9 @@ class HardwareManager:
         waiting if you never receive enough tracing data after a specific
         amount of time.
 
+        This function wakes up as soon as new tracing data is received rather
+        than polling for it.
+
         Args:
             size (int): The number of bytes to wait for.
             timeout (float): The maximum number of seconds to wait for
@@ -588,40 +727,41 @@ class HardwareManager:
             bytearray: The raw trace data obtained.
         """
 
-        if drop_before:
-            self._trace_data = bytearray()
-
         if progress_callback is None:
             progress_callback = lambda x, y: None
 
-        if len(self._trace_data) >= size:
-            progress_callback(size, size)
-
-            data = self._trace_data[:size]
-            self._trace_data = self._trace_data[size:]
+        self._accumulate_trace()
+        if drop_before:
+            self._trace_data.clear()
 
-            return data
+        if len(self._trace_data) < size:
+            if self._trace_queue is None:
+                raise ExternalError("You have to enable tracing before you can wait for tracing data")
 
-        progress_callback(len(self._trace_data), size)
+            deadline = None
+            if timeout is not None:
+                deadline = time.monotonic() + timeout
 
-        start = time.time()
-        while len(self._trace_data) < size:
-            progress_callback(len(self._trace_data), size)
-            self._accumulate_trace()
+            while len(self._trace_data) < size:
+                progress_callback(len(self._trace_data), size)
 
-            time.sleep(0.1)
-            now = time.time()
+                remaining = None
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
 
-            if timeout is not None and ((now - start) > timeout):
-                raise TimeoutExpiredError("Timeout waiting for tracing data", expected_size=size,
-                                          received_size=len(self._trace_data), timeout=timeout)
+                try:
+                    if remaining is not None and remaining <= 0:
+                        raise Empty()
 
-        progress_callback(size, size)
+                    self._trace_data.append(self._trace_queue.get(timeout=remaining))
+                except Empty:
+                    raise TimeoutExpiredError("Timeout waiting for tracing data", expected_size=size,
+                                              received_size=len(self._trace_data), timeout=timeout)
 
-        data = self._trace_data[:size]
-        self._trace_data = self._trace_data[size:]
+                self._accumulate_trace()
 
-        return data
+        progress_callback(size, size)
+        return self._trace_data.read(size)
 
     def _accumulate_trace(self):
         """Copy tracing data from trace queue into _trace_data"""
@@ -631,11 +771,69 @@ class HardwareManager:
 
         try:
             while True:
-                blob = self._trace_queue.get(block=False)
-                self._trace_data += bytearray(blob)
+                self._trace_data.append(self._trace_queue.get(block=False))
         except Empty:
             pass
 
+    def queue_stats(self):
+        """Get the counters of the report, trace and broadcast queues.
+
+        See :meth:`AdapterStream.queue_stats`.
+
+        Returns:
+            dict: The stats of each queue or None if it has not been enabled.
+        """
+
+        return self.stream.queue_stats()
+
+    def iter_reports_async(self):
+        """Get an async iterator over reports as they are received.
+
+        The iterator never stops and may be used from any event loop with
+        ``async for``.  It shares the same queue as :meth:`iter_reports` and
+        :meth:`wait_reports`, so each report is only returned once.
+
+        Returns:
+            StreamQueue: An async iterator of reports.
+        """
+
+        if self._stream_queue is None:
+            raise ExternalError("You have to enable streaming before you can iterate over reports")
+
+        return self._stream_queue
+
+    def iter_traces_async(self):
+        """Get an async iterator over tracing data as it is received.
+
+        Tracing data is returned in the chunks that it was received in.  The
+        iterator never stops and may be used from any event loop with
+        ``async for``.  Data that has already been buffered by
+        :meth:`wait_trace` or :meth:`dump_trace` is not returned.
+
+        Returns:
+            StreamQueue: An async iterator of bytes objects.
+        """
+
+        if self._trace_queue is None:
+            raise ExternalError("You have to enable tracing before you can iterate over tracing data")
+
+        return self._trace_queue
+
+    def iter_broadcast_reports_async(self):
+        """Get an async iterator over broadcast reports as they are received.
+
+        The iterator never stops and may be used from any event loop with
+        ``async for``.
+
+        Returns:
+            StreamQueue: An async iterator of broadcast reports.
+        """
+
+        if self._broadcast_queue is None:
+            raise ExternalError("You have to enable broadcasting before you can iterate over broadcast reports")
+
+        return self._broadcast_queue
+
     def iter_broadcast_reports(self, blocking=False):
         """Iterate over broadcast reports that have been received.
 
@@ -780,14 +978,24 @@ class HardwareManager:
     def get_proxy(self, short_name, version):
         """Find a proxy type given its short name.
 
-        If no proxy type is found, return None.
+        If no proxy type is found, return None.  The proxy chosen for each
+        name and version is remembered so repeated lookups are free.
         """
 
-        if short_name not in self._name_map:
-            return None
+        self._setup_proxies()
+
+        key = (short_name, tuple(version))
+        if key in self._proxy_index:
+            return self._proxy_index[key]
+
+        proxy_match = None
+        if short_name in self._name_map:
+            proxy_match = self.find_correct_proxy_version(self._name_map[short_name], version)
+            if proxy_match is None:
+                proxy_match = self._name_map[short_name][0]
 
-        proxy_match = self.find_correct_proxy_version(self._name_map[short_name], version)
-        return proxy_match if proxy_match is not None else self._name_map[short_name][0] 
+        self._proxy_index[key] = proxy_match
+        return proxy_match
 
     def find_correct_proxy_version(self, proxies, version):
         """Retrieves the ModuleVersion of each proxy and match it with the tile version
@@ -839,6 +1047,9 @@ class HardwareManager:
         at the given address.
         """
 
+        if proxy not in self._proxies:
+            self._setup_proxies()
+
         if proxy not in self._proxies:
             raise UnknownModuleTypeError("unknown proxy module specified", module_type=proxy, known_types=list(self._proxies))
 
@@ -854,13 +1065,15 @@ class HardwareManager:
 
         # Check if we're supposed to use a specific device adapter
         if force_adapter is not None:
-            return AdapterStream(force_adapter, record=record)
+            return AdapterStream(force_adapter, record=record, queue_size=self._queue_size,
+                                 queue_policy=self._queue_policy)
 
         # Attempt to find a DeviceAdapter that can handle this transport type
         reg = ComponentRegistry()
 
         for _, adapter_factory in reg.load_extensions('iotile.device_adapter', name_filter=self.transport):
-            return AdapterStream(adapter_factory(port), record=record)
+            return AdapterStream(adapter_factory(port), record=record, queue_size=self._queue_size,
+                                 queue_policy=self._queue_policy)
 
         raise HardwareError("Could not find transport object registered to handle passed transport type",
                             transport=self.transport)
@@ -98,6 +98,59 @@ class TileBusProxyObject:
 
         return unpack_rpc_payload(result_format, payload)
 
+    def rpcs_v2(self, calls, **kw):
+        """Send a batch of RPCs to this module and decode their responses.
+
+        Each call is specified the same way as the arguments to :meth:`rpc_v2`
+        and all of the calls are sent to the device together using
+        ``stream.send_rpcs``.  Calls that fail because the tile was busy are
+        retried individually using :meth:`rpc_v2`.
+
+        Args:
+            calls (list of tuple): Each call is a tuple of (cmd, arg_format,
+                result_format, *args).
+            **kw: Only timeout is supported and applies to each RPC.
+
+        Returns:
+            list: For each call either the decoded response list or the
+            exception that the RPC raised.
+        """
+
+        passed_kw = dict()
+        if 'timeout' in kw:
+            passed_kw['timeout'] = kw['timeout']
+
+        calls = [(call[0], call[1], call[2], list(call[3:])) for call in calls]
+
+        rpcs = []
+        for cmd, arg_format, _result_format, args in calls:
+            if args:
+                packed_args = pack_rpc_payload(arg_format, args)
+            elif arg_format == "":
+                packed_args = b''
+            else:
+                raise RPCInvalidArgumentsError("Arg format expects arguments to be present", arg_format=arg_format, args=args)
+
+            rpcs.append((self.addr, cmd, packed_args))
+
+        responses = self.stream.send_rpcs(rpcs, **passed_kw)
+
+        results = []
+        for (cmd, arg_format, result_format, args), response in zip(calls, responses):
+            try:
+                if isinstance(response, BusyRPCResponse):
+                    result = self.rpc_v2(cmd, arg_format, result_format, *args, **passed_kw)
+                elif isinstance(response, Exception):
+                    result = response
+                else:
+                    result = unpack_rpc_payload(result_format, response)
+            except RPCError as err:
+                result = err
+
+            results.append(result)
+
+        return results
+
     @return_type("string")
     def hardware_version(self):
         """Return the embedded hardware version string for this tile.
@@ -172,6 +225,9 @@ class TileBusProxyObject:
         except TileNotFoundError:
             pass
 
+        if self._hwmanager is not None:
+            self._hwmanager.invalidate_tile_cache(self.addr)
+
         sleep(wait)
 
     @return_type("string")
@@ -17,7 +17,8 @@ import struct
 from collections import namedtuple
 import datetime
 from iotile.core.exceptions import DataError
-from .report import IOTileReading, IOTileReport
+from .report import IOTileReport
+from .reading_block import ReadingBlock
 
 BroadcastHeader = namedtuple('BroadcastHeader', ['auth_type', 'reading_length', 'uuid', 'sent_timestamp', 'reserved'])
 
@@ -84,14 +85,10 @@ class BroadcastReport(IOTileReport):
     def FromReadings(cls, uuid, readings, sent_timestamp=0):
         """Generate a broadcast report from a list of readings and a uuid."""
 
-        header = struct.pack("<BBHLLL", cls.ReportType, 0, len(readings)*16, uuid, sent_timestamp, 0)
+        block = ReadingBlock.FromReadings(readings)
 
-        packed_readings = bytearray()
-
-        for reading in readings:
-            packed_reading = struct.pack("<HHLLL", reading.stream, 0, reading.reading_id,
-                                         reading.raw_time, reading.value)
-            packed_readings += bytearray(packed_reading)
+        header = struct.pack("<BBHLLL", cls.ReportType, 0, len(block)*16, uuid, sent_timestamp, 0)
+        packed_readings = block.encode()
 
         return BroadcastReport(bytearray(header) + packed_readings)
 
@@ -107,14 +104,7 @@ class BroadcastReport(IOTileReport):
         time_base = self.received_time - datetime.timedelta(seconds=parsed_header.sent_timestamp)
 
         readings = self.raw_report[self._HEADER_LENGTH:self._HEADER_LENGTH + parsed_header.reading_length]
-        parsed_readings = []
-
-        for i in range(0, len(readings), 16):
-            reading = readings[i:i+16]
-            stream, _, reading_id, timestamp, value = struct.unpack("<HHLLL", reading)
-
-            parsed = IOTileReading(timestamp, stream, value, time_base=time_base, reading_id=reading_id)
-            parsed_readings.append(parsed)
+        parsed_readings = ReadingBlock.FromBinary(readings, time_base=time_base)
 
         self.sent_timestamp = parsed_header.sent_timestamp
         self.origin = parsed_header.uuid
@@ -11,6 +11,11 @@ class IOTileReportParser:
     Every time a complete report has been received, the optional callback passed in will
     be called with an IOTileReport subclass.
 
+    Received data is appended to a single buffer that is consumed by
+    advancing a read offset, so parsing a long stream of small reports does
+    not repeatedly copy the unprocessed data.  The buffer is compacted only
+    when the consumed prefix makes up most of it.
+
     Args:
         report_callback (callable): A function to be called every time a new report is received
             The signature should be bool report_callback(report, context).  The return value is True to
@@ -19,6 +24,9 @@ class IOTileReportParser:
         error_callback (callable): A function to be called every time an error occurs.
             The signature should be error_callback(error_code, message, context).  If a fatal
             error occurs, further parsing of reports will be stopped.
+        signer (AuthProvider): An optional AuthProvider that is passed to every report that
+            is parsed so that it can be verified and decrypted.  If not passed, reports use
+            the shared default ChainedAuthProvider.
     """
 
     # States for parser state machine
@@ -32,11 +40,19 @@ class IOTileReportParser:
     ErrorParsingReportHeader = 2
     ErrorParsingCompleteReport = 3
 
-    def __init__(self, report_callback=None, error_callback=None):
+    # Only compact the receive buffer once this many bytes have been consumed
+    CompactionThreshold = 64*1024
+
+    _cached_type_map = None
+    _cached_generation = None
+
+    def __init__(self, report_callback=None, error_callback=None, signer=None):
         self.report_callback = report_callback
         self.error_callback = error_callback
+        self.signer = signer
 
-        self.raw_data = bytearray()
+        self._buffer = bytearray()
+        self._offset = 0
         self.state = IOTileReportParser.WaitingForReportType
 
         self.current_type = 0
@@ -58,12 +74,39 @@ class IOTileReportParser:
         if self.state == self.ErrorState:
             return
 
-        self.raw_data += bytearray(data)
+        if not isinstance(data, (bytes, bytearray, memoryview)):
+            data = bytearray(data)
+
+        self._buffer += data
 
         still_processing = True
         while still_processing:
             still_processing = self.process_data()
 
+        self._compact()
+
+    @property
+    def raw_data(self):
+        """A copy of the data that has been received but not yet parsed."""
+
+        return self._buffer[self._offset:]
+
+    def _available(self):
+        return len(self._buffer) - self._offset
+
+    def _compact(self):
+        """Drop consumed data from the front of our buffer if worthwhile."""
+
+        if self._offset == 0:
+            return
+
+        if self._offset == len(self._buffer):
+            del self._buffer[:]
+            self._offset = 0
+        elif self._offset >= self.CompactionThreshold and self._offset >= len(self._buffer) // 2:
+            del self._buffer[:self._offset]
+            self._offset = 0
+
     def process_data(self):
         """Attempt to extract a report from the current data stream contents
 
@@ -74,8 +117,8 @@ class IOTileReportParser:
 
         further_processing = False
 
-        if self.state == self.WaitingForReportType and len(self.raw_data) > 0:
-            self.current_type = self.raw_data[0]
+        if self.state == self.WaitingForReportType and self._available() > 0:
+            self.current_type = self._buffer[self._offset]
 
             try:
                 self.current_header_size = self.calculate_header_size(self.current_type)
@@ -89,10 +132,11 @@ class IOTileReportParser:
                 else:
                     raise
 
-        if self.state == self.WaitingForReportHeader and len(self.raw_data) >= self.current_header_size:
+        if self.state == self.WaitingForReportHeader and self._available() >= self.current_header_size:
             try:
+                header_end = self._offset + self.current_header_size
                 self.current_report_size = self.calculate_report_size(self.current_type,
-                                                                      self.raw_data[:self.current_header_size])
+                                                                      self._buffer[self._offset:header_end])
                 self.state = self.WaitingForCompleteReport
                 further_processing = True
             except Exception as exc:
@@ -103,10 +147,11 @@ class IOTileReportParser:
                 else:
                     raise
 
-        if self.state == self.WaitingForCompleteReport and len(self.raw_data) >= self.current_report_size:
+        if self.state == self.WaitingForCompleteReport and self._available() >= self.current_report_size:
             try:
-                report_data = self.raw_data[:self.current_report_size]
-                self.raw_data = self.raw_data[self.current_report_size:]
+                report_end = self._offset + self.current_report_size
+                report_data = self._buffer[self._offset:report_end]
+                self._offset = report_end
 
                 report = self.parse_report(self.current_type, report_data)
                 self._handle_report(report)
@@ -138,7 +183,7 @@ class IOTileReportParser:
         """Parse a report into an IOTileReport subclass"""
 
         fmt = self.known_formats[current_type]
-        return fmt(report_data)
+        return fmt(report_data, **self._report_kwargs())
 
     def deserialize_report(self, serialized):
         """Deserialize a report that has been serialized by calling report.serialize()
@@ -152,11 +197,19 @@ class IOTileReportParser:
         if serialized['report_format'] not in type_map:
             raise ArgumentError("Unknown report format in DeserializeReport", format=serialized['report_format'])
 
-        report = type_map[serialized['report_format']](serialized['encoded_report'])
+        report = type_map[serialized['report_format']](serialized['encoded_report'], **self._report_kwargs())
         report.received_time = serialized['received_time']
 
         return report
 
+    def _report_kwargs(self):
+        # Only pass a signer if we have one so that report formats that predate
+        # the signer argument keep working.
+        if self.signer is None:
+            return {}
+
+        return {'signer': self.signer}
+
     def _handle_report(self, report):
         """Try to emit a report and possibly keep a copy of it"""
 
@@ -170,7 +223,17 @@ class IOTileReportParser:
 
     @classmethod
     def _build_type_map(cls):
-        """Build a map of all of the known report format processors"""
+        """Build a map of all of the known report format processors.
+
+        The installed report formats are only searched for once per process,
+        or again if the extensions in the ComponentRegistry change.
+        """
+
+        generation = ComponentRegistry().extension_generation
+
+        if cls._cached_type_map is None or cls._cached_generation != generation:
+            IOTileReportParser._cached_type_map = {report_format.ReportType: report_format for _, report_format in
+                                                   ComponentRegistry().load_extensions('iotile.report_format')}
+            IOTileReportParser._cached_generation = generation
 
-        return {report_format.ReportType: report_format for _, report_format in
-                ComponentRegistry().load_extensions('iotile.report_format')}
+        return dict(cls._cached_type_map)
@@ -0,0 +1,253 @@
+"""A compact, columnar container for the readings inside a report.
+
+Reports that come from a device can contain tens of thousands of readings.
+Building an IOTileReading object (with its own datetime) for each of them
+as soon as the report is received is by far the most expensive part of
+report decoding, even though most consumers only look at a handful of the
+readings or just need the raw integer values.
+
+ReadingBlock stores the four integer fields of each reading in separate
+arrays and only creates IOTileReading objects when they are accessed.  It
+behaves like a read-only list of IOTileReading objects so it can be used
+anywhere that a list of readings was previously expected.
+"""
+
+import array
+import struct
+import sys
+from collections.abc import Sequence
+from iotile.core.exceptions import ArgumentError
+from .report import IOTileReading
+
+
+def _array_type(size):
+    for typecode in ('H', 'I', 'L'):
+        if array.array(typecode).itemsize == size:
+            return typecode
+
+    return None
+
+
+_U16 = _array_type(2)
+_U32 = _array_type(4)
+
+# We can only use the strided memoryview fast path if the native integer
+# layout matches the little-endian wire format of a packed reading.
+_NATIVE_LAYOUT = sys.byteorder == 'little' and _U16 is not None and _U32 is not None
+
+
+class ReadingBlock(Sequence):
+    """A read-only sequence of IOTileReadings stored as integer columns.
+
+    The packed binary format of each reading is the 16 byte structure used
+    by SignedListReport and BroadcastReport:
+    ``<HHLLL: stream, reserved, reading_id, raw_time, value``.
+
+    IOTileReading objects are only materialized when they are accessed by
+    index or iteration and are cached afterwards so that repeated access
+    returns the same object.
+
+    Args:
+        streams (array): The stream of each reading.
+        reading_ids (array): The reading id of each reading.
+        raw_times (array): The raw device timestamp of each reading.
+        values (array): The value of each reading.
+        time_base (datetime): An optional estimate of when the device was last
+            turned on, used to calculate the reading_time of each reading when
+            it is materialized.
+    """
+
+    READING_SIZE = 16
+    _READING = struct.Struct("<HHLLL")
+
+    def __init__(self, streams, reading_ids, raw_times, values, time_base=None):
+        if not len(streams) == len(reading_ids) == len(raw_times) == len(values):
+            raise ArgumentError("All reading columns must have the same length", streams=len(streams),
+                                reading_ids=len(reading_ids), raw_times=len(raw_times), values=len(values))
+
+        self.streams = streams
+        self.reading_ids = reading_ids
+        self.raw_times = raw_times
+        self.values = values
+        self.time_base = time_base
+
+        self._readings = [None] * len(streams)
+
+    @classmethod
+    def FromBinary(cls, data, time_base=None):
+        """Decode a block of packed 16 byte readings.
+
+        Args:
+            data (bytes-like): The packed readings.  Its length must be a
+                multiple of 16 bytes.
+            time_base (datetime): An optional estimate of when the device was
+                last turned on.
+
+        Returns:
+            ReadingBlock: The decoded readings.
+        """
+
+        if len(data) % cls.READING_SIZE != 0:
+            raise ArgumentError("Packed readings must be a multiple of 16 bytes", length=len(data))
+
+        view = memoryview(data)
+        if view.format != 'B' or view.ndim != 1:
+            view = view.cast('B')
+
+        if _NATIVE_LAYOUT:
+            halfwords = view.cast(_U16)
+            words = view.cast(_U32)
+
+            streams = _column(_U16, halfwords[0::8])
+            reading_ids = _column(_U32, words[1::4])
+            raw_times = _column(_U32, words[2::4])
+            values = _column(_U32, words[3::4])
+        else:
+            streams = array.array('H')
+            reading_ids = array.array('L')
+            raw_times = array.array('L')
+            values = array.array('L')
+
+            for stream, _reserved, reading_id, raw_time, value in cls._READING.iter_unpack(view):
+                streams.append(stream)
+                reading_ids.append(reading_id)
+                raw_times.append(raw_time)
+                values.append(value)
+
+        return ReadingBlock(streams, reading_ids, raw_times, values, time_base=time_base)
+
+    @classmethod
+    def FromReadings(cls, readings):
+        """Create a ReadingBlock from a list of IOTileReading objects.
+
+        If readings is already a ReadingBlock it is returned unchanged.
+
+        Args:
+            readings (list of IOTileReading): The readings to store.
+
+        Returns:
+            ReadingBlock: The columnar version of the readings.
+        """
+
+        if isinstance(readings, ReadingBlock):
+            return readings
+
+        streams = array.array(_U16 or 'H', [x.stream for x in readings])
+        reading_ids = array.array(_U32 or 'L', [x.reading_id for x in readings])
+        raw_times = array.array(_U32 or 'L', [x.raw_time for x in readings])
+        values = array.array(_U32 or 'L', [x.value for x in readings])
+
+        block = ReadingBlock(streams, reading_ids, raw_times, values)
+        block._readings = list(readings)
+        return block
+
+    def encode(self):
+        """Pack all readings into their 16 byte binary format.
+
+        Returns:
+            bytearray: The packed readings.
+        """
+
+        count = len(self)
+        packed = bytearray(count * self.READING_SIZE)
+
+        if count == 0:
+            return packed
+
+        view = memoryview(packed)
+
+        if _NATIVE_LAYOUT:
+            halfwords = view.cast(_U16)
+            words = view.cast(_U32)
+
+            halfwords[0::8] = _as_array(_U16, self.streams)
+            words[1::4] = _as_array(_U32, self.reading_ids)
+            words[2::4] = _as_array(_U32, self.raw_times)
+            words[3::4] = _as_array(_U32, self.values)
+        else:
+            for i in range(count):
+                self._READING.pack_into(packed, i * self.READING_SIZE, self.streams[i], 0, self.reading_ids[i],
+                                        self.raw_times[i], self.values[i])
+
+        return packed
+
+    def id_range(self):
+        """Find the lowest and highest valid reading ids in this block.
+
+        Readings with IOTileReading.InvalidReadingID are ignored.
+
+        Returns:
+            (int, int): The lowest and highest reading id.  If there are no
+                valid reading ids, both are IOTileReading.InvalidReadingID.
+        """
+
+        valid_ids = [x for x in self.reading_ids if x != IOTileReading.InvalidReadingID]
+        if len(valid_ids) == 0:
+            return IOTileReading.InvalidReadingID, IOTileReading.InvalidReadingID
+
+        return min(valid_ids), max(valid_ids)
+
+    def _materialize(self, index):
+        reading = self._readings[index]
+        if reading is None:
+            reading = IOTileReading(self.raw_times[index], self.streams[index], self.values[index],
+                                    time_base=self.time_base, reading_id=self.reading_ids[index])
+            self._readings[index] = reading
+
+        return reading
+
+    def __len__(self):
+        return len(self.streams)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            block = ReadingBlock(self.streams[index], self.reading_ids[index], self.raw_times[index],
+                                 self.values[index], time_base=self.time_base)
+            block._readings = self._readings[index]
+            return block
+
+        if index < 0:
+            index += len(self)
+        if index < 0 or index >= len(self):
+            raise IndexError("ReadingBlock index out of range")
+
+        return self._materialize(index)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self._materialize(i)
+
+    def __eq__(self, other):
+        if isinstance(other, ReadingBlock):
+            return (self.streams == other.streams and self.reading_ids == other.reading_ids and
+                    self.raw_times == other.raw_times and self.values == other.values)
+
+        if isinstance(other, (list, tuple)):
+            return len(self) == len(other) and all(x == y for x, y in zip(self, other))
+
+        return NotImplemented
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        if result is NotImplemented:
+            return result
+
+        return not result
+
+    __hash__ = None
+
+    def __repr__(self):
+        return "ReadingBlock(%d readings)" % len(self)
+
+
+def _column(typecode, strided_view):
+    column = array.array(typecode)
+    column.frombytes(strided_view.tobytes())
+    return column
+
+
+def _as_array(typecode, column):
+    if isinstance(column, array.array) and column.typecode == typecode:
+        return column
+
+    return array.array(typecode, column)
@@ -241,13 +241,17 @@ class IOTileReport:
         encrypted (bool): Whether this report is encrypted
         received_time (datetime): The time in UTC when this report was received from a device.
             If not received, the time is assumed to be utcnow().
+        signer (AuthProvider): An optional AuthProvider that should be used to verify and
+            decrypt this report if it is signed or encrypted.  If not passed, report formats
+            that need one will use the shared default ChainedAuthProvider.
     """
 
-    def __init__(self, rawreport, signed, encrypted, received_time=None):
+    def __init__(self, rawreport, signed, encrypted, received_time=None, signer=None):
         self.visible_readings = []
         self.visible_events = []
 
         self.origin = None
+        self.signer = signer
 
         if received_time is None:
             self.received_time = datetime.datetime.utcnow()
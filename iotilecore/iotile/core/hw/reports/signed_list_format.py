@@ -3,6 +3,7 @@
 import datetime
 import struct
 from .report import IOTileReport, IOTileReading
+from .reading_block import ReadingBlock
 from iotile.core.utilities.packed import unpack
 from iotile.core.exceptions import NotFoundError, ExternalError
 from iotile.core.hw.auth.auth_provider import AuthProvider
@@ -14,6 +15,8 @@ class SignedListReport(IOTileReport):
 
     Args:
         rawreport (bytearray): The raw data of this report
+        signer (AuthProvider): An optional AuthProvider used to verify and decrypt
+            the report.  If not passed, the shared default ChainedAuthProvider is used.
     """
 
     ReportType = 1
@@ -51,11 +54,13 @@ class SignedListReport(IOTileReport):
 
         Args:
             uuid (int): The uuid of the deviec that this report came from
-            readings (list): A list of IOTileReading objects containing the data in the report
+            readings (list): A list of IOTileReading objects containing the data in the report.
+                A ReadingBlock may also be passed, in which case the readings are packed
+                directly from its columns.
             root_key (int): The key that should be used to sign the report (must be supported
                 by an auth_provider)
             signer (AuthProvider): An optional preconfigured AuthProvider that should be used to sign this
-                report.  If no AuthProvider is provided, the default ChainedAuthProvider is used.
+                report.  If no AuthProvider is provided, the shared default ChainedAuthProvider is used.
             report_id (int): The id of the report.  If not provided it defaults to IOTileReading.InvalidReadingID.
                 Note that you can specify anything you want for the report id but for actual IOTile devices
                 the report id will always be greater than the id of all of the readings contained in the report
@@ -66,33 +71,24 @@ class SignedListReport(IOTileReport):
             sent_timestamp (int): The device's uptime that sent this report.
         """
 
-        lowest_id = IOTileReading.InvalidReadingID
-        highest_id = IOTileReading.InvalidReadingID
+        block = ReadingBlock.FromReadings(readings)
 
-        report_len = 20 + 16*len(readings) + 24
+        report_len = 20 + 16*len(block) + 24
         len_low = report_len & 0xFF
         len_high = report_len >> 8
 
-        unique_readings = [x.reading_id for x in readings if x.reading_id != IOTileReading.InvalidReadingID]
-        if len(unique_readings) > 0:
-            lowest_id = min(unique_readings)
-            highest_id = max(unique_readings)
+        lowest_id, highest_id = block.id_range()
 
         header = struct.pack("<BBHLLLBBH", cls.ReportType, len_low, len_high, uuid, report_id,
                              sent_timestamp, root_key, streamer, selector)
         header = bytearray(header)
 
-        packed_readings = bytearray()
-
-        for reading in readings:
-            packed_reading = struct.pack("<HHLLL", reading.stream, 0, reading.reading_id,
-                                         reading.raw_time, reading.value)
-            packed_readings += bytearray(packed_reading)
+        packed_readings = block.encode()
 
         footer_stats = struct.pack("<LL", lowest_id, highest_id)
 
         if signer is None:
-            signer = ChainedAuthProvider()
+            signer = ChainedAuthProvider.Shared()
 
         # If we are supposed to encrypt this report, do the encryption
         if root_key != signer.NoKey:
@@ -121,7 +117,7 @@ class SignedListReport(IOTileReport):
         footer = bytearray(footer)
 
         data = signed_data + footer
-        return SignedListReport(data)
+        return SignedListReport(data, signer=signer)
 
     def decode(self):
         """Decode this report into a list of readings
@@ -155,7 +151,10 @@ class SignedListReport(IOTileReport):
         self.signature = signature
 
         signed_data = self.raw_report[:-16]
-        signer = ChainedAuthProvider()
+
+        signer = self.signer
+        if signer is None:
+            signer = ChainedAuthProvider.Shared()
 
         if signature_flags == AuthProvider.NoKey:
             self.encrypted = False
@@ -188,13 +187,7 @@ class SignedListReport(IOTileReport):
         assert (len(readings) % 16) == 0
 
         time_base = self.received_time - datetime.timedelta(seconds=sent_timestamp)
-        parsed_readings = []
-
-        for i in range(0, len(readings), 16):
-            reading = readings[i:i+16]
-            stream, _, reading_id, timestamp, value = unpack("<HHLLL", reading)
-
-            parsed = IOTileReading(timestamp, stream, value, time_base=time_base, reading_id=reading_id)
-            parsed_readings.append(parsed)
 
-        return parsed_readings, []
+        # Readings are decoded in bulk into columns and only turned into IOTileReading
+        # objects when someone actually looks at them.
+        return ReadingBlock.FromBinary(readings, time_base=time_base), []
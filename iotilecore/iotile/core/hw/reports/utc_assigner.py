@@ -18,14 +18,24 @@ reconstruction process is exact.
 However, in the general case, an exact assignment is not possible and
 UTCAssigner uses various other methods to infer an approximate UTC timestamp,
 returning confidence metrics along with the assigned value.
+
+To make assignment fast even when there are very large gaps between anchors
+with known UTC times, UTCAssigner maintains an index over its anchor points
+that contains running sums of the uptime deltas between consecutive anchors
+(along with counts of the steps that are inexact or cross a break) and the
+positions of all anchors with a known UTC time.  Walking from a reading to its
+nearest UTC anchor then becomes two binary searches and a subtraction rather
+than a linear scan.  The index is updated incrementally as anchor points are
+added.
 """
 
+import bisect
 import datetime
 import logging
 from typedargs.exceptions import ArgumentError
 from sortedcontainers import SortedKeyList
 from .signed_list_format import SignedListReport
-from .report import IOTileReading
+from .reading_block import ReadingBlock
 
 
 class _TimeAnchor:
@@ -110,6 +120,14 @@ class UTCAssigner:
     def __init__(self):
         self._anchor_points = SortedKeyList(key=lambda x: x.reading_id)
         self._prepared = False
+
+        # Index over anchor points, see _ensure_index()
+        self._anchor_list = []
+        self._anchor_ids = []
+        self._left_steps = [(0, 0, 0)]
+        self._right_steps = [(0, 0, 0)]
+        self._utc_positions = []
+        self._index_dirty_from = None
         self._anchor_streams = {}
         self._break_streams = set()
         self._logger = logging.getLogger(__name__)
@@ -197,6 +215,10 @@ class UTCAssigner:
         self._anchor_points.add(anchor)
         self._prepared = False
 
+        position = self._anchor_points.bisect_key_right(reading_id) - 1
+        if self._index_dirty_from is None or position < self._index_dirty_from:
+            self._index_dirty_from = position
+
     def add_reading(self, reading):
         """Add an IOTileReading."""
 
@@ -220,8 +242,19 @@ class UTCAssigner:
 
             raise ArgumentError("You can only add SignedListReports to a UTCAssigner", report=report)
 
-        for reading in report.visible_readings:
-            self.add_reading(reading)
+        readings = report.visible_readings
+
+        if isinstance(readings, ReadingBlock):
+            # Only materialize the readings that anchor converters need to look at
+            for i, (stream, reading_id, raw_time) in enumerate(zip(readings.streams, readings.reading_ids,
+                                                                  readings.raw_times)):
+                if stream in self._anchor_streams:
+                    self.add_reading(readings[i])
+                else:
+                    self.add_point(reading_id, raw_time, is_break=stream in self._break_streams)
+        else:
+            for reading in readings:
+                self.add_reading(reading)
 
         self.add_point(report.report_id, report.sent_timestamp, report.received_time)
 
@@ -257,29 +290,67 @@ class UTCAssigner:
         if len(self._anchor_points) == 0:
             return None
 
-        if reading_id > self._anchor_points[-1].reading_id:
-            return None
+        self._ensure_index()
+        return self._assign_utc(reading_id, uptime, prefer)
 
-        i = self._anchor_points.bisect_key_left(reading_id)
-        found_id = False
-        crossed_break = False
-        exact = True
+    def assign_utc_many(self, reading_ids, uptimes=None, prefer="before"):
+        """Assign utc datetimes to many reading ids at once.
 
-        last = self._anchor_points[i].copy()
-        if uptime is not None:
-            last.uptime = uptime
+        This is equivalent to calling assign_utc() on each reading id but
+        avoids repeated argument checking and index validation.
 
-        if last.reading_id == reading_id:
-            found_id = True
+        Args:
+            reading_ids (iterable of int): The monotonic reading ids that we
+                wish to assign utc timestamps to.
+            uptimes (iterable of int): Optional uptimes that should be
+                associated with each reading id.  If passed, it must have the
+                same length as reading_ids and individual entries may be None.
+            prefer (str): Either "before" or "after".  See assign_utc().
 
-            if last.utc is not None:
-                return UTCAssignment(reading_id, last.utc, found_id, exact, crossed_break)
+        Returns:
+            list of UTCAssignment: The assigned UTC time for each reading id, in
+            the same order as reading_ids, or None for each reading that could not
+            be assigned.
+        """
+
+        if prefer not in ("before", "after"):
+            raise ArgumentError("Invalid prefer parameter: {}, must be 'before' or 'after'".format(prefer))
 
-        left_assign = self._fix_left(reading_id, last, i, found_id)
+        reading_ids = list(reading_ids)
+        if uptimes is None:
+            uptimes = [None] * len(reading_ids)
+        else:
+            uptimes = list(uptimes)
+
+        if len(uptimes) != len(reading_ids):
+            raise ArgumentError("uptimes must have the same length as reading_ids",
+                                reading_ids=len(reading_ids), uptimes=len(uptimes))
+
+        if len(self._anchor_points) == 0:
+            return [None] * len(reading_ids)
+
+        self._ensure_index()
+        return [self._assign_utc(reading_id, uptime, prefer) for reading_id, uptime in zip(reading_ids, uptimes)]
+
+    def _assign_utc(self, reading_id, uptime, prefer):
+        if reading_id > self._anchor_ids[-1]:
+            return None
+
+        i = bisect.bisect_left(self._anchor_ids, reading_id)
+        anchor = self._anchor_list[i]
+
+        found_id = anchor.reading_id == reading_id
+        if found_id and anchor.utc is not None:
+            return UTCAssignment(reading_id, anchor.utc, found_id, True, False)
+
+        if uptime is None:
+            uptime = anchor.uptime
+
+        left_assign = self._fix_left(reading_id, uptime, i, found_id)
         if left_assign is not None and left_assign.exact:
             return left_assign
 
-        right_assign = self._fix_right(reading_id, last, i, found_id)
+        right_assign = self._fix_right(reading_id, uptime, i, found_id)
         if right_assign is not None and right_assign.exact:
             return right_assign
 
@@ -297,12 +368,13 @@ class UTCAssigner:
 
         self._logger.debug("Preparing UTCAssigner (%d total anchors)", len(self._anchor_points))
 
-        for curr in self._anchor_points:
+        for position, curr in enumerate(self._anchor_points):
             if not curr.exact:
                 assignment = self.assign_utc(curr.reading_id, curr.uptime)
                 if assignment is not None and assignment.exact:
                     curr.utc = assignment.utc
                     curr.exact = True
+                    bisect.insort(self._utc_positions, position)
                     fixed_count += 1
                 else:
                     inexact_count += 1
@@ -345,19 +417,16 @@ class UTCAssigner:
 
         self.ensure_prepared()
 
-        fixed_readings = []
-        dropped_readings = 0
+        readings = ReadingBlock.FromReadings(report.visible_readings)
+        assignments = self.assign_utc_many(readings.reading_ids, readings.raw_times, prefer=prefer)
 
-        for reading in report.visible_readings:
-            assignment = self.assign_utc(reading.reading_id, reading.raw_time, prefer=prefer)
+        keep = [i for i, assignment in enumerate(assignments) if assignment is not None]
+        dropped_readings = len(assignments) - len(keep)
 
-            if assignment is None:
-                dropped_readings += 1
-                continue
-
-            fixed_reading = IOTileReading(assignment.rtc_value, reading.stream, reading.value,
-                                          reading_time=assignment.utc, reading_id=reading.reading_id)
-            fixed_readings.append(fixed_reading)
+        fixed_readings = ReadingBlock([readings.streams[i] for i in keep],
+                                      [readings.reading_ids[i] for i in keep],
+                                      [assignments[i].rtc_value for i in keep],
+                                      [readings.values[i] for i in keep])
 
         fixed_report = SignedListReport.FromReadings(report.origin, fixed_readings, report_id=report.report_id,
                                                      selector=report.streamer_selector, streamer=report.origin_streamer,
@@ -397,56 +466,137 @@ class UTCAssigner:
 
         return after
 
-    def _fix_right(self, reading_id, last, start, found_id):
-        """Fix a reading by looking for the nearest anchor point after it."""
+    def _ensure_index(self):
+        """Bring the anchor point index up to date.
+
+        The index consists of:
+        - _left_steps[k] and _right_steps[k]: running totals (uptime delta,
+          inexact steps, break steps) of all steps between consecutive anchor
+          points before anchor k, as seen when walking left (toward lower
+          reading ids) or right respectively.  The two directions differ only
+          in which anchor's is_break flag marks a step as crossing a break.
+        - _utc_positions: the sorted positions of all anchors with a known utc.
+        - _anchor_list and _anchor_ids: flat copies of the anchor points and their
+          reading ids for constant time access by position.
+
+        Only the part of the index at or after the first anchor added since
+        the last update is recalculated, so adding anchor points in reading_id
+        order is cheap.
+        """
 
-        accum_delta = 0
-        exact = True
-        crossed_break = False
+        start = self._index_dirty_from
+        if start is None:
+            return
 
-        if start == len(self._anchor_points) - 1:
-            return None
+        self._index_dirty_from = None
+        start = max(start, 1)
+
+        del self._anchor_list[start - 1:]
+        del self._anchor_ids[start - 1:]
+        del self._left_steps[start:]
+        del self._right_steps[start:]
+        del self._utc_positions[bisect.bisect_left(self._utc_positions, start - 1):]
+
+        self._anchor_list.extend(self._anchor_points.islice(start - 1))
+        self._anchor_ids.extend(x.reading_id for x in self._anchor_list[start - 1:])
 
-        for curr in self._anchor_points.islice(start + 1):
-            if curr.uptime is None or last.uptime is None:
-                exact = False
-            elif curr.is_break or curr.uptime < last.uptime:
-                exact = False
-                crossed_break = True
+        left_delta, left_inexact, left_breaks = self._left_steps[-1]
+        right_delta, right_inexact, right_breaks = self._right_steps[-1]
+
+        prev = self._anchor_list[start - 1]
+        if prev.utc is not None:
+            self._utc_positions.append(start - 1)
+
+        for position in range(start, len(self._anchor_list)):
+            curr = self._anchor_list[position]
+            if curr.uptime is None or prev.uptime is None:
+                left_inexact += 1
+                right_inexact += 1
             else:
-                accum_delta += curr.uptime - last.uptime
+                step_broken = curr.uptime < prev.uptime
+
+                if prev.is_break or step_broken:
+                    left_inexact += 1
+                    left_breaks += 1
+                else:
+                    left_delta += curr.uptime - prev.uptime
+
+                if curr.is_break or step_broken:
+                    right_inexact += 1
+                    right_breaks += 1
+                else:
+                    right_delta += curr.uptime - prev.uptime
+
+            self._left_steps.append((left_delta, left_inexact, left_breaks))
+            self._right_steps.append((right_delta, right_inexact, right_breaks))
 
             if curr.utc is not None:
-                time_delta = datetime.timedelta(seconds=accum_delta)
-                return UTCAssignment(reading_id, curr.utc - time_delta, found_id, exact, crossed_break)
+                self._utc_positions.append(position)
 
-            last = curr
+            prev = curr
 
-        return None
+    def _fix_right(self, reading_id, uptime, start, found_id):
+        """Fix a reading by looking for the nearest anchor point after it."""
 
-    def _fix_left(self, reading_id, last, start, found_id):
-        """Fix a reading by looking for the nearest anchor point before it."""
+        if start == len(self._anchor_list) - 1:
+            return None
+
+        utc_index = bisect.bisect_left(self._utc_positions, start + 1)
+        if utc_index == len(self._utc_positions):
+            return None
+
+        end = self._utc_positions[utc_index]
+
+        # The first step is from the reading itself, whose uptime may differ from its anchor
+        curr = self._anchor_list[start + 1]
+        accum_delta, inexact, breaks = _single_step(uptime, curr.uptime, curr.is_break)
 
-        accum_delta = 0
-        exact = True
-        crossed_break = False
+        delta_end, inexact_end, breaks_end = self._right_steps[end]
+        delta_start, inexact_start, breaks_start = self._right_steps[start + 1]
+
+        accum_delta += delta_end - delta_start
+        inexact += inexact_end - inexact_start
+        breaks += breaks_end - breaks_start
+
+        time_delta = datetime.timedelta(seconds=accum_delta)
+        utc = self._anchor_list[end].utc - time_delta
+        return UTCAssignment(reading_id, utc, found_id, inexact == 0, breaks > 0)
+
+    def _fix_left(self, reading_id, uptime, start, found_id):
+        """Fix a reading by looking for the nearest anchor point before it."""
 
         if start == 0:
             return None
 
-        for curr in self._anchor_points.islice(None, start, reverse=True):
-            if curr.uptime is None or last.uptime is None:
-                exact = False
-            elif curr.is_break or last.uptime < curr.uptime:
-                exact = False
-                crossed_break = True
-            else:
-                accum_delta += last.uptime - curr.uptime
+        utc_index = bisect.bisect_right(self._utc_positions, start - 1)
+        if utc_index == 0:
+            return None
 
-            if curr.utc is not None:
-                time_delta = datetime.timedelta(seconds=accum_delta)
-                return UTCAssignment(reading_id, curr.utc + time_delta, found_id, exact, crossed_break)
+        end = self._utc_positions[utc_index - 1]
+
+        # The first step is from the reading itself, whose uptime may differ from its anchor
+        curr = self._anchor_list[start - 1]
+        accum_delta, inexact, breaks = _single_step(curr.uptime, uptime, curr.is_break)
+
+        delta_start, inexact_start, breaks_start = self._left_steps[start - 1]
+        delta_end, inexact_end, breaks_end = self._left_steps[end]
+
+        accum_delta += delta_start - delta_end
+        inexact += inexact_start - inexact_end
+        breaks += breaks_start - breaks_end
+
+        time_delta = datetime.timedelta(seconds=accum_delta)
+        utc = self._anchor_list[end].utc + time_delta
+        return UTCAssignment(reading_id, utc, found_id, inexact == 0, breaks > 0)
+
+
+def _single_step(earlier_uptime, later_uptime, is_break):
+    """Calculate the (delta, inexact, breaks) contribution of one step between anchors."""
+
+    if earlier_uptime is None or later_uptime is None:
+        return 0, 1, 0
 
-            last = curr
+    if is_break or later_uptime < earlier_uptime:
+        return 0, 1, 1
 
-        return None
+    return later_uptime - earlier_uptime, 0, 0
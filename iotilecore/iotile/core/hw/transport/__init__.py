@@ -10,6 +10,9 @@ from .adapterstream import AdapterStream
 from .adapter import AbstractDeviceAdapter, StandardDeviceAdapter
 from .server import AbstractDeviceServer, StandardDeviceServer
 from .virtualadapter import VirtualDeviceAdapter
+from .stream_queue import StreamQueue
+from .rpc_recorder import RecordedRPC, RPCRecorder, RPCRecording
 
-__all__ = ['AbstractDeviceAdapter', 'AbstractDeviceServer', 'AdapterStream',
-           'StandardDeviceAdapter', 'StandardDeviceServer', 'VirtualDeviceAdapter']
+__all__ = ['AbstractDeviceAdapter', 'AbstractDeviceServer', 'AdapterStream', 'RecordedRPC',
+           'RPCRecorder', 'RPCRecording', 'StandardDeviceAdapter', 'StandardDeviceServer',
+           'StreamQueue', 'VirtualDeviceAdapter']
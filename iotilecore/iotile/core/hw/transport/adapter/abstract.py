@@ -112,6 +112,7 @@ are:
 """
 
 import abc
+from ...exceptions import VALID_RPC_EXCEPTIONS
 
 
 class AbstractDeviceAdapter(abc.ABC):
@@ -530,6 +531,46 @@ class AbstractDeviceAdapter(abc.ABC):
                 invoking the RPC.
         """
 
+    async def send_rpcs(self, conn_id, rpcs, timeout):
+        """Send several RPCs to a device.
+
+        The RPCs are executed in order and their results are returned in the
+        same order.  An RPC that fails with one of the RPC level exceptions
+        documented in :meth:`send_rpc` does not stop the remaining RPCs from
+        being sent, instead its exception is returned in place of its
+        response.
+
+        The default implementation just calls :meth:`send_rpc` for each RPC.
+        DeviceAdapters whose transport can have more than one RPC in flight
+        at a time should override this method to send the RPCs without
+        waiting for each response in turn.
+
+        Args:
+            conn_id (int): A unique identifier that will refer to this connection
+            rpcs (list of (int, int, bytes)): The address, rpc_id and payload
+                of each RPC to send.
+            timeout (float): the number of seconds to wait for each RPC to execute
+
+        Returns:
+            list: For each RPC either its response payload as bytes or the
+            exception that it raised.
+
+        Raises:
+            DeviceAdapterError: If there is a hardware or communication issue
+                invoking the RPCs.
+        """
+
+        results = []
+        for address, rpc_id, payload in rpcs:
+            try:
+                response = await self.send_rpc(conn_id, address, rpc_id, payload, timeout)
+            except VALID_RPC_EXCEPTIONS as err:
+                response = err
+
+            results.append(response)
+
+        return results
+
     @abc.abstractmethod
     async def debug(self, conn_id, name, cmd_args):
         """Send a debug command to a device.
@@ -1,10 +1,7 @@
 """An adapter class that takes a DeviceAdapter and produces a CMDStream compatible interface"""
 
 from copy import deepcopy
-import queue
 from time import monotonic, sleep
-from datetime import datetime
-import binascii
 import logging
 import threading
 from iotile.core.exceptions import HardwareError, ArgumentError
@@ -12,48 +9,8 @@ from iotile.core.utilities import SharedLoop
 from ..exceptions import VALID_RPC_EXCEPTIONS
 from ..virtual import unpack_rpc_response, pack_rpc_response
 from .adapter import AbstractDeviceAdapter, AsynchronousModernWrapper, DeviceAdapter
-
-
-class _RecordedRPC:
-    """Internal helper class for saving recorded RPCs to csv files."""
-
-    def __init__(self, connection, address, rpc_id, call):
-        if isinstance(connection, bytes):
-            connection = connection.decode('utf-8')
-
-        self.connection = connection
-        self.address = address
-        self.rpc_id = rpc_id
-        self.call = binascii.hexlify(call).decode('utf-8')
-
-        self.status = -1
-        self.start_stamp = None
-
-        self.response = ""
-        self.error = ""
-
-        self.runtime = 0
-        self._start_time = 0
-
-    def start(self):
-        """Mark the beginning of a recorded RPC."""
-
-        self._start_time = monotonic()
-        self.start_stamp = datetime.utcnow()
-
-    def finish(self, status, response):
-        """Mark the end of a recorded RPC."""
-
-        self.response = binascii.hexlify(response).decode('utf-8')
-        self.status = status
-        self.runtime = monotonic() - self._start_time
-
-    def serialize(self):
-        """Convert this recorded RPC into a string."""
-
-        return "{},{: <26},{:2d},{:#06x},{:#04x},{:5.0f},{: <40},{: <40},{}".\
-            format(self.connection, self.start_stamp.isoformat(), self.address, self.rpc_id,
-                   self.status, self.runtime * 1000, self.call, self.response, self.error)
+from .stream_queue import StreamQueue
+from .rpc_recorder import RecordedRPC, RPCRecorder
 
 
 class AdapterStream:
@@ -72,23 +29,42 @@ class AdapterStream:
     in order to make it more convenient to process them.  It also contains a generic
     RPC logging mechanism to produce a record of what RPCs were sent to a device.
 
+    By default these queues are unbounded.  Long running sessions that may not
+    keep up with the data sent by a device can bound them by passing a
+    ``queue_size``, in which case ``queue_policy`` determines what happens
+    when a queue is full, see :class:`StreamQueue`.  The queues count how many
+    items were received and dropped, which is available from :meth:`queue_stats`.
+
     Args:
         adapter (AbstractDeviceAdapter): the DeviceAdapter that we should use
-        record (string): The path to a file that we should use to record any RPCs
-            sent for tracing purposes.
+        record (string or RPCRecorder): The path to a file that we should use to
+            record any RPCs sent for tracing purposes.  RPCs are written to the
+            file as they finish.  Paths ending in ``.bin`` are recorded in a
+            compact binary format, all others are recorded as csv.  Pass an
+            :class:`RPCRecorder` to control file rotation and flushing.
+        queue_size (int): The maximum number of reports, traces or broadcasts
+            to buffer in each queue.  Defaults to 0, which means unbounded.
+        queue_policy (str): What to do when a queue is full: ``drop`` the new
+            item, drop the ``oldest`` item or ``block`` until there is room.
+            Defaults to ``oldest``.
     """
 
-    def __init__(self, adapter, record=None, loop=SharedLoop):
+    def __init__(self, adapter, record=None, loop=SharedLoop, queue_size=0, queue_policy='oldest'):
         self._scanned_devices = {}
         self._scan_lock = threading.Lock()
         self._reports = None
         self._broadcast_reports = None
         self._traces = None
 
+        # Make sure the queue settings are valid before we start the adapter
+        StreamQueue(queue_size, queue_policy)
+        self._queue_size = queue_size
+        self._queue_policy = queue_policy
+
         self._loop = loop
-        self._record = record
-        if self._record is not None:
-            self._recording = []
+        self._recorder = record
+        if isinstance(record, str):
+            self._recorder = RPCRecorder(record)
 
         self._on_progress = None
 
@@ -98,6 +74,10 @@ class AdapterStream:
         self.connected = False
         self.connection_string = None
 
+        # Incremented whenever the connection changes or is interrupted so
+        # that anything cached about the connected device can be invalidated
+        self.connection_generation = 0
+
         if isinstance(adapter, DeviceAdapter):
             adapter = AsynchronousModernWrapper(adapter)
         elif not isinstance(adapter, AbstractDeviceAdapter):
@@ -229,6 +209,7 @@ class AdapterStream:
         self.connected = True
         self.connection_string = connection_string
         self.connection_interrupted = False
+        self.connection_generation += 1
 
     def disconnect(self):
         """Disconnect from the device that we are currently connected to."""
@@ -244,6 +225,7 @@ class AdapterStream:
         self.connected = False
         self.connection_interrupted = False
         self.connection_string = None
+        self.connection_generation += 1
 
     def _try_reconnect(self):
         """Try to recover an interrupted connection."""
@@ -301,8 +283,8 @@ class AdapterStream:
         if self.connection_interrupted:
             self._try_reconnect()
 
-        if self._record is not None:
-            recording = _RecordedRPC(self.connection_string, address, rpc_id, call_payload)
+        if self._recorder is not None:
+            recording = RecordedRPC(self.connection_string, address, rpc_id, call_payload)
             recording.start()
 
         try:
@@ -311,15 +293,78 @@ class AdapterStream:
         except VALID_RPC_EXCEPTIONS as exc:
             status, payload = pack_rpc_response(payload, exc)
 
-        if self._record is not None:
+        if self._recorder is not None:
             recording.finish(status, payload)
-            self._recording.append(recording)
+            self._recorder.record(recording)
 
         if self.connection_interrupted:
             self._try_reconnect()
 
         return unpack_rpc_response(status, payload, rpc_id, address)
 
+    def send_rpcs(self, rpcs, timeout=3.0):
+        """Send several rpcs to our connected device in a single batch.
+
+        All of the RPCs are handed to the DeviceAdapter at once so that there
+        is only a single round trip to the background event loop and so that
+        DeviceAdapters that can pipeline RPCs are able to do so.  The RPCs are
+        executed in order.
+
+        Unlike :meth:`send_rpc`, RPC errors are not raised.  Instead the
+        exception that :meth:`send_rpc` would have raised is returned in place
+        of that RPC's response payload.
+
+        Args:
+            rpcs (list of (int, int, bytes)): The address, rpc_id and call
+                payload of each RPC to send.
+            timeout (float): The maximum number of seconds to wait for each
+                RPC to finish.  Defaults to 3s.
+
+        Returns:
+            list: For each RPC either its response payload or the exception it raised.
+        """
+
+        if not self.connected:
+            raise HardwareError("Cannot send an RPC if we are not in a connected state")
+
+        if timeout is None:
+            timeout = 3.0
+
+        rpcs = list(rpcs)
+        recordings = None
+
+        if self.connection_interrupted:
+            self._try_reconnect()
+
+        if self._recorder is not None:
+            recordings = [RecordedRPC(self.connection_string, address, rpc_id, call_payload)
+                          for address, rpc_id, call_payload in rpcs]
+            for recording in recordings:
+                recording.start()
+
+        responses = self._loop.run_coroutine(self.adapter.send_rpcs(0, rpcs, timeout))
+
+        results = []
+        for i, ((address, rpc_id, _call_payload), response) in enumerate(zip(rpcs, responses)):
+            if isinstance(response, Exception):
+                status, payload = pack_rpc_response(None, response)
+            else:
+                status, payload = pack_rpc_response(response, None)
+
+            if recordings is not None:
+                recordings[i].finish(status, payload)
+                self._recorder.record(recordings[i])
+
+            try:
+                results.append(unpack_rpc_response(status, payload, rpc_id, address))
+            except VALID_RPC_EXCEPTIONS as err:
+                results.append(err)
+
+        if self.connection_interrupted:
+            self._try_reconnect()
+
+        return results
+
     def send_highspeed(self, data, progress_callback):
         """Send a script to a device at highspeed, reporting progress.
 
@@ -364,17 +409,17 @@ class AdapterStream:
         all.
 
         Returns:
-            queue.Queue: A queue that will be filled with reports from the device.
+            StreamQueue: A queue that will be filled with reports from the device.
         """
 
         if not self.connected:
             raise HardwareError("Cannot enable streaming if we are not in a connected state")
 
         if self._reports is not None:
-            _clear_queue(self._reports)
+            self._reports.clear()
             return self._reports
 
-        self._reports = queue.Queue()
+        self._reports = StreamQueue(self._queue_size, self._queue_policy)
         self._loop.run_coroutine(self.adapter.open_interface(0, 'streaming'))
 
         return self._reports
@@ -394,7 +439,7 @@ class AdapterStream:
         all.
 
         Returns:
-            queue.Queue: A queue that will be filled with trace data from the device.
+            StreamQueue: A queue that will be filled with trace data from the device.
 
             The trace data will be in disjoint bytes objects in the queue
         """
@@ -403,10 +448,10 @@ class AdapterStream:
             raise HardwareError("Cannot enable tracing if we are not in a connected state")
 
         if self._traces is not None:
-            _clear_queue(self._traces)
+            self._traces.clear()
             return self._traces
 
-        self._traces = queue.Queue()
+        self._traces = StreamQueue(self._queue_size, self._queue_policy)
         self._loop.run_coroutine(self.adapter.open_interface(0, 'tracing'))
 
         return self._traces
@@ -418,16 +463,28 @@ class AdapterStream:
         will be filled asynchronously as broadcast reports are received.
 
         Returns:
-            queue.Queue: A queue that will be filled with braodcast reports.
+            StreamQueue: A queue that will be filled with braodcast reports.
         """
 
         if self._broadcast_reports is not None:
-            _clear_queue(self._broadcast_reports)
+            self._broadcast_reports.clear()
             return self._broadcast_reports
 
-        self._broadcast_reports = queue.Queue()
+        self._broadcast_reports = StreamQueue(self._queue_size, self._queue_policy)
         return self._broadcast_reports
 
+    def queue_stats(self):
+        """Get the counters of the report, trace and broadcast queues.
+
+        Returns:
+            dict: A dictionary with ``reports``, ``traces`` and ``broadcasts``
+            keys containing each queue's :meth:`StreamQueue.stats` or None if
+            that queue has not been enabled.
+        """
+
+        queues = {'reports': self._reports, 'traces': self._traces, 'broadcasts': self._broadcast_reports}
+        return {name: (None if value is None else value.stats()) for name, value in queues.items()}
+
     def enable_debug(self):
         """Open the debug interface on the connected device."""
 
@@ -472,14 +529,16 @@ class AdapterStream:
         AdapterStream and it will shutdown the underlying device adapter,
         disconnect all devices and stop all background activity.
 
-        If this stream is configured to save a record of all RPCs, the RPCs
-        will be logged to a file at this point.
+        If this stream is configured to save a record of all RPCs, any RPCs
+        that have not been written to the recording yet are written and the
+        recording is closed.
         """
 
         try:
             self._loop.run_coroutine(self.adapter.stop())
         finally:
-            self._save_recording()
+            if self._recorder is not None:
+                self._recorder.close()
 
     def _on_notification(self, conn_string, _conn_id, name, event):
         if name not in ('device_seen', 'broadcast') and conn_string != self.connection_string:
@@ -499,22 +558,25 @@ class AdapterStream:
             self._on_progress(event.get('finished'), event.get('total'))
 
     def _on_broadcast(self, report):
-        if self._broadcast_reports is None:
+        broadcasts = self._broadcast_reports
+        if broadcasts is None:
             return
 
-        self._broadcast_reports.put(report)
+        broadcasts.offer(report)
 
     def _on_report(self, report):
-        if self._reports is None:
+        reports = self._reports
+        if reports is None:
             return
 
-        self._reports.put(report)
+        reports.offer(report)
 
     def _on_trace(self, tracing_data):
-        if self._traces is None:
+        traces = self._traces
+        if traces is None:
             return
 
-        self._traces.put(tracing_data)
+        traces.offer(tracing_data)
 
     def _on_scan(self, info):
         """Callback called when a new device is discovered on this CMDStream
@@ -542,30 +604,4 @@ class AdapterStream:
 
         self._logger.info("Connection to device %s was interrupted", self.connection_string)
         self.connection_interrupted = True
-
-    def _save_recording(self):
-        if not self._record:
-            return
-
-        with open(self._record, "w", encoding="utf-8") as outfile:
-            outfile.write("# IOTile RPC Recording\n")
-            outfile.write("# Format: 1.0\n\n")
-            outfile.write("Connection,Timestamp [utc isoformat],Address,RPC ID,"
-                          "Duration [ms],Status,Call,Response,Error\n")
-
-            for recording in self._recording:
-                outfile.write(recording.serialize())
-                outfile.write('\n')
-
-        self._record = None
-
-
-def _clear_queue(to_clear):
-    """Clear all items from a queue safely."""
-
-    while not to_clear.empty():
-        try:
-            to_clear.get(False)
-            to_clear.task_done()
-        except queue.Empty:
-            continue
+        self.connection_generation += 1
@@ -0,0 +1,470 @@
+"""Incremental recording and replay of the RPCs sent through an AdapterStream.
+
+RPCs are recorded by :class:`RPCRecorder`, which writes each RPC to disk from
+a background thread as soon as it finishes so that long sessions do not keep
+every RPC in memory and do not lose their recording if the process dies.
+Recordings can be saved either as the human readable CSV format or as a
+compact binary format and can be rotated into multiple files once they reach
+a given size.
+
+Recordings are read back with :class:`RPCRecording`, which can also replay
+them against another device, for example one provided by a
+VirtualDeviceAdapter, to check that it responds the same way and to measure
+how long it takes.
+"""
+
+import binascii
+import calendar
+import logging
+import os
+import queue
+import struct
+import threading
+from datetime import datetime
+from time import monotonic
+from iotile.core.exceptions import ArgumentError, DataError
+from ..exceptions import VALID_RPC_EXCEPTIONS
+from ..virtual import pack_rpc_response, unpack_rpc_response
+
+CSV_HEADER = ("# IOTile RPC Recording\n"
+              "# Format: 1.0\n\n"
+              "Connection,Timestamp [utc isoformat],Address,RPC ID,"
+              "Duration [ms],Status,Call,Response,Error\n")
+
+BINARY_MAGIC = b'IOTRPC'
+BINARY_VERSION = 1
+_BINARY_HEADER = struct.Struct("<6sH")
+
+# timestamp, runtime, address, rpc_id, status, connection, call, response and error lengths
+_BINARY_RECORD = struct.Struct("<dfBHBHHHH")
+
+
+class RecordedRPC:
+    """A single RPC that was sent to a device.
+
+    Args:
+        connection (str): The connection string of the device.
+        address (int): The address of the tile that the RPC was sent to.
+        rpc_id (int): The id of the RPC.
+        call (bytes): The RPC's call payload.
+    """
+
+    def __init__(self, connection, address, rpc_id, call):
+        if isinstance(connection, bytes):
+            connection = connection.decode('utf-8')
+
+        self.connection = connection
+        self.address = address
+        self.rpc_id = rpc_id
+        self.call = binascii.hexlify(call).decode('utf-8')
+
+        self.status = -1
+        self.start_stamp = None
+
+        self.response = ""
+        self.error = ""
+
+        self.runtime = 0
+        self._start_time = 0
+
+    def start(self):
+        """Mark the beginning of a recorded RPC."""
+
+        self._start_time = monotonic()
+        self.start_stamp = datetime.utcnow()
+
+    def finish(self, status, response):
+        """Mark the end of a recorded RPC."""
+
+        self.response = binascii.hexlify(response).decode('utf-8')
+        self.status = status
+        self.runtime = monotonic() - self._start_time
+
+    def serialize(self):
+        """Convert this recorded RPC into a string."""
+
+        return "{},{: <26},{:2d},{:#06x},{:#04x},{:5.0f},{: <40},{: <40},{}".\
+            format(self.connection, self.start_stamp.isoformat(), self.address, self.rpc_id,
+                   self.status, self.runtime * 1000, self.call, self.response, self.error)
+
+    def encode(self):
+        """Convert this recorded RPC into its compact binary form."""
+
+        connection = str(self.connection).encode('utf-8')
+        call = binascii.unhexlify(self.call)
+        response = binascii.unhexlify(self.response)
+        error = self.error.encode('utf-8')
+
+        stamp = calendar.timegm(self.start_stamp.timetuple()) + self.start_stamp.microsecond / 1e6
+        header = _BINARY_RECORD.pack(stamp, self.runtime, self.address, self.rpc_id, self.status & 0xFF,
+                                     len(connection), len(call), len(response), len(error))
+
+        return b''.join((header, connection, call, response, error))
+
+    @classmethod
+    def Restore(cls, connection, start_stamp, address, rpc_id, status, runtime, call, response, error=""):
+        """Create a RecordedRPC from values that were loaded from a recording.
+
+        Args:
+            connection (str): The connection string of the device.
+            start_stamp (datetime): When the RPC was started.
+            address (int): The address of the tile that the RPC was sent to.
+            rpc_id (int): The id of the RPC.
+            status (int): The status byte returned by the RPC.
+            runtime (float): How long the RPC took in seconds.
+            call (bytes): The RPC's call payload.
+            response (bytes): The RPC's response payload.
+            error (str): Any error message that was recorded.
+
+        Returns:
+            RecordedRPC: The restored RPC.
+        """
+
+        rpc = cls(connection, address, rpc_id, call)
+        rpc.start_stamp = start_stamp
+        rpc.status = status
+        rpc.runtime = runtime
+        rpc.response = binascii.hexlify(response).decode('utf-8')
+        rpc.error = error
+        return rpc
+
+    @property
+    def call_payload(self):
+        """bytes: The RPC's call payload."""
+        return binascii.unhexlify(self.call)
+
+    @property
+    def response_payload(self):
+        """bytes: The RPC's response payload."""
+        return binascii.unhexlify(self.response)
+
+
+def _recording_format(path, format_name):
+    if format_name is None:
+        format_name = 'binary' if path.endswith('.bin') else 'csv'
+
+    if format_name not in ('csv', 'binary'):
+        raise ArgumentError("Unknown RPC recording format", format=format_name, known_formats=['csv', 'binary'])
+
+    return format_name
+
+
+class RPCRecorder:
+    """Write recorded RPCs to a file from a background thread.
+
+    RPCs are written in the order that they are passed to :meth:`record`.
+    The file is flushed at least every ``flush_interval`` seconds while RPCs
+    are being recorded.  If ``max_size`` is given, the file is rotated once it
+    is larger than ``max_size`` bytes: the current file is renamed with a
+    ``.1`` suffix, older files are renamed to ``.2``, ``.3`` and so on and
+    files beyond ``backup_count`` are deleted.  Each file starts with its own
+    header so it can be read on its own.
+
+    If writing the recording fails, the error is logged and stored in
+    :attr:`error` and every RPC recorded after that is dropped.
+
+    Args:
+        path (str): The path of the file to record RPCs to.
+        format_name (str): Either ``csv`` or ``binary``.  If not given, files
+            ending in ``.bin`` use the binary format and all others use csv.
+        max_size (int): The size in bytes at which to rotate the file.
+            Defaults to 0, which means never rotate.
+        backup_count (int): The number of rotated files to keep.
+        flush_interval (float): The maximum number of seconds that recorded
+            RPCs can wait before being flushed to disk.
+    """
+
+    def __init__(self, path, format_name=None, max_size=0, backup_count=5, flush_interval=1.0):
+        self.path = path
+        self.format = _recording_format(path, format_name)
+        self.max_size = max_size
+        self.backup_count = backup_count
+        self.flush_interval = flush_interval
+
+        self._logger = logging.getLogger(__name__)
+        self._queue = queue.Queue()
+        self._file = None
+        self._size = 0
+        self._closed = False
+        self._error = None
+        self._error_lock = threading.Lock()
+        self.dropped = 0
+
+        self._open()
+
+        self._thread = threading.Thread(target=self._writer, name="RPCRecorder", daemon=True)
+        self._thread.start()
+
+    def record(self, rpc):
+        """Queue a finished RPC to be written to the recording.
+
+        Args:
+            rpc (RecordedRPC): The RPC to record.
+        """
+
+        # Nothing drains the queue once the writer has failed
+        with self._error_lock:
+            if self._error is not None:
+                self.dropped += 1
+                return
+
+            self._queue.put(rpc)
+
+    @property
+    def error(self):
+        """Exception: The error that stopped RPCs from being written, or None."""
+
+        return self._error
+
+    def close(self):
+        """Write all queued RPCs and close the recording.
+
+        This method may be called multiple times.
+        """
+
+        if self._closed:
+            return
+
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join()
+
+    def _open(self):
+        if self.format == 'binary':
+            self._file = open(self.path, "wb")
+            header = _BINARY_HEADER.pack(BINARY_MAGIC, BINARY_VERSION)
+        else:
+            self._file = open(self.path, "w", encoding="utf-8")
+            header = CSV_HEADER
+
+        self._file.write(header)
+        self._file.flush()
+        self._size = len(header)
+
+    def _rotate(self):
+        self._file.close()
+
+        if self.backup_count > 0:
+            for i in range(self.backup_count - 1, 0, -1):
+                older = "%s.%d" % (self.path, i)
+                if os.path.exists(older):
+                    os.replace(older, "%s.%d" % (self.path, i + 1))
+
+            os.replace(self.path, self.path + ".1")
+
+        self._open()
+
+    def _encode(self, rpc):
+        if self.format == 'binary':
+            return rpc.encode()
+
+        return rpc.serialize() + '\n'
+
+    def _writer(self):
+        last_flush = monotonic()
+        dirty = False
+
+        try:
+            while True:
+                timeout = None
+                if dirty:
+                    timeout = max(0, last_flush + self.flush_interval - monotonic())
+
+                try:
+                    rpc = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    rpc = False
+
+                if rpc is None:
+                    break
+
+                if rpc is not False:
+                    data = self._encode(rpc)
+                    self._file.write(data)
+                    self._size += len(data)
+                    dirty = True
+
+                    if self.max_size and self._size >= self.max_size:
+                        self._rotate()
+                        last_flush = monotonic()
+                        dirty = False
+                        continue
+
+                if dirty and monotonic() - last_flush >= self.flush_interval:
+                    self._file.flush()
+                    last_flush = monotonic()
+                    dirty = False
+        except Exception as err:  # pylint:disable=broad-except;We must not crash silently in a background thread
+            self._logger.exception("Error writing RPC recording to %s, no more RPCs will be recorded", self.path)
+
+            with self._error_lock:
+                self._error = err
+
+                while not self._queue.empty():
+                    if self._queue.get_nowait() is not None:
+                        self.dropped += 1
+        finally:
+            self._file.close()
+
+
+def _rpc_result(response, exception=None):
+    """Convert what AdapterStream.send_rpc returned or raised to a comparable value.
+
+    Statuses cannot be compared directly since AdapterStream.send_rpc does not
+    preserve every status code that a device can return.
+    """
+
+    status, response = pack_rpc_response(response, exception)
+    return status, bytes(response)
+
+
+def _parse_stamp(stamp):
+    if '.' in stamp:
+        return datetime.strptime(stamp, "%Y-%m-%dT%H:%M:%S.%f")
+
+    return datetime.strptime(stamp, "%Y-%m-%dT%H:%M:%S")
+
+
+class RPCRecording:
+    """Read and replay a recording made by :class:`RPCRecorder`.
+
+    Iterating over an RPCRecording yields :class:`RecordedRPC` objects in the
+    order that they were recorded, starting with the oldest rotated file.
+    The format of each file is detected from its contents.  If the last
+    record of a binary file is incomplete because the process that made it
+    was killed, it is ignored.
+
+    Args:
+        path (str): The path of the recording, as passed to RPCRecorder.
+        include_rotated (bool): Whether to also read rotated files.
+    """
+
+    def __init__(self, path, include_rotated=True):
+        self.path = path
+        self.paths = [path]
+
+        if include_rotated:
+            i = 1
+            while os.path.exists("%s.%d" % (path, i)):
+                self.paths.insert(0, "%s.%d" % (path, i))
+                i += 1
+
+    def __iter__(self):
+        for path in self.paths:
+            with open(path, "rb") as infile:
+                magic = infile.read(len(BINARY_MAGIC))
+
+            if magic == BINARY_MAGIC:
+                yield from self._iter_binary(path)
+            else:
+                yield from self._iter_csv(path)
+
+    @classmethod
+    def _iter_binary(cls, path):
+        with open(path, "rb") as infile:
+            data = infile.read()
+
+        _magic, version = _BINARY_HEADER.unpack_from(data)
+        if version != BINARY_VERSION:
+            raise DataError("Unsupported binary RPC recording version", path=path, version=version)
+
+        view = memoryview(data)
+        offset = _BINARY_HEADER.size
+        while offset + _BINARY_RECORD.size <= len(data):
+            stamp, runtime, address, rpc_id, status, conn_len, call_len, resp_len, error_len = \
+                _BINARY_RECORD.unpack_from(data, offset)
+
+            start = offset + _BINARY_RECORD.size
+            end = start + conn_len + call_len + resp_len + error_len
+            if end > len(data):
+                break
+
+            connection = bytes(view[start:start + conn_len]).decode('utf-8')
+            start += conn_len
+            call = bytes(view[start:start + call_len])
+            start += call_len
+            response = bytes(view[start:start + resp_len])
+            start += resp_len
+            error = bytes(view[start:end]).decode('utf-8')
+
+            yield RecordedRPC.Restore(connection, datetime.utcfromtimestamp(stamp), address, rpc_id, status,
+                                      runtime, call, response, error)
+            offset = end
+
+    @classmethod
+    def _iter_csv(cls, path):
+        with open(path, "r", encoding="utf-8") as infile:
+            in_header = True
+            for line in infile:
+                line = line.rstrip('\n')
+                if in_header:
+                    if line.startswith('Connection,'):
+                        in_header = False
+                    continue
+
+                if line == "":
+                    continue
+
+                fields = line.rsplit(',', 8)
+                if len(fields) != 9:
+                    raise DataError("Invalid line in RPC recording", path=path, line=line)
+
+                connection, stamp, address, rpc_id, status, runtime, call, response, error = fields
+                try:
+                    yield RecordedRPC.Restore(connection, _parse_stamp(stamp.strip()), int(address), int(rpc_id, 16),
+                                              int(status, 16), float(runtime) / 1000.0,
+                                              binascii.unhexlify(call.strip()), binascii.unhexlify(response.strip()),
+                                              error)
+                except (ValueError, binascii.Error) as err:
+                    raise DataError("Invalid line in RPC recording", path=path, line=line, error=str(err)) from err
+
+    def replay(self, stream, timeout=3.0):
+        """Send every recorded RPC to a device and compare the responses.
+
+        The device must already be connected.  For example, to replay a
+        recording against a virtual device::
+
+            stream = AdapterStream(VirtualDeviceAdapter(devices=[device]))
+            stream.connect_direct('1')
+            result = RPCRecording('recording.bin').replay(stream)
+
+        Args:
+            stream (AdapterStream): A connected AdapterStream to send the RPCs with.
+            timeout (float): The timeout to use for each RPC.
+
+        Returns:
+            dict: The number of RPCs sent as ``count``, the indices of the
+            RPCs whose status or response did not match the recording as
+            ``mismatches``, the number of seconds the replay took as
+            ``elapsed`` and the total runtime of the recorded RPCs as
+            ``recorded_runtime``.
+        """
+
+        count = 0
+        mismatches = []
+        recorded_runtime = 0.0
+
+        start = monotonic()
+        for i, rpc in enumerate(self):
+            try:
+                actual = _rpc_result(stream.send_rpc(rpc.address, rpc.rpc_id, rpc.call_payload, timeout=timeout))
+            except VALID_RPC_EXCEPTIONS as exc:
+                actual = _rpc_result(None, exc)
+
+            try:
+                expected = _rpc_result(unpack_rpc_response(rpc.status, rpc.response_payload, rpc.rpc_id, rpc.address))
+            except VALID_RPC_EXCEPTIONS as exc:
+                expected = _rpc_result(None, exc)
+
+            if actual != expected:
+                mismatches.append(i)
+
+            count += 1
+            recorded_runtime += rpc.runtime
+
+        return {
+            'count': count,
+            'mismatches': mismatches,
+            'elapsed': monotonic() - start,
+            'recorded_runtime': recorded_runtime
+        }
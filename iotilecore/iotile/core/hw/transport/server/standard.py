@@ -366,6 +366,33 @@ class StandardDeviceServer(AbstractDeviceServer):
         conn_id = self._client_connection(client_id, conn_string)
         return await self.adapter.send_rpc(conn_id, address, rpc_id, payload, timeout)
 
+    async def send_rpcs(self, client_id, conn_string, rpcs, timeout):
+        """Send a batch of RPCs on behalf of a client.
+
+        See :meth:`AbstractDeviceAdapter.send_rpcs`.
+
+        Args:
+            client_id (str): The client we are working for.
+            conn_string (str): A connection string that will be
+                passed to the underlying device adapter to connect.
+            rpcs (list of (int, int, bytes)): The address, rpc_id and payload
+                of each RPC.
+            timeout (float): The expected timeout of each RPC to hand to the
+                underlying device adapter.
+
+        Returns:
+            list: For each RPC either its response or the exception it raised.
+
+        Raises:
+            DeviceServerError: There is an issue with your client_id such
+                as not being connected to the device.
+            DeviceAdapterError: If there is a hardware or communication issue
+                invoking the RPCs.
+        """
+
+        conn_id = self._client_connection(client_id, conn_string)
+        return await self.adapter.send_rpcs(conn_id, rpcs, timeout)
+
     async def send_script(self, client_id, conn_string, script):
         """Send a script to a device on behalf of a client.
 
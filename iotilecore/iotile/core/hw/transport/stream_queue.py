@@ -0,0 +1,251 @@
+"""Bounded queues and buffers for data received asynchronously from devices.
+
+Reports, traces and broadcasts are delivered to AdapterStream from the
+background event loop as they arrive and must be buffered until the user
+looks at them.  The classes in this module bound how much data is buffered
+and let consumers wait for new data without polling, either by blocking a
+thread or by awaiting from any asyncio event loop.
+"""
+
+import asyncio
+from collections import deque
+import queue
+from iotile.core.exceptions import ArgumentError
+
+
+class StreamQueue(queue.Queue):
+    """A queue.Queue with an overflow policy, counters and async iteration.
+
+    Producers should call :meth:`offer` to add items, which applies the
+    overflow policy when the queue is full.  Consumers can use the normal
+    blocking ``queue.Queue`` methods or ``async for`` from any event loop.
+
+    The overflow policies are:
+
+    - ``drop``: drop the new item.
+    - ``oldest``: drop the oldest item in the queue to make room.
+    - ``block``: wait until there is room in the queue.  Since items are
+      normally offered from the background event loop, this stops all
+      processing on that loop until the consumer catches up.
+
+    Args:
+        maxsize (int): The maximum number of items to buffer.  If this is 0,
+            the queue is unbounded and the policy is never applied.
+        policy (str): The overflow policy, one of ``drop``, ``oldest`` or ``block``.
+    """
+
+    POLICIES = frozenset(['drop', 'oldest', 'block'])
+
+    def __init__(self, maxsize=0, policy='oldest'):
+        if maxsize < 0:
+            raise ArgumentError("Queue size must not be negative", maxsize=maxsize)
+
+        if policy not in self.POLICIES:
+            raise ArgumentError("Unknown queue overflow policy", policy=policy, known_policies=sorted(self.POLICIES))
+
+        super(StreamQueue, self).__init__(maxsize)
+
+        self.policy = policy
+        self.received = 0
+        self.dropped = 0
+        self.blocked = 0
+        self.high_water = 0
+
+        self._waiters = []
+
+    def offer(self, item):
+        """Add an item to the queue, applying the overflow policy if it is full.
+
+        Args:
+            item (object): The item to add.
+
+        Returns:
+            bool: Whether the item was added to the queue.
+        """
+
+        with self.not_full:
+            self.received += 1
+
+            if 0 < self.maxsize <= self._qsize():
+                if self.policy == 'drop':
+                    self.dropped += 1
+                    return False
+
+                if self.policy == 'oldest':
+                    self._get()
+                    self.unfinished_tasks -= 1
+                    self.dropped += 1
+                else:
+                    self.blocked += 1
+                    while self._qsize() >= self.maxsize:
+                        self.not_full.wait()
+
+            self._put(item)
+            self.unfinished_tasks += 1
+            self.high_water = max(self.high_water, self._qsize())
+            self.not_empty.notify()
+            self._wake_waiters()
+
+        return True
+
+    def clear(self):
+        """Remove all items from the queue without changing any counters."""
+
+        with self.mutex:
+            self.queue.clear()
+            self.unfinished_tasks = 0
+            self.all_tasks_done.notify_all()
+            self.not_full.notify_all()
+
+    def stats(self):
+        """Get the counters for this queue.
+
+        Returns:
+            dict: The ``received``, ``dropped`` and ``blocked`` counts along
+            with the current ``size``, the ``high_water`` size and the
+            ``maxsize`` and ``policy`` of the queue.
+        """
+
+        with self.mutex:
+            return {
+                'size': self._qsize(),
+                'maxsize': self.maxsize,
+                'policy': self.policy,
+                'received': self.received,
+                'dropped': self.dropped,
+                'blocked': self.blocked,
+                'high_water': self.high_water
+            }
+
+    async def get_async(self):
+        """Wait for and remove the next item from the queue.
+
+        This may be awaited from any event loop, including the one that is
+        adding items to the queue.
+
+        Returns:
+            object: The next item in the queue.
+        """
+
+        loop = asyncio.get_event_loop()
+
+        while True:
+            with self.mutex:
+                if self._qsize() > 0:
+                    item = self._get()
+                    self.not_full.notify()
+                    return item
+
+                future = loop.create_future()
+                self._waiters.append((loop, future))
+
+            await future
+
+    def _wake_waiters(self):
+        """Notify all coroutines waiting in get_async.  Must hold self.mutex."""
+
+        for loop, future in self._waiters:
+            loop.call_soon_threadsafe(_set_future, future)
+
+        self._waiters = []
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        return await self.get_async()
+
+
+def _set_future(future):
+    if not future.done():
+        future.set_result(None)
+
+
+class ChunkBuffer:
+    """A FIFO byte buffer that stores data as a list of received chunks.
+
+    Appending never copies previously received data and reading only copies
+    the bytes that are returned, so data can be streamed through the buffer
+    without the quadratic cost of growing and slicing a single bytearray.
+    """
+
+    def __init__(self):
+        self._chunks = deque()
+        self._offset = 0
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def append(self, data):
+        """Add data to the end of the buffer.
+
+        Args:
+            data (bytes): The data to add.
+        """
+
+        if len(data) == 0:
+            return
+
+        self._chunks.append(bytes(data))
+        self.size += len(data)
+
+    def clear(self):
+        """Remove all data from the buffer."""
+
+        self._chunks.clear()
+        self._offset = 0
+        self.size = 0
+
+    def peek(self):
+        """Get all of the data in the buffer without removing it.
+
+        Returns:
+            bytes: The buffered data.
+        """
+
+        if len(self._chunks) == 0:
+            return b''
+
+        first = self._chunks[0]
+        if len(self._chunks) > 1 or self._offset > 0:
+            first = b''.join(self._chunk_views())
+            self._chunks = deque([first])
+            self._offset = 0
+
+        return first
+
+    def read(self, size):
+        """Remove and return data from the front of the buffer.
+
+        Args:
+            size (int): The maximum number of bytes to read.
+
+        Returns:
+            bytearray: The data that was read.
+        """
+
+        size = min(size, self.size)
+        out = bytearray(size)
+
+        pos = 0
+        while pos < size:
+            chunk = self._chunks[0]
+            count = min(size - pos, len(chunk) - self._offset)
+            out[pos:pos + count] = memoryview(chunk)[self._offset:self._offset + count]
+            pos += count
+
+            self._offset += count
+            if self._offset == len(chunk):
+                self._chunks.popleft()
+                self._offset = 0
+
+        self.size -= size
+        return out
+
+    def _chunk_views(self):
+        for i, chunk in enumerate(self._chunks):
+            if i == 0 and self._offset > 0:
+                yield memoryview(chunk)[self._offset:]
+            else:
+                yield chunk
@@ -1,5 +1,6 @@
 """A list of update records that specify a script for updating a device."""
 
+import mmap
 import struct
 import hashlib
 import logging
@@ -59,10 +60,10 @@ class UpdateScript:
             raise ArgumentError("Script length does not match embedded length",
                                 embedded_length=total_length, length=len(script_data))
 
-        hashed_data = script_data[16:]
-
         sha = hashlib.sha256()
-        sha.update(hashed_data)
+        with memoryview(script_data) as view:
+            sha.update(view[16:])
+
         hash_value = sha.digest()[:16]
 
         if not compare_digest(embedded_hash, hash_value):
@@ -90,29 +91,78 @@ class UpdateScript:
             UpdateScript: The parsed update script.
         """
 
-        curr = 0
-        records = []
+        with memoryview(script_data) as view:
+            header = cls.ParseHeader(view)
+            records = list(cls._iter_binary_records(view, header.header_length, allow_unknown, show_rpcs))
+
+        return UpdateScript(records)
+
+    @classmethod
+    def iter_records(cls, path, allow_unknown=True, show_rpcs=False):
+        """Lazily parse the records in a binary update script file.
+
+        The file is memory mapped rather than read into memory and records
+        are parsed one at a time as they are requested, so only the record
+        currently being parsed needs to be held in memory.  The integrity
+        header is checked before any records are returned.
+
+        Args:
+            path (str): The path to the binary script file.
+            allow_unknown (bool): Allow the script to contain unknown records
+                so long as they have correct headers to allow us to skip them.
+            show_rpcs (bool): Show SendRPCRecord matches for each record rather than
+                the more specific operation
+
+        Raises:
+            ArgumentError: If the script contains malformed data that cannot
+                be parsed.
+            DataError: If the script contains unknown records and allow_unknown=False
+
+        Yields:
+            UpdateRecord: Each record in the script, in order.
+        """
+
+        with open(path, "rb") as infile:
+            # Empty files cannot be memory mapped but are also not valid scripts
+            if infile.seek(0, 2) < cls.SCRIPT_HEADER_LENGTH:
+                infile.seek(0)
+                cls.ParseHeader(infile.read())
+
+            with mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                with memoryview(mapped) as view:
+                    header = cls.ParseHeader(view)
+
+                    for record in cls._iter_binary_records(view, header.header_length, allow_unknown, show_rpcs):
+                        yield record
 
-        header = cls.ParseHeader(script_data)
-        curr = header.header_length
+    @classmethod
+    def _iter_binary_records(cls, view, curr, allow_unknown, show_rpcs):
+        """Parse records from a memoryview of a script starting at an offset.
+
+        Records are located using offsets into the view so that nothing is
+        copied except the bytes of the records that are passed to each
+        record class.
+        """
 
-        cls.logger.debug("Parsed script header: %s, skipping %d bytes", header, curr)
+        end = len(view)
 
         record_count = 0
         record_data = bytearray()
         partial_match = None
         match_offset = 0
 
-        while curr < len(script_data):
-            if len(script_data) - curr < UpdateRecord.HEADER_LENGTH:
-                raise ArgumentError("Script ended with a partial record", remaining_length=len(script_data) - curr)
+        while curr < end:
+            if end - curr < UpdateRecord.HEADER_LENGTH:
+                raise ArgumentError("Script ended with a partial record", remaining_length=end - curr)
 
             # Add another record to our current list of records that we're parsing
 
-            total_length, record_type = struct.unpack_from("<LB", script_data[curr:])
+            total_length, record_type = struct.unpack_from("<LB", view, curr)
             cls.logger.debug("Found record of type %d, length %d", record_type, total_length)
 
-            record_data += script_data[curr:curr+total_length]
+            with view[curr:curr+total_length] as record_view:
+                record_data += record_view
+
             record_count += 1
 
             curr += total_length
@@ -156,32 +206,59 @@ class UpdateScript:
             partial_match = None
             match_offset = 0
 
-            records.append(record)
+            yield record
 
-        return UpdateScript(records)
+    def iter_encoded(self):
+        """Encode this script incrementally.
 
-    def encode(self):
-        """Encode this record into a binary blob.
+        Each record is only encoded once and the integrity hash is calculated
+        as the records are encoded, so no intermediate copies of the whole
+        script are made.  Joining the returned chunks gives the same result
+        as encode().
 
-        This binary blob could be parsed via a call to FromBinary().
+        Returns:
+            list of bytes-like: The chunks of the encoded script, in order.
+        """
+
+        chunks = [record.encode() for record in self.records]
+        total_length = sum(len(chunk) for chunk in chunks) + self.SCRIPT_HEADER_LENGTH
+
+        header = struct.pack("<LL", self.SCRIPT_MAGIC, total_length)
+
+        sha = hashlib.sha256()
+        sha.update(header)
+        for chunk in chunks:
+            sha.update(chunk)
+
+        return [sha.digest()[:16], header] + chunks
+
+    def write(self, outfile):
+        """Write this encoded script to a file one record at a time.
+
+        Args:
+            outfile (file): A binary file object to write the script to.
 
         Returns:
-            bytearray: The binary encoded script.
+            int: The number of bytes written.
         """
 
-        blob = bytearray()
+        written = 0
+        for chunk in self.iter_encoded():
+            outfile.write(chunk)
+            written += len(chunk)
 
-        for record in self.records:
-            blob += record.encode()
+        return written
 
-        header = struct.pack("<LL", self.SCRIPT_MAGIC, len(blob) + self.SCRIPT_HEADER_LENGTH)
-        blob = header + blob
+    def encode(self):
+        """Encode this record into a binary blob.
 
-        sha = hashlib.sha256()
-        sha.update(blob)
-        hash_value = sha.digest()[:16]
+        This binary blob could be parsed via a call to FromBinary().
+
+        Returns:
+            bytearray: The binary encoded script.
+        """
 
-        return bytearray(hash_value) + blob
+        return bytearray().join(self.iter_encoded())
 
     def __eq__(self, other):
         if not isinstance(other, UpdateScript):
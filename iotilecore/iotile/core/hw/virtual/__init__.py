@@ -122,10 +122,10 @@ from .virtualdevice_simple import SimpleVirtualDevice
 
 from .common_types import (rpc, tile_rpc, unpack_rpc_payload, pack_rpc_payload,
                            pack_rpc_response, unpack_rpc_response, RPCDispatcher,
-                           RPCDeclaration)
+                           RPCDeclaration, compile_rpc_format, CompiledRPCFormat)
 
 __all__ = ['BaseVirtualTile', 'VirtualTile', 'BaseVirtualDevice',
            'AbstractAsyncDeviceChannel', 'StandardVirtualDevice',
            'RPCDeclaration', 'SimpleVirtualDevice', 'tile_rpc', 'rpc',
            'unpack_rpc_payload', 'pack_rpc_payload', 'pack_rpc_response',
-           'unpack_rpc_response']
+           'unpack_rpc_response', 'compile_rpc_format', 'CompiledRPCFormat']
@@ -1,5 +1,6 @@
 """Shared decorators and exceptions used in virtual tiles and devices."""
 
+import re
 import struct
 from collections import namedtuple
 import binascii
@@ -13,36 +14,173 @@ from ..exceptions import (RPCNotFoundError, RPCInvalidArgumentsError,
 RPCDeclaration = namedtuple("RPCDeclaration", ["rpc_id", "arg_format", "resp_format"])
 
 
-def _create_argcode(code, arg_bytes):
-    if not code.endswith('V'):
-        return "<" + code
+# Matches one item of a struct format code, e.g. 'L', '3H' or '12s'
+_FORMAT_ITEM = re.compile(r'(\d*)([xcbB?hHiIlLqQnNefdspP])')
 
-    code = code[:-1]
-    fixed_size = struct.calcsize("<" + code)
-    var_size = len(arg_bytes) - fixed_size
 
-    if var_size < 0:
-        raise RPCInvalidArgumentsError("Argument was too small for variable size argument value", arg_format=code,
-                                       minimum_size=fixed_size, actual_size=len(arg_bytes),
-                                       payload=binascii.hexlify(arg_bytes))
+class CompiledRPCFormat:
+    """An RPC argument or response format compiled into struct.Struct objects.
 
-    return "<" + code + "%ds" % var_size
+    Compiled formats should be obtained from :func:`compile_rpc_format`,
+    which caches them by format code, rather than created directly.
 
+    If the format code ends in ``V``, the last item is a variable length
+    bytes object and a separate Struct is cached for each length that is
+    seen.
 
-def _create_respcode(code, resp):
-    if not code.endswith('V'):
-        return "<" + code
+    Packing checks the same things as packing and unpacking again to make
+    sure that nothing was truncated would, but does so by checking the length
+    of each fixed size string and the value of each bool directly.  Formats
+    that contain floating point items are still checked by round-tripping.
 
-    code = code[:-1]
+    Args:
+        arg_format (str): a struct format code (without the <).  This format
+            code may include the final character V, which means that it
+            expects a variable length bytearray.
+    """
+
+    def __init__(self, arg_format):
+        self.arg_format = arg_format
+        self.variable = arg_format.endswith('V')
+        self.fixed_code = arg_format[:-1] if self.variable else arg_format
+
+        self._fixed = struct.Struct("<" + self.fixed_code)
+        self.fixed_size = self._fixed.size
+        self._variable_structs = {}
+
+        self._roundtrip = False
+        self._string_checks = []
+        self._bool_checks = []
+
+        index = 0
+        for count, code in _FORMAT_ITEM.findall(self.fixed_code):
+            if code == 'x':
+                continue
+
+            if code in 'sp':
+                if code == 'p':
+                    self._roundtrip = True
+
+                self._string_checks.append((index, int(count) if count else 1))
+                index += 1
+                continue
+
+            count = int(count) if count else 1
+            if code in 'efd':
+                self._roundtrip = True
+            elif code == '?':
+                self._bool_checks.extend(range(index, index + count))
+
+            index += count
+
+    def _struct(self, variable_length):
+        """Get the Struct for packing or unpacking with a given variable length."""
+
+        if not self.variable:
+            return self._fixed
+
+        packer = self._variable_structs.get(variable_length)
+        if packer is None:
+            packer = struct.Struct("<%s%ds" % (self.fixed_code, variable_length))
+            self._variable_structs[variable_length] = packer
+
+        return packer
+
+    def _check_values(self, args):
+        """Check that no strings or bools would be changed by packing."""
+
+        for i, size in self._string_checks:
+            if len(args[i]) != size:
+                return False
+
+        for i in self._bool_checks:
+            if args[i] != bool(args[i]):
+                return False
+
+        return True
+
+    def pack(self, args):
+        """Pack a list of arguments according to this format.
+
+        Args:
+            args (list): The arguments to pack.
+
+        Returns:
+            bytes: The packed argument buffer.
+        """
+
+        variable_length = 0
+        if self.variable:
+            variable_length = len(args[-1])
 
-    final_length = len(resp[-1])
-    fixed_size = struct.calcsize("<" + code)
+            if self.fixed_size + variable_length > 20:
+                raise RPCInvalidReturnValueError(0, 0, self.fixed_code, args, reason="Variable length return value is too large for rpc response payload (20 bytes)",
+                                                 fixed_code=self.fixed_code, fixed_length=self.fixed_size, variable_length=variable_length)
 
-    if fixed_size + final_length > 20:
-        raise RPCInvalidReturnValueError(0, 0, code, resp, reason="Variable length return value is too large for rpc response payload (20 bytes)",
-                                         fixed_code=code, fixed_length=fixed_size, variable_length=final_length)
+        packer = self._struct(variable_length)
+        packed_result = packer.pack(*args)
 
-    return "<" + code + "%ds" % final_length
+        if self._roundtrip:
+            valid = tuple(args) == packer.unpack(packed_result)
+        elif self._string_checks or self._bool_checks:
+            valid = self._check_values(args)
+        else:
+            valid = True
+
+        if not valid:
+            code = "<" + self.fixed_code
+            if self.variable:
+                code += "%ds" % variable_length
+
+            raise RPCInvalidArgumentsError("Passed values would be truncated, please validate the size of your string",
+                                           code=code, args=args)
+
+        return packed_result
+
+    def unpack(self, payload):
+        """Unpack a binary payload according to this format.
+
+        Args:
+            payload (bytes): The binary payload that should be unpacked.
+
+        Returns:
+            tuple: The unpacked payload items.
+        """
+
+        if not self.variable:
+            return self._fixed.unpack(payload)
+
+        var_size = len(payload) - self.fixed_size
+        if var_size < 0:
+            raise RPCInvalidArgumentsError("Argument was too small for variable size argument value", arg_format=self.fixed_code,
+                                           minimum_size=self.fixed_size, actual_size=len(payload),
+                                           payload=binascii.hexlify(payload))
+
+        return self._struct(var_size).unpack(payload)
+
+
+_COMPILED_FORMATS = {}
+
+
+def compile_rpc_format(arg_format):
+    """Get the compiled version of an RPC format code.
+
+    Compiled formats are cached so each format code is only compiled once.
+
+    Args:
+        arg_format (str): a struct format code (without the <) that may
+            end in V for a variable length bytearray.
+
+    Returns:
+        CompiledRPCFormat: The compiled format.
+    """
+
+    compiled = _COMPILED_FORMATS.get(arg_format)
+    if compiled is None:
+        compiled = CompiledRPCFormat(arg_format)
+        _COMPILED_FORMATS[arg_format] = compiled
+
+    return compiled
 
 
 def pack_rpc_response(response=None, exception=None):
@@ -113,14 +251,7 @@ def pack_rpc_payload(arg_format, args):
         bytes: The packed argument buffer.
     """
 
-    code = _create_respcode(arg_format, args)
-
-    packed_result = struct.pack(code, *args)
-    unpacked_validation = struct.unpack(code, packed_result)
-    if tuple(args) != unpacked_validation:
-        raise RPCInvalidArgumentsError("Passed values would be truncated, please validate the size of your string",
-                                       code=code, args=args)
-    return packed_result
+    return compile_rpc_format(arg_format).pack(args)
 
 
 def unpack_rpc_payload(resp_format, payload):
@@ -136,8 +267,7 @@ def unpack_rpc_payload(resp_format, payload):
         list: A list of the unpacked payload items.
     """
 
-    code = _create_argcode(resp_format, payload)
-    return struct.unpack(code, payload)
+    return compile_rpc_format(resp_format).unpack(payload)
 
 
 def rpc(address, rpc_id, arg_format, resp_format=None):
@@ -174,7 +304,7 @@ def rpc(address, rpc_id, arg_format, resp_format=None):
     def _rpc_wrapper(func):
         async def _rpc_executor(self, payload):
             try:
-                args = unpack_rpc_payload(arg_format, payload)
+                args = compile_rpc_format(arg_format).unpack(payload)
             except struct.error as exc:
                 raise RPCInvalidArgumentsError(str(exc), arg_format=arg_format, payload=binascii.hexlify(payload))
 
@@ -187,7 +317,7 @@ def rpc(address, rpc_id, arg_format, resp_format=None):
 
             if resp_format is not None:
                 try:
-                    return pack_rpc_payload(resp_format, resp)
+                    return compile_rpc_format(resp_format).pack(resp)
                 except struct.error as exc:
                     raise RPCInvalidReturnValueError(address, rpc_id, resp_format, resp, error=exc) from exc
 
@@ -2,7 +2,9 @@ import unittest
 import os
 import pytest
 from iotile.core.exceptions import *
+from iotile.core.dev import ComponentRegistry
 from iotile.core.hw.auth.auth_chain import ChainedAuthProvider
+from iotile.core.hw.reports import SignedListReport, IOTileReading, IOTileReportParser
 
 
 def test_key_finding(monkeypatch):
@@ -38,3 +40,75 @@ def test_key_finding(monkeypatch):
 
     #Make sure we also find the hash only auth module
     auth.sign_report(2, 0, data, report_id=0, sent_timestamp=0)
+
+
+def test_chain_cache():
+    """Make sure the provider chain is cached and invalidated when extensions change."""
+
+    ChainedAuthProvider.ClearCache()
+
+    shared = ChainedAuthProvider.Shared()
+    assert ChainedAuthProvider.Shared() is shared
+
+    auth1 = ChainedAuthProvider()
+    auth2 = ChainedAuthProvider()
+    assert [type(x) for _, x in auth1.providers] == [type(x) for _, x in auth2.providers]
+    assert auth1._auth_factories is auth2._auth_factories
+
+    reg = ComponentRegistry()
+    reg.register_extension('iotile.default_auth_providers', 'test', (50, 'BasicAuthProvider', {}))
+
+    try:
+        auth3 = ChainedAuthProvider()
+        assert len(auth3.providers) == len(auth1.providers) + 1
+        assert ChainedAuthProvider.Shared() is not shared
+    finally:
+        reg.clear_extensions('iotile.default_auth_providers')
+
+    assert len(ChainedAuthProvider().providers) == len(auth1.providers)
+
+
+def test_injected_signer():
+    """Make sure reports and the report parser use an injected signer."""
+
+    class _CountingProvider(ChainedAuthProvider):
+        def __init__(self):
+            super(_CountingProvider, self).__init__()
+            self.verify_count = 0
+
+        def verify_report(self, device_id, root, data, signature, **kwargs):
+            self.verify_count += 1
+            return super(_CountingProvider, self).verify_report(device_id, root, data, signature, **kwargs)
+
+    signer = _CountingProvider()
+    report = SignedListReport.FromReadings(1, [IOTileReading(0, 0x1000, 1)])
+
+    parser = IOTileReportParser(signer=signer)
+    parser.add_data(report.encode())
+    parser.add_data(report.encode())
+
+    assert len(parser.reports) == 2
+    assert parser.reports[0].verified
+    assert parser.reports[0].signer is signer
+    assert signer.verify_count == 2
+
+
+def test_chained_verify_reports(monkeypatch):
+    """Make sure batch verification falls through the chain of providers."""
+
+    monkeypatch.setenv('USER_KEY_00000001', '00' * 32)
+
+    auth = ChainedAuthProvider()
+    data = bytearray("what do ya want for nothing?".encode('utf-8'))
+    kwargs = dict(report_id=5, sent_timestamp=10)
+
+    user_sig = auth.sign_report(1, 1, data, **kwargs)['signature']
+    hash_sig = auth.sign_report(1, 0, data, **kwargs)['signature']
+
+    results = auth.verify_reports([(1, 1, data, user_sig, kwargs),
+                                   (1, 0, data, hash_sig, kwargs),
+                                   (1, 2, data, hash_sig, kwargs)])
+
+    assert results[0]['verified'] is True
+    assert results[1]['verified'] is True
+    assert results[2] is None
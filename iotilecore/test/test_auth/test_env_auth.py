@@ -53,3 +53,81 @@ def test_unsupported_methods():
 
     with pytest.raises(NotFoundError):
         auth.verify_report(1, 2, data, bytearray(), report_id=0, sent_timestamp=0)
+
+
+def test_key_cache(monkeypatch):
+    """Make sure derived keys are cached, bounded and invalidated on rotation."""
+
+    key1 = '00' * 32
+    key2 = '11' * 32
+
+    monkeypatch.setenv('USER_KEY_00000001', key1)
+
+    auth = EnvAuthProvider({'report_key_cache_size': 2})
+    data = bytearray("what do ya want for nothing?".encode('utf-8'))
+
+    sig1 = auth.sign_report(1, 1, data, report_id=0, sent_timestamp=0)['signature']
+    assert auth.sign_report(1, 1, data, report_id=0, sent_timestamp=0)['signature'] == sig1
+    assert len(auth._report_keys) == 1
+
+    auth.sign_report(1, 1, data, report_id=1, sent_timestamp=0)
+    auth.sign_report(1, 1, data, report_id=2, sent_timestamp=0)
+    assert [key[:3] for key in auth._report_keys] == [(1, 1, 0), (1, 2, 0)]
+
+    # Rotating the key in the environment must invalidate all cached keys
+    monkeypatch.setenv('USER_KEY_00000001', key2)
+    sig2 = auth.sign_report(1, 1, data, report_id=0, sent_timestamp=0)['signature']
+    assert sig2 != sig1
+    assert [key[:3] for key in auth._report_keys] == [(1, 0, 0)]
+
+    auth.invalidate_keys(1)
+    assert len(auth._report_keys) == 0
+    assert len(auth._root_keys) == 0
+
+    monkeypatch.delenv('USER_KEY_00000001')
+    with pytest.raises(NotFoundError):
+        auth.sign_report(1, 1, data, report_id=0, sent_timestamp=0)
+
+
+def test_verify_reports(monkeypatch):
+    """Make sure batch verification reports results in order."""
+
+    monkeypatch.setenv('USER_KEY_00000001', '00' * 32)
+
+    auth = EnvAuthProvider()
+    data = bytearray("what do ya want for nothing?".encode('utf-8'))
+    kwargs = dict(report_id=5, sent_timestamp=10)
+    signature = auth.sign_report(1, 1, data, **kwargs)['signature']
+
+    results = auth.verify_reports([(1, 1, data, signature, kwargs),
+                                   (1, 1, data, bytearray(16), kwargs),
+                                   (1, 0, data, signature, kwargs)])
+
+    assert results[0]['verified'] is True
+    assert results[1]['verified'] is False
+    assert results[2] is None
+
+
+def test_key_cache_eviction(monkeypatch):
+    """Make sure report keys are not reused after their root key is evicted and rotated."""
+
+    monkeypatch.setenv('USER_KEY_00000001', '00' * 32)
+    monkeypatch.setenv('USER_KEY_00000002', '22' * 32)
+
+    auth = EnvAuthProvider({'root_key_cache_size': 1})
+    data = bytearray("what do ya want for nothing?".encode('utf-8'))
+
+    sig1 = auth.sign_report(1, 1, data, report_id=0, sent_timestamp=0)['signature']
+    assert len(auth._report_keys) == 1
+
+    # Evicting the root key of device 1 must also drop its report keys
+    auth.sign_report(2, 1, data, report_id=0, sent_timestamp=0)
+    assert list(auth._root_keys) == [2]
+    assert [key[0] for key in auth._report_keys] == [2]
+
+    monkeypatch.setenv('USER_KEY_00000001', '11' * 32)
+    sig2 = auth.sign_report(1, 1, data, report_id=0, sent_timestamp=0)['signature']
+    assert sig2 != sig1
+
+    fresh = EnvAuthProvider()
+    assert fresh.sign_report(1, 1, data, report_id=0, sent_timestamp=0)['signature'] == sig2
@@ -1,5 +1,6 @@
 import pytest
 import os
+import json
 from iotile.core.dev.registry import ComponentRegistry, _check_registry_type
 from iotile.core.exceptions import ArgumentError
 from iotile.core.utilities.kvstore_json import JSONKVStore
@@ -67,3 +68,114 @@ def test_backing_store_type(tmpdir):
     _check_registry_type(str(regdir))
 
     assert ComponentRegistry.BackingType is JSONKVStore
+
+
+@pytest.fixture
+def index_folder(tmpdir, monkeypatch):
+    """Store the extension index in a temporary folder."""
+
+    folder = tmpdir.mkdir('index')
+    monkeypatch.setattr('iotile.core.dev.registry._registry_folder', lambda _folder=None: str(folder))
+
+    ComponentRegistry._frozen_extensions = None
+    yield folder
+    ComponentRegistry._frozen_extensions = None
+    ComponentRegistry().clear_extensions()
+
+
+def test_extension_cache():
+    """Make sure load_extensions results are cached until extensions change."""
+
+    reg = ComponentRegistry()
+    reg.clear_extensions()
+
+    try:
+        reg.register_extension('iotile.cache_test', 'first', ArgumentError)
+
+        found = reg.load_extensions('iotile.cache_test')
+        assert found == [('first', ArgumentError)]
+
+        found.append(('other', None))
+        assert reg.load_extensions('iotile.cache_test') == [('first', ArgumentError)]
+
+        reg.register_extension('iotile.cache_test', 'second', JSONKVStore)
+        assert reg.load_extensions('iotile.cache_test') == [('first', ArgumentError), ('second', JSONKVStore)]
+    finally:
+        reg.clear_extensions()
+
+
+def test_component_cache(registry, tmpdir):
+    """Make sure components are only reparsed when module_settings.json changes."""
+
+    comp = tmpdir.mkdir('comp')
+    comp.mkdir('python').join('cache_test_product.py').write("VALUE = 1\n")
+    settings = comp.join('module_settings.json')
+    settings.write('{"file_format": "v2", "module_name": "cache_test", "module_version": "1.0.0", '
+                   '"products": {"python/cache_test_product.py": "proxy_module"}}')
+
+    registry.add_component(str(comp))
+
+    found = registry.load_extensions('iotile.cache_test', product_name='proxy_module')
+    assert [(name, ext.VALUE) for name, ext in found] == [('cache_test_product', 1)]
+    assert registry.load_extensions('iotile.cache_test', product_name='app_module') == []
+
+    settings.write('{"file_format": "v2", "module_name": "cache_test", "module_version": "1.0.0", '
+                   '"products": {"python/cache_test_product.py": "app_module"}}')
+    os.utime(str(settings), ns=(0, 0))
+
+    assert registry.load_extensions('iotile.cache_test', product_name='proxy_module') == []
+    assert len(registry.load_extensions('iotile.cache_test', product_name='app_module')) == 1
+
+
+def test_extension_index(index_folder, monkeypatch):
+    """Make sure the entry point index is saved and rebuilt when distributions change."""
+
+    reg = ComponentRegistry()
+    index_file = index_folder.join(ComponentRegistry.IndexFileName)
+
+    assert len(reg.load_extensions('iotile.device_adapter', name_filter='virtual')) == 1
+    assert index_file.exists()
+
+    # Make sure the index is used if it is up to date
+    data = json.loads(index_file.read())
+    data['extensions']['iotile.device_adapter'] = []
+    index_file.write(json.dumps(data))
+
+    ComponentRegistry._frozen_extensions = None
+    reg.clear_extensions()
+    assert reg.load_extensions('iotile.device_adapter', name_filter='virtual') == []
+
+    # Make sure the index is rebuilt if the signature changes
+    monkeypatch.setattr('iotile.core.dev.registry._distribution_signature', lambda: [['changed', 0, []]])
+    ComponentRegistry._frozen_extensions = None
+    reg.clear_extensions()
+    assert len(reg.load_extensions('iotile.device_adapter', name_filter='virtual')) == 1
+    assert json.loads(index_file.read())['signature'] == [['changed', 0, []]]
+
+
+def test_frozen_extensions(index_folder, monkeypatch):
+    """Make sure frozen extensions are refrozen when distributions change."""
+
+    reg = ComponentRegistry()
+    reg.freeze_extensions()
+    assert reg.frozen
+
+    frozen_file = index_folder.join(ComponentRegistry.FrozenFileName)
+    data = json.loads(frozen_file.read())
+    assert 'iotile.device_adapter' in data['extensions']
+
+    # Old frozen files without a signature are always trusted
+    frozen_file.write(json.dumps({'iotile.device_adapter': []}))
+    reg.clear_extensions()
+    assert reg.load_extensions('iotile.device_adapter', name_filter='virtual') == []
+
+    reg.freeze_extensions()
+    monkeypatch.setattr('iotile.core.dev.registry._distribution_signature', lambda: [['changed', 0, []]])
+    ComponentRegistry._frozen_extensions = None
+    reg.clear_extensions()
+
+    assert len(reg.load_extensions('iotile.device_adapter', name_filter='virtual')) == 1
+    assert json.loads(frozen_file.read())['signature'] == [['changed', 0, []]]
+
+    reg.unfreeze_extensions()
+    assert not reg.frozen
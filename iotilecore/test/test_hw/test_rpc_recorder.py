@@ -0,0 +1,140 @@
+"""Tests of incremental RPC recording, rotation and replay."""
+
+import os
+import pytest
+from iotile.core.exceptions import ArgumentError
+from iotile.core.hw.hwmanager import HardwareManager
+from iotile.core.hw.exceptions import RPCNotFoundError
+from iotile.core.hw.transport import AdapterStream, RPCRecorder, RPCRecording, VirtualDeviceAdapter
+
+
+@pytest.fixture
+def conf_file():
+    path = os.path.join(os.path.dirname(__file__), 'tile_config.json')
+
+    if '@' in path or ',' in path or ';' in path:
+        pytest.skip('Cannot pass device config because path has [@,;] in it')
+
+    return path
+
+
+def _send_rpcs(hw):
+    hw.stream.send_rpc(9, 0x0004, b'')
+    hw.stream.send_rpc(11, 0x0004, b'')
+
+    with pytest.raises(RPCNotFoundError):
+        hw.stream.send_rpc(11, 0x1234, b'')
+
+
+@pytest.mark.parametrize("filename", ['recording.csv', 'recording.bin'])
+def test_record_and_replay(tmpdir, conf_file, filename):
+    """Make sure recordings are written incrementally and can be replayed."""
+
+    record_path = str(tmpdir.join(filename))
+
+    with HardwareManager('virtual:tile_based@%s' % conf_file, record=record_path) as hw:
+        hw.connect(1)
+        _send_rpcs(hw)
+
+        # The header is written as soon as the recording is opened
+        assert os.path.getsize(record_path) > 0
+
+    rpcs = list(RPCRecording(record_path))
+    assert [(x.address, x.rpc_id, x.status) for x in rpcs] == [(9, 4, 0xc0), (11, 4, 0xc0), (11, 0x1234, 2)]
+    assert rpcs[0].response_payload == bytes.fromhex('ffff74657374303101000003')
+    assert rpcs[0].connection == '1'
+
+    with HardwareManager('virtual:tile_based@%s' % conf_file) as hw:
+        hw.connect(1)
+        result = RPCRecording(record_path).replay(hw.stream)
+
+    assert result['count'] == 3
+    assert result['mismatches'] == []
+
+    with HardwareManager('virtual:report_test') as hw:
+        hw.connect(1)
+        result = RPCRecording(record_path).replay(hw.stream)
+
+    assert result['mismatches'] == [0, 1, 2]
+
+
+@pytest.mark.parametrize("filename", ['recording.csv', 'recording.bin'])
+def test_rotation(tmpdir, conf_file, filename):
+    """Make sure recordings are rotated by size and read back in order."""
+
+    record_path = str(tmpdir.join(filename))
+    recorder = RPCRecorder(record_path, max_size=100, backup_count=2)
+    stream = AdapterStream(VirtualDeviceAdapter('tile_based@%s' % conf_file), record=recorder)
+
+    try:
+        stream.connect_direct('1')
+
+        for _i in range(0, 10):
+            stream.send_rpc(9, 0x0004, b'')
+
+        stream.send_rpc(11, 0x0004, b'')
+        stream.disconnect()
+    finally:
+        stream.close()
+
+    assert os.path.exists(record_path + '.1')
+    assert os.path.exists(record_path + '.2')
+    assert not os.path.exists(record_path + '.3')
+
+    rpcs = list(RPCRecording(record_path))
+    assert 0 < len(rpcs) < 11
+    assert rpcs[-1].address == 11
+
+    assert len(list(RPCRecording(record_path, include_rotated=False))) < len(rpcs)
+
+
+def test_truncated_binary(tmpdir, conf_file):
+    """Make sure a partially written final record is ignored."""
+
+    record_path = tmpdir.join('recording.bin')
+
+    with HardwareManager('virtual:tile_based@%s' % conf_file, record=str(record_path)) as hw:
+        hw.connect(1)
+        _send_rpcs(hw)
+
+    data = record_path.read_binary()
+    record_path.write_binary(data[:-3])
+
+    rpcs = list(RPCRecording(str(record_path)))
+    assert len(rpcs) == 2
+
+
+def test_writer_failure(tmpdir, conf_file):
+    """Make sure RPCs are dropped instead of queued forever once the writer fails."""
+
+    recorder = RPCRecorder(str(tmpdir.join('recording.csv')))
+
+    def _encode(rpc):
+        raise ValueError("Simulated write failure")
+
+    recorder._encode = _encode
+    stream = AdapterStream(VirtualDeviceAdapter('tile_based@%s' % conf_file), record=recorder)
+
+    try:
+        stream.connect_direct('1')
+        stream.send_rpc(9, 0x0004, b'')
+
+        recorder._thread.join(5.0)
+        assert not recorder._thread.is_alive()
+        assert isinstance(recorder.error, ValueError)
+
+        for _i in range(0, 10):
+            stream.send_rpc(9, 0x0004, b'')
+
+        assert recorder._queue.qsize() == 0
+        assert recorder.dropped == 10
+        stream.disconnect()
+    finally:
+        stream.close()
+
+
+def test_invalid_format(tmpdir):
+    """Make sure we reject unknown recording formats."""
+
+    with pytest.raises(ArgumentError):
+        RPCRecorder(str(tmpdir.join('recording.csv')), format_name='xml')
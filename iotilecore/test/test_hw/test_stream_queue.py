@@ -0,0 +1,129 @@
+"""Tests of the bounded queues used to buffer reports, traces and broadcasts."""
+
+import asyncio
+import threading
+import time
+import pytest
+from iotile.core.exceptions import ArgumentError
+from iotile.core.hw.hwmanager import HardwareManager
+from iotile.core.hw.transport.stream_queue import StreamQueue, ChunkBuffer
+
+
+@pytest.mark.parametrize("policy, expected, dropped", [
+    ('oldest', [2, 3, 4], 2),
+    ('drop', [0, 1, 2], 2),
+])
+def test_overflow_policies(policy, expected, dropped):
+    """Make sure full queues drop the right items and count them."""
+
+    queue = StreamQueue(3, policy)
+
+    for i in range(0, 5):
+        queue.offer(i)
+
+    assert [queue.get(block=False) for _i in range(0, 3)] == expected
+
+    stats = queue.stats()
+    assert stats['received'] == 5
+    assert stats['dropped'] == dropped
+    assert stats['high_water'] == 3
+    assert stats['size'] == 0
+
+
+def test_block_policy():
+    """Make sure the block policy waits for the consumer."""
+
+    queue = StreamQueue(1, 'block')
+    queue.offer(0)
+
+    producer = threading.Thread(target=queue.offer, args=(1,))
+    producer.start()
+
+    time.sleep(0.05)
+    assert producer.is_alive()
+    assert queue.get(block=False) == 0
+
+    producer.join(1.0)
+    assert not producer.is_alive()
+    assert queue.get(block=False) == 1
+    assert queue.stats()['blocked'] == 1
+
+
+def test_invalid_settings():
+    """Make sure bad queue settings are rejected."""
+
+    with pytest.raises(ArgumentError):
+        StreamQueue(-1)
+
+    with pytest.raises(ArgumentError):
+        StreamQueue(10, 'unknown')
+
+
+def test_async_iteration():
+    """Make sure items offered from another thread wake async consumers."""
+
+    queue = StreamQueue()
+    loop = asyncio.new_event_loop()
+
+    async def _consume():
+        received = []
+        async for item in queue:
+            received.append(item)
+            if len(received) == 10:
+                return received
+
+    def _produce():
+        for i in range(0, 10):
+            time.sleep(0.001)
+            queue.offer(i)
+
+    producer = threading.Thread(target=_produce)
+    producer.start()
+
+    try:
+        assert loop.run_until_complete(asyncio.wait_for(_consume(), 2.0)) == list(range(0, 10))
+    finally:
+        loop.close()
+        producer.join()
+
+
+def test_chunk_buffer():
+    """Make sure reads can span and split received chunks."""
+
+    buf = ChunkBuffer()
+    buf.append(b'abc')
+    buf.append(b'')
+    buf.append(bytearray(b'defgh'))
+
+    assert len(buf) == 8
+    assert buf.read(2) == b'ab'
+    assert buf.peek() == b'cdefgh'
+    assert buf.read(4) == b'cdef'
+
+    buf.append(b'ij')
+    assert buf.read(100) == b'ghij'
+    assert len(buf) == 0
+    assert buf.peek() == b''
+
+
+def test_bounded_reports():
+    """Make sure HardwareManager passes queue settings through to its queues."""
+
+    hw = HardwareManager('virtual:report_test', queue_size=10, queue_policy='oldest')
+
+    try:
+        assert hw.queue_stats() == {'reports': None, 'traces': None, 'broadcasts': None}
+
+        hw.connect_direct('1')
+        hw.enable_streaming()
+
+        assert hw.count_reports() == 10
+
+        stats = hw.queue_stats()['reports']
+        assert stats['received'] == 100
+        assert stats['dropped'] == 90
+        assert stats['maxsize'] == 10
+
+        hw.disconnect()
+    finally:
+        hw.close()
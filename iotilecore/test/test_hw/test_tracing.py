@@ -6,6 +6,7 @@ import unittest
 import pytest
 import os.path
 import os
+import time
 
 @pytest.fixture
 def conf_hex_tracing():
@@ -58,3 +59,25 @@ def test_ascii_tracing(conf_ascii_tracing):
     hw.enable_tracing()
 
     assert hw.dump_trace('raw') == b'hello this is an acsii data stream that is somewhat long'
+
+def test_wait_trace(conf_ascii_tracing):
+    """Make sure we can consume tracing data in pieces and time out."""
+
+    hw = conf_ascii_tracing
+
+    with pytest.raises(ExternalError):
+        hw.wait_trace(5, timeout=0.1)
+
+    hw.enable_tracing()
+
+    progress = []
+    assert hw.wait_trace(5, timeout=1.0, progress_callback=lambda x, y: progress.append((x, y))) == b'hello'
+    assert progress[-1] == (5, 5)
+    assert hw.wait_trace(6, timeout=1.0) == b' this '
+
+    start = time.monotonic()
+    with pytest.raises(TimeoutExpiredError):
+        hw.wait_trace(1000, timeout=0.2)
+    assert time.monotonic() - start < 1.0
+
+    assert hw.dump_trace('raw') == b'is an acsii data stream that is somewhat long'
@@ -64,3 +64,36 @@ def test_set_version():
     assert str(script2.records[0]) == u'Set device app to (tag:12 version:3.4)'
     assert str(script2.records[1]) == u'Set device os to (tag:56, version:7.8)'
     assert str(script2.records[2]) == u'Set device os to (tag:12, version:3.4) and app to (tag:56, version:7.8)'
+
+
+def test_streaming_script_file(tmpdir):
+    """Make sure scripts can be written incrementally and parsed lazily from a file."""
+
+    records = [ReflashTileRecord(1, bytearray(range(200)), 0x1000),
+               SendRPCRecord(11, 0x8000, bytearray(20)),
+               UnknownRecord(128, bytearray(15))]
+    script = UpdateScript(records)
+
+    encoded = script.encode()
+    assert bytearray().join(script.iter_encoded()) == encoded
+
+    path = str(tmpdir.join('script.trub'))
+    with open(path, "wb") as outfile:
+        assert script.write(outfile) == len(encoded)
+
+    lazy = UpdateScript.iter_records(path)
+    assert next(lazy) == records[0]
+    assert UpdateScript(list(lazy)) == UpdateScript(records[1:])
+
+    with open(path, "r+b") as outfile:
+        outfile.seek(len(encoded) - 1)
+        outfile.write(b'\xff')
+
+    with pytest.raises(ArgumentError):
+        list(UpdateScript.iter_records(path))
+
+    empty = str(tmpdir.join('empty.trub'))
+    open(empty, "wb").close()
+
+    with pytest.raises(ArgumentError):
+        list(UpdateScript.iter_records(empty))
@@ -13,6 +13,7 @@ from iotile.core.exceptions import *
 from iotile.core.dev import ComponentRegistry
 import pytest
 import os.path
+import struct
 import os
 import time
 import sys
@@ -308,7 +309,7 @@ def test_recording_rpcs(tmpdir):
     assert record_path.exists()
 
     rpcs = record_path.readlines(cr=False)
-    assert len(rpcs) == 12
+    assert len(rpcs) == 15
     assert rpcs[:3] == ['# IOTile RPC Recording',
                         '# Format: 1.0',
                         '']
@@ -323,11 +324,120 @@ def test_recording_rpcs(tmpdir):
 
     rpc_lines = [",".join(x) for x in rpc_lines]
 
-    print(rpc_lines[4])
-    assert rpc_lines == ['1,, 9,0x0004,0xc0,,                                        ,ffff74657374303101000003                ,',
+    # The controller is asked to describe all tiles once, but the virtual
+    # controller does not report usable versions so each tile's status is
+    # only queried the first time that we get a proxy for it.
+    assert rpc_lines == ['1,, 8,0x2a01,0xc0,,                                        ,0400                                    ,',
+                         '1,, 8,0x2a02,0xc0,,0000                                    ,0000007465737430320000000000000700000000,',
+                         '1,, 8,0x2a02,0xc0,,0100                                    ,0000007465737430310000000000000900000000,',
+                         '1,, 8,0x2a02,0xc0,,0200                                    ,0000007465737430310000000000000b00000000,',
+                         '1,, 8,0x2a02,0xc0,,0300                                    ,000000766972636f6e0000000000000800000000,',
                          '1,, 9,0x0004,0xc0,,                                        ,ffff74657374303101000003                ,',
                          '1,,11,0x0004,0xc0,,                                        ,ffff74657374303101000003                ,',
-                         '1,,11,0x0004,0xc0,,                                        ,ffff74657374303101000003                ,',
                          '1,, 9,0x8001,0xc0,,                                        ,00000000                                ,',
                          '1,,11,0x8000,0xc0,,0300000005000000                        ,08000000                                ,',
                          '1,,11,0x8001,0xc0,,                                        ,00000000                                ,']
+
+
+def test_batched_rpcs(tile_based):
+    """Make sure we can send a batch of RPCs and get per-RPC results."""
+
+    tile_based.connect_direct('1')
+
+    results = tile_based.send_rpcs([(11, 0x8000, struct.pack("<LL", 3, 5)),
+                                    (11, 0x8100, b''),
+                                    (12, 0x8000, b''),
+                                    (9, 0x8001, b'')])
+
+    assert results[0] == struct.pack("<L", 8)
+    assert isinstance(results[1], RPCNotFoundError)
+    assert isinstance(results[2], TileNotFoundError)
+    assert results[3] == struct.pack("<L", 0)
+
+    tile1 = tile_based.get(11)
+    results = tile1.rpcs_v2([(0x8000, "LL", "L", i, i) for i in range(0, 50)] + [(0x8100, "", "")])
+
+    assert results[:50] == [(2 * i,) for i in range(0, 50)]
+    assert isinstance(results[50], RPCNotFoundError)
+
+
+def _count_rpcs(hw, monkeypatch):
+    """Count every RPC sent through a HardwareManager's stream."""
+
+    sent = []
+    send_rpc = hw.stream.send_rpc
+    send_rpcs = hw.stream.send_rpcs
+
+    def _send_rpc(address, rpc_id, *args, **kwargs):
+        sent.append((address, rpc_id))
+        return send_rpc(address, rpc_id, *args, **kwargs)
+
+    def _send_rpcs(rpcs, *args, **kwargs):
+        rpcs = list(rpcs)
+        sent.extend((address, rpc_id) for address, rpc_id, _payload in rpcs)
+        return send_rpcs(rpcs, *args, **kwargs)
+
+    monkeypatch.setattr(hw.stream, 'send_rpc', _send_rpc)
+    monkeypatch.setattr(hw.stream, 'send_rpcs', _send_rpcs)
+    return sent
+
+
+def test_tile_cache(tile_based, monkeypatch):
+    """Make sure repeated calls to get() do not query the tile again."""
+
+    hw = tile_based
+    sent = _count_rpcs(hw, monkeypatch)
+
+    hw.connect(1)
+    tile1 = hw.get(11)
+    assert sent.count((11, 0x0004)) == 1
+
+    del sent[:]
+    assert hw.get(11).add(3, 5) == 8
+    assert type(hw.get(11)) is type(tile1)
+    assert sent == [(11, 0x8000)]
+
+    # Forgetting a single tile only requeries that tile
+    del sent[:]
+    hw.invalidate_tile_cache(11)
+    hw.get(11)
+    hw.get(9)
+    assert sent == [(11, 0x0004), (9, 0x0004)]
+
+    # Reconnecting clears everything
+    hw.disconnect()
+    hw.connect(1)
+
+    del sent[:]
+    hw.get(11)
+    assert sent.count((11, 0x0004)) == 1
+    assert sent[0] == (8, 0x2a01)
+
+
+def test_tile_cache_prefetch(monkeypatch):
+    """Make sure tiles described by the controller need no status RPCs."""
+
+    conf_file = os.path.join(os.path.dirname(__file__), 'tile_manager_config.json')
+
+    if '@' in conf_file or ',' in conf_file or ';' in conf_file:
+        pytest.skip('Cannot pass device config because path has [@,;] in it')
+
+    reg = ComponentRegistry()
+    reg.register_extension('iotile.proxy', 'virtual_tile', 'test/test_hw/virtual_tile.py')
+
+    try:
+        with HardwareManager('virtual:tile_based@%s' % conf_file) as hw:
+            sent = _count_rpcs(hw, monkeypatch)
+            hw.connect(1)
+
+            tile1 = hw.get(11)
+            assert tile1.add(3, 5) == 8
+            assert sent == [(8, 0x2a01), (8, 0x2a02), (8, 0x2a02), (11, 0x8000)]
+
+            # Resetting the controller forgets every tile
+            del sent[:]
+            hw.invalidate_tile_cache(8)
+            hw.get(11)
+            assert sent == [(8, 0x2a01), (8, 0x2a02), (8, 0x2a02)]
+    finally:
+        reg.clear_extensions()
@@ -0,0 +1,27 @@
+"""Virtual controller tile that describes its registered tiles like a real controller."""
+
+from iotile.core.hw.virtual import VirtualTile, tile_rpc
+
+
+class TileManagerTile(VirtualTile):
+    """A controller whose TileManager reports a peripheral tile in slot 1 (address 11)."""
+
+    def __init__(self, address, _args, device=None):
+        super(TileManagerTile, self).__init__(address, 'tmtest')
+
+        # hw_type, api_major, api_minor, name, fw_major, fw_minor, fw_patch,
+        # exec_major, exec_minor, exec_patch, slot, unique_id
+        self.registered_tiles = [(1, 3, 0, b'tmtest', 1, 0, 0, 1, 0, 0, 0, 0),
+                                 (1, 3, 0, b'test01', 1, 0, 0, 1, 0, 0, 1, 0)]
+
+    @tile_rpc(0x2a01, "", "H")
+    def count_tiles(self):
+        """Count the number of registered tiles including the controller."""
+
+        return [len(self.registered_tiles)]
+
+    @tile_rpc(0x2a02, "H", "3B6s6BBL")
+    def describe_tile(self, index):
+        """Get the registration information for the tile at the given index."""
+
+        return self.registered_tiles[index]
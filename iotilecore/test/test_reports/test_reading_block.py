@@ -0,0 +1,71 @@
+"""Tests of columnar ReadingBlock decoding and encoding."""
+
+import struct
+import datetime
+import pytest
+from iotile.core.exceptions import ArgumentError
+from iotile.core.hw.reports import ReadingBlock, IOTileReading, SignedListReport
+
+
+def make_readings(count):
+    return [IOTileReading(i * 10, 0x5000 + (i % 3), 0xFFFF0000 + i, reading_id=i + 1) for i in range(count)]
+
+
+def test_roundtrip():
+    """Make sure we can encode and decode readings in bulk."""
+
+    readings = make_readings(100)
+
+    block = ReadingBlock.FromReadings(readings)
+    encoded = block.encode()
+
+    assert len(encoded) == 16 * 100
+    assert encoded[:16] == struct.pack("<HHLLL", 0x5000, 0, 1, 0, 0xFFFF0000)
+
+    decoded = ReadingBlock.FromBinary(encoded)
+    assert decoded == block
+    assert decoded == readings
+    assert list(decoded.values) == [x.value for x in readings]
+    assert decoded.id_range() == (1, 100)
+
+
+def test_lazy_materialization():
+    """Make sure readings are only created once and get the right time base."""
+
+    time_base = datetime.datetime(2019, 1, 1)
+    block = ReadingBlock.FromBinary(ReadingBlock.FromReadings(make_readings(10)).encode(), time_base=time_base)
+
+    assert block._readings == [None] * 10
+
+    reading = block[-1]
+    assert reading is block[9]
+    assert reading.reading_time == time_base + datetime.timedelta(seconds=90)
+    assert sum(1 for x in block._readings if x is None) == 9
+
+    sliced = block[2:4]
+    assert len(sliced) == 2
+    assert sliced[0].reading_id == 3
+
+    with pytest.raises(IndexError):
+        block[10]
+
+
+def test_invalid_length():
+    """Make sure we reject data that is not a whole number of readings."""
+
+    with pytest.raises(ArgumentError):
+        ReadingBlock.FromBinary(bytearray(17))
+
+
+def test_report_from_block():
+    """Make sure SignedListReport can be built directly from a ReadingBlock."""
+
+    block = ReadingBlock.FromReadings(make_readings(50))
+
+    report = SignedListReport.FromReadings(1, block)
+    decoded = SignedListReport(report.encode())
+
+    assert isinstance(decoded.visible_readings, ReadingBlock)
+    assert decoded.visible_readings == block
+    assert decoded.lowest_id == 1
+    assert decoded.highest_id == 50
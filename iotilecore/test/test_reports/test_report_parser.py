@@ -138,3 +138,34 @@ class TestReportParser(unittest.TestCase):
             assert reading.raw_time == i
             assert reading.reading_id == i+1
             assert reading.stream == 2
+
+
+def test_stream_of_reports():
+    """Make sure we correctly parse a long stream of reports split at arbitrary points."""
+
+    stream = bytearray()
+    for i in range(0, 5000):
+        stream += make_report(10, 1, i, 3, 4)
+
+    parser = IOTileReportParser()
+    parser.CompactionThreshold = 1024
+
+    for i in range(0, len(stream), 333):
+        parser.add_data(stream[i:i+333])
+        assert len(parser._buffer) - parser._offset < 20
+        assert len(parser._buffer) <= 2048 + 333
+
+    assert len(parser.reports) == 5000
+    assert [x.visible_readings[0].value for x in parser.reports] == list(range(0, 5000))
+    assert parser.raw_data == bytearray()
+
+
+def test_type_map_cached():
+    """Make sure we only search for report formats once."""
+
+    map1 = IOTileReportParser._build_type_map()
+    cached = IOTileReportParser._cached_type_map
+
+    parser = IOTileReportParser()
+    assert parser.known_formats == map1
+    assert IOTileReportParser._cached_type_map is cached
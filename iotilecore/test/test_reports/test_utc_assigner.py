@@ -222,3 +222,112 @@ def test_whole_report_fixing_osc():
     compare_fixed_report(fixed0_2, 'd_05db/report_0_05db_fixed.txt')
     compare_fixed_report(fixed1_2, 'd_05db/report_1_05db_fixed.txt')
     compare_fixed_report(fixed2_2, 'd_05db/report_2_05db_fixed.txt')
+
+
+def _linear_assign(anchors, reading_id, uptime, prefer):
+    """Reference implementation that walks the anchor points one at a time."""
+
+    anchors = list(anchors)
+    if len(anchors) == 0 or reading_id > anchors[-1].reading_id:
+        return None
+
+    i = [x.reading_id for x in anchors].index(min(x.reading_id for x in anchors if x.reading_id >= reading_id))
+    found_id = anchors[i].reading_id == reading_id
+    if found_id and anchors[i].utc is not None:
+        return (anchors[i].utc, True, False)
+
+    if uptime is None:
+        uptime = anchors[i].uptime
+
+    def _walk(indices, is_left):
+        delta = 0
+        exact = True
+        crossed = False
+        last_uptime = uptime
+
+        for j in indices:
+            curr = anchors[j]
+            if curr.uptime is None or last_uptime is None:
+                exact = False
+            elif curr.is_break or (last_uptime < curr.uptime if is_left else curr.uptime < last_uptime):
+                exact = False
+                crossed = True
+            else:
+                delta += abs(last_uptime - curr.uptime)
+
+            if curr.utc is not None:
+                offset = datetime.timedelta(seconds=delta)
+                return (curr.utc + offset if is_left else curr.utc - offset, exact, crossed)
+
+            last_uptime = curr.uptime
+
+        return None
+
+    left = _walk(range(i - 1, -1, -1), True)
+    if left is not None and left[1]:
+        return left
+
+    right = _walk(range(i + 1, len(anchors)), False)
+    if right is not None and right[1]:
+        return right
+
+    options = [x for x in (left, right) if x is not None]
+    if len(options) < 2:
+        return options[0] if options else None
+
+    if left[2] != right[2]:
+        return right if left[2] else left
+    if left[1] != right[1]:
+        return left if left[1] else right
+
+    return left if prefer == 'before' else right
+
+
+def test_indexed_assignment_matches_walk():
+    """Make sure the indexed assignment gives the same answer as walking anchors."""
+
+    import random
+    rand = random.Random(1234)
+
+    assigner = UTCAssigner()
+    base = datetime.datetime(2019, 1, 1)
+
+    def _add_random(reading_id):
+        uptime = rand.choice([None, rand.randint(0, 10000)])
+        utc = None
+        if rand.random() < 0.05:
+            utc = base + datetime.timedelta(seconds=rand.randint(0, 100000))
+
+        assigner.add_point(reading_id, uptime, utc, is_break=rand.random() < 0.05)
+
+    for reading_id in range(1, 400, 2):
+        _add_random(reading_id)
+
+    def _check():
+        for reading_id in range(0, 420):
+            uptime = rand.choice([None, rand.randint(0, 10000)])
+            for prefer in ('before', 'after'):
+                ref = _linear_assign(assigner._anchor_points, reading_id, uptime, prefer)
+                assignment = assigner.assign_utc(reading_id, uptime, prefer=prefer)
+
+                if ref is None:
+                    assert assignment is None
+                else:
+                    assert (assignment.utc, assignment.exact, assignment.crossed_break) == ref
+
+        batch = assigner.assign_utc_many(range(0, 420), [1000] * 420)
+        assert [x.utc if x else None for x in batch] == \
+               [x.utc if x else None for x in (assigner.assign_utc(i, 1000) for i in range(0, 420))]
+
+    _check()
+
+    assigner.ensure_prepared()
+    _check()
+
+    # Make sure the index is maintained when new points are added after preparing
+    for reading_id in range(2, 400, 7):
+        _add_random(reading_id)
+
+    _check()
+    assigner.ensure_prepared()
+    _check()
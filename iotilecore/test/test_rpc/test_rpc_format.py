@@ -0,0 +1,72 @@
+"""Tests of compiled RPC argument and response formats."""
+
+import struct
+import pytest
+from iotile.core.hw.exceptions import RPCInvalidArgumentsError, RPCInvalidReturnValueError
+from iotile.core.hw.virtual import pack_rpc_payload, unpack_rpc_payload, compile_rpc_format
+
+
+def test_compiled_cache():
+    """Make sure formats are only compiled once."""
+
+    assert compile_rpc_format("LH") is compile_rpc_format("LH")
+    assert compile_rpc_format("LV") is not compile_rpc_format("LH")
+
+
+@pytest.mark.parametrize("arg_format,code,args", [
+    ("LL", "<LL", [1, 2]),
+    ("BB12s", "<BB12s", [1, 2, bytes(range(12))]),
+    ("3H?", "<3H?", [1, 2, 3, True]),
+    ("2xl", "<2xl", [-5]),
+    ("LV", "<L3s", [1, b'abc']),
+    ("V", "<0s", [b'']),
+    ("f", "<f", [0.5]),
+    ("", "<", [])
+])
+def test_roundtrip(arg_format, code, args):
+    """Make sure packing and unpacking matches struct."""
+
+    packed = pack_rpc_payload(arg_format, args)
+
+    assert packed == struct.pack(code, *args)
+    assert list(unpack_rpc_payload(arg_format, packed)) == args
+
+
+def test_variable_lengths():
+    """Make sure variable length formats work with many different lengths."""
+
+    for length in range(0, 17):
+        data = bytes(range(length))
+        assert unpack_rpc_payload("LV", pack_rpc_payload("LV", [length, data])) == (length, data)
+
+    with pytest.raises(RPCInvalidReturnValueError):
+        pack_rpc_payload("LV", [1, bytes(17)])
+
+    with pytest.raises(RPCInvalidArgumentsError):
+        unpack_rpc_payload("LLV", bytes(7))
+
+
+@pytest.mark.parametrize("arg_format,args", [
+    ("BB12s", [1, 2, bytes(15)]),
+    ("BB12s", [1, 2, bytes(3)]),
+    ("H?", [1, 2]),
+    ("f", [0.1])
+])
+def test_truncation(arg_format, args):
+    """Make sure values that do not survive packing are rejected."""
+
+    with pytest.raises(RPCInvalidArgumentsError):
+        pack_rpc_payload(arg_format, args)
+
+
+def test_struct_errors():
+    """Make sure out of range values and wrong sizes raise struct.error."""
+
+    with pytest.raises(struct.error):
+        pack_rpc_payload("B", [256])
+
+    with pytest.raises(struct.error):
+        pack_rpc_payload("LL", [1])
+
+    with pytest.raises(struct.error):
+        unpack_rpc_payload("LL", bytes(7))
@@ -1,6 +1,7 @@
 """Main class where all emulation takes place."""
 
 import sys
+import heapq
 import logging
 import asyncio
 
@@ -51,6 +52,14 @@ class EmulationLoop:
     of the ripples of the RPC have settled down.  This allows for writing
     simple synchronous code that interacts with the EmulationLoop externally.
 
+    By default the emulation runs in wall clock time.  If you call
+    ``enable_virtual_time()``, the loop instead keeps a virtual clock that
+    only moves forward when ``advance_time()`` is called.  Tile background
+    tasks that need to wait for time to pass should use ``sleep()`` so that
+    they work the same in both modes.  The device driving the virtual clock
+    can use ``next_deadline()`` to jump directly to the next time that a
+    sleeping task needs to be woken up.
+
     Args:
         rpc_handler (callable): The method that actually dispatches each RPC.
             This method will always be invoked inside of the event loop.
@@ -65,8 +74,91 @@ class EmulationLoop:
         self._rpc_queue = RPCQueue(self._loop.get_loop(), rpc_handler)
         self._work_queues = set([self._rpc_queue])
         self._events = set()
+        self._virtual_time = None
+        self._timers = []
+        self._timer_count = 0
         self._logger = logging.getLogger(__name__)
 
+    @property
+    def virtual_time(self):
+        """The current virtual time in seconds or None if using wall clock time."""
+
+        return self._virtual_time
+
+    def enable_virtual_time(self):
+        """Switch the emulation to a virtual clock starting at 0 seconds.
+
+        This must be called before any tasks call ``sleep()``.
+        """
+
+        if self._virtual_time is None:
+            self._virtual_time = 0.0
+
+    async def sleep(self, delay):
+        """Wait for a given number of seconds of emulation time.
+
+        If virtual time is enabled, this coroutine returns once the virtual
+        clock has been advanced by at least delay seconds, otherwise it is
+        the same as asyncio.sleep().
+
+        **This method must only be called from inside the EmulationLoop**
+
+        Args:
+            delay (float): The number of seconds to wait.
+        """
+
+        if self._virtual_time is None:
+            await asyncio.sleep(delay)
+            return
+
+        future = self._loop.get_loop().create_future()
+
+        # The counter keeps timers with the same deadline in FIFO order
+        self._timer_count += 1
+        heapq.heappush(self._timers, (self._virtual_time + delay, self._timer_count, future))
+        await future
+
+    def next_deadline(self):
+        """Get the virtual time when the next sleeping task should wake up.
+
+        Returns:
+            float: The deadline or None if no task is sleeping.
+        """
+
+        while len(self._timers) > 0 and self._timers[0][2].done():
+            heapq.heappop(self._timers)
+
+        if len(self._timers) == 0:
+            return None
+
+        return self._timers[0][0]
+
+    def advance_time(self, new_time):
+        """Move the virtual clock forward and wake up all expired sleepers.
+
+        **This method must only be called from inside the EmulationLoop**
+
+        Args:
+            new_time (float): The new virtual time, which must not be before
+                the current virtual time.
+        """
+
+        self.verify_calling_thread(True, "advance_time must be called from **inside** the event loop")
+
+        if self._virtual_time is None:
+            raise InternalError("advance_time called without enabling virtual time")
+
+        if new_time < self._virtual_time:
+            raise ArgumentError("Virtual time cannot move backwards", current_time=self._virtual_time,
+                                new_time=new_time)
+
+        self._virtual_time = new_time
+
+        while len(self._timers) > 0 and self._timers[0][0] <= new_time:
+            _deadline, _count, future = heapq.heappop(self._timers)
+            if not future.done():
+                future.set_result(None)
+
     def create_event(self, register=False):
         """Create an asyncio.Event inside the emulation loop.
 
@@ -63,6 +63,11 @@ You are free to send the same periodic inputs to sensor-graph yourself using
 rpcs if you wish to control the passage of emulation time (as seen by your
 sensor-graph rules) in a fine-grained fashion.
 
+When running in virtual time, nothing happens between timer inputs so the
+device can use `next_tick_delay()` and `advance()` to skip directly from
+one timer input to the next, producing exactly the same inputs as calling
+`handle_tick()` once per second.
+
 Handling Time When Loading Snapshots
 -----------------------------------
 
@@ -154,6 +159,54 @@ class ClockManagerSubsystem(ControllerSubsystemBase):
                 self.graph_input(self.TICK_STREAMS[name], self.uptime)
                 self.tick_counters[name] = 0
 
+    def next_tick_delay(self):
+        """Get the number of seconds until the next timer input is generated.
+
+        Returns:
+            int: The number of times handle_tick() can be called before a
+                timer input is sent to sensor graph, including the call that
+                sends it.
+        """
+
+        delay = None
+        for name, interval in self.ticks.items():
+            remaining = interval - self.tick_counters[name]
+
+            # A tick whose interval was lowered below its counter never fires again
+            if interval == 0 or remaining <= 0:
+                continue
+
+            if delay is None or remaining < delay:
+                delay = remaining
+
+        return delay
+
+    def advance(self, seconds):
+        """Advance the clock by multiple seconds at once.
+
+        This has exactly the same effect as calling handle_tick() seconds
+        times but only does work for the seconds on which a timer input is
+        generated.
+
+        Args:
+            seconds (int): The number of seconds to advance.
+        """
+
+        while seconds > 0:
+            step = self.next_tick_delay()
+            if step is None or step > seconds:
+                step = seconds
+
+            skipped = step - 1
+            if skipped > 0:
+                self.uptime += skipped
+                for name, interval in self.ticks.items():
+                    if interval != 0:
+                        self.tick_counters[name] += skipped
+
+            self.handle_tick()
+            seconds -= step
+
     def set_tick(self, index, interval):
         """Update the a tick's interval.
 
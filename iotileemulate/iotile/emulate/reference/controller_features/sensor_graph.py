@@ -549,7 +549,8 @@ async def process_graph_input(graph, stream, value, rpc_executor):
         associated_output = stream.associated_stream()
         graph.sensor_log.push(associated_output, value)
 
-    to_check = deque([x for x in graph.roots])
+    roots = graph.input_roots(stream)
+    to_check = deque(roots)
 
     while len(to_check) > 0:
         node = to_check.popleft()
@@ -569,3 +570,5 @@ async def process_graph_input(graph, stream, value, rpc_executor):
             # so that they are also checked to see if they should run.
             if len(results) > 0:
                 to_check.extend(node.outputs)
+
+    graph.rearm_roots(roots)
@@ -24,10 +24,13 @@ from .controller_system import ControllerSubsystemBase
 class SensorLogSubsystem(ControllerSubsystemBase):
     """Container for raw sensor log state."""
 
-    def __init__(self, emulator, model):
+    def __init__(self, emulator, model, engine=None):
         super(SensorLogSubsystem, self).__init__(emulator)
 
-        self.engine = InMemoryStorageEngine(model=model)
+        if engine is None:
+            engine = InMemoryStorageEngine(model=model)
+
+        self.engine = engine
         self.storage = SensorLog(self.engine, model=model, id_assigner=lambda x, y: self.allocate_id())
         self.dump_walker = None
         self.next_id = 1
@@ -270,11 +273,13 @@ class RawSensorLogMixin(object):
     Args:
         model (DeviceModel): The device model to use to calculate
             constraints and other operating parameters.
+        engine (StorageEngine): Optional storage engine to hold the readings.
+            Defaults to an InMemoryStorageEngine.
     """
 
 
-    def __init__(self, emulator, model):
-        self.sensor_log = SensorLogSubsystem(emulator, model)
+    def __init__(self, emulator, model, engine=None):
+        self.sensor_log = SensorLogSubsystem(emulator, model, engine)
         self._post_config_subsystems.append(self.sensor_log)
 
         # Declare all of our config variables
@@ -7,6 +7,7 @@ from iotile.core.hw.exceptions import TileNotFoundError
 from iotile.core.hw.reports import IOTileReading
 from iotile.core.exceptions import ArgumentError
 from iotile.sg.model import DeviceModel
+from iotile.sg.engine import MemoryMappedStorageEngine
 from iotile.sg.parser import SensorGraphFileParser
 from iotile.sg.optimizer import SensorGraphOptimizer
 from ..virtual import EmulatedTile
@@ -37,6 +38,9 @@ class ReferenceController(RawSensorLogMixin, RemoteBridgeMixin,
                 name (str): The 6 character name that should be returned when this
                     tile is asked for its status to allow matching it with a proxy
                     object.
+                storage_dir (str): Optional directory where the raw sensor log
+                    should persistently store its readings in memory mapped files.
+                    If not specified, readings are only kept in memory.
         device (TileBasedVirtualDevice) : optional, device on which this tile is running
     """
 
@@ -54,6 +58,11 @@ class ReferenceController(RawSensorLogMixin, RemoteBridgeMixin,
 
         model = DeviceModel()
 
+        engine = None
+        storage_dir = args.get('storage_dir')
+        if storage_dir is not None:
+            engine = MemoryMappedStorageEngine(model, storage_dir)
+
         EmulatedTile.__init__(self, address, device)
 
         # Initialize all of the controller subsystems
@@ -61,7 +70,7 @@ class ReferenceController(RawSensorLogMixin, RemoteBridgeMixin,
         ConfigDatabaseMixin.__init__(self, 4096, 4096)  #FIXME: Load the controller model info to get its memory map
         TileManagerMixin.__init__(self, device.emulator)
         RemoteBridgeMixin.__init__(self, device.emulator)
-        RawSensorLogMixin.__init__(self, device.emulator, model)
+        RawSensorLogMixin.__init__(self, device.emulator, model, engine)
         StreamingSubsystemMixin.__init__(self, device.emulator, basic=True)
         SensorGraphMixin.__init__(self, device.emulator, self.sensor_log, self.stream_manager, model=model)
 
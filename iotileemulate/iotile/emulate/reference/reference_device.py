@@ -21,6 +21,13 @@ class ReferenceDevice(EmulatedDevice):
             supported are:
                 iotile_id (int or hex string): The id of this device. This
                 defaults to 1 if not specified.
+                simulate_time (bool): Generate timer inputs as time passes.
+                    Defaults to True.
+                accelerate_time (bool): Generate timer inputs as fast as
+                    possible rather than once per second of wall clock time.
+                virtual_time (bool): Run the device on a virtual clock that
+                    jumps directly to the next timer input or tile deadline.
+                    This implies accelerate_time.
     """
 
     __NO_EXTENSION__ = True
@@ -43,6 +50,10 @@ class ReferenceDevice(EmulatedDevice):
         self._logger = logging.getLogger(__name__)
         self._simulating_time = args.get('simulate_time', True)
         self._accelerating_time = args.get('accelerate_time', False)
+        self._virtual_time = args.get('virtual_time', False)
+
+        if self._virtual_time:
+            self.emulator.enable_virtual_time()
 
     async def _time_ticker(self):
         start = monotonic()
@@ -66,6 +77,27 @@ class ReferenceDevice(EmulatedDevice):
 
         self._logger.debug("Time ticker task stopped due to _simulating_time flag cleared")
 
+    async def _virtual_time_ticker(self):
+        clock = self.controller.clock_manager
+        last_tick = self.emulator.virtual_time
+
+        while self._simulating_time:
+            tick_time = last_tick + clock.next_tick_delay()
+            deadline = self.emulator.next_deadline()
+
+            if deadline is not None and deadline < tick_time:
+                self.emulator.advance_time(deadline)
+            else:
+                self.emulator.advance_time(tick_time)
+                clock.advance(tick_time - last_tick)
+                last_tick = tick_time
+
+            # Let any tasks woken up by the new time run before checking for idle
+            await asyncio.sleep(0)
+            await self.emulator.wait_idle()
+
+        self._logger.debug("Virtual time ticker task stopped due to _simulating_time flag cleared")
+
     def iter_tiles(self, include_controller=True):
         """Iterate over all tiles in this device in order.
 
@@ -129,7 +161,9 @@ class ReferenceDevice(EmulatedDevice):
 
             self.emulator.run_task_external(_launch_tiles())
 
-            if self._simulating_time:
+            if self._simulating_time and self._virtual_time:
+                self.emulator.add_task(None, self._virtual_time_ticker())
+            elif self._simulating_time:
                 self.emulator.add_task(None, self._time_ticker())
         except:
             self.stop()
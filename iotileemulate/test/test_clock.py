@@ -1,5 +1,6 @@
 """Tests of the clock manager subsystem."""
 
+import time
 import datetime
 import pytest
 
@@ -7,6 +8,7 @@ from iotile.core.hw import HardwareManager
 from iotile.core.exceptions import HardwareError
 from iotile.emulate.reference import ReferenceDevice
 from iotile.emulate.transport import EmulatedDeviceAdapter
+from iotile.emulate.constants import streams
 
 
 @pytest.fixture(scope="function")
@@ -146,3 +148,69 @@ def test_utc_time(basic_device):
     assert (device_time & ~(1 << 31)) == int(y2k_delta)
     assert device_uptime == 1
     assert info == {'is_utc': True, 'offset': int(y2k_delta) - 1}
+
+
+
+def test_advance_matches_ticks():
+    """Make sure advancing several seconds at once sends the same inputs as ticking."""
+
+    device = ReferenceDevice({'simulate_time': False})
+    clock_man = device.controller.clock_manager
+
+    inputs = []
+    clock_man.graph_input = lambda stream, value: inputs.append((stream, value))
+
+    config_vars = {'fast_tick': 3, 'user_tick_1': 7}
+    clock_man.clear_to_reset(config_vars)
+    for _i in range(0, 100):
+        clock_man.handle_tick()
+
+    ticked = list(inputs), dict(clock_man.tick_counters), clock_man.uptime
+
+    clock_man.clear_to_reset(config_vars)
+    del inputs[:]
+
+    delays = []
+    while clock_man.uptime < 100:
+        delay = min(clock_man.next_tick_delay(), 100 - clock_man.uptime)
+        delays.append(delay)
+        clock_man.advance(delay)
+
+    assert (inputs, clock_man.tick_counters, clock_man.uptime) == ticked
+    assert len(delays) < 100
+
+    clock_man.clear_to_reset(config_vars)
+    del inputs[:]
+    clock_man.advance(100)
+    assert (inputs, clock_man.tick_counters, clock_man.uptime) == ticked
+
+
+def test_virtual_time():
+    """Make sure a device in virtual time quickly emulates a long period."""
+
+    device = ReferenceDevice({'virtual_time': True})
+    clock_man = device.controller.clock_manager
+
+    normal_ticks = []
+    original_input = clock_man.graph_input
+
+    def _graph_input(stream, value):
+        if stream == streams.NORMAL_TICK:
+            normal_ticks.append(value)
+
+        original_input(stream, value)
+
+    clock_man.graph_input = _graph_input
+
+    device.start()
+    try:
+        start = time.monotonic()
+        while clock_man.uptime < 24*60*60:
+            assert time.monotonic() - start < 60.0
+            time.sleep(0.01)
+    finally:
+        device.stop()
+
+    count = len(normal_ticks)
+    assert count >= 24*60*6
+    assert normal_ticks == list(range(10, 10 * (count + 1), 10))
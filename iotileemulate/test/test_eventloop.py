@@ -6,7 +6,7 @@ import pytest
 from iotile.emulate.internal import EmulationLoop
 from iotile.emulate import RPCRuntimeError
 from iotile.core.hw.exceptions import AsynchronousRPCResponse
-from iotile.core.exceptions import TimeoutExpiredError, InternalError
+from iotile.core.exceptions import TimeoutExpiredError, InternalError, ArgumentError
 
 
 def test_basic_eventloop():
@@ -117,3 +117,42 @@ def test_rpc_timeout():
 
     finally:
         loop.stop()
+
+
+def test_virtual_time():
+    """Make sure sleeping tasks wake up in order as virtual time advances."""
+
+    loop = EmulationLoop(lambda _address, _rpc_id, arg_payload: arg_payload)
+    loop.enable_virtual_time()
+    loop.start()
+
+    woken = []
+
+    async def _sleeper(name, delay):
+        await loop.sleep(delay)
+        woken.append((name, loop.virtual_time))
+
+    async def _drive():
+        loop._add_task(None, _sleeper('b', 20))
+        loop._add_task(None, _sleeper('a', 5))
+        loop._add_task(None, _sleeper('c', 20))
+        await asyncio.sleep(0)
+
+        assert loop.next_deadline() == 5
+        loop.advance_time(5)
+        await asyncio.sleep(0)
+        assert woken == [('a', 5)]
+
+        assert loop.next_deadline() == 20
+        loop.advance_time(100)
+        await asyncio.sleep(0)
+        assert loop.next_deadline() is None
+
+        with pytest.raises(ArgumentError):
+            loop.advance_time(50)
+
+    try:
+        loop.run_task_external(_drive())
+        assert woken == [('a', 5), ('b', 100), ('c', 100)]
+    finally:
+        loop.stop()
@@ -1,16 +1,19 @@
 """Test coverage of the sensorgraph subsystem on the reference controller."""
 
 import sys
+import asyncio
 import pytest
 import time
 from iotile.core.hw import HardwareManager
-from iotile.core.hw.reports import SignedListReport
+from iotile.core.hw.reports import SignedListReport, IOTileReading
 from iotile.core.exceptions import HardwareError
 from iotile.emulate.virtual import EmulatedPeripheralTile
 from iotile.emulate.reference import ReferenceDevice
 from iotile.emulate.demo import DemoEmulatedDevice
 from iotile.emulate.constants import rpcs, Error
 from iotile.emulate.transport import EmulatedDeviceAdapter
+from iotile.emulate.reference.controller_features.sensor_graph import process_graph_input
+from iotile.sg import DataStream, DataStreamSelector, DeviceModel, SensorGraph, SensorLog
 
 @pytest.fixture(scope="function")
 def sg_device():
@@ -286,3 +289,29 @@ def test_rpc_engine(rpc_sg):
 
     values = sg.download_stream('output 1')
     assert [x.value for x in values] == [0, 1]
+
+
+def test_process_graph_input():
+    """Make sure inputs that are not important are processed through the graph."""
+
+    model = DeviceModel()
+    log = SensorLog(model=model)
+    graph = SensorGraph(log, model=model)
+    graph.add_node('(input 1 always) => output 1 using copy_latest_a')
+    graph.add_node('(input 2 always) => output 2 using copy_count_a')
+
+    stream = DataStream.FromString('input 1')
+    assert not stream.important
+
+    loop = asyncio.new_event_loop()
+    try:
+        loop.run_until_complete(process_graph_input(graph, stream, IOTileReading(0, stream.encode(), 5), None))
+    finally:
+        loop.close()
+
+    output1 = log.create_walker(DataStreamSelector.FromString('output 1'), skip_all=False)
+    output2 = log.create_walker(DataStreamSelector.FromString('output 2'), skip_all=False)
+    assert output1.count() == 1
+    assert output1.pop().value == 5
+    assert output2.count() == 1
+    assert output2.pop().value == 0
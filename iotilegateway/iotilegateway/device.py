@@ -10,19 +10,18 @@ adapter that can see that device and has an open connection slot.  You can
 force a connection to use a specific device adapter by using a specially
 formatted connection string if you don't want the automatic behavior.
 
-TODO:
-- [ ] Periodically expire devices from visible_devices
-- [ ] Add threadsafe mutex around visible_devices
+The devices seen by each adapter are tracked in a :class:`DeviceTable` that is
+updated incrementally as devices are seen and periodically expired.
 """
 
 import logging
-import copy
 from time import monotonic
 import functools
 from iotile.core.exceptions import ArgumentError, InternalError
 from iotile.core.utilities import SharedLoop
 from iotile.core.hw.transport.adapter import AbstractDeviceAdapter, BasicNotificationMixin, PerConnectionDataMixin, DeviceAdapter, AsynchronousModernWrapper
 from iotile.core.hw.exceptions import DeviceAdapterError
+from .device_table import DeviceTable
 
 
 _MISSING = object()
@@ -45,6 +44,10 @@ class AggregatingDeviceAdapter(BasicNotificationMixin,
     that is reported by each DeviceAdapter and used to rank which one has a
     better route to a given device.
 
+    Devices that an adapter has not seen within their ``validity_period`` are
+    removed every ``expiration_interval`` seconds, which can be adjusted with
+    :meth:`set_config` before calling :meth:`start`.
+
     Args:
         loop (BackgroundEventLoop): The background event loop that we should
             use to run our adapters.   Defaults to :class:`SharedLoop`.
@@ -56,8 +59,8 @@ class AggregatingDeviceAdapter(BasicNotificationMixin,
         AbstractDeviceAdapter.__init__(self)
 
         self._config = {}
-        self._devices = {}
-        self._conn_strings = {}
+        self._devices = DeviceTable()
+        self._expiry_task = None
         self.adapters = []
         self.connections = {}
         self._started = False
@@ -68,6 +71,7 @@ class AggregatingDeviceAdapter(BasicNotificationMixin,
 
         self.set_config('probe_supported', True)
         self.set_config('probe_required', True)
+        self.set_config('expiration_interval', 1.0)
 
         if adapters is None:
             adapters = []
@@ -146,6 +150,8 @@ class AggregatingDeviceAdapter(BasicNotificationMixin,
         """
 
         successful = 0
+        interval = self.get_config('expiration_interval')
+        self._devices.resolution = interval
 
         try:
             for adapter in self.adapters:
@@ -159,57 +165,31 @@ class AggregatingDeviceAdapter(BasicNotificationMixin,
 
             raise
 
+        self._expiry_task = self._loop.launch_periodic_coroutine(self._expire_devices, interval)
+
     async def stop(self):
         """Stop all adapters managed by this device adapter."""
 
+        if self._expiry_task is not None:
+            self._expiry_task.cancel()
+            self._expiry_task = None
+
         for adapter in self.adapters:
             await adapter.stop()
 
     def visible_devices(self):
         """Unify all visible devices across all connected adapters
 
+        The result is an immutable snapshot that is only rebuilt for devices
+        that have changed since the last call, so it is cheap to call this
+        method often.  Each device's ``adapters`` lists every adapter that
+        can see it, from the strongest to the weakest signal.
+
         Returns:
-            dict: A dictionary mapping UUIDs to device information dictionaries
+            Mapping: A read-only map of UUIDs to read-only device information dictionaries
         """
 
-        devs = {}
-
-        for device_id, adapters in self._devices.items():
-            dev = None
-            max_signal = None
-            best_adapter = None
-
-            for adapter_id, devinfo in adapters.items():
-                connstring = "adapter/{0}/{1}".format(adapter_id, devinfo['connection_string'])
-                if dev is None:
-                    dev = copy.deepcopy(devinfo)
-                    del dev['connection_string']
-
-                if 'adapters' not in dev:
-                    dev['adapters'] = []
-                    best_adapter = adapter_id
-
-                dev['adapters'].append((adapter_id, devinfo['signal_strength'], connstring))
-
-                if max_signal is None:
-                    max_signal = devinfo['signal_strength']
-                elif devinfo['signal_strength'] > max_signal:
-                    max_signal = devinfo['signal_strength']
-                    best_adapter = adapter_id
-
-            # If device has been seen in no adapters, it will get expired
-            # don't return it
-            if dev is None:
-                continue
-
-            dev['connection_string'] = "device/%x" % dev['uuid']
-            dev['adapters'] = sorted(dev['adapters'], key=lambda x: x[1], reverse=True)
-            dev['best_adapter'] = best_adapter
-            dev['signal_strength'] = max_signal
-
-            devs[device_id] = dev
-
-        return devs
+        return self._devices.snapshot()
 
     async def connect(self, conn_id, connection_string):
         """Connect to a device.
@@ -329,14 +309,14 @@ class AggregatingDeviceAdapter(BasicNotificationMixin,
 
     def _track_device_seen(self, adapter_id, conn_string, event):
         universal_conn = "device/%x" % event.get('uuid')
-        local_conn = "adapter/%d/%s" % (adapter_id, conn_string)
 
-        if universal_conn not in self._devices:
-            self._devices[universal_conn] = {}
+        expires = None
+        validity_period = event.get('validity_period')
+        if validity_period is not None:
+            expires = monotonic() + validity_period
+            event['expires'] = expires
 
-        event['expires'] = monotonic() + event.get('validity_period')
-        self._devices[universal_conn][adapter_id] = event
-        self._conn_strings[local_conn] = universal_conn
+        self._devices.update(universal_conn, adapter_id, event, expires)
 
     def _translate_device_seen(self, adapter_id, conn_string, event):
         universal_conn = self._translate_conn_string(adapter_id, conn_string)
@@ -345,41 +325,27 @@ class AggregatingDeviceAdapter(BasicNotificationMixin,
         return translated_event
 
     def _translate_conn_string(self, adapter_id, conn_string):
-        local_conn = "adapter/%d/%s" % (adapter_id, conn_string)
-        return self._conn_strings.get(local_conn)
+        return self._devices.resolve(adapter_id, conn_string)
 
     def _find_best_adapter(self, universal_conn, conn_id):
+        """Find the adapter with the strongest signal that can accept a connection."""
+
         if universal_conn not in self._devices:
             raise DeviceAdapterError(conn_id, 'find_best_adapter', 'device not seen on any adapters')
 
-        for adapter_id, dev in self._devices[universal_conn].items():
+        for adapter_id, connection_string in self._devices.routes(universal_conn):
             if self.adapters[adapter_id].can_connect():
-                return adapter_id, dev.get('connection_string')
+                return adapter_id, connection_string
 
         raise DeviceAdapterError(conn_id, 'find_best_adapter', 'no adapter has space for connection')
 
+    async def _expire_devices(self):
+        self._device_expiry_callback()
+
     def _device_expiry_callback(self):
         """Periodic callback to remove expired devices from visible_devices."""
 
-        expired = 0
-        for adapters in self._devices.values():
-            to_remove = []
-            now = monotonic()
-
-            for adapter_id, dev in adapters.items():
-                if 'expires' not in dev:
-                    continue
-
-                if now > dev['expires']:
-                    to_remove.append(adapter_id)
-                    local_conn = "adapter/%d/%s" % (adapter_id, dev['connection_string'])
-
-                    if local_conn in self._conn_strings:
-                        del self._conn_strings[local_conn]
-
-            for entry in to_remove:
-                del adapters[entry]
-                expired += 1
+        expired = self._devices.expire(monotonic())
 
         if expired > 0:
             self._logger.info('Expired %d devices', expired)
@@ -0,0 +1,339 @@
+"""An incrementally updated table of the devices seen by several device adapters.
+
+:class:`DeviceTable` is used by :class:`AggregatingDeviceAdapter` to keep
+track of every route to every device that its adapters can see.  It is
+designed so that the cost of each operation does not depend on how many
+devices are in view:
+
+- Each ``device_seen`` event only touches the entry for that device.
+- The adapters that can see a device are kept in a heap ordered by signal
+  strength so the best route is found without sorting.
+- Expiration times are bucketed in a timing wheel so that periodic expiry
+  only looks at the routes that are actually due to expire.
+- :meth:`DeviceTable.snapshot` returns an immutable view that is only rebuilt
+  for the devices that changed since the last snapshot.
+"""
+
+import heapq
+import threading
+from types import MappingProxyType
+
+
+class _Route:
+    """A single adapter's view of a device."""
+
+    __slots__ = ('adapter_id', 'connection_string', 'signal_strength', 'info', 'expires', 'bucket', 'seq')
+
+    def __init__(self, adapter_id):
+        self.adapter_id = adapter_id
+        self.connection_string = None
+        self.signal_strength = None
+        self.info = None
+        self.expires = None
+        self.bucket = None
+        self.seq = 0
+
+
+class _DeviceEntry:
+    """All of the routes to a single device."""
+
+    __slots__ = ('routes', 'heap', 'view')
+
+    def __init__(self):
+        self.routes = {}
+        self.heap = []
+        self.view = None
+
+    def push(self, route):
+        heapq.heappush(self.heap, (-route.signal_strength, route.seq, route.adapter_id))
+
+        # Stale heap entries are discarded lazily, compact the heap if too many build up
+        if len(self.heap) > 2 * len(self.routes) + 8:
+            self.heap = [(-x.signal_strength, x.seq, x.adapter_id) for x in self.routes.values()]
+            heapq.heapify(self.heap)
+
+    def best(self):
+        """Return the route with the strongest signal or None if there are no routes."""
+
+        heap = self.heap
+        while len(heap) > 0:
+            _signal, seq, adapter_id = heap[0]
+
+            route = self.routes.get(adapter_id)
+            if route is not None and route.seq == seq:
+                return route
+
+            heapq.heappop(heap)
+
+        return None
+
+    def ranked(self):
+        """Return all routes sorted from strongest to weakest signal."""
+
+        return sorted(self.routes.values(), key=lambda x: x.signal_strength, reverse=True)
+
+
+class DeviceTable:
+    """The devices that are visible across several device adapters.
+
+    Devices are identified by a universal connection string that does not
+    depend on which adapter saw them, e.g. ``device/1``.  Each adapter that
+    can see a device contributes a route to it with its own local connection
+    string, signal strength and expiration time.
+
+    This class is threadsafe so that snapshots can be taken from any thread
+    while the table is updated from the event loop.
+
+    Args:
+        resolution (float): The width in seconds of each bucket in the
+            expiration timing wheel.  Routes are removed at most this long
+            after they expire.
+    """
+
+    def __init__(self, resolution=1.0):
+        self.resolution = resolution
+
+        self._lock = threading.Lock()
+        self._devices = {}
+        self._conn_strings = {}
+        self._seq = 0
+
+        self._buckets = {}
+        self._next_bucket = None
+
+        self._views = {}
+        self._dirty = set()
+        self._snapshot = MappingProxyType({})
+
+    def __len__(self):
+        return len(self._devices)
+
+    def __contains__(self, universal_conn):
+        return universal_conn in self._devices
+
+    def update(self, universal_conn, adapter_id, info, expires=None):
+        """Add or update the route to a device through an adapter.
+
+        Args:
+            universal_conn (str): The universal connection string of the device.
+            adapter_id (int): The adapter that saw the device.
+            info (dict): The device_seen event from the adapter.  It must
+                contain a ``connection_string`` and ``signal_strength``.
+            expires (float): The monotonic time after which this route should
+                be removed.  If None, the route never expires.
+        """
+
+        connection_string = info['connection_string']
+        signal_strength = info['signal_strength']
+
+        with self._lock:
+            entry = self._devices.get(universal_conn)
+            if entry is None:
+                entry = _DeviceEntry()
+                self._devices[universal_conn] = entry
+
+            route = entry.routes.get(adapter_id)
+            if route is None:
+                route = _Route(adapter_id)
+                entry.routes[adapter_id] = route
+
+            if route.connection_string != connection_string:
+                if route.connection_string is not None:
+                    self._conn_strings.pop(_local_conn(adapter_id, route.connection_string), None)
+
+                route.connection_string = connection_string
+                self._conn_strings[_local_conn(adapter_id, connection_string)] = universal_conn
+
+            route.info = info
+            route.expires = expires
+            self._schedule(universal_conn, route)
+
+            # Only reorder the heap if the signal strength actually changed
+            if route.signal_strength != signal_strength:
+                self._seq += 1
+                route.seq = self._seq
+                route.signal_strength = signal_strength
+                entry.push(route)
+
+            entry.view = None
+            self._dirty.add(universal_conn)
+
+    def remove(self, universal_conn, adapter_id):
+        """Remove the route to a device through an adapter.
+
+        The device is removed entirely once there are no routes to it.
+
+        Args:
+            universal_conn (str): The universal connection string of the device.
+            adapter_id (int): The adapter to remove.
+        """
+
+        with self._lock:
+            self._remove(universal_conn, adapter_id)
+
+    def expire(self, now):
+        """Remove all routes that have expired.
+
+        Args:
+            now (float): The current monotonic time.
+
+        Returns:
+            int: The number of routes that were removed.
+        """
+
+        current = int(now // self.resolution)
+
+        with self._lock:
+            if self._next_bucket is None or len(self._buckets) == 0:
+                self._next_bucket = current
+                return 0
+
+            # Only visit buckets that exist if we have not expired anything in a long time
+            if current - self._next_bucket > len(self._buckets):
+                due = sorted(x for x in self._buckets if x < current)
+            else:
+                due = range(self._next_bucket, current)
+
+            self._next_bucket = max(current, self._next_bucket)
+
+            expired = 0
+            for index in due:
+                bucket = self._buckets.pop(index, None)
+                if bucket is None:
+                    continue
+
+                for universal_conn, adapter_id in bucket:
+                    self._remove(universal_conn, adapter_id)
+                    expired += 1
+
+            return expired
+
+    def resolve(self, adapter_id, connection_string):
+        """Find the universal connection string for an adapter's local connection string.
+
+        Returns:
+            str: The universal connection string or None if the device has not been seen.
+        """
+
+        return self._conn_strings.get(_local_conn(adapter_id, connection_string))
+
+    def routes(self, universal_conn):
+        """Get the routes to a device from strongest to weakest signal.
+
+        The first route is found without sorting, so callers that usually
+        only need the best route should stop iterating as soon as possible.
+
+        Yields:
+            (int, str): The adapter id and local connection string of each route.
+        """
+
+        with self._lock:
+            entry = self._devices.get(universal_conn)
+            if entry is None:
+                return
+
+            best = entry.best()
+
+        yield best.adapter_id, best.connection_string
+
+        with self._lock:
+            others = [(x.adapter_id, x.connection_string) for x in entry.ranked() if x is not best]
+
+        for route in others:
+            yield route
+
+    def snapshot(self):
+        """Get an immutable view of all visible devices.
+
+        The view maps each universal connection string to a read-only
+        device info dictionary that includes all of the routes to the device
+        under ``adapters``.  Only devices that changed since the last call are
+        rebuilt.
+
+        Returns:
+            Mapping: A read-only map of universal connection string to device info.
+        """
+
+        with self._lock:
+            if len(self._dirty) == 0:
+                return self._snapshot
+
+            for universal_conn in self._dirty:
+                entry = self._devices.get(universal_conn)
+                if entry is None:
+                    self._views.pop(universal_conn, None)
+                    continue
+
+                if entry.view is None:
+                    entry.view = _build_view(universal_conn, entry)
+
+                self._views[universal_conn] = entry.view
+
+            self._dirty.clear()
+            self._snapshot = MappingProxyType(dict(self._views))
+            return self._snapshot
+
+    def _remove(self, universal_conn, adapter_id):
+        entry = self._devices.get(universal_conn)
+        if entry is None:
+            return
+
+        route = entry.routes.pop(adapter_id, None)
+        if route is None:
+            return
+
+        self._unschedule(universal_conn, route)
+        self._conn_strings.pop(_local_conn(adapter_id, route.connection_string), None)
+
+        if len(entry.routes) == 0:
+            del self._devices[universal_conn]
+
+        entry.view = None
+        self._dirty.add(universal_conn)
+
+    def _schedule(self, universal_conn, route):
+        bucket = None
+        if route.expires is not None:
+            bucket = int(route.expires // self.resolution)
+
+        if bucket == route.bucket:
+            return
+
+        self._unschedule(universal_conn, route)
+        route.bucket = bucket
+
+        if bucket is not None:
+            self._buckets.setdefault(bucket, set()).add((universal_conn, route.adapter_id))
+
+            # A route can expire before anything we have already swept
+            if self._next_bucket is None or bucket < self._next_bucket:
+                self._next_bucket = bucket
+
+    def _unschedule(self, universal_conn, route):
+        if route.bucket is None:
+            return
+
+        bucket = self._buckets.get(route.bucket)
+        if bucket is not None:
+            bucket.discard((universal_conn, route.adapter_id))
+            if len(bucket) == 0:
+                del self._buckets[route.bucket]
+
+        route.bucket = None
+
+
+def _local_conn(adapter_id, connection_string):
+    return "adapter/%d/%s" % (adapter_id, connection_string)
+
+
+def _build_view(universal_conn, entry):
+    best = entry.best()
+
+    dev = dict(best.info)
+    dev['adapters'] = tuple((x.adapter_id, x.signal_strength, _local_conn(x.adapter_id, x.connection_string))
+                            for x in entry.ranked())
+    dev['connection_string'] = universal_conn
+    dev['best_adapter'] = best.adapter_id
+    dev['signal_strength'] = best.signal_strength
+
+    return MappingProxyType(dev)
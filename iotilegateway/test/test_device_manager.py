@@ -1,6 +1,7 @@
 import logging
 import pytest
 from iotilegateway.device import AggregatingDeviceAdapter
+from iotilegateway.device_table import DeviceTable
 from iotile.core.hw.transport import VirtualDeviceAdapter
 from iotile.core.hw.exceptions import DeviceAdapterError
 from iotile.core.utilities import BackgroundEventLoop
@@ -78,3 +79,106 @@ def test_connect_disconnect(loop, adapter):
         loop.run_coroutine(adapter.connect(1, 'adapter/1/1'))
 
     loop.run_coroutine(adapter.connect(1, 'adapter/0/1'))
+
+
+def _seen(conn_string, signal_strength):
+    return dict(connection_string=conn_string, signal_strength=signal_strength, uuid=1)
+
+
+def test_best_route():
+    """Make sure routes are ranked by signal strength as they change."""
+
+    table = DeviceTable()
+    table.update('device/1', 0, _seen('a', -80))
+    table.update('device/1', 1, _seen('b', -60))
+    table.update('device/1', 2, _seen('c', -70))
+
+    assert list(table.routes('device/1')) == [(1, 'b'), (2, 'c'), (0, 'a')]
+
+    table.update('device/1', 1, _seen('b', -90))
+    assert list(table.routes('device/1')) == [(2, 'c'), (0, 'a'), (1, 'b')]
+
+    table.remove('device/1', 2)
+    assert list(table.routes('device/1')) == [(0, 'a'), (1, 'b')]
+    assert table.resolve(2, 'c') is None
+    assert table.resolve(0, 'a') == 'device/1'
+
+    table.remove('device/1', 0)
+    table.remove('device/1', 1)
+    assert 'device/1' not in table
+    assert list(table.routes('device/1')) == []
+
+
+def test_expiry_wheel():
+    """Make sure routes expire once and refreshed routes are kept."""
+
+    table = DeviceTable(resolution=1.0)
+    table.update('device/1', 0, _seen('a', 0), expires=10.5)
+    table.update('device/2', 0, _seen('b', 0), expires=10.5)
+    table.update('device/2', 1, _seen('c', 0), expires=20.5)
+    table.update('device/3', 0, _seen('d', 0))
+
+    assert table.expire(5.0) == 0
+
+    # Seeing a device again pushes back its expiration
+    table.update('device/1', 0, _seen('a', 0), expires=30.5)
+
+    assert table.expire(12.0) == 1
+    assert table.expire(12.0) == 0
+    assert set(table.snapshot()) == set(['device/1', 'device/2', 'device/3'])
+    assert table.snapshot()['device/2']['adapters'] == ((1, 0, 'adapter/1/c'),)
+
+    assert table.expire(1000.0) == 2
+    assert set(table.snapshot()) == set(['device/3'])
+
+
+def test_snapshot():
+    """Make sure snapshots are immutable and only rebuilt when something changes."""
+
+    table = DeviceTable()
+    table.update('device/1', 0, _seen('a', -80))
+    table.update('device/1', 1, _seen('b', -60))
+    table.update('device/2', 0, _seen('c', -60))
+
+    snap = table.snapshot()
+    assert table.snapshot() is snap
+
+    dev = snap['device/1']
+    assert dev['connection_string'] == 'device/1'
+    assert dev['best_adapter'] == 1
+    assert dev['signal_strength'] == -60
+    assert dev['adapters'] == ((1, -60, 'adapter/1/b'), (0, -80, 'adapter/0/a'))
+
+    with pytest.raises(TypeError):
+        snap['device/3'] = {}
+
+    with pytest.raises(TypeError):
+        dev['best_adapter'] = 0
+
+    table.update('device/1', 0, _seen('a', -50))
+    new_snap = table.snapshot()
+
+    assert new_snap is not snap
+    assert new_snap['device/2'] is snap['device/2']
+    assert new_snap['device/1']['best_adapter'] == 0
+    assert snap['device/1']['best_adapter'] == 1
+
+
+def test_visible_devices_signal(loop, adapter):
+    """Make sure connections go through the adapter with the best signal."""
+
+    adapter, _sub, _devs = adapter
+
+    loop.run_coroutine(adapter.probe())
+
+    event = dict(uuid=1, connection_string='1', signal_strength=200, validity_period=60)
+    loop.run_coroutine(adapter.handle_adapter_event(1, '1', None, 'device_seen', event))
+
+    dev = adapter.visible_devices()['device/1']
+    assert dev['best_adapter'] == 1
+    assert [x[0] for x in dev['adapters']] == [1, 0]
+    assert adapter._find_best_adapter('device/1', 1) == (1, '1')
+
+    # Adapter 1 cannot actually see device 1 so the connection must fail
+    with pytest.raises(DeviceAdapterError):
+        loop.run_coroutine(adapter.connect(1, 'device/1'))
@@ -1,3 +1,4 @@
 from .in_memory import InMemoryStorageEngine
+from .memory_mapped import MemoryMappedStorageEngine
 
-__all__ = ['InMemoryStorageEngine']
+__all__ = ['InMemoryStorageEngine', 'MemoryMappedStorageEngine']
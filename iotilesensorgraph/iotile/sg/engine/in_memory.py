@@ -4,11 +4,15 @@ from iotile.core.exceptions import ArgumentError
 from iotile.core.hw.reports import IOTileReading
 from iotile.sg import DataStream
 from iotile.sg.exceptions import StorageFullError, StreamEmptyError
+from .stream_index import StreamIndex
 
 
 class InMemoryStorageEngine:
     """A simple in memory storage engine for sensor graph.
 
+    Each storage area is indexed by stream and reading id so that walkers
+    can count, find and seek to readings without scanning the entire area.
+
     Args:
         model (DeviceModel): A model for the device type that we are
             emulating so that we can constrain our total memory
@@ -22,6 +26,8 @@ class InMemoryStorageEngine:
         self.streaming_length = model.get(u'max_streaming_buffer')
         self.streaming_data = []
         self.storage_data = []
+        self._storage_index = StreamIndex()
+        self._streaming_index = StreamIndex()
 
     def dump(self):
         """Serialize the state of this InMemoryStorageEngine to a dict.
@@ -49,6 +55,9 @@ class InMemoryStorageEngine:
         self.storage_data = [IOTileReading.FromDict(x) for x in storage_data]
         self.streaming_data = [IOTileReading.FromDict(x) for x in streaming_data]
 
+        self._storage_index.rebuild((x.stream for x in self.storage_data), (x.reading_id for x in self.storage_data))
+        self._streaming_index.rebuild((x.stream for x in self.streaming_data), (x.reading_id for x in self.streaming_data))
+
     def count(self):
         """Count the number of readings.
 
@@ -70,22 +79,45 @@ class InMemoryStorageEngine:
             int: The number of matching readings.
         """
 
-        if selector.output:
-            data = self.streaming_data
-        elif selector.buffered:
-            data = self.storage_data
-        else:
-            raise ArgumentError("You can only pass a buffered selector to count_matching", selector=selector)
+        return self._selector_index(selector).count_matching(selector, offset)
 
-        count = 0
-        for i in range(offset, len(data)):
-            reading = data[i]
+    def next_matching(self, selector, offset=0):
+        """Find the first reading matching selector at or after offset.
+
+        Args:
+            selector (DataStreamSelector): The selector that we want to
+                find a matching reading for.
+            offset (int): The starting offset that we should begin searching at.
+
+        Returns:
+            int: The offset of the matching reading or None if there is none.
+        """
 
-            stream = DataStream.FromEncoded(reading.stream)
-            if selector.matches(stream):
-                count += 1
+        return self._selector_index(selector).next_matching(selector, offset)
+
+    def find_id(self, buffer_type, reading_id):
+        """Find the offset of the first reading with the given reading id.
+
+        Args:
+            buffer_type (str): The buffer to search (either u"storage" or u"streaming")
+            reading_id (int): The reading id to search for.
+
+        Returns:
+            int: The offset of the reading or None if it could not be found.
+        """
+
+        if buffer_type == u'streaming':
+            return self._streaming_index.find_id(reading_id)
+
+        return self._storage_index.find_id(reading_id)
+
+    def _selector_index(self, selector):
+        if selector.output:
+            return self._streaming_index
+        elif selector.buffered:
+            return self._storage_index
 
-        return count
+        raise ArgumentError("You can only pass a buffered selector to count_matching", selector=selector)
 
     def scan_storage(self, area_name, callable, start=0, stop=None):
         """Iterate over streaming or storage areas, calling callable.
@@ -134,6 +166,8 @@ class InMemoryStorageEngine:
 
         self.storage_data = []
         self.streaming_data = []
+        self._storage_index.clear()
+        self._streaming_index.clear()
 
     def push(self, value):
         """Store a new value for the given stream.
@@ -150,11 +184,13 @@ class InMemoryStorageEngine:
                 raise StorageFullError('Streaming buffer full')
 
             self.streaming_data.append(value)
+            self._streaming_index.push(value.stream, value.reading_id)
         else:
             if len(self.storage_data) == self.storage_length:
                 raise StorageFullError('Storage buffer full')
 
             self.storage_data.append(value)
+            self._storage_index.push(value.stream, value.reading_id)
 
     def get(self, buffer_type, offset):
         """Get a reading from the buffer at offset.
@@ -206,7 +242,9 @@ class InMemoryStorageEngine:
 
         if buffer_type == u'streaming':
             self.streaming_data = remaining
+            self._streaming_index.popn(x.stream for x in popped)
         else:
             self.storage_data = remaining
+            self._storage_index.popn(x.stream for x in popped)
 
         return popped
@@ -0,0 +1,568 @@
+"""A persistent, memory mapped storage engine for sensor graph.
+
+Each storage area (storage and streaming) is kept in its own ring file that
+stores readings as fixed size 16 byte records using the same packed format
+that reports use on the wire: ``<HHLLL: stream, reserved, reading_id,
+raw_time, value``.
+
+The start of each file contains two copies of a small header that records
+where the ring currently starts and how many readings it contains.  Every
+update writes the reading data first and then the *older* of the two header
+slots with an incremented sequence number and a crc32, so a crash in the
+middle of an update always leaves at least one valid header describing a
+consistent ring.  When a file is opened, the valid header with the highest
+sequence number is used.
+"""
+
+import os
+import sys
+import mmap
+import array
+import base64
+import struct
+import zlib
+from iotile.core.exceptions import ArgumentError, DataError
+from iotile.core.hw.reports import IOTileReading, ReadingBlock
+from iotile.sg import DataStream
+from iotile.sg.exceptions import StorageFullError, StreamEmptyError
+from .stream_index import StreamIndex
+
+
+class _RingFile:
+    """A fixed capacity ring of packed readings stored in a memory mapped file.
+
+    Args:
+        path (str): The path to the file backing this ring.  It is created if
+            it does not exist.
+        capacity (int): The maximum number of readings that the ring can hold.
+            If an existing file has a different capacity, its contents are
+            copied into a correctly sized file.
+    """
+
+    MAGIC = b'SGRB'
+    VERSION = 1
+    HEADER = struct.Struct("<4sHHLLLQ")
+    CRC = struct.Struct("<L")
+    SLOT_SIZE = 32
+    DATA_OFFSET = 2 * SLOT_SIZE
+    RECORD = struct.Struct("<HHLLL")
+    RECORD_SIZE = 16
+
+    def __init__(self, path, capacity):
+        self.path = path
+        self.capacity = capacity
+        self.head = 0
+        self.count = 0
+        self.sequence = 0
+
+        self._file = None
+        self._mm = None
+
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            self._create(path, capacity, b'')
+
+        self._open()
+
+        if self.capacity != capacity:
+            try:
+                self.replace(self.read_range(0, self.count), capacity)
+            except ArgumentError:
+                self.close()
+                raise
+
+    def _create(self, path, capacity, records):
+        """Atomically create a new ring file containing records."""
+
+        count = self._check_records(path, capacity, records)
+        header = self._pack_header(capacity, 0, count, 1)
+
+        temp_path = path + '.tmp'
+        with open(temp_path, "wb") as outfile:
+            outfile.write(bytes(self.SLOT_SIZE))
+            outfile.write(header)
+            outfile.write(records)
+            outfile.truncate(self.DATA_OFFSET + capacity * self.RECORD_SIZE)
+            outfile.flush()
+            os.fsync(outfile.fileno())
+
+        os.replace(temp_path, path)
+
+    @classmethod
+    def _check_records(cls, path, capacity, records):
+        """Make sure packed records fit in a ring, returning how many there are."""
+
+        if len(records) % cls.RECORD_SIZE != 0:
+            raise ArgumentError("Packed readings are not a whole number of records", length=len(records),
+                                record_size=cls.RECORD_SIZE, path=path)
+
+        count = len(records) // cls.RECORD_SIZE
+        if count > capacity:
+            raise ArgumentError("Too many readings to fit in ring file", readings=count, capacity=capacity, path=path)
+
+        return count
+
+    def _open(self):
+        self._file = open(self.path, "r+b")
+        self._mm = mmap.mmap(self._file.fileno(), 0)
+
+        best = None
+        for slot in range(0, 2):
+            header = self._unpack_header(slot)
+            if header is not None and (best is None or header[3] > best[3]):
+                best = header
+
+        if best is None:
+            self.close()
+            raise DataError("Storage ring file is corrupted, no valid header found", path=self.path)
+
+        capacity, head, count, sequence = best
+        if len(self._mm) < self.DATA_OFFSET + capacity * self.RECORD_SIZE or count > capacity or head >= max(capacity, 1):
+            self.close()
+            raise DataError("Storage ring file header does not match file contents", path=self.path,
+                            capacity=capacity, head=head, count=count)
+
+        self.capacity = capacity
+        self.head = head
+        self.count = count
+        self.sequence = sequence
+
+    def _pack_header(self, capacity, head, count, sequence):
+        header = self.HEADER.pack(self.MAGIC, self.VERSION, 0, capacity, head, count, sequence)
+        return header + self.CRC.pack(zlib.crc32(header) & 0xFFFFFFFF)
+
+    def _unpack_header(self, slot):
+        offset = slot * self.SLOT_SIZE
+        header = self._mm[offset:offset + self.HEADER.size]
+        crc, = self.CRC.unpack_from(self._mm, offset + self.HEADER.size)
+
+        if zlib.crc32(header) & 0xFFFFFFFF != crc:
+            return None
+
+        magic, version, _reserved, capacity, head, count, sequence = self.HEADER.unpack(header)
+        if magic != self.MAGIC or version != self.VERSION:
+            return None
+
+        return capacity, head, count, sequence
+
+    def _commit(self, head, count):
+        """Persist a new head and count into the older header slot."""
+
+        self.sequence += 1
+        offset = (self.sequence % 2) * self.SLOT_SIZE
+        self._mm[offset:offset + self.SLOT_SIZE] = self._pack_header(self.capacity, head, count, self.sequence)
+
+        self.head = head
+        self.count = count
+
+    def _physical(self, index):
+        index += self.head
+        if index >= self.capacity:
+            index -= self.capacity
+
+        return index
+
+    def _segments(self, start, stop):
+        """Split the logical range [start, stop) into contiguous byte ranges."""
+
+        if start >= stop:
+            return []
+
+        first = self._physical(start)
+        length = stop - start
+
+        if first + length <= self.capacity:
+            return [(first, length)]
+
+        first_length = self.capacity - first
+        return [(first, first_length), (0, length - first_length)]
+
+    def read_range(self, start, stop):
+        """Read the packed records in the logical range [start, stop).
+
+        Returns:
+            bytes: The packed records in order.
+        """
+
+        chunks = []
+        for first, length in self._segments(start, stop):
+            offset = self.DATA_OFFSET + first * self.RECORD_SIZE
+            chunks.append(self._mm[offset:offset + length * self.RECORD_SIZE])
+
+        return b''.join(chunks)
+
+    def iter_range(self, start, stop):
+        """Iterate over the unpacked records in the logical range [start, stop)."""
+
+        for first, length in self._segments(start, stop):
+            offset = self.DATA_OFFSET + first * self.RECORD_SIZE
+            for record in self.RECORD.iter_unpack(self._mm[offset:offset + length * self.RECORD_SIZE]):
+                yield record
+
+    def columns(self):
+        """Extract the stream and reading id of every record in the ring.
+
+        Returns:
+            (array, array): The encoded streams and reading ids in order.
+        """
+
+        data = memoryview(self.read_range(0, self.count))
+
+        streams = array.array('H')
+        streams.frombytes(data.cast('H')[0::8].tobytes())
+        reading_ids = array.array('I')
+        reading_ids.frombytes(data.cast('I')[1::4].tobytes())
+
+        if sys.byteorder == 'big':
+            streams.byteswap()
+            reading_ids.byteswap()
+
+        return streams, reading_ids
+
+    def get(self, index):
+        offset = self.DATA_OFFSET + self._physical(index) * self.RECORD_SIZE
+        return self.RECORD.unpack_from(self._mm, offset)
+
+    def append(self, stream, reading_id, raw_time, value):
+        offset = self.DATA_OFFSET + self._physical(self.count) * self.RECORD_SIZE
+        self.RECORD.pack_into(self._mm, offset, stream, 0, reading_id, raw_time, value)
+        self._commit(self.head, self.count + 1)
+
+    def drop(self, count):
+        """Discard the oldest count records by advancing the start of the ring."""
+
+        self._commit(self._physical(count) if count < self.count else 0, self.count - count)
+
+    def clear(self):
+        self._commit(0, 0)
+
+    def replace(self, records, capacity=None):
+        """Atomically replace the contents of the ring with packed records."""
+
+        if capacity is None:
+            capacity = self.capacity
+
+        # Check before closing anything so that the ring stays usable if the records don't fit
+        self._check_records(self.path, capacity, records)
+
+        self.close()
+        self._create(self.path, capacity, records)
+        self._open()
+
+    def flush(self):
+        if self._mm is not None:
+            self._mm.flush()
+
+    def close(self):
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class MemoryMappedStorageEngine:
+    """A persistent storage engine for sensor graph backed by memory mapped files.
+
+    This engine has the same interface as InMemoryStorageEngine but keeps
+    readings as packed 16 byte records in one ring file per storage area
+    inside of a directory.  Rolling over a buffer only moves the start of
+    the ring and saving or restoring a snapshot copies the packed records
+    directly without creating an IOTileReading for each of them.
+
+    If the directory already contains ring files from a previous run, their
+    readings are loaded so that the sensor log persists across runs.
+
+    Readings are written into the shared memory map as soon as they are
+    pushed so they survive a crash of the process.  Call flush() to make
+    sure they are also written to disk.
+
+    Args:
+        model (DeviceModel): A model for the device type that we are
+            emulating so that we can constrain our total memory
+            size appropriately to get the same behavior that would
+            be seen on an actual device.
+        path (str): The directory that should contain the ring files.  It is
+            created if it does not exist.
+    """
+
+    STORAGE_FILE = 'storage.bin'
+    STREAMING_FILE = 'streaming.bin'
+
+    def __init__(self, model, path):
+        self.model = model
+        self.path = path
+        self.storage_length = model.get(u'max_storage_buffer')
+        self.streaming_length = model.get(u'max_streaming_buffer')
+
+        if not os.path.isdir(path):
+            os.makedirs(path)
+
+        self._storage = _RingFile(os.path.join(path, self.STORAGE_FILE), self.storage_length)
+        self._streaming = _RingFile(os.path.join(path, self.STREAMING_FILE), self.streaming_length)
+
+        self._storage_index = StreamIndex()
+        self._streaming_index = StreamIndex()
+        self._rebuild_indices()
+
+    def _rebuild_indices(self):
+        self._storage_index.rebuild(*self._storage.columns())
+        self._streaming_index.rebuild(*self._streaming.columns())
+
+    def _choose_ring(self, buffer_type):
+        if buffer_type == u'streaming':
+            return self._streaming, self._streaming_index
+
+        return self._storage, self._storage_index
+
+    def _selector_index(self, selector):
+        if selector.output:
+            return self._streaming_index
+        elif selector.buffered:
+            return self._storage_index
+
+        raise ArgumentError("You can only pass a buffered selector to count_matching", selector=selector)
+
+    def dump(self):
+        """Serialize the state of this MemoryMappedStorageEngine to a dict.
+
+        The readings are stored as base64 encoded packed records so the
+        result can be saved as json.
+
+        Returns:
+            dict: The serialized data.
+        """
+
+        return {
+            u'storage_records': base64.b64encode(self._storage.read_range(0, self._storage.count)).decode('ascii'),
+            u'streaming_records': base64.b64encode(self._streaming.read_range(0, self._streaming.count)).decode('ascii')
+        }
+
+    def restore(self, state):
+        """Restore the state of this MemoryMappedStorageEngine from a dict.
+
+        Both the packed format produced by dump() and the list of readings
+        format produced by InMemoryStorageEngine.dump() are supported.
+        """
+
+        if u'storage_records' in state or u'streaming_records' in state:
+            storage_data = base64.b64decode(state.get(u'storage_records', u''))
+            streaming_data = base64.b64decode(state.get(u'streaming_records', u''))
+        else:
+            storage_data = self._pack_dicts(state.get(u'storage_data', []))
+            streaming_data = self._pack_dicts(state.get(u'streaming_data', []))
+
+        if len(storage_data) % _RingFile.RECORD_SIZE != 0 or len(streaming_data) % _RingFile.RECORD_SIZE != 0:
+            raise ArgumentError("Cannot restore MemoryMappedStorageEngine, packed readings are not a whole "
+                                "number of records", storage_length=len(storage_data),
+                                streaming_length=len(streaming_data), record_size=_RingFile.RECORD_SIZE)
+
+        storage_size = len(storage_data) // _RingFile.RECORD_SIZE
+        streaming_size = len(streaming_data) // _RingFile.RECORD_SIZE
+
+        if storage_size > self.storage_length or streaming_size > self.streaming_length:
+            raise ArgumentError("Cannot restore MemoryMappedStorageEngine, too many readings",
+                                storage_size=storage_size, storage_max=self.storage_length,
+                                streaming_size=streaming_size, streaming_max=self.streaming_length)
+
+        self._storage.replace(storage_data)
+        self._streaming.replace(streaming_data)
+        self._rebuild_indices()
+
+    @classmethod
+    def _pack_dicts(cls, readings):
+        return bytes(ReadingBlock.FromReadings([IOTileReading.FromDict(x) for x in readings]).encode())
+
+    def count(self):
+        """Count the number of readings.
+
+        Returns:
+            (int, int): The number of readings in storage and streaming buffers.
+        """
+
+        return (self._storage.count, self._streaming.count)
+
+    def count_matching(self, selector, offset=0):
+        """Count the number of readings matching selector.
+
+        Args:
+            selector (DataStreamSelector): The selector that we want to
+                count matching readings for.
+            offset (int): The starting offset that we should begin counting at.
+
+        Returns:
+            int: The number of matching readings.
+        """
+
+        return self._selector_index(selector).count_matching(selector, offset)
+
+    def next_matching(self, selector, offset=0):
+        """Find the first reading matching selector at or after offset.
+
+        Args:
+            selector (DataStreamSelector): The selector that we want to
+                find a matching reading for.
+            offset (int): The starting offset that we should begin searching at.
+
+        Returns:
+            int: The offset of the matching reading or None if there is none.
+        """
+
+        return self._selector_index(selector).next_matching(selector, offset)
+
+    def find_id(self, buffer_type, reading_id):
+        """Find the offset of the first reading with the given reading id.
+
+        Args:
+            buffer_type (str): The buffer to search (either u"storage" or u"streaming")
+            reading_id (int): The reading id to search for.
+
+        Returns:
+            int: The offset of the reading or None if it could not be found.
+        """
+
+        _ring, index = self._choose_ring(buffer_type)
+        return index.find_id(reading_id)
+
+    def scan_storage(self, area_name, callable, start=0, stop=None):
+        """Iterate over streaming or storage areas, calling callable.
+
+        Args:
+            area_name (str): Either 'storage' or 'streaming' to indicate which
+                storage area to scan.
+            callable (callable): A function that will be called as (offset, reading)
+                for each reading between start_offset and end_offset (inclusive).  If
+                the scan function wants to stop early it can return True.  If it returns
+                anything else (including False or None), scanning will continue.
+            start (int): Optional offset to start at (included in scan).
+            stop (int): Optional offset to end at (included in scan).
+
+        Returns:
+            int: The number of entries scanned.
+        """
+
+        if area_name == u'storage':
+            ring = self._storage
+        elif area_name == u'streaming':
+            ring = self._streaming
+        else:
+            raise ArgumentError("Unknown area name in scan_storage (%s) should be storage or streaming" % area_name)
+
+        if ring.count == 0:
+            return 0
+
+        if stop is None:
+            stop = ring.count - 1
+        elif stop >= ring.count:
+            raise ArgumentError("Given stop offset is greater than the highest offset supported", length=ring.count, stop_offset=stop)
+
+        scanned = 0
+        for i, record in enumerate(ring.iter_range(start, stop + 1), start):
+            scanned += 1
+
+            should_break = callable(i, _unpack_reading(record))
+            if should_break is True:
+                break
+
+        return scanned
+
+    def clear(self):
+        """Clear all data from this storage engine."""
+
+        self._storage.clear()
+        self._streaming.clear()
+        self._storage_index.clear()
+        self._streaming_index.clear()
+
+    def push(self, value):
+        """Store a new value for the given stream.
+
+        Args:
+            value (IOTileReading): The value to store.  The stream
+                parameter must have the correct value
+        """
+
+        stream = DataStream.FromEncoded(value.stream)
+
+        if stream.stream_type == DataStream.OutputType:
+            if self._streaming.count == self.streaming_length:
+                raise StorageFullError('Streaming buffer full')
+
+            ring, index = self._streaming, self._streaming_index
+        else:
+            if self._storage.count == self.storage_length:
+                raise StorageFullError('Storage buffer full')
+
+            ring, index = self._storage, self._storage_index
+
+        ring.append(value.stream, value.reading_id, value.raw_time, value.value)
+        index.push(value.stream, value.reading_id)
+
+    def get(self, buffer_type, offset):
+        """Get a reading from the buffer at offset.
+
+        Offset is specified relative to the start of the data buffer.
+        This means that if the buffer rolls over, the offset for a given
+        item will appear to change.  Anyone holding an offset outside of this
+        engine object will need to be notified when rollovers happen (i.e.
+        popn is called so that they can update their offset indices)
+
+        Args:
+            buffer_type (str): The buffer to pop from (either u"storage" or u"streaming")
+            offset (int): The offset of the reading to get
+        """
+
+        ring, _index = self._choose_ring(buffer_type)
+
+        if offset >= ring.count:
+            raise StreamEmptyError("Invalid index given in get command", requested=offset, stored=ring.count, buffer=buffer_type)
+
+        return _unpack_reading(ring.get(offset))
+
+    def popn(self, buffer_type, count):
+        """Remove and return the oldest count values from the named buffer
+
+        The readings are removed by advancing the start of the ring so the
+        cost does not depend on how many readings remain in the buffer.
+
+        Args:
+            buffer_type (str): The buffer to pop from (either u"storage" or u"streaming")
+            count (int): The number of readings to pop
+
+        Returns:
+            list(IOTileReading): The values popped from the buffer
+        """
+
+        buffer_type = str(buffer_type)
+        ring, index = self._choose_ring(buffer_type)
+
+        if count > ring.count:
+            raise StreamEmptyError("Not enough data in buffer for popn command", requested=count, stored=ring.count, buffer=buffer_type)
+
+        popped = [_unpack_reading(x) for x in ring.iter_range(0, count)]
+        ring.drop(count)
+        index.popn(x.stream for x in popped)
+
+        return popped
+
+    def flush(self):
+        """Make sure all readings have been written to disk."""
+
+        self._storage.flush()
+        self._streaming.flush()
+
+    def close(self):
+        """Flush and close the ring files.
+
+        The engine cannot be used after it is closed.
+        """
+
+        self.flush()
+        self._storage.close()
+        self._streaming.close()
+
+
+def _unpack_reading(record):
+    stream, _reserved, reading_id, raw_time, value = record
+    return IOTileReading(raw_time, stream, value, reading_id=reading_id)
@@ -0,0 +1,197 @@
+"""A secondary index over the readings stored in a storage area.
+
+Storage engines keep readings in the order that they were pushed and refer
+to them by their offset from the oldest reading in the area.  Finding the
+readings that match a DataStreamSelector or that have a given reading id
+would otherwise require decoding every reading in the area.
+
+StreamIndex keeps, for each encoded stream, the sorted positions of all of
+its readings along with the reading id stored at each position so that
+these lookups only need a binary search.
+"""
+
+import array
+from bisect import bisect_left
+
+
+class StreamIndex:
+    """Per-stream offset and reading id index for a single storage area.
+
+    Positions are absolute, the first reading pushed after the index was
+    cleared has position 0 and every subsequent reading gets the next
+    position.  ``base`` is the position of the oldest reading still in the
+    storage area so that a reading's offset is ``position - base``.
+
+    The index must be told about every reading that is pushed or popped
+    from the storage area in the same order as the storage engine sees them.
+    """
+
+    CompactionThreshold = 1024
+
+    def __init__(self):
+        self.base = 0
+        self._streams = {}
+        self._starts = {}
+        self._ids = array.array('L')
+        self._ids_start = 0
+        self._ids_sorted = True
+
+    def __len__(self):
+        return len(self._ids) - self._ids_start
+
+    def clear(self):
+        """Remove all readings from the index."""
+
+        self.base = 0
+        self._streams = {}
+        self._starts = {}
+        self._ids = array.array('L')
+        self._ids_start = 0
+        self._ids_sorted = True
+
+    def rebuild(self, streams, reading_ids):
+        """Clear the index and add the given readings in order.
+
+        Args:
+            streams (iterable of int): The encoded stream of each reading.
+            reading_ids (iterable of int): The reading id of each reading.
+        """
+
+        self.clear()
+        for stream, reading_id in zip(streams, reading_ids):
+            self.push(stream, reading_id)
+
+    def push(self, stream, reading_id):
+        """Add a new reading to the end of the index.
+
+        Args:
+            stream (int): The encoded stream of the reading.
+            reading_id (int): The reading's id.
+        """
+
+        position = self.base + len(self)
+
+        positions = self._streams.get(stream)
+        if positions is None:
+            positions = array.array('q')
+            self._streams[stream] = positions
+            self._starts[stream] = 0
+
+        positions.append(position)
+
+        if self._ids_sorted and len(self) > 0 and reading_id < self._ids[-1]:
+            self._ids_sorted = False
+
+        self._ids.append(reading_id)
+
+    def popn(self, streams):
+        """Remove the oldest readings from the index.
+
+        Args:
+            streams (iterable of int): The encoded streams of the readings
+                that were removed, oldest first.
+        """
+
+        count = 0
+        for stream in streams:
+            count += 1
+
+            positions = self._streams[stream]
+            start = self._starts[stream] + 1
+
+            if start == len(positions):
+                del self._streams[stream]
+                del self._starts[stream]
+                continue
+
+            if start >= self.CompactionThreshold and 2 * start >= len(positions):
+                del positions[:start]
+                start = 0
+
+            self._starts[stream] = start
+
+        self.base += count
+        self._ids_start += count
+
+        if self._ids_start == len(self._ids):
+            self._ids = array.array('L')
+            self._ids_start = 0
+            self._ids_sorted = True
+        elif self._ids_start >= self.CompactionThreshold and 2 * self._ids_start >= len(self._ids):
+            del self._ids[:self._ids_start]
+            self._ids_start = 0
+
+    def count_matching(self, selector, offset=0):
+        """Count the readings at or after offset that match selector.
+
+        Args:
+            selector (DataStreamSelector): The selector to match.
+            offset (int): The offset to start counting at.
+
+        Returns:
+            int: The number of matching readings.
+        """
+
+        position = self.base + offset
+
+        count = 0
+        for stream, positions in self._streams.items():
+            if selector.matches(stream):
+                count += len(positions) - bisect_left(positions, position, self._starts[stream])
+
+        return count
+
+    def next_matching(self, selector, offset=0):
+        """Find the first reading at or after offset that matches selector.
+
+        Args:
+            selector (DataStreamSelector): The selector to match.
+            offset (int): The offset to start searching at.
+
+        Returns:
+            int: The offset of the matching reading or None if there is no
+                matching reading.
+        """
+
+        position = self.base + offset
+
+        found = None
+        for stream, positions in self._streams.items():
+            if not selector.matches(stream):
+                continue
+
+            i = bisect_left(positions, position, self._starts[stream])
+            if i < len(positions) and (found is None or positions[i] < found):
+                found = positions[i]
+
+        if found is None:
+            return None
+
+        return found - self.base
+
+    def find_id(self, reading_id):
+        """Find the offset of the first reading with the given reading id.
+
+        Reading ids are normally assigned in increasing order so this is a
+        binary search.  If readings were ever pushed out of order, a linear
+        search is performed instead until the index is emptied.
+
+        Args:
+            reading_id (int): The reading id to search for.
+
+        Returns:
+            int: The offset of the reading or None if it could not be found.
+        """
+
+        if self._ids_sorted:
+            i = bisect_left(self._ids, reading_id, self._ids_start)
+            if i < len(self._ids) and self._ids[i] == reading_id:
+                return i - self._ids_start
+
+            return None
+
+        for i in range(self._ids_start, len(self._ids)):
+            if self._ids[i] == reading_id:
+                return i - self._ids_start
+
+        return None
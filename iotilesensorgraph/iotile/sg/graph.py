@@ -6,6 +6,7 @@ from pkg_resources import iter_entry_points
 from toposort import toposort_flatten
 from iotile.core.exceptions import ArgumentError
 from iotile.core.hw.reports import IOTileReading
+from .node import SGNode, InputTrigger
 from .node_descriptor import parse_node_descriptor
 from .slot import SlotIdentifier
 from .stream import DataStream
@@ -27,6 +28,8 @@ class SensorGraph:
             Defaults to False.
     """
 
+    _NOOP_WHEN_EMPTY = frozenset(['copy_all_a', 'copy_latest_a'])
+
     def __init__(self, sensor_log, model=None, enforce_limits=False):
         self.roots = []
         self.nodes = []
@@ -40,6 +43,9 @@ class SensorGraph:
         self.model = model
 
         self._manually_triggered_streamers = set()
+        self._root_dispatch = {}
+        self._root_gates = None
+        self._armed_roots = None
         self._logger = logging.getLogger(__name__)
 
         if enforce_limits:
@@ -67,6 +73,132 @@ class SensorGraph:
         self.metadata_database = {}
         self.config_database = {}
 
+        self.invalidate_dispatch()
+
+    def invalidate_dispatch(self):
+        """Discard the cached table of which root nodes respond to each input.
+
+        The table is rebuilt lazily as inputs are processed.  It is
+        invalidated automatically when nodes are added or sorted but must be
+        invalidated explicitly by anyone who modifies the roots or node inputs
+        of this graph directly, or who adds readings to input streams without
+        going through process_input.
+        """
+
+        self._root_dispatch = {}
+        self._root_gates = None
+        self._armed_roots = None
+
+    def input_roots(self, stream):
+        """Find the root nodes that should be checked when an input is processed.
+
+        Only the root nodes that could do something are returned, which gives
+        the same results as checking every root node.  These are:
+
+        - root nodes with an input that matches the stream (or the associated
+          output of an important stream) since those have new data.
+        - root nodes whose trigger does not depend on data in an input
+          stream, such as ``copy_count_a`` nodes with an ``always`` trigger.
+        - root nodes that still held enough input data to be triggered the
+          last time they were checked.
+
+        The first two sets are computed once per stream and cached.  Callers
+        must pass the returned list to rearm_roots() once they have finished
+        processing the input.
+
+        Args:
+            stream (DataStream): The input stream that is being processed.
+
+        Returns:
+            list(SGNode): The root nodes to check in the order they appear in
+                self.roots.
+        """
+
+        if self._root_gates is None:
+            self._root_gates = {node: self._find_gates(node) for node in self.roots}
+            self._armed_roots = set(node for node, gates in self._root_gates.items()
+                                    if gates is not None and self._may_trigger(node, gates))
+
+        encoded = stream.encode()
+
+        roots = self._root_dispatch.get(encoded)
+        if roots is None:
+            streams = [encoded]
+            if stream.important:
+                streams.append(stream.associated_stream().encode())
+
+            roots = [node for node in self.roots if self._root_gates[node] is None
+                     or any(walker.matches(x) for walker, _trigger in node.inputs for x in streams)]
+            self._root_dispatch[encoded] = roots
+
+        armed = self._armed_roots.difference(roots)
+        if len(armed) == 0:
+            return roots
+
+        return [node for node in self.roots if node in armed or node in roots]
+
+    def rearm_roots(self, roots):
+        """Record which of the given root nodes could still be triggered.
+
+        This must be called with the result of input_roots() after an input
+        and all of the nodes it triggered have been processed.
+
+        Args:
+            roots (list(SGNode)): The root nodes that were checked.
+        """
+
+        for node in roots:
+            gates = self._root_gates.get(node)
+            if gates is None:
+                continue
+
+            if self._may_trigger(node, gates):
+                self._armed_roots.add(node)
+            else:
+                self._armed_roots.discard(node)
+
+    @classmethod
+    def _find_gates(cls, node):
+        """Find the input walkers that must hold data for a root node to be triggered.
+
+        A gate is an input on an input stream whose trigger cannot be true
+        while that input is empty, or the only input of a node whose
+        processing function does nothing while it is empty.  Such an input
+        only gains data when its stream is processed as an input.  Returns
+        None if the node could do something without any gate holding data.
+        """
+
+        # These functions do nothing when their only input is empty, whatever its trigger
+        if node.func_name in cls._NOOP_WHEN_EMPTY and node.num_inputs == 1:
+            walker = node.inputs[0][0]
+            if walker.selector.input and not walker.selector.inexhaustible:
+                return [walker]
+
+        gates = []
+        others = 0
+        for walker, trigger in node.inputs:
+            selector = walker.selector
+            if (selector is not None and selector.input and isinstance(trigger, InputTrigger)
+                    and not (trigger.use_count and trigger.comp_function(0, trigger.reference))):
+                gates.append(walker)
+            else:
+                others += 1
+
+        if len(gates) == 0:
+            return None
+
+        if node.trigger_combiner == SGNode.OrTriggerCombiner and others > 0:
+            return None
+
+        return gates
+
+    @classmethod
+    def _may_trigger(cls, node, gates):
+        if node.trigger_combiner == SGNode.OrTriggerCombiner:
+            return any(walker.count() > 0 for walker in gates)
+
+        return all(walker.count() > 0 for walker in gates)
+
     def add_node(self, node_descriptor):
         """Add a node to the sensor graph based on the description given.
 
@@ -125,6 +257,7 @@ class SensorGraph:
 
         node.set_func(processor, func)
         self.nodes.append(node)
+        self.invalidate_dispatch()
 
     def add_config(self, slot, config_id, config_type, value):
         """Add a config variable assignment to this sensor graph.
@@ -337,7 +470,8 @@ class SensorGraph:
             associated_output = stream.associated_stream()
             self.sensor_log.push(associated_output, value)
 
-        to_check = deque([x for x in self.roots])
+        roots = self.input_roots(stream)
+        to_check = deque(roots)
 
         while len(to_check) > 0:
             node = to_check.popleft()
@@ -355,6 +489,8 @@ class SensorGraph:
                 if len(results) > 0:
                     to_check.extend(node.outputs)
 
+        self.rearm_roots(roots)
+
     def mark_streamer(self, index):
         """Manually mark a streamer that should trigger.
 
@@ -482,6 +618,7 @@ class SensorGraph:
         # sort the nodes and reorder them.
         node_order = toposort_flatten(node_deps)
         self.nodes = [self.nodes[x] for x in node_order]
+        self.invalidate_dispatch()
 
         #Check root nodes all topographically sorted to the beginning
         for root in self.roots:
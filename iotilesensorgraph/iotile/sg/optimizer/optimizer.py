@@ -106,3 +106,6 @@ class SensorGraphOptimizer:
 
             while rerun:
                 rerun = pass_instance.run(sensor_graph, model=model)
+
+        # Optimization passes modify nodes and roots directly
+        sensor_graph.invalidate_dispatch()
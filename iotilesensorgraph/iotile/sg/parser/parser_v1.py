@@ -82,7 +82,7 @@ class SensorGraphFileParser:
             parsed = self.parse_statement(statement, orig_contents=data)
             self.statements.append(parsed)
 
-    def compile(self, model):
+    def compile(self, model, engine=None):
         """Compile this file into a SensorGraph.
 
         You must have preivously called parse_file to parse a
@@ -95,9 +95,15 @@ class SensorGraphFileParser:
         Args:
             model (DeviceModel): The device model that we should compile
                 this sensor graph for.
+            engine (StorageEngine): Optional storage engine that the sensor
+                graph's SensorLog should use.  If not specified, an
+                InMemoryStorageEngine is created.
         """
 
-        log = SensorLog(InMemoryStorageEngine(model), model)
+        if engine is None:
+            engine = InMemoryStorageEngine(model)
+
+        log = SensorLog(engine, model)
         self.sensor_graph = SensorGraph(log, model)
 
         allocator = StreamAllocator(self.sensor_graph, model)
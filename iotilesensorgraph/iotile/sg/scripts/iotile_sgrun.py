@@ -9,6 +9,7 @@ from iotile.sg.sim.hosted_executor import SemihostedRPCExecutor
 from iotile.sg.parser import SensorGraphFileParser
 from iotile.sg.known_constants import user_connected
 from iotile.sg.optimizer import SensorGraphOptimizer
+from iotile.sg.engine import MemoryMappedStorageEngine
 
 DESCRIPTION = \
 u"""Load and run a sensor graph, either in a simulator or on a physical device.
@@ -53,6 +54,11 @@ examples:
     iotile-sgrun -i "input 1 = 5" <sensor_graph file> -s "run_time 1 minute"
         This will run the simulation for exactly 60 simulated seconds and begin
         the simulation by injecting the value 5 onto input 1 exactly once.
+
+    iotile-sgrun --storage-dir ./sglog --buffer-size 5000000 <sensor_graph file>
+        This will store all readings in memory mapped files inside ./sglog that
+        can each hold up to 5 million readings.  The readings are kept between
+        runs.
 """
 
 
@@ -70,6 +76,8 @@ def build_args():
     parser.add_argument(u"--port", u"-p", help=u"The port to use to connect to a device if we are semihosting")
     parser.add_argument(u"--semihost-device", u"-d", type=lambda x: int(x, 0), help=u"The device id of the device we should semihost this sensor graph on.")
     parser.add_argument(u"-c", u"--connected", action="store_true", help=u"Simulate with a user connected to the device (to enable realtime outputs)")
+    parser.add_argument(u"--storage-dir", help=u"Store readings persistently in memory mapped files inside this directory")
+    parser.add_argument(u"--buffer-size", type=int, help=u"The maximum number of readings to keep in each of the storage and streaming buffers")
     parser.add_argument(u"-i", u"--stimulus", action=u"append", default=[], help="Push a value to an input stream at the specified time (or before starting).  The syntax is [time: ][system ]input X = Y where X and Y are integers")
     return parser
 
@@ -142,14 +150,21 @@ def main(argv=None):
 
     try:
         executor = None
+        engine = None
         parser = build_args()
         args = parser.parse_args(args=argv)
 
         model = DeviceModel()
+        if args.buffer_size is not None:
+            model.set(u'max_storage_buffer', args.buffer_size)
+            model.set(u'max_streaming_buffer', args.buffer_size)
+
+        if args.storage_dir is not None:
+            engine = MemoryMappedStorageEngine(model, args.storage_dir)
 
         parser = SensorGraphFileParser()
         parser.parse_file(args.sensor_graph)
-        parser.compile(model)
+        parser.compile(model, engine=engine)
 
         if not args.disable_optimizer:
             opt = SensorGraphOptimizer()
@@ -186,7 +201,7 @@ def main(argv=None):
             if args.connected:
                 sim.step(user_connected, 8)
 
-            sim.run(accelerated=not args.realtime)
+            sim.run(accelerated=not args.realtime, fast_forward=not args.realtime)
         except KeyboardInterrupt:
             pass
 
@@ -196,4 +211,7 @@ def main(argv=None):
         if executor is not None:
             executor.hw.close()
 
+        if engine is not None:
+            engine.close()
+
     return 0
@@ -57,6 +57,8 @@ class SensorLog:
         self._last_values = {}
         self._virtual_walkers = []
         self._queue_walkers = []
+        self._dispatch = {}
+        self._modification_count = 0
 
         if model is None:
             model = DeviceModel()
@@ -71,6 +73,51 @@ class SensorLog:
 
         self.id_assigner = id_assigner
 
+    @property
+    def modification_count(self):
+        """A counter that changes whenever data or walkers in this SensorLog change.
+
+        This can be used to cheaply detect whether any stream walker could
+        have changed state since the last time it was checked.
+        """
+
+        return self._modification_count
+
+    def _walkers_changed(self):
+        self._dispatch = {}
+        self._modification_count += 1
+
+    def _stream_dispatch(self, stream, encoded):
+        """Find the walkers and monitors that are interested in a stream.
+
+        The result is cached per encoded stream until walkers or monitors are
+        added or removed so that push() does not need to check every walker
+        and monitor selector for every reading.
+
+        Returns:
+            (list, list, list): The queue walkers, monitor callbacks and virtual
+                walkers that match the stream.
+        """
+
+        targets = self._dispatch.get(encoded)
+        if targets is not None:
+            return targets
+
+        queue_walkers = []
+        if stream.buffered:
+            queue_walkers = [x for x in self._queue_walkers if x.selector.output == stream.output and x.matches(stream)]
+
+        callbacks = []
+        for selector in self._monitors:
+            if selector is None or selector.matches(stream):
+                callbacks.extend(self._monitors[selector])
+
+        virtual_walkers = [x for x in self._virtual_walkers if x.matches(stream)]
+
+        targets = (queue_walkers, callbacks, virtual_walkers)
+        self._dispatch[encoded] = targets
+        return targets
+
     def dump(self):
         """Dump the state of this SensorLog.
 
@@ -121,6 +168,7 @@ class SensorLog:
                 SensorLog and permissive==False.
         """
 
+        self._modification_count += 1
         self._engine.restore(state.get(u'engine'))
         self._last_values = {DataStream.FromString(stream): IOTileReading.FromDict(reading) for
                              stream, reading in state.get(u"last_values", {}).items()}
@@ -203,6 +251,7 @@ class SensorLog:
             self._monitors[selector] = set()
 
         self._monitors[selector].add(callback)
+        self._dispatch = {}
 
     def create_walker(self, selector, skip_all=True):
         """Create a stream walker based on the given selector.
@@ -227,6 +276,8 @@ class SensorLog:
             StreamWalker: A properly updating stream walker with the given selector.
         """
 
+        self._walkers_changed()
+
         if selector.buffered:
             walker = BufferedStreamWalker(selector, self._engine, skip_all=skip_all)
             self._queue_walkers.append(walker)
@@ -254,6 +305,8 @@ class SensorLog:
         else:
             self._virtual_walkers.remove(walker)
 
+        self._walkers_changed()
+
     def restore_walker(self, dumped_state):
         """Restore a stream walker that was previously serialized.
 
@@ -284,6 +337,7 @@ class SensorLog:
 
         self._queue_walkers = []
         self._virtual_walkers = []
+        self._walkers_changed()
 
     def count(self):
         """Count many many readings are persistently stored.
@@ -301,6 +355,8 @@ class SensorLog:
         destroyed.
         """
 
+        self._modification_count += 1
+
         for walker in self._virtual_walkers:
             walker.skip_all()
 
@@ -320,12 +376,14 @@ class SensorLog:
         """
 
         # Make sure the stream is correct
+        encoded = stream.encode()
         reading = copy.copy(reading)
-        reading.stream = stream.encode()
+        reading.stream = encoded
 
-        if stream.buffered:
-            output_buffer = stream.output
+        self._modification_count += 1
+        queue_walkers, callbacks, virtual_walkers = self._stream_dispatch(stream, encoded)
 
+        if stream.buffered:
             if self.id_assigner is not None:
                 reading.reading_id = self.id_assigner(stream, reading)
 
@@ -339,22 +397,17 @@ class SensorLog:
                 self._erase_buffer(stream.output)
                 self._engine.push(reading)
 
-            for walker in self._queue_walkers:
-                # Only notify the walkers that are on this queue
-                if walker.selector.output == output_buffer:
-                    walker.notify_added(stream)
+            for walker in queue_walkers:
+                walker.notify_added(stream)
 
         # Activate any monitors we have for this stream
-        for selector in self._monitors:
-            if selector is None or selector.matches(stream):
-                for callback in self._monitors[selector]:
-                    callback(stream, reading)
+        for callback in callbacks:
+            callback(stream, reading)
 
         # Virtual streams live only in their walkers, so update each walker
         # that contains this stream.
-        for walker in self._virtual_walkers:
-            if walker.matches(stream):
-                walker.push(stream, reading)
+        for walker in virtual_walkers:
+            walker.push(stream, reading)
 
         self._last_values[stream] = reading
 
@@ -371,13 +424,10 @@ class SensorLog:
 
         # Now go through all of our walkers that could match and
         # update their availability counts and data buffer pointers
+        walkers = [x for x in self._queue_walkers if x.selector.output == output_buffer]
         for reading in old_readings:
-            stream = DataStream.FromEncoded(reading.stream)
-
-            for walker in self._queue_walkers:
-                # Only notify the walkers that are on this queue
-                if walker.selector.output == output_buffer:
-                    walker.notify_rollover(stream)
+            for walker in walkers:
+                walker.notify_rollover(reading.stream)
 
     def inspect_last(self, stream, only_allocated=False):
         """Return the last value pushed into a stream.
@@ -108,13 +108,20 @@ class SensorGraphSimulator:
         reading = IOTileReading(input_stream.encode(), self.tick_count, value)
         self.sensor_graph.process_input(input_stream, reading, self.rpc_executor)
 
-    def run(self, include_reset=True, accelerated=True):
+    def run(self, include_reset=True, accelerated=True, fast_forward=False):
         """Run this sensor graph until a stop condition is hit.
 
         Multiple calls to this function are useful only if
         there has been some change in the stop conditions that would
         cause the second call to not exit immediately.
 
+        If fast_forward is passed, the simulator does not step through
+        every second of simulated time.  Instead it computes when the next
+        tick input, stimulus or stop condition could happen and jumps
+        directly to it.  The inputs given to the sensor graph, and hence
+        any trace that is recorded, are identical to stepping one second
+        at a time.  Fast forwarding only has an effect in accelerated mode.
+
         Args:
             include_reset (bool): Start the sensor graph run with
                 a reset event to match what would happen when an
@@ -122,6 +129,8 @@ class SensorGraphSimulator:
             accelerated (bool): Whether to run this sensor graph as
                 fast as possible or to delay tick events to simulate
                 the actual passage of wall clock time.
+            fast_forward (bool): Skip over simulated seconds where nothing
+                would happen rather than processing each one in turn.
         """
 
         self._start_tick = self.tick_count
@@ -133,16 +142,11 @@ class SensorGraphSimulator:
             pass  # TODO: include a reset event here
 
         # Process all stimuli that occur at the start of the simulation
-        i = None
-        for i, stim in enumerate(self.stimuli):
-            if stim.time != 0:
-                break
+        self._process_stimuli(0)
 
-            reading = IOTileReading(self.tick_count, stim.stream.encode(), stim.value)
-            self.sensor_graph.process_input(stim.stream, reading, self.rpc_executor)
-
-        if i is not None and i > 0:
-            self.stimuli = self.stimuli[i:]
+        if accelerated and fast_forward:
+            self._run_fast_forward()
+            return
 
         while not self._check_stop_conditions(self.sensor_graph):
             # Process one more one second tick
@@ -152,40 +156,85 @@ class SensorGraphSimulator:
             # To match what is done in actual hardware, we increment tick count so the first tick
             # is 1.
             self.tick_count += 1
+            self._process_tick(self._tick_intervals())
 
-            # Process all stimuli that occur at this tick of the simulation
-            i = None
-            for i, stim in enumerate(self.stimuli):
-                if stim.time != self.tick_count:
-                    break
+            now = monotonic()
 
-                reading = IOTileReading(self.tick_count, stim.stream.encode(), stim.value)
-                self.sensor_graph.process_input(stim.stream, reading, self.rpc_executor)
+            # If we are trying to execute this sensor graph in realtime, wait for
+            # the remaining slice of this tick.
+            if (not accelerated) and (now < next_tick):
+                time.sleep(next_tick - now)
 
-            if i is not None and i > 0:
-                self.stimuli = self.stimuli[i:]
+    def _run_fast_forward(self):
+        """Run the simulation by jumping between the ticks where something happens.
 
-            self._check_additional_ticks(self.tick_count)
+        The tick intervals are fixed by the sensor graph's config variables
+        so they are looked up once.  Before each jump we check the stop
+        conditions at the current tick, just like a normal run would, and
+        we never jump past a tick where a stop condition could become true.
+        """
 
-            if (self.tick_count % 10) == 0:
-                reading = IOTileReading(self.tick_count, system_tick.encode(), self.tick_count)
-                self.sensor_graph.process_input(system_tick, reading, self.rpc_executor)
+        intervals = self._tick_intervals()
+        periods = [x for x in intervals if x != 0] + [10]
 
-                # Every 10 seconds the battery voltage is reported in 16.16 fixed point format in volts
-                reading = IOTileReading(self.tick_count, battery_voltage.encode(), int(self.voltage * 65536))
-                self.sensor_graph.process_input(battery_voltage, reading, self.rpc_executor)
+        while not self._check_stop_conditions(self.sensor_graph):
+            tick = self.tick_count
+            rel_tick = tick - self._start_tick
 
-            now = monotonic()
+            next_event = min((tick // period + 1) * period for period in periods)
+            if len(self.stimuli) > 0 and tick < self.stimuli[0].time < next_event:
+                next_event = self.stimuli[0].time
 
-            # If we are trying to execute this sensor graph in realtime, wait for
-            # the remaining slice of this tick.
-            if (not accelerated) and (now < next_tick):
-                time.sleep(next_tick - now)
+            skip = next_event - tick
+            for stop in self.stop_conditions:
+                skip = min(skip, stop.next_check(tick, rel_tick))
 
-    def _check_additional_ticks(self, tick_value):
-        fast_interval = self.sensor_graph.get_tick('fast')
-        tick_1_interval = self.sensor_graph.get_tick('user1')
-        tick_2_interval = self.sensor_graph.get_tick('user2')
+            # Nothing can happen before tick + skip, so jump to just before it
+            # and process that tick normally after checking for a stop.
+            if skip > 1:
+                self.tick_count += skip - 1
+                continue
+
+            self.tick_count += 1
+            self._process_tick(intervals)
+
+    def _tick_intervals(self):
+        return (self.sensor_graph.get_tick('fast'), self.sensor_graph.get_tick('user1'),
+                self.sensor_graph.get_tick('user2'))
+
+    def _process_tick(self, intervals):
+        """Send all of the inputs that happen on the current tick."""
+
+        self._process_stimuli(self.tick_count)
+        self._check_additional_ticks(self.tick_count, intervals)
+
+        if (self.tick_count % 10) == 0:
+            reading = IOTileReading(self.tick_count, system_tick.encode(), self.tick_count)
+            self.sensor_graph.process_input(system_tick, reading, self.rpc_executor)
+
+            # Every 10 seconds the battery voltage is reported in 16.16 fixed point format in volts
+            reading = IOTileReading(self.tick_count, battery_voltage.encode(), int(self.voltage * 65536))
+            self.sensor_graph.process_input(battery_voltage, reading, self.rpc_executor)
+
+    def _process_stimuli(self, stim_time):
+        """Process all stimuli that occur at the given time."""
+
+        i = None
+        for i, stim in enumerate(self.stimuli):
+            if stim.time != stim_time:
+                break
+
+            reading = IOTileReading(self.tick_count, stim.stream.encode(), stim.value)
+            self.sensor_graph.process_input(stim.stream, reading, self.rpc_executor)
+
+        if i is not None and i > 0:
+            self.stimuli = self.stimuli[i:]
+
+    def _check_additional_ticks(self, tick_value, intervals=None):
+        if intervals is None:
+            intervals = self._tick_intervals()
+
+        fast_interval, tick_1_interval, tick_2_interval = intervals
 
         if fast_interval != 0 and (tick_value % fast_interval) == 0:
             reading = IOTileReading(self.tick_count, fast_tick.encode(), self.tick_count)
@@ -199,7 +248,6 @@ class SensorGraphSimulator:
             reading = IOTileReading(self.tick_count, tick_2.encode(), self.tick_count)
             self.sensor_graph.process_input(tick_2, reading, self.rpc_executor)
 
-
     def _check_stop_conditions(self, sensor_graph):
         """Check if any of our stop conditions are met.
 
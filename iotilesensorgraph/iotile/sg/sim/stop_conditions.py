@@ -41,6 +41,10 @@ class StopCondition(object):
     There should be a second class method, FromString(cls, desc) that
     tries to parse this stop condition from a text string.  The function
     must raise an ArgumentError if it could not match the input string.
+
+    Subclasses may also override next_check(self, abs_seconds, rel_seconds)
+    to let the simulator skip ahead when fast forwarding.  The default
+    implementation requires the condition to be checked every second.
     """
 
     def should_stop(self, abs_second_count, rel_second_count, sensor_graph):
@@ -60,6 +64,27 @@ class StopCondition(object):
 
         return False
 
+    def next_check(self, abs_second_count, rel_second_count):
+        """Return how long until this stop condition could next be fulfilled.
+
+        This is only called when should_stop returned False for the given
+        times.  The answer must assume that the sensor graph does not
+        change in the meantime since the simulator always checks the stop
+        conditions again after sending any inputs to the sensor graph.
+
+        Args:
+            abs_second_count (int): The number of seconds that
+                have expired since the start of the simulation.
+            rel_second_count (int): The number of seconds that
+                have expired since the start of the last `run` calls.
+
+        Returns:
+            int: The number of seconds, at least 1, until should_stop could
+                return True.
+        """
+
+        return 1
+
 
 class TimeBasedStopCondition(StopCondition):
     """Stop the simulation after a fixed period of time.
@@ -91,6 +116,21 @@ class TimeBasedStopCondition(StopCondition):
 
         return rel_seconds >= self.max_time
 
+    def next_check(self, abs_seconds, rel_seconds):
+        """Return how long until this stop condition is fulfilled.
+
+        Args:
+            abs_seconds (int): The number of seconds that
+                have expired since the start of the simulation.
+            rel_seconds (int): The number of seconds that
+                have expired since the start of the last `run` calls.
+
+        Returns:
+            int: The number of seconds until should_stop will return True.
+        """
+
+        return max(self.max_time - rel_seconds, 1)
+
     @classmethod
     def FromString(cls, desc):
         """Parse this stop condition from a string representation.
@@ -408,24 +408,31 @@ class DataStreamSelector:
         """Check if this selector matches the given stream
 
         Args:
-            stream (DataStream): The stream to check
+            stream (DataStream or int): The stream to check, either as a
+                DataStream object or as an encoded 16-bit stream id.
 
         Returns:
             bool: True if this selector matches the stream
         """
 
-        if self.match_type != stream.stream_type:
+        if isinstance(stream, int):
+            return self._matches(stream >> 12, stream & ((1 << 11) - 1), bool(stream & (1 << 11)))
+
+        return self._matches(stream.stream_type, stream.stream_id, stream.system)
+
+    def _matches(self, stream_type, stream_id, system):
+        if self.match_type != stream_type:
             return False
 
         if self.match_id is not None:
-            return self.match_id == stream.stream_id
+            return self.match_id == stream_id
 
         if self.match_spec == DataStreamSelector.MatchUserOnly:
-            return not stream.system
+            return not system
         elif self.match_spec == DataStreamSelector.MatchSystemOnly:
-            return stream.system
+            return system
         elif self.match_spec == DataStreamSelector.MatchUserAndBreaks:
-            return (not stream.system) or (stream.system and (stream.stream_id in DataStream.KnownBreakStreams))
+            return (not system) or (system and (stream_id in DataStream.KnownBreakStreams))
 
         # The other case is that match_spec is MatchCombined, which matches everything
         # regardless of system of user flag
@@ -108,14 +108,12 @@ class BufferedStreamWalker(StreamWalker):
         if self._count == 0:
             raise StreamEmptyError("Pop called on buffered stream walker without any data", selector=self.selector)
 
-        while True:
-            curr = self.engine.get(self.storage_type, self.offset)
-            self.offset += 1
+        offset = self._next_offset()
+        curr = self.engine.get(self.storage_type, offset)
 
-            stream = DataStream.FromEncoded(curr.stream)
-            if self.matches(stream):
-                self._count -= 1
-                return curr
+        self.offset = offset + 1
+        self._count -= 1
+        return curr
 
     def seek(self, value, target="offset"):
         """Seek this stream to a specific offset or reading id.
@@ -176,21 +174,19 @@ class BufferedStreamWalker(StreamWalker):
         self._count = self.engine.count_matching(self.selector, offset=self.offset)
 
         curr = self.engine.get(self.storage_type, self.offset)
-        return self.matches(DataStream.FromEncoded(curr.stream))
+        return self.matches(curr.stream)
 
-    def _find_id(self, reading_id):
-        shared = [None]
+    def _next_offset(self):
+        """Find the offset of the next reading selected by this walker."""
 
-        def _id_searcher(i, reading):
-            """Find the offset of the first reading with the given reading id."""
-            if reading.reading_id == reading_id:
-                shared[0] = i
-                return True
+        offset = self.engine.next_matching(self.selector, self.offset)
+        if offset is None:
+            raise InternalError("BufferedStreamWalker out of sync with storage engine, count was wrong.")
 
-            return False
+        return offset
 
-        self.engine.scan_storage(self.storage_type, _id_searcher)
-        found_offset = shared[0]
+    def _find_id(self, reading_id):
+        found_offset = self.engine.find_id(self.storage_type, reading_id)
 
         if found_offset is None:
             raise UnresolvedIdentifierError("Cannot find reading ID '%d' in storage area '%s'" % (reading_id, self.storage_type))
@@ -215,15 +211,7 @@ class BufferedStreamWalker(StreamWalker):
         if self._count == 0:
             raise StreamEmptyError("Peek called on buffered stream walker without any data", selector=self.selector)
 
-        offset = self.offset
-
-        while True:
-            curr = self.engine.get(self.storage_type, offset)
-            offset += 1
-
-            stream = DataStream.FromEncoded(curr.stream)
-            if self.matches(stream):
-                return curr
+        return self.engine.get(self.storage_type, self._next_offset())
 
     def skip_all(self):
         """Skip all readings in this walker."""
@@ -253,10 +241,15 @@ class BufferedStreamWalker(StreamWalker):
         """Notify that a reading in the given stream was overwritten.
 
         Args:
-            stream (DataStream): The stream that had overwritten data.
+            stream (DataStream or int): The stream that had overwritten data,
+                either as a DataStream or as an encoded stream id.
         """
 
-        self.offset -= 1
+        # If we already walked past the overwritten reading, only our offset
+        # changes, otherwise we lost a reading that we had not seen yet.
+        if self.offset > 0:
+            self.offset -= 1
+            return
 
         if not self.matches(stream):
             return
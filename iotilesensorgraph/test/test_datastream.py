@@ -170,6 +170,21 @@ def test_matching():
     assert not sel.matches(DataStream.FromString('counter 1'))
 
 
+def test_matching_encoded():
+    """Make sure selectors match encoded streams the same as DataStreams."""
+
+    selectors = [u'all system buffered', u'all user outputs', u'all combined outputs', u'all outputs',
+                 u'output 1', u'system output 1', u'all buffered', u'counter 5']
+    streams = [u'system buffered 1', u'buffered 1', u'counter 1', u'counter 5', u'output 1',
+               u'system output 1', u'system output 1024', u'output 1024', u'system buffered 1025']
+
+    for sel_string in selectors:
+        sel = DataStreamSelector.FromString(sel_string)
+        for stream_string in streams:
+            stream = DataStream.FromString(stream_string)
+            assert sel.matches(stream.encode()) == sel.matches(stream)
+
+
 def test_encoding():
     """Test data stream and selector encoding."""
 
@@ -0,0 +1,241 @@
+"""Tests of the persistent memory mapped storage engine."""
+
+import base64
+import json
+import pytest
+from iotile.core.exceptions import ArgumentError, DataError
+from iotile.core.hw.reports import IOTileReading
+from iotile.sg import DataStreamSelector, DataStream, StreamEmptyError
+from iotile.sg.model import DeviceModel
+from iotile.sg.sensor_log import SensorLog
+from iotile.sg.exceptions import StorageFullError
+from iotile.sg.engine import InMemoryStorageEngine, MemoryMappedStorageEngine
+from iotile.sg.engine.memory_mapped import _RingFile
+
+
+@pytest.fixture
+def small_model():
+    model = DeviceModel()
+    model.set(u'max_storage_buffer', 100)
+    model.set(u'max_streaming_buffer', 50)
+    model.set(u'buffer_erase_size', 10)
+
+    return model
+
+
+def test_basic_operations(tmpdir):
+    """Make sure the engine behaves the same as the in memory one."""
+
+    model = DeviceModel()
+    engine = MemoryMappedStorageEngine(model, str(tmpdir.join('sg')))
+    reference = InMemoryStorageEngine(model)
+
+    storage1 = DataStream.FromString('buffered 1').encode()
+    storage2 = DataStream.FromString('buffered 2').encode()
+    output1 = DataStream.FromString('output 1').encode()
+
+    for i in range(0, 100):
+        for stream in (storage1, storage2, output1):
+            reading = IOTileReading(i, stream, i * 2, reading_id=i + 1)
+            engine.push(reading)
+            reference.push(reading)
+
+    assert engine.count() == reference.count() == (200, 100)
+
+    for selector in ('buffered 1', 'buffered 2', 'all buffered', 'output 1', 'all outputs'):
+        selector = DataStreamSelector.FromString(selector)
+        assert engine.count_matching(selector) == reference.count_matching(selector)
+        assert engine.count_matching(selector, offset=33) == reference.count_matching(selector, offset=33)
+
+    with pytest.raises(ArgumentError):
+        engine.count_matching(DataStreamSelector.FromString('unbuffered 1'))
+
+    assert engine.get(u'storage', 5) == reference.get(u'storage', 5)
+    assert engine.get(u'streaming', 99) == reference.get(u'streaming', 99)
+
+    with pytest.raises(StreamEmptyError):
+        engine.get(u'streaming', 100)
+
+    assert engine.popn(u'storage', 10) == reference.popn(u'storage', 10)
+    assert engine.get(u'storage', 0) == reference.get(u'storage', 0)
+
+    with pytest.raises(StreamEmptyError):
+        engine.popn(u'streaming', 101)
+
+    seen = []
+    scanned = engine.scan_storage(u'storage', lambda i, reading: seen.append((i, reading.value)), start=2, stop=5)
+    assert scanned == 4
+    assert seen == [(2, 12), (3, 12), (4, 14), (5, 14)]
+
+    with pytest.raises(ArgumentError):
+        engine.scan_storage(u'other_name', lambda i, reading: None)
+
+    engine.clear()
+    assert engine.count() == (0, 0)
+    engine.close()
+
+
+def test_ring_rollover(tmpdir, small_model):
+    """Make sure the ring wraps correctly after readings are popped."""
+
+    engine = MemoryMappedStorageEngine(small_model, str(tmpdir))
+    stream = DataStream.FromString('output 1').encode()
+
+    for i in range(0, 50):
+        engine.push(IOTileReading(i, stream, i))
+
+    with pytest.raises(StorageFullError):
+        engine.push(IOTileReading(0, stream, 0))
+
+    for base in range(0, 200, 20):
+        popped = engine.popn(u'streaming', 20)
+        assert [x.value for x in popped] == list(range(base, base + 20))
+
+        for i in range(base + 50, base + 70):
+            engine.push(IOTileReading(i, stream, i))
+
+        assert engine.count() == (0, 50)
+        assert [engine.get(u'streaming', i).value for i in range(0, 50)] == list(range(base + 20, base + 70))
+        assert engine.count_matching(DataStreamSelector.FromString('output 1'), offset=45) == 5
+
+
+def test_persistence(tmpdir, small_model):
+    """Make sure readings survive reopening the engine and corrupted headers."""
+
+    path = str(tmpdir)
+    engine = MemoryMappedStorageEngine(small_model, path)
+    stream = DataStream.FromString('buffered 1').encode()
+
+    for i in range(0, 30):
+        engine.push(IOTileReading(i, stream, i, reading_id=i))
+
+    engine.popn(u'storage', 10)
+    engine.close()
+
+    engine = MemoryMappedStorageEngine(small_model, path)
+    assert engine.count() == (20, 0)
+    assert engine.get(u'storage', 0).value == 10
+    engine.close()
+
+    # Corrupt the most recent header, we should fall back to the previous one
+    ring_path = tmpdir.join(MemoryMappedStorageEngine.STORAGE_FILE)
+    data = bytearray(ring_path.read_binary())
+    newest = max(0, 1, key=lambda slot: int.from_bytes(data[slot * 32 + 20:slot * 32 + 28], 'little'))
+    data[newest * 32 + 12] ^= 0xFF
+    ring_path.write_binary(bytes(data))
+
+    engine = MemoryMappedStorageEngine(small_model, path)
+    assert engine.count() == (30, 0)
+    assert engine.get(u'storage', 0).value == 0
+    engine.close()
+
+    ring_path.write_binary(bytes(64))
+    with pytest.raises(DataError):
+        MemoryMappedStorageEngine(small_model, path)
+
+
+def test_resize(tmpdir, small_model):
+    """Make sure existing files are resized to match the model."""
+
+    path = str(tmpdir)
+    engine = MemoryMappedStorageEngine(small_model, path)
+    stream = DataStream.FromString('buffered 1').encode()
+
+    for i in range(0, 100):
+        engine.push(IOTileReading(i, stream, i))
+
+    engine.popn(u'storage', 50)
+    for i in range(100, 120):
+        engine.push(IOTileReading(i, stream, i))
+    engine.close()
+
+    small_model.set(u'max_storage_buffer', 1000)
+    engine = MemoryMappedStorageEngine(small_model, path)
+    assert engine.count() == (70, 0)
+    assert [engine.get(u'storage', i).value for i in range(0, 70)] == list(range(50, 120))
+
+    for i in range(0, 930):
+        engine.push(IOTileReading(i, stream, i))
+
+    with pytest.raises(StorageFullError):
+        engine.push(IOTileReading(0, stream, 0))
+
+    engine.close()
+
+    small_model.set(u'max_storage_buffer', 10)
+    with pytest.raises(ArgumentError):
+        MemoryMappedStorageEngine(small_model, path)
+
+
+def test_failed_shrink(tmpdir):
+    """Make sure a ring is still usable after failing to shrink it."""
+
+    ring = _RingFile(str(tmpdir.join('ring')), 10)
+    records = bytes(range(0, 128))
+    ring.replace(records)
+
+    with pytest.raises(ArgumentError):
+        ring.replace(ring.read_range(0, ring.count), 4)
+
+    with pytest.raises(ArgumentError):
+        ring.replace(records[:-1])
+
+    assert ring.capacity == 10
+    assert ring.read_range(0, ring.count) == records
+    ring.close()
+
+
+def test_dump_restore(tmpdir, small_model):
+    """Make sure we can snapshot and restore in both formats."""
+
+    reference = InMemoryStorageEngine(small_model)
+    stream = DataStream.FromString('buffered 1').encode()
+    output = DataStream.FromString('output 1').encode()
+
+    for i in range(0, 40):
+        reference.push(IOTileReading(i, stream, i, reading_id=i + 1))
+        reference.push(IOTileReading(i, output, i, reading_id=i + 1))
+
+    engine = MemoryMappedStorageEngine(small_model, str(tmpdir.join('first')))
+    engine.restore(reference.dump())
+    assert engine.count() == (40, 40)
+    assert engine.get(u'streaming', 39) == reference.get(u'streaming', 39)
+
+    engine.popn(u'streaming', 10)
+    state = json.loads(json.dumps(engine.dump()))
+
+    other = MemoryMappedStorageEngine(small_model, str(tmpdir.join('second')))
+    other.restore(state)
+    assert other.count() == (40, 30)
+    assert other.get(u'streaming', 0) == reference.get(u'streaming', 10)
+    assert other.dump() == state
+
+    small_model.set(u'max_streaming_buffer', 20)
+    limited = MemoryMappedStorageEngine(small_model, str(tmpdir.join('third')))
+    with pytest.raises(ArgumentError):
+        limited.restore(state)
+
+    # Packed data must be a whole number of records
+    state[u'storage_records'] = base64.b64encode(bytes(20)).decode('ascii')
+    with pytest.raises(ArgumentError):
+        other.restore(state)
+
+    assert other.count() == (40, 30)
+
+
+def test_sensor_log_rollover(tmpdir, small_model):
+    """Make sure SensorLog walkers work with the memory mapped engine."""
+
+    log = SensorLog(MemoryMappedStorageEngine(small_model, str(tmpdir)), model=small_model)
+
+    walker = log.create_walker(DataStreamSelector.FromString('buffered 1'))
+    storage1 = DataStream.FromString('buffered 1')
+    storage2 = DataStream.FromString('buffered 2')
+
+    for i in range(0, 100):
+        log.push(storage1, IOTileReading(0, 0, i))
+        log.push(storage2, IOTileReading(0, 0, i))
+
+    assert log.count() == (100, 0)
+    assert walker.count() == 50
+    assert walker.pop().value == 50
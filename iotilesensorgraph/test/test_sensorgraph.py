@@ -91,3 +91,117 @@ def test_triggering_streamers():
     sg.process_input(DataStream.FromString('input 1'), IOTileReading(0, 1, 1), rpc_executor=None)
     triggered = sg.check_streamers()
     assert len(triggered) == 2
+
+
+class _FullScanGraph(SensorGraph):
+    """Reference implementation that checks every root node on every input."""
+
+    def process_input(self, stream, value, rpc_executor):
+        self.sensor_log.push(stream, value)
+
+        to_check = list(self.roots)
+        while len(to_check) > 0:
+            node = to_check.pop(0)
+            if node.triggered():
+                results = node.process(rpc_executor, self.mark_streamer)
+                for result in results:
+                    result.raw_time = value.raw_time
+                    self.sensor_log.push(node.stream, result)
+
+                if len(results) > 0:
+                    to_check.extend(node.outputs)
+
+
+def test_root_dispatch():
+    """Make sure only checking subscribed roots gives the same results as checking all of them."""
+
+    descriptors = [
+        '(input 1 always) => unbuffered 1 using copy_all_a',
+        '(input 2 when count >= 2) => unbuffered 2 using copy_all_a',
+        '(input 3 when value == 5 && constant 1 always) => counter 1 using copy_latest_a',
+        '(input 4 when count >= 1 || input 5 when count >= 1) => buffered 1 using copy_all_a',
+        '(input 6 when count >= 1 && buffered 1 when count >= 3) => unbuffered 6 using copy_latest_a',
+        '(counter 1 when count >= 2) => output 1 using copy_count_a',
+        '(unbuffered 1 always && unbuffered 2 always) => unbuffered 3 using copy_latest_a'
+    ]
+
+    model = DeviceModel()
+    model.set('max_storage_buffer', 8)
+    model.set('buffer_erase_size', 2)
+
+    pushes = []
+    for graph_class in (_FullScanGraph, SensorGraph):
+        log = SensorLog(model=model)
+        sg = graph_class(log, model=model)
+        for descriptor in descriptors:
+            sg.add_node(descriptor)
+
+        seen = []
+        log.watch(None, lambda stream, reading: seen.append((str(stream), reading.value)))
+        sg.add_constant(DataStream.FromString('constant 1'), 7)
+        sg.load_constants()
+
+        for i in range(0, 500):
+            stream = DataStream.FromString('input %d' % (1 + (i * 7) % 6))
+            sg.process_input(stream, IOTileReading(i, stream.encode(), i % 7), rpc_executor=None)
+
+        pushes.append(seen)
+
+    assert len(pushes[0]) > 700
+    assert pushes[0] == pushes[1]
+
+    # Copying from an empty input does nothing even with an always trigger
+    sg = SensorGraph(SensorLog(model=model), model=model)
+    for descriptor in descriptors:
+        sg.add_node(descriptor)
+
+    assert [str(x.stream) for x in sg.input_roots(DataStream.FromString('input 5'))] == ['buffered 1']
+    assert sg.input_roots(DataStream.FromString('input 7')) == []
+
+
+def _run_graph(graph_class, descriptors, inputs):
+    model = DeviceModel()
+
+    log = SensorLog(model=model)
+    sg = graph_class(log, model=model)
+    for descriptor in descriptors:
+        sg.add_node(descriptor)
+
+    seen = []
+    log.watch(None, lambda stream, reading: seen.append((str(stream), reading.value)))
+    sg.add_constant(DataStream.FromString('constant 1'), 7)
+    sg.load_constants()
+
+    for i, (name, value) in enumerate(inputs):
+        stream = DataStream.FromString(name)
+        sg.process_input(stream, IOTileReading(i, stream.encode(), value), rpc_executor=None)
+
+    return seen
+
+
+def test_root_dispatch_untriggered_roots():
+    """Make sure roots that can trigger without new data on their inputs still run on every input."""
+
+    descriptors = [
+        '(input 1 always) => output 1 using copy_count_a',
+        '(input 2 when count >= 1 && unbuffered 5 when count >= 1) => output 2 using copy_all_a',
+        '(input 3 when value == 1) => unbuffered 5 using copy_latest_a',
+        '(input 4 when count >= 1 && constant 1 always) => output 4 using subtract_afromb'
+    ]
+
+    inputs = [('input 1', 1), ('input 9', 0), ('input 9', 0), ('input 9', 0),
+              ('input 2', 2), ('input 3', 1), ('input 9', 0),
+              ('input 4', 10), ('input 4', 11), ('input 9', 0), ('input 9', 0)]
+
+    baseline = _run_graph(_FullScanGraph, descriptors, inputs)
+    dispatched = _run_graph(SensorGraph, descriptors, inputs)
+
+    assert [value for stream, value in baseline if stream == 'output 1'][:4] == [1, 0, 0, 0]
+    assert ('output 2', 2) in baseline
+    assert dispatched == baseline
+
+    sg = SensorGraph(SensorLog(model=DeviceModel()), model=DeviceModel())
+    for descriptor in descriptors:
+        sg.add_node(descriptor)
+
+    assert [str(x.stream) for x in sg.input_roots(DataStream.FromString('input 9'))] == ['output 1']
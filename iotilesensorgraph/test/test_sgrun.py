@@ -35,3 +35,14 @@ def test_basic_simulation(exitcode):
 
     retval = main(['-s', 'run_time 1 second', infile])
     assert retval == 0
+
+
+def test_persistent_storage(exitcode, tmpdir):
+    """Make sure we can run a simulation with memory mapped storage."""
+
+    infile = os.path.join(os.path.dirname(__file__), 'sensor_graphs', 'basic_block.sgf')
+    storage_dir = str(tmpdir.join('storage'))
+
+    retval = main(['-s', 'run_time 1 second', '--storage-dir', storage_dir, '--buffer-size', '100000', infile])
+    assert retval == 0
+    assert tmpdir.join('storage', 'storage.bin').size() == 64 + 16 * 100000
@@ -2,6 +2,7 @@ import pytest
 from typedargs.exceptions import ArgumentError
 from iotile.sg.sim import SensorGraphSimulator
 from iotile.sg.sim.stimulus import SimulationStimulus
+from iotile.sg.sim.stop_conditions import StopCondition
 from iotile.sg.slot import SlotIdentifier
 from iotile.sg.known_constants import config_fast_tick_secs, config_tick1_secs, config_tick2_secs
 from iotile.sg import DeviceModel, SensorLog, SensorGraph, DataStream
@@ -199,3 +200,69 @@ def test_stimulus_parsing():
     with pytest.raises(ArgumentError):
         SimulationStimulus.FromString('unbuffered 1 = 1')
 
+
+
+def _record_inputs(sim):
+    inputs = []
+    original = sim.sensor_graph.process_input
+
+    def _process_input(stream, reading, rpc_executor):
+        inputs.append((str(stream), reading.raw_time, reading.value))
+        original(stream, reading, rpc_executor)
+
+    sim.sensor_graph.process_input = _process_input
+    return inputs
+
+
+def _build_ticks_sg():
+    model = DeviceModel()
+    log = SensorLog(model=model)
+    sg = SensorGraph(log, model=model)
+
+    sg.add_node('(system input 3 always) => counter 1 using copy_latest_a')
+    sg.add_node('(system input 5 always) => counter 2 using copy_latest_a')
+    sg.add_node('(input 1 always) => counter 3 using copy_latest_a')
+    sg.add_config(SlotIdentifier.FromString('controller'), config_fast_tick_secs, 'uint32_t', 4)
+    sg.add_config(SlotIdentifier.FromString('controller'), config_tick1_secs, 'uint32_t', 35)
+
+    return sg
+
+
+@pytest.mark.parametrize("run_times", [[1000], [7, 3, 200], [0, 45]])
+def test_fast_forward(run_times):
+    """Make sure fast forwarding sends exactly the same inputs as stepping."""
+
+    traces = []
+    for fast_forward in (False, True):
+        sim = SensorGraphSimulator(_build_ticks_sg())
+        for stim in ('input 1 = 5', '5 seconds: input 1 = 6', '5 seconds: input 1 = 7', '37 seconds: input 1 = 8',
+                     '2 minutes: input 1 = 9'):
+            sim.stimulus(stim)
+
+        inputs = _record_inputs(sim)
+        for run_time in run_times:
+            sim.stop_conditions = []
+            sim.stop_condition('run_time %d seconds' % run_time)
+            sim.run(fast_forward=fast_forward)
+
+        traces.append((inputs, sim.tick_count, sim.sensor_graph.sensor_log.count()))
+
+    assert traces[0] == traces[1]
+    assert len(traces[0][0]) > 0
+
+
+def test_fast_forward_custom_stop(basic_sg):
+    """Make sure stop conditions that cannot predict the future still work."""
+
+    class _InputStopCondition(StopCondition):
+        def should_stop(self, abs_seconds, rel_seconds, sensor_graph):
+            return sensor_graph.sensor_log.inspect_last(DataStream.FromString('system input 2')).value >= 73
+
+    sim = SensorGraphSimulator(basic_sg)
+    sim.stop_conditions.append(_InputStopCondition())
+    sim.stimulus('input 1 = 1')
+    sim.stimulus('73 seconds: system input 2 = 73')
+    sim.step(DataStream.FromString('system input 2'), 0)
+    sim.run(fast_forward=True)
+
+    assert sim.tick_count == 73
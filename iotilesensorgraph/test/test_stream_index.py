@@ -0,0 +1,100 @@
+"""Tests of the per-stream storage area index."""
+
+import random
+import pytest
+from iotile.core.hw.reports import IOTileReading
+from iotile.sg import DataStream, DataStreamSelector
+from iotile.sg.model import DeviceModel
+from iotile.sg.sensor_log import SensorLog
+from iotile.sg.engine import InMemoryStorageEngine, MemoryMappedStorageEngine
+from iotile.sg.engine.stream_index import StreamIndex
+
+
+STREAMS = [DataStream.FromString(x).encode() for x in (u'buffered 1', u'buffered 2', u'system buffered 1024',
+                                                     u'system buffered 3')]
+SELECTORS = [DataStreamSelector.FromString(x) for x in (u'buffered 1', u'all buffered', u'all system buffered',
+                                                        u'all combined buffered', u'buffered 3')]
+
+
+def test_index_matches_scan():
+    """Make sure the index agrees with a linear scan through random pushes and pops."""
+
+    rand = random.Random(10)
+    index = StreamIndex()
+    index.CompactionThreshold = 8
+    data = []
+    next_id = 1
+
+    for _i in range(0, 300):
+        if rand.random() < 0.7 or len(data) == 0:
+            stream = rand.choice(STREAMS)
+            data.append((stream, next_id))
+            index.push(stream, next_id)
+            next_id += rand.randint(1, 3)
+        else:
+            count = rand.randint(1, len(data))
+            index.popn(x[0] for x in data[:count])
+            data = data[count:]
+
+        assert len(index) == len(data)
+
+        offset = rand.randint(0, len(data))
+        for selector in SELECTORS:
+            matching = [i for i in range(offset, len(data)) if selector.matches(data[i][0])]
+            assert index.count_matching(selector, offset) == len(matching)
+            assert index.next_matching(selector, offset) == (matching[0] if matching else None)
+
+        if len(data) > 0:
+            offset = rand.randint(0, len(data) - 1)
+            assert index.find_id(data[offset][1]) == offset
+
+        assert index.find_id(next_id) is None
+
+
+def test_unsorted_ids():
+    """Make sure we fall back to a linear search for out of order reading ids."""
+
+    index = StreamIndex()
+    for reading_id in (5, 6, 2, 7, 2):
+        index.push(STREAMS[0], reading_id)
+
+    assert index.find_id(2) == 2
+    assert index.find_id(7) == 3
+    assert index.find_id(1) is None
+
+    index.popn([STREAMS[0]] * 5)
+    index.push(STREAMS[0], 1)
+    assert index.find_id(1) == 0
+
+
+@pytest.mark.parametrize('use_mmap', [False, True])
+def test_walker_with_index(tmpdir, use_mmap):
+    """Make sure walkers pop, peek and seek correctly using the engine index."""
+
+    model = DeviceModel()
+    if use_mmap:
+        engine = MemoryMappedStorageEngine(model, str(tmpdir))
+    else:
+        engine = InMemoryStorageEngine(model)
+
+    log = SensorLog(engine, model=model, id_assigner=lambda stream, reading: reading.value + 1)
+
+    stream1 = DataStream.FromString(u'buffered 1')
+    stream2 = DataStream.FromString(u'buffered 2')
+    for i in range(0, 10000):
+        log.push(stream1 if i % 10 == 0 else stream2, IOTileReading(0, 0, i))
+
+    walker = log.create_walker(DataStreamSelector.FromString(u'buffered 1'), skip_all=False)
+    assert walker.count() == 1000
+    assert walker.peek().value == 0
+    assert walker.pop().value == 0
+    assert walker.offset == 1
+    assert walker.pop().value == 10
+
+    assert walker.seek(5001, target=u'id') is True
+    assert walker.offset == 5000
+    assert walker.count() == 500
+
+    assert walker.seek(5002, target=u'id') is False
+    assert walker.count() == 499
+    assert walker.pop().value == 5010
@@ -0,0 +1,121 @@
+"""Measure report and trace throughput of the AWS IOT gateway agent over a local broker.
+
+The agent publishes reports and traces through an in-process LocalBroker to
+a client that decodes and verifies every message, so no connection to AWS
+IOT is needed.  Each case is run once with hex encoded JSON payloads and
+once with binary msgpack payloads and reports the number of bytes that
+crossed the broker along with the throughput.
+"""
+
+import argparse
+import time
+import tornado.ioloop
+from iotile.core.hw.reports import IOTileReading, SignedListReport
+from iotile_transport_awsiot import messages
+from iotile_transport_awsiot.gateway_agent import AWSIOTGatewayAgent
+from iotile_transport_awsiot.local_broker import LocalBroker
+from iotile_transport_awsiot.mqtt_client import OrderedAWSIOTClient
+
+DEVICE = 5
+
+
+def _make_agent(binary, args):
+    agent_args = {'iotile_id': '0x2', 'local_broker': True, 'binary_payloads': binary,
+                  'trace_throttle_interval': 3600.0, 'trace_flush_size': args.trace_flush_size}
+
+    agent = AWSIOTGatewayAgent(agent_args, None, tornado.ioloop.IOLoop())
+    agent._prepare()
+    agent._connections[DEVICE] = {'key': 'key', 'client': 'client', 'connection_id': 1, 'trace_accum': [],
+                                  'trace_accum_size': 0, 'last_trace': None, 'trace_scheduled': False,
+                                  'trace_timer': None}
+    return agent
+
+
+def _listen():
+    """Subscribe a decoding client and a raw byte counter to all device data."""
+
+    topic = 'devices/+/devices/+/data/+'
+    totals = {'wire': 0, 'data': 0}
+
+    def _on_raw(_client, _userdata, message):
+        totals['wire'] += len(message.payload)
+
+    def _on_message(_seq, _topic, message):
+        if message.get('encoding') == 'bin':
+            verifiers = (messages.BinaryReportNotification, messages.BinaryTracingNotification)
+        else:
+            verifiers = (messages.ReportNotification, messages.TracingNotification)
+
+        if message['operation'] == 'report':
+            totals['data'] += len(verifiers[0].verify(message)['report'])
+        else:
+            totals['data'] += len(verifiers[1].verify(message)['trace'])
+
+    LocalBroker('counter').subscribe(topic, 1, _on_raw)
+
+    client = OrderedAWSIOTClient({'local_broker': True})
+    client.connect('listener')
+    client.subscribe(topic, _on_message)
+
+    return totals
+
+
+def _run_reports(binary, args):
+    LocalBroker.Reset()
+    LocalBroker.keep_messages = False
+
+    totals = _listen()
+    agent = _make_agent(binary, args)
+
+    readings = [IOTileReading(i, 0x5000, i) for i in range(args.report_readings)]
+    report = SignedListReport.FromReadings(DEVICE, readings)
+
+    start = time.perf_counter()
+    for _i in range(args.reports):
+        agent._notify_report(DEVICE, 'report', report)
+    elapsed = time.perf_counter() - start
+
+    assert totals['data'] == args.reports * len(report.encode())
+    return elapsed, totals
+
+
+def _run_traces(binary, args):
+    LocalBroker.Reset()
+    LocalBroker.keep_messages = False
+
+    totals = _listen()
+    agent = _make_agent(binary, args)
+    chunk = bytes(args.trace_size)
+
+    start = time.perf_counter()
+    for _i in range(args.traces):
+        agent._notify_trace(DEVICE, 'trace', chunk)
+    agent._send_accum_trace(DEVICE)
+    elapsed = time.perf_counter() - start
+
+    assert totals['data'] == args.traces * args.trace_size
+    return elapsed, totals
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--reports', type=int, default=200, help="number of reports to publish")
+    parser.add_argument('--report-readings', type=int, default=10000, help="number of readings in each report")
+    parser.add_argument('--traces', type=int, default=100000, help="number of trace events to publish")
+    parser.add_argument('--trace-size', type=int, default=20, help="size in bytes of each trace event")
+    parser.add_argument('--trace-flush-size', type=int, default=48*1024,
+                        help="bytes of throttled tracing data that trigger an early flush")
+    args = parser.parse_args(argv)
+
+    for name, runner in (('reports', _run_reports), ('traces', _run_traces)):
+        for label, binary in (('json/hex', False), ('msgpack/bin', True)):
+            elapsed, totals = runner(binary, args)
+
+            print("%-7s %-11s  %8.2f MB data  %8.2f MB on wire  %8.2f MB/s" %
+                  (name, label, totals['data'] / 1e6, totals['wire'] / 1e6, totals['data'] / elapsed / 1e6))
+
+    LocalBroker.Reset()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+"""Measure RPC throughput to several devices sharing one mock BLED112.
+
+Each simulated device takes a fixed time to respond to every RPC.  The same
+number of RPCs is sent to every device, first with BLED112Adapter from one
+thread per device and then with AsyncBLED112Core from one coroutine per
+device, and the total RPC rate is printed for each.
+
+The mock serial port used by the bled112 unit tests is reused, so this
+script must be run from a source checkout.
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import threading
+import time
+import serial
+from iotile.core.hw.virtual.virtualdevice_simple import SimpleVirtualDevice
+from iotile.core.utilities.async_tools import BackgroundEventLoop
+from iotile.mock.mock_ble import MockBLEDevice
+from iotile_transport_bled112.bled112 import BLED112Adapter
+from iotile_transport_bled112.bled112_async import AsyncBLED112Core
+from iotile_transport_bled112.hardware.emulator.mock_bled112 import MockBLED112
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'transport_plugins', 'bled112', 'test'))
+import util.dummy_serial  # pylint: disable=wrong-import-position
+
+
+def _make_dongle(args):
+    dongle = MockBLED112(args.devices, notification_delay=args.latency / 1000.0)
+    macs = ["00:11:22:33:%02X:%02X" % (i >> 8, i & 0xFF) for i in range(args.devices)]
+
+    for i, mac in enumerate(macs):
+        dongle.add_device(MockBLEDevice(mac, SimpleVirtualDevice(100 + i, 'TestCN')))
+
+    util.dummy_serial.RESPONSE_GENERATOR = dongle.generate_response
+    return dongle, macs
+
+
+def _run_threaded(args):
+    dongle, macs = _make_dongle(args)
+    adapter = BLED112Adapter('test', stop_check_interval=0.01)
+    dongle.inject_callback = adapter._serial_port.inject
+
+    try:
+        for i, mac in enumerate(macs):
+            adapter.connect_sync(i, mac)
+            adapter.open_interface_sync(i, 'rpc')
+
+        def _rpcs(conn_id):
+            for _i in range(args.rpcs):
+                result = adapter.send_rpc_sync(conn_id, 8, 0x0004, b'', 5.0)
+                assert result['success'] is True
+
+        threads = [threading.Thread(target=_rpcs, args=(i,)) for i in range(len(macs))]
+
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+    finally:
+        adapter.stop_sync()
+
+    return elapsed
+
+
+def _run_async(args):
+    dongle, macs = _make_dongle(args)
+    loop = BackgroundEventLoop()
+    core = AsyncBLED112Core('test', loop=loop)
+    dongle.inject_callback = core._serial_port.inject
+
+    async def _connect(mac):
+        handle = await core.connect(mac)
+        services = await core.probe_services(handle)
+        await core.probe_characteristics(handle, services)
+        await core.enable_rpcs(handle, services)
+        return handle, services
+
+    async def _rpcs(handle, services):
+        for _i in range(args.rpcs):
+            result = await core.send_rpc(handle, services, 8, 0x0004, b'', 5.0)
+            assert result['status'] == 0
+
+    async def _run():
+        conns = [await _connect(mac) for mac in macs]
+
+        start = time.perf_counter()
+        await asyncio.gather(*[_rpcs(handle, services) for handle, services in conns])
+        elapsed = time.perf_counter() - start
+
+        for handle, _services in conns:
+            await core.disconnect(handle)
+
+        return elapsed
+
+    try:
+        return loop.run_coroutine(_run())
+    finally:
+        core.stop()
+        loop.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--devices', type=int, nargs='+', default=[1, 4, 8], help="numbers of connected devices")
+    parser.add_argument('--rpcs', type=int, default=20, help="number of RPCs sent to each device")
+    parser.add_argument('--latency', type=float, default=20.0, help="simulated RPC response time in ms")
+    args = parser.parse_args(argv)
+
+    old_serial = serial.Serial
+    serial.Serial = util.dummy_serial.Serial
+
+    try:
+        for count in args.devices:
+            case = argparse.Namespace(devices=count, rpcs=args.rpcs, latency=args.latency)
+            total = count * args.rpcs
+
+            for label, runner in (('threaded', _run_threaded), ('async', _run_async)):
+                elapsed = runner(case)
+                print("%2d devices  %-8s  %7.1f RPCs/s  (%d RPCs with %.0f ms latency)" %
+                      (count, label, total / elapsed, total, args.latency))
+    finally:
+        serial.Serial = old_serial
+
+
+if __name__ == '__main__':
+    main()
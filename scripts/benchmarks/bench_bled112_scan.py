@@ -0,0 +1,92 @@
+"""Measure how many advertisements per second BLED112Adapter can process.
+
+A stream of advertisements from many simulated devices is generated with
+MockAdvertisingBLED112 and then replayed directly into the adapter's scan
+event handler, with and without broadcast and scan throttling enabled.  The
+processing rate is printed along with the adapter's scan metrics.
+
+The mock serial port used by the bled112 unit tests is reused, so this
+script must be run from a source checkout.
+"""
+
+import argparse
+import os
+import sys
+import time
+import serial
+from iotile_transport_bled112.bled112 import BLED112Adapter, packet_length
+from iotile_transport_bled112.bled112_cmd import BGAPIPacket
+from iotile_transport_bled112.hardware.emulator.mock_adv_bled112 import MockAdvertisingBLED112
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'transport_plugins', 'bled112', 'test'))
+import util.dummy_serial  # pylint: disable=wrong-import-position
+
+
+def _generate_events(args, version):
+    dongle = MockAdvertisingBLED112(3, advertising_version=version)
+    dongle.scanning = True
+    dongle.active_scan = False
+
+    data = next(dongle.generate_multiple_adv_packets(args.packets, args.devices, args.update_probability))
+
+    events = []
+    while len(data) > 0:
+        length = packet_length(data[:4]) + 4
+        events.append(BGAPIPacket(is_event=True, command_class=data[2], command=data[3], payload=bytes(data[4:length])))
+        data = data[length:]
+
+    return events
+
+
+def _run_case(events, throttle):
+    dongle = MockAdvertisingBLED112(3)
+    util.dummy_serial.RESPONSE_GENERATOR = dongle.generate_response
+
+    adapter = BLED112Adapter('test', lambda *args: None, passive=True, stop_check_interval=0.01)
+    adapter.add_callback('on_report', lambda *args: None)
+    adapter._throttle_scans = throttle
+    adapter._throttle_broadcast = throttle
+
+    try:
+        adapter.reset_scan_stats()
+
+        start = time.perf_counter()
+        for event in events:
+            adapter._process_scan_event(event)
+        elapsed = time.perf_counter() - start
+
+        metrics = adapter.get_scan_metrics()
+    finally:
+        adapter.stop_sync()
+
+    return len(events) / elapsed, metrics
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--packets', type=int, default=100000, help="number of advertisements to replay")
+    parser.add_argument('--devices', type=int, default=1000, help="number of unique advertising devices")
+    parser.add_argument('--update-probability', type=int, default=5,
+                        help="percent chance that a device's broadcast value changes between advertisements")
+    args = parser.parse_args(argv)
+
+    old_serial = serial.Serial
+    serial.Serial = util.dummy_serial.Serial
+
+    try:
+        for version in (1, 2):
+            events = _generate_events(args, version)
+
+            for throttle in (False, True):
+                rate, metrics = _run_case(events, throttle)
+
+                print("v%d  %-11s  %9.0f adverts/s  %7d scans  %7d broadcasts  %7d duplicates  %5d cached" %
+                      (version, 'throttled' if throttle else 'unthrottled', rate, metrics['reported_scans'],
+                       metrics['reported_broadcasts'], metrics['duplicate_broadcasts'],
+                       metrics['broadcast_cache_entries']))
+    finally:
+        serial.Serial = old_serial
+
+
+if __name__ == '__main__':
+    main()
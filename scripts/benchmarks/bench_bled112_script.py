@@ -0,0 +1,84 @@
+"""Measure how quickly BLED112Adapter sends scripts to a device on the mock BLED112.
+
+The mock dongle simulates a limited number of transmit buffers that drain
+at a fixed number of packets per connection interval, so writes are
+rejected with error 0x182 whenever the adapter sends faster than the
+simulated radio.  The script throughput is printed next to the over the air
+limit for each script window size.
+
+The mock serial port used by the bled112 unit tests is reused, so this
+script must be run from a source checkout.
+"""
+
+import argparse
+import os
+import sys
+import time
+import serial
+from iotile.core.hw.virtual.virtualdevice_simple import SimpleVirtualDevice
+from iotile.mock.mock_ble import MockBLEDevice
+from iotile_transport_bled112.bled112 import BLED112Adapter
+from iotile_transport_bled112.hardware.emulator.mock_bled112 import MockBLED112
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'transport_plugins', 'bled112', 'test'))
+import util.dummy_serial  # pylint: disable=wrong-import-position
+
+MAC = "00:11:22:33:44:55"
+
+
+def _run_case(args, window, tx_buffers):
+    dongle = MockBLED112(3, tx_buffers=tx_buffers, connection_interval=args.interval / 1000.0,
+                         packets_per_interval=args.packets_per_interval)
+    device = SimpleVirtualDevice(100, 'TestCN')
+    dongle.add_device(MockBLEDevice(MAC, device))
+    util.dummy_serial.RESPONSE_GENERATOR = dongle.generate_response
+
+    adapter = BLED112Adapter('test', stop_check_interval=0.01, script_window=window)
+
+    try:
+        adapter.connect_sync(1, MAC)
+        adapter.open_interface_sync(1, 'script')
+
+        script = bytes(os.urandom(int(args.size * 1024)))
+
+        start = time.perf_counter()
+        result = adapter.send_script_sync(1, script, lambda current, total: None)
+        elapsed = time.perf_counter() - start
+
+        assert result['success'] is True
+        assert device.script == script
+    finally:
+        adapter.stop_sync()
+
+    return len(script) / elapsed, dongle.rejected_writes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--size', type=float, default=32.0, help="script size in KiB")
+    parser.add_argument('--windows', type=int, nargs='+', default=[1, 16, 64], help="script window sizes to test")
+    parser.add_argument('--tx-buffers', type=int, default=8, help="simulated dongle transmit buffers")
+    parser.add_argument('--interval', type=float, default=7.5, help="simulated connection interval in ms")
+    parser.add_argument('--packets-per-interval', type=int, default=4,
+                        help="simulated packets sent per connection interval")
+    args = parser.parse_args(argv)
+
+    old_serial = serial.Serial
+    serial.Serial = util.dummy_serial.Serial
+
+    air_limit = 20 * args.packets_per_interval / (args.interval / 1000.0)
+
+    try:
+        for window in args.windows:
+            for label, tx_buffers in (('unlimited', None), ('%d buffers' % args.tx_buffers, args.tx_buffers)):
+                rate, rejected = _run_case(args, window, tx_buffers)
+                limit = "" if tx_buffers is None else "  (air limit %.1f KB/s)" % (air_limit / 1e3)
+
+                print("window %3d  %-11s  %8.1f KB/s  %6d rejected writes%s" %
+                      (window, label, rate / 1e3, rejected, limit))
+    finally:
+        serial.Serial = old_serial
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""Measure the action latency of the AWS IOT ConnectionManager with many open connections.
+
+A number of connections are opened and then RPC operations are started
+and finished on all of them from another thread, each with a long timeout
+so that every connection has a pending deadline.  The time for each
+operation's callback to arrive and the manager's own counters are reported.
+Finally operations with a short timeout are started on every connection to
+measure how late after its deadline each timeout is reported.
+"""
+
+import argparse
+import threading
+import time
+from iotile_transport_awsiot.connection_manager import ConnectionManager
+
+
+def _run_case(connections, rounds):
+    manager = ConnectionManager(0)
+    manager.start()
+
+    done = threading.Semaphore(0)
+
+    def _callback(*_args):
+        done.release()
+
+    try:
+        for i in range(connections):
+            manager.begin_connection(i, 'dev%d' % i, _callback, {}, 60.0)
+            manager.finish_connection(i, True)
+        for _i in range(connections):
+            done.acquire()
+
+        latencies = []
+        for _round in range(rounds):
+            for i in range(connections):
+                start = time.perf_counter()
+                manager.begin_operation(i, 'rpc', _callback, 60.0)
+                manager.finish_operation(i, True, None, 0, b'')
+                done.acquire()
+                latencies.append(time.perf_counter() - start)
+
+        stats = manager.stats()
+
+        lateness = []
+
+        def _on_timeout(*_args):
+            lateness.append(time.perf_counter() - deadline)
+            done.release()
+
+        deadline = time.perf_counter() + 0.02
+        for i in range(connections):
+            manager.begin_operation(i, 'rpc', _on_timeout, 0.02)
+        for _i in range(connections):
+            done.acquire()
+    finally:
+        manager.stop()
+
+    latencies.sort()
+    lateness.sort()
+    return latencies, lateness, stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--connections', type=int, nargs='+', default=[1, 100, 1000],
+                        help="numbers of open connections to test")
+    parser.add_argument('--rounds', type=int, default=5, help="number of operations per connection")
+    args = parser.parse_args(argv)
+
+    for count in args.connections:
+        latencies, lateness, stats = _run_case(count, args.rounds)
+
+        print("%5d connections  op median %7.1f us  p99 %7.1f us  action mean %6.1f us  max queue %4d  "
+              "timeout late median %6.1f ms  max %6.1f ms" %
+              (count, latencies[len(latencies) // 2] * 1e6, latencies[int(len(latencies) * 0.99)] * 1e6,
+               stats['mean_latency'] * 1e6, stats['high_water'],
+               lateness[len(lateness) // 2] * 1e3, lateness[-1] * 1e3))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""Measure how AggregatingDeviceAdapter scales with the number of visible devices.
+
+Several simulated adapters each see every device with a different signal
+strength, which is what happens when a gateway has multiple BLE dongles that
+can hear the same devices.  Advertisements are fed directly into the
+aggregating adapter so that only its device tracking is measured.
+"""
+
+import argparse
+import random
+import time
+from iotile.core.hw.transport import VirtualDeviceAdapter
+from iotilegateway.device import AggregatingDeviceAdapter
+
+
+class SimulatedAdapter(VirtualDeviceAdapter):
+    """An adapter with no devices of its own that may have no free connection slots."""
+
+    def __init__(self, free):
+        super(SimulatedAdapter, self).__init__(devices=[])
+        self.free = free
+
+    def can_connect(self):
+        return self.free
+
+
+def _advertisement(uuid, adapter_id, rand):
+    return dict(uuid=uuid, connection_string='%d-%d' % (adapter_id, uuid),
+                signal_strength=rand.randint(-100, -40), validity_period=60.0)
+
+
+def _time(func, count):
+    start = time.perf_counter()
+    for _i in range(count):
+        func()
+
+    return (time.perf_counter() - start) / count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--devices', type=int, default=2000, help="number of devices in view")
+    parser.add_argument('--adapters', type=int, default=4, help="number of simulated adapters")
+    parser.add_argument('--calls', type=int, default=20, help="number of times to repeat each per-call case")
+    args = parser.parse_args(argv)
+
+    rand = random.Random(0)
+
+    # Only the last adapter has a free connection slot
+    adapters = [SimulatedAdapter(i == args.adapters - 1) for i in range(args.adapters)]
+    agg = AggregatingDeviceAdapter(adapters=adapters)
+
+    events = [(adapter_id, _advertisement(uuid, adapter_id, rand))
+              for uuid in range(1, args.devices + 1) for adapter_id in range(args.adapters)]
+
+    start = time.perf_counter()
+    for adapter_id, event in events:
+        agg._track_device_seen(adapter_id, event['connection_string'], event)
+    per_event = (time.perf_counter() - start) / len(events)
+
+    print("%-45s %10.2f us" % ("device_seen, new devices (%d events)" % len(events), per_event * 1e6))
+
+    start = time.perf_counter()
+    for adapter_id, event in events:
+        event['signal_strength'] += rand.randint(-1, 1)
+        agg._track_device_seen(adapter_id, event['connection_string'], event)
+    per_event = (time.perf_counter() - start) / len(events)
+
+    print("%-45s %10.2f us" % ("device_seen, known devices (%d events)" % len(events), per_event * 1e6))
+
+    agg.visible_devices()
+
+    print("%-45s %10.2f ms" % ("visible_devices() unchanged",
+                                 _time(agg.visible_devices, args.calls) * 1e3))
+
+    def _one_update_then_visible():
+        adapter_id, event = events[rand.randrange(len(events))]
+        agg._track_device_seen(adapter_id, event['connection_string'], event)
+        agg.visible_devices()
+
+    print("%-45s %10.2f ms" % ("visible_devices() after 1 device_seen",
+                                 _time(_one_update_then_visible, args.calls) * 1e3))
+
+    def _connect_lookup():
+        agg._find_best_adapter("device/%x" % rand.randint(1, args.devices), 0)
+
+    print("%-45s %10.2f us" % ("_find_best_adapter()", _time(_connect_lookup, args.calls * 100) * 1e6))
+
+    print("%-45s %10.2f ms" % ("expiry sweep, nothing expired",
+                                 _time(agg._device_expiry_callback, args.calls) * 1e3))
+
+
+if __name__ == '__main__':
+    main()
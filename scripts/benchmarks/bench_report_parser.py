@@ -0,0 +1,56 @@
+"""Measure IOTileReportParser throughput over a large synthetic report stream.
+
+The stream is made of many small IndividualReadingReports interleaved with
+SignedListReports and is fed to the parser in fixed size chunks, the way a
+transport would deliver it.
+"""
+
+import argparse
+import struct
+import time
+from iotile.core.hw.reports import IOTileReading, IOTileReportParser, SignedListReport
+
+
+def _build_stream(size, signed_every, readings_per_signed):
+    individual = struct.pack("<BBHLLLL", 0, 0, 0x5001, 1, 0, 10, 100)
+    readings = [IOTileReading(i, 0x5002, i, reading_id=i + 1) for i in range(readings_per_signed)]
+    signed = SignedListReport.FromReadings(1, readings).encode()
+
+    stream = bytearray()
+    count = 0
+    while len(stream) < size:
+        if signed_every > 0 and count % signed_every == 0:
+            stream += signed
+        else:
+            stream += individual
+
+        count += 1
+
+    return stream, count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--size', type=float, default=4.0, help="size of the report stream in megabytes")
+    parser.add_argument('--chunk', type=int, default=4096, help="number of bytes passed to each add_data call")
+    parser.add_argument('--signed-every', type=int, default=100,
+                        help="insert a signed list report every N reports (0 for none)")
+    parser.add_argument('--readings', type=int, default=100, help="readings in each signed list report")
+    args = parser.parse_args(argv)
+
+    stream, count = _build_stream(int(args.size * 1024 * 1024), args.signed_every, args.readings)
+
+    report_parser = IOTileReportParser(report_callback=lambda report, context: False)
+
+    start = time.perf_counter()
+    for i in range(0, len(stream), args.chunk):
+        report_parser.add_data(stream[i:i + args.chunk])
+    elapsed = time.perf_counter() - start
+
+    megabytes = len(stream) / (1024.0 * 1024.0)
+    print("%d reports (%.1f MB) in %.3f s: %.1f reports/s, %.2f MB/s" % (count, megabytes, elapsed, count / elapsed,
+                                                                         megabytes / elapsed))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+"""Measure how many SignedListReports per second can be verified and decoded.
+
+The "uncached" case clears the ChainedAuthProvider cache before every report,
+which reproduces the cost of searching the ComponentRegistry for installed
+auth providers each time a report is decoded.  The "shared" case uses the
+process wide provider chain and the "parser" case injects a single signer
+into an IOTileReportParser.
+"""
+
+import argparse
+import time
+from iotile.core.hw.auth.auth_chain import ChainedAuthProvider
+from iotile.core.hw.reports import SignedListReport, IOTileReading, IOTileReportParser
+
+
+def _build_report(num_readings):
+    readings = [IOTileReading(i, 0x5001, i, reading_id=i + 1) for i in range(num_readings)]
+    return SignedListReport.FromReadings(1, readings).encode()
+
+
+def _measure(name, count, func):
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+
+    print("%-10s %8d reports in %7.3f s: %10.1f reports/s" % (name, count, elapsed, count / elapsed))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--reports', type=int, default=1000, help="number of reports to verify")
+    parser.add_argument('--readings', type=int, default=10, help="number of readings in each report")
+    args = parser.parse_args(argv)
+
+    encoded = _build_report(args.readings)
+
+    def _uncached():
+        for _i in range(args.reports):
+            ChainedAuthProvider.ClearCache()
+            SignedListReport(encoded)
+
+    def _shared():
+        for _i in range(args.reports):
+            SignedListReport(encoded)
+
+    def _parser():
+        report_parser = IOTileReportParser(report_callback=lambda report, context: False,
+                                           signer=ChainedAuthProvider())
+        for _i in range(args.reports):
+            report_parser.add_data(encoded)
+
+    _measure("uncached", args.reports, _uncached)
+    _measure("shared", args.reports, _shared)
+    _measure("parser", args.reports, _parser)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""Measure the overhead of encoding, decoding and dispatching RPCs.
+
+The compiled RPC formats used by pack_rpc_payload and unpack_rpc_payload are
+compared against building a format string and packing then unpacking with
+the struct module on every call, which is what was done before formats were
+compiled.  RPC dispatch through a VirtualTile using @tile_rpc decorated
+methods is also measured since that is the path taken by every emulated RPC.
+"""
+
+import argparse
+import asyncio
+import struct
+import time
+from iotile.core.hw.virtual import VirtualTile, tile_rpc, pack_rpc_payload, unpack_rpc_payload
+
+FORMATS = [
+    ("LL", [1, 2]),
+    ("BB12s", [1, 2, bytes(12)]),
+    ("LHHV", [1, 2, 3, b'abcdefgh']),
+]
+
+
+def _struct_code(arg_format, length):
+    if not arg_format.endswith('V'):
+        return "<" + arg_format
+
+    return "<%s%ds" % (arg_format[:-1], length)
+
+
+def _roundtrip_pack(arg_format, args):
+    code = _struct_code(arg_format, len(args[-1]) if arg_format.endswith('V') else 0)
+    packed = struct.pack(code, *args)
+    if tuple(args) != struct.unpack(code, packed):
+        raise ValueError("Truncated value")
+
+    return packed
+
+
+def _roundtrip_unpack(arg_format, payload):
+    length = len(payload) - struct.calcsize("<" + arg_format[:-1]) if arg_format.endswith('V') else 0
+    return struct.unpack(_struct_code(arg_format, length), payload)
+
+
+class _BenchTile(VirtualTile):
+    def __init__(self):
+        super(_BenchTile, self).__init__(10, 'bench1')
+
+    @tile_rpc(0x8000, "LL", "L")
+    def add(self, arg_1, arg_2):
+        return [arg_1 + arg_2]
+
+    @tile_rpc(0x8001, "HV", "LV")
+    def echo(self, length, data):
+        return [length, data]
+
+
+def _time_calls(func, count):
+    start = time.perf_counter()
+    for _i in range(count):
+        func()
+
+    return time.perf_counter() - start
+
+
+def _report(name, count, elapsed):
+    print("%-44s %8.0f ns/call" % (name, elapsed / count * 1e9))
+
+
+def _bench_codecs(count):
+    for arg_format, args in FORMATS:
+        packed = pack_rpc_payload(arg_format, args)
+
+        _report("pack %s (struct round trip)" % arg_format, count,
+                _time_calls(lambda: _roundtrip_pack(arg_format, args), count))
+        _report("pack %s (compiled)" % arg_format, count,
+                _time_calls(lambda: pack_rpc_payload(arg_format, args), count))
+        _report("unpack %s (struct round trip)" % arg_format, count,
+                _time_calls(lambda: _roundtrip_unpack(arg_format, packed), count))
+        _report("unpack %s (compiled)" % arg_format, count,
+                _time_calls(lambda: unpack_rpc_payload(arg_format, packed), count))
+
+
+def _bench_dispatch(count):
+    tile = _BenchTile()
+    loop = asyncio.get_event_loop()
+
+    for rpc_id, payload in ((0x8000, struct.pack("<LL", 1, 2)), (0x8001, struct.pack("<H", 5) + b'hello')):
+        async def _dispatch():
+            for _i in range(count):
+                await tile.call_rpc(rpc_id, payload)
+
+        start = time.perf_counter()
+        loop.run_until_complete(_dispatch())
+        _report("dispatch rpc 0x%04X" % rpc_id, count, time.perf_counter() - start)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--count', type=int, default=100000, help="number of calls to time for each case")
+    args = parser.parse_args(argv)
+
+    _bench_codecs(args.count)
+    _bench_dispatch(args.count)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""Measure SensorGraph input processing throughput over sensor graph files.
+
+Each graph is compiled and optimized the same way iotile-sgrun does and then
+simulated for a fixed amount of device time.  Optionally, extra root nodes
+listening on unused inputs can be added to each graph to see how processing
+cost scales with the size of the graph.
+"""
+
+import argparse
+import glob
+import os
+import time
+from iotile.sg import DeviceModel
+from iotile.sg.parser import SensorGraphFileParser
+from iotile.sg.optimizer import SensorGraphOptimizer
+from iotile.sg.sim import SensorGraphSimulator
+
+DEFAULT_GRAPHS = os.path.join(os.path.dirname(__file__), '..', '..', 'iotilesensorgraph', 'test', 'sensor_graphs')
+
+
+def _padding(count):
+    return "".join("on input %d\n{\n\tcopy => unbuffered %d;\n}\n" % (100 + i, 100 + i) for i in range(count))
+
+
+def _count_inputs(graph):
+    counter = [0]
+    original = graph.process_input
+
+    def _process_input(*args, **kwargs):
+        counter[0] += 1
+        return original(*args, **kwargs)
+
+    graph.process_input = _process_input
+    return counter
+
+
+def _run_graph(path, padding, seconds, fast_forward):
+    with open(path, "r") as infile:
+        text = infile.read() + "\n" + _padding(padding)
+
+    model = DeviceModel()
+    parser = SensorGraphFileParser()
+    parser.parse_file(data=text)
+    parser.compile(model)
+
+    SensorGraphOptimizer().optimize(parser.sensor_graph, model=model)
+
+    graph = parser.sensor_graph
+    sim = SensorGraphSimulator(graph)
+    sim.stop_condition('run_time %d seconds' % seconds)
+    graph.load_constants()
+
+    inputs = _count_inputs(graph)
+
+    start = time.perf_counter()
+    sim.run(fast_forward=fast_forward)
+    elapsed = time.perf_counter() - start
+
+    return len(graph.nodes), inputs[0], elapsed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('graphs', nargs='*', help="sensor graph files to run (defaults to the bundled example graphs)")
+    parser.add_argument('--seconds', type=int, default=86400, help="simulated seconds to run each graph for")
+    parser.add_argument('--padding', type=int, default=0, help="extra unused root nodes to add to each graph")
+    parser.add_argument('--fast-forward', action='store_true', help="skip simulated seconds where nothing happens")
+    args = parser.parse_args(argv)
+
+    graphs = args.graphs
+    if len(graphs) == 0:
+        graphs = sorted(glob.glob(os.path.join(DEFAULT_GRAPHS, '*.sgf')))
+
+    for path in graphs:
+        try:
+            nodes, inputs, elapsed = _run_graph(path, args.padding, args.seconds, args.fast_forward)
+        except Exception as exc:  #pylint:disable=broad-except;This is a benchmark of arbitrary files
+            print("%-28s skipped: %s" % (os.path.basename(path), exc.__class__.__name__))
+            continue
+
+        print("%-28s %4d nodes: %d inputs in %.3f s: %.0f inputs/s" % (os.path.basename(path), nodes, inputs,
+                                                                         elapsed, inputs / elapsed))
+
+
+if __name__ == '__main__':
+    main()
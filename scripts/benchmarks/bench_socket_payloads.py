@@ -0,0 +1,122 @@
+"""Measure RPC and trace throughput of the socket transports for each protocol version.
+
+A client and server are connected over a real TCP or unix domain socket and
+exchange the same send_rpc commands and trace notifications that a
+SocketDeviceAdapter and SocketDeviceServer would, including schema
+validation on both sides.  Each case is run once with the legacy base64
+protocol and once with the binary protocol.
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from iotile.core.utilities import BackgroundEventLoop
+from iotile.core.utilities.schema_verify import Verifier
+from iotile_transport_socket_lib.generic import AsyncSocketServer, AsyncSocketClient
+from iotile_transport_socket_lib.protocol import COMMANDS, NOTIFICATIONS, OPERATIONS, LEGACY_PROTOCOL, BINARY_PROTOCOL
+from iotile_transport_socket_lib.protocol.versions import encode_bytes
+from iotile_transport_socket_lib.tcp_socket.tcpsocket_implementation import TcpServerImplementation, \
+    TcpClientImplementation
+from iotile_transport_socket_lib.unix_socket.unixsocket_implementation import UnixServerImplementation, \
+    UnixClientImplementation
+
+
+def _tcp_pair(loop, _tmpdir):
+    server = TcpServerImplementation(host='127.0.0.1', loop=loop)
+    return server, lambda: TcpClientImplementation('127.0.0.1', server.port, loop)
+
+
+def _unix_pair(loop, tmpdir):
+    path = os.path.join(tmpdir, 'bench.sock')
+    return UnixServerImplementation(path=path, loop=loop), lambda: UnixClientImplementation(path=path, loop=loop)
+
+
+TRANSPORTS = (('tcp', _tcp_pair), ('unix', _unix_pair))
+
+
+async def _send_rpc(payload, context):
+    return dict(status=0xc0, payload=encode_bytes(payload['payload'], context.binary))
+
+
+async def _stream_traces(payload, context):
+    server = context.server
+    chunk = encode_bytes(bytes(payload['size']), context.binary)
+
+    for _i in range(payload['count']):
+        await server.send_event(context.connection, OPERATIONS.NOTIFY_TRACE,
+                                dict(connection_string='1', payload=chunk))
+
+
+def _run_case(loop, transport, protocol_version, args, tmpdir):
+    server_impl, client_factory = transport(loop, tmpdir)
+    server = AsyncSocketServer(server_impl, loop=loop)
+    server.register_command(OPERATIONS.SEND_RPC, _send_rpc, COMMANDS.SendRPCCommand)
+    server.register_command('stream_traces', _stream_traces, Verifier())
+    loop.run_coroutine(server.start())
+
+    client = AsyncSocketClient(client_factory(), loop=loop, protocol_version=protocol_version)
+    loop.run_coroutine(client.start())
+
+    received = [0]
+    done = loop.create_event()
+
+    def _on_trace(event):
+        received[0] += len(event['payload'])
+        if received[0] >= args.traces * args.trace_size:
+            done.set()
+
+    client.register_event(OPERATIONS.NOTIFY_TRACE, _on_trace, NOTIFICATIONS.TraceEvent)
+
+    rpc_payload = bytes(range(20))
+
+    async def _send_rpcs():
+        for _i in range(args.rpcs):
+            msg = dict(connection_string='1', address=8, rpc_id=0x0004, timeout=1.0,
+                       payload=encode_bytes(rpc_payload, client.binary))
+            await client.send_command(OPERATIONS.SEND_RPC, msg, COMMANDS.SendRPCResponse)
+
+    async def _stream():
+        await client.send_command('stream_traces', dict(count=args.traces, size=args.trace_size), None)
+        await done.wait()
+
+    try:
+        start = time.perf_counter()
+        loop.run_coroutine(_send_rpcs())
+        rpc_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        loop.run_coroutine(_stream())
+        trace_time = time.perf_counter() - start
+    finally:
+        loop.run_coroutine(client.stop())
+        loop.run_coroutine(server.stop())
+
+    return rpc_time, trace_time
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rpcs', type=int, default=2000, help="number of sequential RPCs to send")
+    parser.add_argument('--traces', type=int, default=2000, help="number of trace notifications to stream")
+    parser.add_argument('--trace-size', type=int, default=1024, help="size in bytes of each trace notification")
+    args = parser.parse_args(argv)
+
+    loop = BackgroundEventLoop()
+    loop.start()
+
+    try:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            for name, transport in TRANSPORTS:
+                for label, version in (('legacy', LEGACY_PROTOCOL), ('binary', BINARY_PROTOCOL)):
+                    rpc_time, trace_time = _run_case(loop, transport, version, args, tmpdir)
+
+                    print("%-4s %-6s  send_rpc %8.1f us/rpc   traces %8.2f MB/s" %
+                          (name, label, rpc_time / args.rpcs * 1e6,
+                           args.traces * args.trace_size / trace_time / 1e6))
+    finally:
+        loop.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""Measure iotile startup time and the cost of creating HardwareManagers.
+
+Each startup case is run in a fresh python process so that nothing is cached
+in memory.  The cold index cases delete the on disk extension index before
+every run so that every installed distribution has to be scanned for entry
+points, which is what happened on every call to load_extensions before the
+index existed.
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+HWMANAGER_SNIPPET = ("from iotile.core.hw import HardwareManager\n"
+                     "hw = HardwareManager(port='{port}')\n"
+                     "hw.close()\n")
+
+
+def _index_path():
+    from iotile.core.dev.registry import ComponentRegistry, _registry_folder
+
+    # Older versions of iotile-core do not have an extension index
+    index_name = getattr(ComponentRegistry, 'IndexFileName', None)
+    if index_name is None:
+        return None
+
+    return os.path.join(_registry_folder(), index_name)
+
+
+def _time_process(args, runs, cold_index):
+    index_path = _index_path()
+
+    samples = []
+    for _i in range(runs):
+        if cold_index and index_path is not None and os.path.exists(index_path):
+            os.remove(index_path)
+
+        start = time.perf_counter()
+        subprocess.run(args, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        samples.append(time.perf_counter() - start)
+
+    return statistics.median(samples)
+
+
+def _time_in_process(port, count):
+    from iotile.core.hw import HardwareManager
+
+    start = time.perf_counter()
+    for _i in range(count):
+        hw = HardwareManager(port=port)
+        hw.close()
+
+    return (time.perf_counter() - start) / count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--port', default='virtual:simple', help="the port to open a HardwareManager on")
+    parser.add_argument('--runs', type=int, default=5, help="number of fresh processes to time for each case")
+    parser.add_argument('--count', type=int, default=20, help="number of HardwareManagers to create in process")
+    args = parser.parse_args(argv)
+
+    iotile_cmd = [os.path.join(os.path.dirname(sys.executable), 'iotile'), 'hw', '--port=%s' % args.port]
+    hwman_cmd = [sys.executable, '-c', HWMANAGER_SNIPPET.format(port=args.port)]
+
+    for name, cmd in (('iotile hw', iotile_cmd), ('HardwareManager()', hwman_cmd)):
+        for cold_index in (True, False):
+            elapsed = _time_process(cmd, args.runs, cold_index)
+            label = "%s (%s index)" % (name, "cold" if cold_index else "warm")
+            print("%-40s %8.1f ms" % (label, elapsed * 1000))
+
+    print("%-40s %8.1f ms" % ("HardwareManager() in process", _time_in_process(args.port, args.count) * 1000))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""Measure how long it takes to parse and encode large synthetic update scripts.
+
+Two kinds of scripts are generated: reflash scripts made of a few large
+ReflashTileRecords and configuration scripts made of many small
+SendRPCRecords.  Each is encoded in memory, written to a file, parsed from
+memory with FromBinary() and parsed lazily from the file with
+iter_records().
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from iotile.core.hw import UpdateScript
+from iotile.core.hw.update.records import ReflashTileRecord, SendRPCRecord
+
+
+def _reflash_script(size, record_size):
+    count = max(1, size // record_size)
+    return UpdateScript([ReflashTileRecord(11, bytearray(os.urandom(record_size)), i * record_size)
+                         for i in range(count)])
+
+
+def _rpc_script(size, record_size):
+    payload_size = max(0, record_size - 12)
+    count = max(1, size // record_size)
+    return UpdateScript([SendRPCRecord(11, 0x8000 | (i & 0x7FFF), bytearray(os.urandom(payload_size)))
+                         for i in range(count)])
+
+
+def _time(func):
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+
+def _run_case(name, script, tmpdir):
+    path = os.path.join(tmpdir, 'script.trub')
+
+    encode_time, encoded = _time(script.encode)
+
+    def _write():
+        with open(path, 'wb') as outfile:
+            script.write(outfile)
+
+    write_time, _ = _time(_write)
+    parse_time, parsed = _time(lambda: UpdateScript.FromBinary(encoded))
+    iter_time, count = _time(lambda: sum(1 for _record in UpdateScript.iter_records(path)))
+
+    assert len(parsed.records) == len(script.records) == count
+
+    print("%-38s encode %7.3f s  write %7.3f s  FromBinary %7.3f s  iter_records %7.3f s" %
+          ("%s (%d records, %.1f MB)" % (name, len(script.records), len(encoded) / 1e6),
+           encode_time, write_time, parse_time, iter_time))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--size', type=float, default=10.0, help="approximate size of each script in MB")
+    parser.add_argument('--reflash-record-size', type=int, default=64*1024,
+                        help="size of each reflash record in bytes")
+    parser.add_argument('--rpc-record-size', type=int, default=64, help="size of each rpc record in bytes")
+    args = parser.parse_args(argv)
+
+    size = int(args.size * 1e6)
+
+    # Record plugins are loaded the first time a script is parsed
+    UpdateScript.FromBinary(_reflash_script(1, 1).encode())
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        _run_case("reflash", _reflash_script(size, args.reflash_record_size), tmpdir)
+        _run_case("send_rpc", _rpc_script(size, args.rpc_record_size), tmpdir)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,8 @@
+import heapq
 import threading
-import queue
 import logging
+from collections import deque
+from time import monotonic
 from .timeout import TimeoutInterval
 from iotile.core.exceptions import ArgumentError
 
@@ -22,6 +24,8 @@ class ConnectionAction:
         self.data = data
         self.sync = sync
         self.timeout = TimeoutInterval(timeout)
+        self.queued = monotonic()
+        self.deadline = self.queued + timeout
 
         if self.sync:
             self.done = threading.Event()
@@ -60,6 +64,11 @@ class ConnectionManager(threading.Thread):
         nonexistent -> connecting -> idle <--> in_progress <--> idle -> disconnecting -> nonexistant
 
     ConnectionManager will fail a request that does not follow the above pattern.
+
+    The worker thread sleeps until either an action is queued or the earliest
+    pending timeout is due.  Timeouts are kept in a heap ordered by deadline
+    so only the operations that are actually due are checked.  Counters for
+    the action queue depth and latency are available from :meth:`stats`.
     """
 
     Disconnected = 0
@@ -81,11 +90,29 @@ class ConnectionManager(threading.Thread):
 
         self.id = adapter_id
         self._stop_event = threading.Event()
-        self._actions = queue.Queue()
+        self._actions = deque()
+        self._wakeup = threading.Condition()
+        self._deadlines = []
         self._connections = {}
         self._int_connections = {}
         self._data_lock = threading.Lock()
 
+        self._handlers = {
+            'begin_connection': self._begin_connection_action,
+            'finish_connection': self._finish_connection_action,
+            'force_disconnect': self._force_disconnect_action,
+            'begin_disconnection': self._begin_disconnection_action,
+            'finish_disconnection': self._finish_disconnection_action,
+            'begin_operation': self._begin_operation_action,
+            'finish_operation': self._finish_operation_action
+        }
+
+        self._processed = 0
+        self._timeouts = 0
+        self._high_water = 0
+        self._total_latency = 0.0
+        self._max_latency = 0.0
+
         # Our thread should be a daemon so that we don't block exiting the program if we hang
         self.daemon = True
 
@@ -96,38 +123,113 @@ class ConnectionManager(threading.Thread):
     def run(self):
         while True:
             try:
-                if self._stop_event.is_set():
-                    break
+                with self._wakeup:
+                    while len(self._actions) == 0 and not self._stop_event.is_set():
+                        wait_time = self._next_timeout()
+                        if wait_time is not None and wait_time <= 0:
+                            break
+
+                        self._wakeup.wait(wait_time)
+
+                    if self._stop_event.is_set():
+                        break
+
+                    action = None
+                    if len(self._actions) > 0:
+                        action = self._actions.popleft()
 
                 # Check if we should time anything out
                 self._check_timeouts()
 
-                try:
-                    action = self._actions.get(timeout=0.1)
-                except queue.Empty:
+                if action is None:
                     continue
 
-                handler_name = '_{}_action'.format(action.action)
-
-                if not hasattr(self, handler_name):
+                handler = self._handlers.get(action.action)
+                if handler is None:
                     self._logger.error("Ignoring unknown action in ConnectionManager: %s", action.action)
                     continue
 
-                handler = getattr(self, handler_name)
                 handler(action)
 
                 if action.sync:
                     action.done.set()
+
+                self._record_latency(action)
             except Exception:
                 self._logger.exception('Exception processing event in ConnectionManager')
 
     def stop(self):
         try:
-            self._stop_event.set()
+            with self._wakeup:
+                self._stop_event.set()
+                self._wakeup.notify()
+
             self.join(5.0)
         except RuntimeError:
             self._logger.warn("Could not stop connection manager thread, killing it on exit in a dirty fashion")
 
+    def stats(self):
+        """Get counters describing how quickly actions are being processed.
+
+        Latency is measured from when an action is queued until its handler
+        returns.
+
+        Returns:
+            dict: The current ``queue_depth`` and its ``high_water`` mark, the
+            number of ``actions`` processed, their ``mean_latency`` and
+            ``max_latency`` in seconds, the number of ``pending_timeouts`` and
+            the number of operations that have ``timed_out``.
+        """
+
+        with self._wakeup:
+            mean_latency = 0.0
+            if self._processed > 0:
+                mean_latency = self._total_latency / self._processed
+
+            return {
+                'queue_depth': len(self._actions),
+                'high_water': self._high_water,
+                'actions': self._processed,
+                'mean_latency': mean_latency,
+                'max_latency': self._max_latency,
+                'pending_timeouts': len(self._deadlines),
+                'timed_out': self._timeouts
+            }
+
+    def _put_action(self, action):
+        """Queue an action and wake the worker thread."""
+
+        with self._wakeup:
+            self._actions.append(action)
+            self._high_water = max(self._high_water, len(self._actions))
+            self._wakeup.notify()
+
+    def _record_latency(self, action):
+        latency = monotonic() - action.queued
+
+        with self._wakeup:
+            self._processed += 1
+            self._total_latency += latency
+            self._max_latency = max(self._max_latency, latency)
+
+    def _schedule_timeout(self, conn_id, action):
+        """Remember when the operation started by an action should time out.
+
+        Heap entries are not removed when an operation finishes, instead they
+        are ignored when they come due if the connection has moved on to a
+        different operation.
+        """
+
+        heapq.heappush(self._deadlines, (action.deadline, id(action.timeout), conn_id, action.timeout))
+
+    def _next_timeout(self):
+        """Return the number of seconds until the next timeout or None if there are none."""
+
+        if len(self._deadlines) == 0:
+            return None
+
+        return self._deadlines[0][0] - monotonic()
+
     def get_connections(self):
         """Get a list of all open connections
 
@@ -264,17 +366,26 @@ class ConnectionManager(threading.Thread):
         timeout.
         """
 
-        for conn_id, data in self._connections.items():
-            if 'timeout' in data and data['timeout'].expired:
-                if data['state'] == self.Connecting:
-                    self.finish_connection(conn_id, False, 'Connection attempt timed out')
-                elif data['state'] == self.Disconnecting:
-                    self.finish_disconnection(conn_id, False, 'Disconnection attempt timed out')
-                elif data['state'] == self.InProgress:
-                    if data['microstate'] == 'rpc':
-                        self.finish_operation(conn_id, False, 'RPC timed out without response', None, None)
-                    elif data['microstate'] == 'open_interface':
-                        self.finish_operation(conn_id, False, 'Open interface request timed out')
+        now = monotonic()
+
+        while len(self._deadlines) > 0 and self._deadlines[0][0] <= now:
+            _deadline, _key, conn_id, timeout = heapq.heappop(self._deadlines)
+
+            data = self._connections.get(conn_id)
+            if data is None or data.get('timeout') is not timeout:
+                continue
+
+            self._timeouts += 1
+
+            if data['state'] == self.Connecting:
+                self.finish_connection(conn_id, False, 'Connection attempt timed out')
+            elif data['state'] == self.Disconnecting:
+                self.finish_disconnection(conn_id, False, 'Disconnection attempt timed out')
+            elif data['state'] == self.InProgress:
+                if data['microstate'] == 'rpc':
+                    self.finish_operation(conn_id, False, 'RPC timed out without response', None, None)
+                elif data['microstate'] == 'open_interface':
+                    self.finish_operation(conn_id, False, 'Open interface request timed out')
 
     def begin_connection(self, conn_id, internal_id, callback, context, timeout):
         """Asynchronously begin a connection attempt
@@ -297,7 +408,7 @@ class ConnectionManager(threading.Thread):
         }
 
         action = ConnectionAction('begin_connection', data, timeout=timeout, sync=False)
-        self._actions.put(action)
+        self._put_action(action)
 
     def finish_connection(self, conn_or_internal_id, successful, failure_reason=None):
         """Finish a conntection attempt
@@ -317,7 +428,7 @@ class ConnectionManager(threading.Thread):
         }
 
         action = ConnectionAction('finish_connection', data, sync=False)
-        self._actions.put(action)
+        self._put_action(action)
 
     def _begin_connection_action(self, action):
         """Begin a connection attempt
@@ -353,6 +464,7 @@ class ConnectionManager(threading.Thread):
 
         self._connections[conn_id] = conn_data
         self._int_connections[int_id] = conn_data
+        self._schedule_timeout(conn_id, action)
 
     def _finish_connection_action(self, action):
         """Finish a connection attempt
@@ -406,7 +518,7 @@ class ConnectionManager(threading.Thread):
         }
 
         action = ConnectionAction('force_disconnect', data, sync=False)
-        self._actions.put(action)
+        self._put_action(action)
 
     def begin_disconnection(self, conn_or_internal_id, callback, timeout):
         """Begin a disconnection attempt
@@ -426,7 +538,7 @@ class ConnectionManager(threading.Thread):
         }
 
         action = ConnectionAction('begin_disconnection', data, timeout=timeout, sync=False)
-        self._actions.put(action)
+        self._put_action(action)
 
     def _force_disconnect_action(self, action):
         """Forcibly disconnect a device.
@@ -484,6 +596,7 @@ class ConnectionManager(threading.Thread):
         data['microstate'] = None
         data['callback'] = callback
         data['timeout'] = action.timeout
+        self._schedule_timeout(data['conn_id'], action)
 
     def finish_disconnection(self, conn_or_internal_id, successful, failure_reason):
         """Finish a disconnection attempt
@@ -503,7 +616,7 @@ class ConnectionManager(threading.Thread):
         }
 
         action = ConnectionAction('finish_disconnection', data, sync=False)
-        self._actions.put(action)
+        self._put_action(action)
 
     def _finish_disconnection_action(self, action):
         """Finish a disconnection attempt
@@ -566,8 +679,8 @@ class ConnectionManager(threading.Thread):
             'operation_name': op_name
         }
 
-        action = ConnectionAction('begin_operation', data, sync=False)
-        self._actions.put(action)
+        action = ConnectionAction('begin_operation', data, timeout=timeout, sync=False)
+        self._put_action(action)
 
     def _begin_operation_action(self, action):
         """Begin an attempted operation.
@@ -589,6 +702,7 @@ class ConnectionManager(threading.Thread):
         data['microstate'] = action.data['operation_name']
         data['callback'] = callback
         data['timeout'] = action.timeout
+        self._schedule_timeout(data['conn_id'], action)
 
     def finish_operation(self, conn_or_internal_id, success, *args):
         """Finish an operation on a connection.
@@ -608,7 +722,7 @@ class ConnectionManager(threading.Thread):
         }
 
         action = ConnectionAction('finish_operation', data, sync=False)
-        self._actions.put(action)
+        self._put_action(action)
 
     def _finish_operation_action(self, action):
         """Finish an attempted operation.
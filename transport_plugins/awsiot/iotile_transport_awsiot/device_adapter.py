@@ -5,7 +5,7 @@ import datetime
 import logging
 import queue
 import uuid
-from iotile.core.exceptions import IOTileException, ArgumentError, HardwareError
+from iotile.core.exceptions import IOTileException, ArgumentError, HardwareError, ValidationError
 from iotile.core.hw.transport.adapter import DeviceAdapter
 from iotile.core.hw.reports.parser import IOTileReportParser
 from iotile.core.dev.registry import ComponentRegistry
@@ -73,6 +73,7 @@ class AWSIOTDeviceAdapter(DeviceAdapter):
         self.set_config('probe_required', True)
         self.mtu = self.get_config('mtu', 60*1024)  # Split script payloads larger than this
         self.report_parser = IOTileReportParser()
+        self._report_fragments = {}
 
     def connect_async(self, connection_id, connection_string, callback):
         """Connect to a device by its connection_string
@@ -408,11 +409,18 @@ class AWSIOTDeviceAdapter(DeviceAdapter):
             return
 
         try:
-            rep_msg = messages.ReportNotification.verify(message)
+            if message.get('encoding') == 'bin':
+                rep_msg = messages.BinaryReportNotification.verify(message)
+            else:
+                rep_msg = messages.ReportNotification.verify(message)
+
+            encoded_report = self._reassemble_report(conn_key, rep_msg)
+            if encoded_report is None:
+                return
 
             serialized_report = {}
             serialized_report['report_format'] = rep_msg['report_format']
-            serialized_report['encoded_report'] = rep_msg['report']
+            serialized_report['encoded_report'] = encoded_report
             serialized_report['received_time'] = datetime.datetime.strptime(rep_msg['received_time'].encode().decode(), "%Y%m%dT%H:%M:%S.%fZ")
 
             report = self.report_parser.deserialize_report(serialized_report)
@@ -420,6 +428,38 @@ class AWSIOTDeviceAdapter(DeviceAdapter):
         except Exception:
             self._logger.exception("Error processing report conn_id=%d", conn_id)
 
+    def _reassemble_report(self, conn_key, rep_msg):
+        """Accumulate the fragments of a report that was split into several messages.
+
+        Fragments are published in order on an ordered topic so they are
+        collected until the last one arrives.
+
+        Returns:
+            bytes: The complete encoded report or None if more fragments are needed.
+        """
+
+        index = rep_msg['fragment_index']
+        count = rep_msg['fragment_count']
+
+        if count == 1:
+            self._report_fragments.pop(conn_key, None)
+            return rep_msg['report']
+
+        if index == 0:
+            self._report_fragments[conn_key] = []
+
+        fragments = self._report_fragments.get(conn_key)
+        if fragments is None or len(fragments) != index:
+            self._report_fragments.pop(conn_key, None)
+            raise ValidationError("Received report fragment out of order", index=index, count=count)
+
+        fragments.append(rep_msg['report'])
+        if index != count - 1:
+            return None
+
+        del self._report_fragments[conn_key]
+        return b''.join(fragments)
+
     def _on_trace(self, sequence, topic, message):
         """Process a trace received from a device.
 
@@ -437,7 +477,11 @@ class AWSIOTDeviceAdapter(DeviceAdapter):
             return
 
         try:
-            tracing = messages.TracingNotification.verify(message)
+            if message.get('encoding') == 'bin':
+                tracing = messages.BinaryTracingNotification.verify(message)
+            else:
+                tracing = messages.TracingNotification.verify(message)
+
             self._trigger_callback('on_trace', conn_id, tracing['trace'])
         except Exception:
             self._logger.exception("Error processing trace conn_id=%d", conn_id)
@@ -488,6 +532,7 @@ class AWSIOTDeviceAdapter(DeviceAdapter):
             self._logger.debug("Dropping message that is for another client %s, we are %s", message['client'], self.name)
 
         if messages.DisconnectionResponse.matches(message):
+            self._report_fragments.pop(conn_key, None)
             self.conns.finish_disconnection(conn_key, message['success'], message.get('failure_reason', None))
         elif messages.OpenInterfaceResponse.matches(message):
             self.conns.finish_operation(conn_key, message['success'], message.get('failure_reason', None))
@@ -511,6 +556,7 @@ class AWSIOTDeviceAdapter(DeviceAdapter):
                 self._logger.warn("Dropping disconnect notification that does not correspond with a known connection, topic=%s", topic)
                 return
 
+            self._report_fragments.pop(conn_key, None)
             self.conns.unexpected_disconnect(conn_key)
             self._trigger_callback('on_disconnect', self.id, conn_id)
         else:
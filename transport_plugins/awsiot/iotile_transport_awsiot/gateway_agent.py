@@ -30,6 +30,17 @@ class AWSIOTGatewayAgent:
               in between this interval and only the last one is sent every interval unless
               the progres event indicates that the total operation has finished, in which
               case it is sent immediately.  Default: 2s
+            - binary_payloads (bool): publish reports and traces as msgpack with raw
+              binary data rather than as JSON with hex encoded data.  Clients decode
+              both formats.  Default: False
+            - report_fragment_size (int): the maximum number of report bytes sent in
+              a single message when binary_payloads is enabled.  Larger reports are
+              split into fragments that are reassembled by the client.  Reports are
+              never fragmented in hex mode since older clients treat every message
+              as a complete report.  Default: 48 KiB.
+            - trace_flush_size (int): the number of bytes of tracing data that may be
+              accumulated while throttled before they are sent immediately.  This is
+              also the maximum size of each trace message.  Default: 48 KiB
 
     """
 
@@ -58,6 +69,12 @@ class AWSIOTGatewayAgent:
         self.throttle_trace = self._args.get('trace_throttle_interval', 5.0)
         self.throttle_progress = self._args.get('progress_throttle_interval', 2.0)
         self.client_timeout = self._args.get('client_timeout', 60.0)
+        self.binary_payloads = self._args.get('binary_payloads', False)
+        self.report_fragment_size = self._args.get('report_fragment_size', 48*1024)
+        self.trace_flush_size = self._args.get('trace_flush_size', 48*1024)
+
+        if self.report_fragment_size <= 0 or self.trace_flush_size <= 0:
+            raise ArgumentError("Report fragment and trace flush sizes must be positive", args=args)
 
     @classmethod
     def _build_device_slug(cls, device_id):
@@ -565,8 +582,8 @@ class AWSIOTGatewayAgent:
         if resp['success']:
             conn_id = resp['connection_id']
             self._connections[uuid] = {'key': key, 'client': client, 'connection_id': conn_id, 'last_touch': monotonic(),
-                                       'script': [], 'trace_accum': bytes(), 'last_trace': None, 'trace_scheduled': False,
-                                       'last_progress': None}
+                                       'script': [], 'trace_accum': [], 'trace_accum_size': 0, 'last_trace': None,
+                                       'trace_scheduled': False, 'trace_timer': None, 'last_progress': None}
         else:
             message['failure_reason'] = resp['reason']
             self._connections[uuid] = {}
@@ -590,17 +607,38 @@ class AWSIOTGatewayAgent:
         slug = self._build_device_slug(device_uuid)
         streaming_topic = self.topics.prefix + 'devices/{}/data/streaming'.format(slug)
 
-        data = {'type': 'notification', 'operation': 'report'}
-
         ser = report.serialize()
-        data['received_time'] = ser['received_time'].strftime("%Y%m%dT%H:%M:%S.%fZ").encode()
-        data['report_origin'] = ser['origin']
-        data['report_format'] = ser['report_format']
-        data['report'] = binascii.hexlify(ser['encoded_report'])
-        data['fragment_count'] = 1
-        data['fragment_index'] = 0
-        self._logger.debug("Publishing report: (topic=%s)", streaming_topic)
-        self.client.publish(streaming_topic, data)
+        encoded = ser['encoded_report']
+        received_time = ser['received_time'].strftime("%Y%m%dT%H:%M:%S.%fZ")
+
+        # Only clients that decode binary payloads also know how to reassemble fragments
+        size = len(encoded)
+        if self.binary_payloads:
+            size = self.report_fragment_size
+
+        count = max(1, (len(encoded) + size - 1) // max(size, 1))
+        view = memoryview(encoded)
+
+        self._logger.debug("Publishing report in %d fragments: (topic=%s)", count, streaming_topic)
+
+        for i in range(count):
+            fragment = view[i*size:(i + 1)*size]
+
+            data = {'type': 'notification', 'operation': 'report'}
+            data['report_origin'] = ser['origin']
+            data['report_format'] = ser['report_format']
+            data['fragment_count'] = count
+            data['fragment_index'] = i
+
+            if self.binary_payloads:
+                data['encoding'] = 'bin'
+                data['received_time'] = received_time
+                data['report'] = bytes(fragment)
+            else:
+                data['received_time'] = received_time.encode()
+                data['report'] = binascii.hexlify(fragment)
+
+            self.client.publish(streaming_topic, data, binary=self.binary_payloads)
 
     def _notify_trace(self, device_uuid, event_name, trace):
         """Notify that we have received tracing data from a device.
@@ -616,20 +654,27 @@ class AWSIOTGatewayAgent:
         last_trace = conn_data['last_trace']
         now = monotonic()
 
-        conn_data['trace_accum'] += bytes(trace)
+        conn_data['trace_accum'].append(bytes(trace))
+        conn_data['trace_accum_size'] += len(trace)
 
         # If we're throttling tracing data, we need to see if we should accumulate this trace or
         # send it now.  We acculumate if we've last sent tracing data less than self.throttle_trace seconds ago
-        if last_trace is not None and (now - last_trace) < self.throttle_trace:
+        # unless we have already accumulated enough data to fill a message.
+        throttled = last_trace is not None and (now - last_trace) < self.throttle_trace
+        if throttled and conn_data['trace_accum_size'] < self.trace_flush_size:
             if not conn_data['trace_scheduled']:
-                self._loop.call_later(self.throttle_trace - (now - last_trace), self._send_accum_trace, device_uuid)
+                conn_data['trace_timer'] = self._loop.call_later(self.throttle_trace - (now - last_trace),
+                                                                 self._send_accum_trace, device_uuid)
                 conn_data['trace_scheduled'] = True
                 self._logger.debug("Deferring trace data due to throttling uuid=0x%X", device_uuid)
         else:
             self._send_accum_trace(device_uuid)
 
     def _send_accum_trace(self, device_uuid):
-        """Send whatever accumulated tracing data we have for the device."""
+        """Send whatever accumulated tracing data we have for the device.
+
+        The data is split into messages of at most trace_flush_size bytes.
+        """
 
         if device_uuid not in self._connections:
             self._logger.debug("Dropping trace data for device without an active connection, uuid=0x%X", device_uuid)
@@ -637,22 +682,38 @@ class AWSIOTGatewayAgent:
 
         conn_data = self._connections[device_uuid]
 
-        trace = conn_data['trace_accum']
+        # If we were flushed early, cancel the pending throttled flush
+        if conn_data['trace_timer'] is not None:
+            self._loop.remove_timeout(conn_data['trace_timer'])
+            conn_data['trace_timer'] = None
+
+        trace = b''.join(conn_data['trace_accum'])
 
         if len(trace) > 0:
             slug = self._build_device_slug(device_uuid)
             tracing_topic = self.topics.prefix + 'devices/{}/data/tracing'.format(slug)
-
-            data = {'type': 'notification', 'operation': 'trace'}
-            data['trace'] = binascii.hexlify(trace)
-            data['trace_origin'] = device_uuid
+            view = memoryview(trace)
 
             self._logger.debug('Publishing trace: (topic=%s)', tracing_topic)
-            self.client.publish(tracing_topic, data)
+
+            for start in range(0, len(trace), self.trace_flush_size):
+                chunk = view[start:start + self.trace_flush_size]
+
+                data = {'type': 'notification', 'operation': 'trace'}
+                data['trace_origin'] = device_uuid
+
+                if self.binary_payloads:
+                    data['encoding'] = 'bin'
+                    data['trace'] = bytes(chunk)
+                else:
+                    data['trace'] = binascii.hexlify(chunk)
+
+                self.client.publish(tracing_topic, data, binary=self.binary_payloads)
 
         conn_data['trace_scheduled'] = False
         conn_data['last_trace'] = monotonic()
-        conn_data['trace_accum'] = bytes()
+        conn_data['trace_accum'] = []
+        conn_data['trace_accum_size'] = 0
 
     def _on_scan_request(self, sequence, topic, message):
         """Process a request for scanning information
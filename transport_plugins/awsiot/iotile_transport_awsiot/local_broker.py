@@ -0,0 +1,137 @@
+"""A local in-process stand-in for the AWS IOT MQTT client.
+
+:class:`LocalBroker` implements the subset of ``AWSIoTMQTTClient`` that
+:class:`OrderedAWSIOTClient` uses and delivers every published message
+synchronously to all subscribers in the same process.  It allows gateway
+agents and device adapters to be tested and benchmarked without a network
+connection to AWS IOT.  Pass ``local_broker: True`` in the client args to
+use it.
+"""
+
+import threading
+import time
+from collections import namedtuple
+from time import monotonic
+
+Message = namedtuple('Message', ['topic', 'payload'])
+
+
+class LocalBroker(object):
+    """A very simple in memory MQTT broker
+
+    All instances share the same class level state so that every client
+    created in a process talks to the same broker.  Published messages are
+    kept in ``messages`` for inspection unless ``keep_messages`` is False.
+    """
+
+    listeners = {}
+    messages = {}
+    keep_messages = True
+    sequence = 0
+    expected = None
+    expect_signal = threading.Event()
+
+    def __init__(self, client_id, useWebsocket=False):
+        self.client = client_id
+        self.websocket = useWebsocket
+
+    @classmethod
+    def Reset(cls):
+        cls.listeners = {}
+        cls.messages = {}
+        cls.sequence = 0
+        cls.keep_messages = True
+        cls.expected = None
+        cls.expect_signal.clear()
+
+    def configureEndpoint(self, endpoint, port):
+        return
+
+    def configureCredentials(self, root, key=None, cert=None):
+        return
+
+    def configureIAMCredentials(self, key, secret, session=None):
+        return
+
+    def configureOfflinePublishQueueing(self, queuing):
+        return
+
+    def connect(self):
+        return
+
+    def disconnect(self):
+        return
+
+    def expect(self, count):
+        """Expect a number of messages to be received."""
+
+        LocalBroker.expected = LocalBroker.sequence + count
+        LocalBroker.expect_signal.clear()
+
+    def wait(self):
+        LocalBroker.expect_signal.wait(timeout=2.0)
+        LocalBroker.expected = None
+
+    def wait_subscriptions(self, count, timeout=2.0):
+        """Wait for a specific number of subscriptions to be made."""
+
+        start = monotonic()
+        while (monotonic() - start) <= timeout:
+            if len(self.listeners) >= count:
+                return
+
+            time.sleep(0.01)
+
+        raise ValueError("Not enough subscriptions were registered in timeout period")
+
+    def find_topic(self, topic):
+        """Find a matching topic including wildcards."""
+
+        parts = topic.split('/')
+
+        for topic in self.listeners:
+            list_parts = topic.split('/')
+            if len(parts) != len(list_parts):
+                continue
+
+            matched = True
+            for i in range(0, len(parts)):
+                if (parts[i] != list_parts[i]) and list_parts[i] != '+':
+                    matched = False
+                    break
+
+            if matched:
+                return topic
+
+        return None
+
+    def publish(self, topic, message, qos):
+        seq = LocalBroker.sequence
+        LocalBroker.sequence += 1
+
+        if LocalBroker.keep_messages:
+            self.messages.setdefault(topic, []).append((seq, message))
+
+        # Look for a match including wildcards
+        matched_topic = self.find_topic(topic)
+        if matched_topic in self.listeners:
+            msg_obj = Message(topic, message)
+
+            for _, callback in self.listeners[matched_topic].items():
+                callback(self.client, None, msg_obj)
+
+        if LocalBroker.expected is not None and LocalBroker.sequence >= self.expected:
+            LocalBroker.expect_signal.set()
+
+    def subscribe(self, topic, qos, callback):
+        if topic not in self.listeners:
+            self.listeners[topic] = {}
+
+        self.listeners[topic][self.client] = callback
+
+    def unsubscribe(self, topic):
+        listeners = self.listeners.get(topic, {})
+        listeners.pop(self.client, None)
+
+        if len(listeners) == 0:
+            self.listeners.pop(topic, None)
@@ -170,6 +170,26 @@ TracingNotification.add_required('operation', LiteralVerifier('trace'))
 TracingNotification.add_required('trace_origin', IntVerifier())
 TracingNotification.add_required('trace', BytesVerifier(encoding='hex'))
 
+# Binary variants of the report and trace notifications, published as msgpack
+# with raw bytes rather than hex encoded strings
+BinaryReportNotification = DictionaryVerifier()  # pylint: disable=C0103
+BinaryReportNotification.add_required('type', LiteralVerifier('notification'))
+BinaryReportNotification.add_required('encoding', LiteralVerifier('bin'))
+BinaryReportNotification.add_required('fragment_count', IntVerifier())
+BinaryReportNotification.add_required('fragment_index', IntVerifier())
+BinaryReportNotification.add_required('operation', LiteralVerifier('report'))
+BinaryReportNotification.add_required('received_time', StringVerifier())
+BinaryReportNotification.add_required('report', BytesVerifier())
+BinaryReportNotification.add_required('report_origin', IntVerifier())
+BinaryReportNotification.add_required('report_format', IntVerifier())
+
+BinaryTracingNotification = DictionaryVerifier()  # pylint: disable=C0103
+BinaryTracingNotification.add_required('type', LiteralVerifier('notification'))
+BinaryTracingNotification.add_required('encoding', LiteralVerifier('bin'))
+BinaryTracingNotification.add_required('operation', LiteralVerifier('trace'))
+BinaryTracingNotification.add_required('trace_origin', IntVerifier())
+BinaryTracingNotification.add_required('trace', BytesVerifier())
+
 ProgressNotification = DictionaryVerifier()  # pylint: disable=C0103
 ProgressNotification.add_required('type', LiteralVerifier('notification'))
 ProgressNotification.add_required('operation', LiteralVerifier('send_script'))
@@ -2,9 +2,11 @@ import json
 import logging
 import AWSIoTPythonSDK.MQTTLib
 import re
+import msgpack
 from AWSIoTPythonSDK.exception.operationError import operationError
 from iotile.core.exceptions import ArgumentError, ExternalError, InternalError
 from iotile.core.dev.registry import ComponentRegistry
+from .local_broker import LocalBroker
 from .packet_queue import PacketQueue
 from .topic_sequencer import TopicSequencer
 
@@ -12,12 +14,28 @@ from .topic_sequencer import TopicSequencer
 class OrderedAWSIOTClient:
     """An MQTT based channel to connect with an IOTile Device
 
+    Messages are normally published as JSON.  Messages with large binary
+    fields can instead be published as msgpack so that the binary data is
+    sent as is.  Both formats are decoded automatically when received.
+
     Args:
         args (dict): A dictionary of arguments for setting up the
-            MQTT connection.
+            MQTT connection.  If ``local_broker`` is True, an in-process
+            :class:`LocalBroker` is used instead of AWS IOT and no
+            credentials are needed.
     """
 
     def __init__(self, args):
+        self.local = args.get('local_broker', False)
+        self.client = None
+        self.sequencer = TopicSequencer()
+        self.queues = {}
+        self.wildcard_queues = []
+        self._logger = logging.getLogger(__name__)
+
+        if self.local:
+            return
+
         cert = args.get('certificate', None)
         key = args.get('private_key', None)
         root = args.get('root_certificate', None)
@@ -69,11 +87,6 @@ class OrderedAWSIOTClient:
         self.key = key
         self.root = root
         self.endpoint = endpoint
-        self.client = None
-        self.sequencer = TopicSequencer()
-        self.queues = {}
-        self.wildcard_queues = []
-        self._logger = logging.getLogger(__name__)
 
     def connect(self, client_id):
         """Connect to AWS IOT with the given client_id
@@ -85,6 +98,11 @@ class OrderedAWSIOTClient:
         if self.client is not None:
             raise InternalError("Connect called on an alreaded connected MQTT client")
 
+        if self.local:
+            self.client = LocalBroker(client_id)
+            self.sequencer.reset()
+            return
+
         client = AWSIoTPythonSDK.MQTTLib.AWSIoTMQTTClient(client_id, useWebsocket=self.websockets)
 
         if self.websockets:
@@ -121,7 +139,7 @@ class OrderedAWSIOTClient:
         except operationError as exc:
             raise InternalError("Could not disconnect from AWS IOT", message=exc.message)
 
-    def publish(self, topic, message):
+    def publish(self, topic, message, binary=False):
         """Publish a json message to a topic with a type and a sequence number
 
         The actual message will be published as a JSON object:
@@ -130,9 +148,13 @@ class OrderedAWSIOTClient:
             "message": message
         }
 
+        If binary is True, the same object is published as msgpack instead
+        and any bytes fields in message are sent unencoded.
+
         Args:
             topic (string): The MQTT topic to publish in
             message (string, dict): The message to publish
+            binary (bool): Publish the message as msgpack rather than JSON.
         """
 
         seq = self.sequencer.next_id(topic)
@@ -141,6 +163,12 @@ class OrderedAWSIOTClient:
             'sequence': seq,
             'message': message
         }
+
+        if binary:
+            serialized_packet = msgpack.packb(packet, use_bin_type=True)
+            self._send(topic, serialized_packet, "<%d bytes of msgpack>" % len(serialized_packet))
+            return
+
         # Need to encode bytes types for json.dumps
         if 'key' in packet['message']:
             packet['message']['key'] = packet['message']['key'].decode('utf8')
@@ -157,9 +185,12 @@ class OrderedAWSIOTClient:
 
         serialized_packet = json.dumps(packet)
 
+        # Limit how much we log in case the message is very long
+        self._send(topic, serialized_packet, serialized_packet[:256])
+
+    def _send(self, topic, serialized_packet, summary):
         try:
-            # Limit how much we log in case the message is very long
-            self._logger.debug("Publishing %s on topic %s", serialized_packet[:256], topic)
+            self._logger.debug("Publishing %s on topic %s", summary, topic)
             self.client.publish(topic, serialized_packet, 1)
         except operationError as exc:
             raise InternalError("Could not publish message", topic=topic, message=exc.message)
@@ -232,9 +263,9 @@ class OrderedAWSIOTClient:
         encoded = message.payload
 
         try:
-            packet = json.loads(encoded)
+            packet = _decode_packet(encoded)
         except ValueError:
-            self._logger.warn("Could not decode json packet: %s", encoded)
+            self._logger.warn("Could not decode packet: %s", encoded[:256])
             return
 
         try:
@@ -259,3 +290,19 @@ class OrderedAWSIOTClient:
                 return
 
         self.queues[topic].receive(seq, [seq, topic, message_data])
+
+
+def _decode_packet(encoded):
+    """Decode a packet that was published as either JSON or msgpack.
+
+    Packets are always maps, so a JSON packet starts with ``{`` or
+    whitespace while a msgpack packet starts with a fixmap header byte.
+    """
+
+    if isinstance(encoded, (bytes, bytearray)) and len(encoded) > 0 and 0x80 <= encoded[0] <= 0x8f:
+        try:
+            return msgpack.unpackb(encoded, raw=False)
+        except Exception as exc:
+            raise ValueError(str(exc))
+
+    return json.loads(encoded)
@@ -9,7 +9,8 @@ setup(
     license="LGPLv3",
     install_requires=[
         "iotile-core>=5.0.0,<6",
-        "AWSIoTPythonSDK>=1.4.3,<2"
+        "AWSIoTPythonSDK>=1.4.3,<2",
+        "msgpack>=0.6.1,<1"
     ],
     python_requires=">=3.5,<4",
     entry_points={'iotile.device_adapter': ['awsiot = iotile_transport_awsiot.device_adapter:AWSIOTDeviceAdapter'],
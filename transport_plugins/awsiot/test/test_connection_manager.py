@@ -0,0 +1,96 @@
+"""Tests of ConnectionManager's action processing and timeouts."""
+
+import threading
+import pytest
+from iotile_transport_awsiot.connection_manager import ConnectionManager
+
+
+@pytest.fixture
+def manager():
+    conns = ConnectionManager(1)
+    conns.start()
+
+    yield conns
+
+    conns.stop()
+
+
+class CallbackRecorder:
+    """Record the arguments of callbacks and allow waiting for them."""
+
+    def __init__(self):
+        self.calls = []
+        self.event = threading.Event()
+
+    def __call__(self, *args):
+        self.calls.append(args)
+        self.event.set()
+
+    def wait(self, timeout=1.0):
+        assert self.event.wait(timeout)
+        self.event.clear()
+        return self.calls[-1]
+
+
+def _connect(manager, conn_id=1, internal_id='dev'):
+    callback = CallbackRecorder()
+    manager.begin_connection(conn_id, internal_id, callback, {'key': 'value'}, 5.0)
+    manager.finish_connection(internal_id, True)
+
+    assert callback.wait() == (conn_id, 1, True, None)
+
+
+def test_connection_lifecycle(manager):
+    """Make sure actions are processed in order without waiting on a poll interval."""
+
+    _connect(manager)
+    assert manager.get_context('dev') == {'key': 'value'}
+    assert manager.get_connection_id('dev') == 1
+
+    callback = CallbackRecorder()
+    manager.begin_operation(1, 'rpc', callback, 5.0)
+    manager.finish_operation('dev', True, None, 0, b'')
+    assert callback.wait() == (1, 1, True, None, 0, b'')
+
+    callback = CallbackRecorder()
+    manager.begin_disconnection(1, callback, 5.0)
+    manager.finish_disconnection('dev', True, None)
+    assert callback.wait() == (1, 1, True, None)
+
+    stats = manager.stats()
+    assert stats['actions'] == 6
+    assert stats['queue_depth'] == 0
+    assert stats['timed_out'] == 0
+    assert stats['high_water'] >= 1
+    assert stats['max_latency'] >= stats['mean_latency'] > 0
+
+
+def test_operation_timeout(manager):
+    """Make sure an operation times out after its own timeout."""
+
+    _connect(manager)
+
+    callback = CallbackRecorder()
+    manager.begin_operation(1, 'rpc', callback, 0.05)
+    assert callback.wait() == (1, 1, False, 'RPC timed out without response', None, None)
+    assert manager.stats()['timed_out'] == 1
+
+
+def test_stale_timeouts_ignored(manager):
+    """Make sure timeouts of operations that already finished do not fire."""
+
+    _connect(manager)
+
+    callback = CallbackRecorder()
+    manager.begin_operation(1, 'open_interface', callback, 0.05)
+    manager.finish_operation(1, True, None)
+    assert callback.wait() == (1, 1, True, None)
+
+    second = CallbackRecorder()
+    manager.begin_operation(1, 'open_interface', second, 0.5)
+
+    assert not second.event.wait(0.2)
+    assert manager.stats()['timed_out'] == 0
+
+    manager.finish_operation(1, True, None)
+    assert second.wait() == (1, 1, True, None)
@@ -0,0 +1,120 @@
+"""Tests of binary payloads and report/trace fragmentation over the local broker."""
+
+import pytest
+import tornado.ioloop
+from iotile.core.dev.registry import ComponentRegistry
+from iotile.core.exceptions import ValidationError
+from iotile.core.hw.reports import IOTileReading, SignedListReport
+from iotile_transport_awsiot import messages
+from iotile_transport_awsiot.device_adapter import AWSIOTDeviceAdapter
+from iotile_transport_awsiot.gateway_agent import AWSIOTGatewayAgent
+from iotile_transport_awsiot.local_broker import LocalBroker
+from iotile_transport_awsiot.mqtt_client import OrderedAWSIOTClient
+
+PREFIX = 'devices/d--0000-0000-0000-0002/devices/d--0000-0000-0000-0005/'
+STREAMING = PREFIX + 'data/streaming'
+TRACING = PREFIX + 'data/tracing'
+
+
+@pytest.fixture
+def received():
+    """Collect every message published through a local broker."""
+
+    client = OrderedAWSIOTClient({'local_broker': True})
+    client.connect('listener')
+
+    messages_seen = []
+    client.subscribe('devices/+/devices/+/data/+', lambda seq, topic, msg: messages_seen.append((topic, msg)))
+
+    yield messages_seen
+
+    LocalBroker.Reset()
+
+
+def _make_agent(binary, **kwargs):
+    args = {'iotile_id': '0x2', 'local_broker': True, 'binary_payloads': binary, 'trace_throttle_interval': 60.0}
+    args.update(kwargs)
+
+    agent = AWSIOTGatewayAgent(args, None, tornado.ioloop.IOLoop())
+    agent._prepare()
+    agent._connections[5] = {'key': 'key', 'client': 'client', 'connection_id': 1, 'trace_accum': [],
+                             'trace_accum_size': 0, 'last_trace': None, 'trace_scheduled': False,
+                             'trace_timer': None}
+    return agent
+
+
+def test_binary_roundtrip(received):
+    """Make sure msgpack messages are decoded with their binary fields intact."""
+
+    client = OrderedAWSIOTClient({'local_broker': True})
+    client.connect('sender')
+
+    client.publish(TRACING, {'trace': b'\x00\x01\xff'}, binary=True)
+    client.publish(TRACING, {'trace': b'abcd'})
+
+    assert received == [(TRACING, {'trace': b'\x00\x01\xff'}), (TRACING, {'trace': 'abcd'})]
+
+
+@pytest.mark.parametrize('binary', [False, True])
+def test_report_fragments(received, binary):
+    """Make sure large binary reports are split into fragments that can be reassembled."""
+
+    readings = [IOTileReading(i, 0x5000, i) for i in range(100)]
+    report = SignedListReport.FromReadings(5, readings)
+
+    agent = _make_agent(binary, report_fragment_size=500)
+    agent._notify_report(5, 'report', report)
+
+    verifier = messages.BinaryReportNotification if binary else messages.ReportNotification
+    fragments = [verifier.verify(msg) for topic, msg in received if topic == STREAMING]
+
+    # Older clients that only understand hex reports treat every message as a whole report
+    if not binary:
+        assert len(fragments) == 1
+        assert fragments[0]['fragment_count'] == 1
+        assert fragments[0]['report'] == report.encode()
+        return
+
+    assert len(fragments) == (len(report.encode()) + 499) // 500
+    assert [x['fragment_index'] for x in fragments] == list(range(len(fragments)))
+    assert all(x['fragment_count'] == len(fragments) for x in fragments)
+    assert b''.join(x['report'] for x in fragments) == report.encode()
+
+
+@pytest.mark.parametrize('binary', [False, True])
+def test_trace_flushing(received, binary):
+    """Make sure throttled traces are flushed once enough data accumulates."""
+
+    agent = _make_agent(binary, trace_flush_size=100)
+
+    agent._notify_trace(5, 'trace', b'\x01' * 10)
+    agent._notify_trace(5, 'trace', b'\x02' * 60)
+    agent._notify_trace(5, 'trace', b'\x03' * 60)
+
+    verifier = messages.BinaryTracingNotification if binary else messages.TracingNotification
+    traces = [verifier.verify(msg)['trace'] for topic, msg in received if topic == TRACING]
+
+    # The first trace is sent immediately and the next two are flushed by size in 100 byte messages
+    assert traces == [b'\x01' * 10, b'\x02' * 60 + b'\x03' * 40, b'\x03' * 20]
+    assert agent._connections[5]['trace_accum'] == []
+    assert agent._connections[5]['trace_timer'] is None
+
+
+def test_report_reassembly(local_broker):
+    """Make sure the device adapter reassembles report fragments in order."""
+
+    reg = ComponentRegistry()
+    for key in ('awsiot-endpoint', 'awsiot-rootcert', 'awsiot-iamkey', 'awsiot-iamtoken'):
+        reg.set_config(key, '')
+
+    adapter = AWSIOTDeviceAdapter(None)
+
+    try:
+        assert adapter._reassemble_report('dev', {'fragment_index': 0, 'fragment_count': 1, 'report': b'ab'}) == b'ab'
+        assert adapter._reassemble_report('dev', {'fragment_index': 0, 'fragment_count': 2, 'report': b'ab'}) is None
+        assert adapter._reassemble_report('dev', {'fragment_index': 1, 'fragment_count': 2, 'report': b'cd'}) == b'abcd'
+
+        with pytest.raises(ValidationError):
+            adapter._reassemble_report('dev', {'fragment_index': 1, 'fragment_count': 2, 'report': b'cd'})
+    finally:
+        adapter.stop_sync()
@@ -13,18 +13,24 @@ class DeviceNotConfiguredError(Exception):
 
 
 class AsyncPacketBuffer:
-    def __init__(self, filelike, header_length, length_function):
+    def __init__(self, filelike, header_length, length_function, callback=None):
         """
         Given an underlying file like object, synchronously read from it
         in a separate thread and communicate the data back to the buffer
         one packet at a time.
+
+        If a callback is given, it is called from the reader thread with each
+        packet instead of putting the packet in the queue.
         """
 
         self.queue = Queue()
         self.file = filelike
         self._stop = Event()
 
-        self._thread = Thread(target=ReaderThread, args=(filelike, self.queue, header_length, length_function, self._stop))
+        if callback is None:
+            callback = self.queue.put
+
+        self._thread = Thread(target=ReaderThread, args=(filelike, callback, header_length, length_function, self._stop))
         self._thread.start()
 
     def write(self, value):
@@ -51,7 +57,7 @@ class AsyncPacketBuffer:
             raise InternalTimeoutError("Timeout waiting for packet in AsyncPacketBuffer")
 
 
-def ReaderThread(filelike, read_queue, header_length, length_function, stop):
+def ReaderThread(filelike, callback, header_length, length_function, stop):
     logger = logging.getLogger(__name__)
 
     while not stop.is_set():
@@ -81,7 +87,7 @@ def ReaderThread(filelike, read_queue, header_length, length_function, stop):
 
             # We have a complete packet now, process it
             packet = header + remaining
-            read_queue.put(packet)
+            callback(packet)
         except:
             logger.exception("Error in reader thread")
             break
@@ -2,6 +2,8 @@
 # Except as otherwise provided in the relevant LICENSE file, all rights are reserved.
 
 from queue import Queue
+from collections import OrderedDict
+import struct
 import time
 import threading
 import logging
@@ -20,6 +22,23 @@ from .tilebus import TileBusService, TileBusStreamingCharacteristic, TileBusTrac
 from .async_packet import AsyncPacketBuffer
 from .utilities import open_bled112
 
+# Scan events are decoded in place with precompiled layouts since there can be
+# thousands of them per second.  The scan data that follows the header is
+# always 31 bytes long for IOTile advertisements and scan responses.
+_SCAN_HEADER = struct.Struct("<bB6sBBB")
+_SCAN_DATA_LENGTH = 31
+_IOTILE_SCAN_EVENT_LENGTH = _SCAN_HEADER.size + _SCAN_DATA_LENGTH
+_V1_MARKER = b'\xff\xc0\x03'
+_V1_MARKER_OFFSET = _SCAN_HEADER.size + 22
+_V2_MARKER = b'\x1b\x16\xdd\xfd'
+_V2_MARKER_OFFSET = _SCAN_HEADER.size + 3
+_V2_ADVERTISEMENT = struct.Struct("<LHBBLBBHLL")
+_V2_ADVERTISEMENT_OFFSET = _SCAN_HEADER.size + 7
+
+# A BroadcastReport header followed by a single packed reading
+_BROADCAST_REPORT = struct.Struct("<BBHLLLHHLLL")
+
+
 def packet_length(header):
     """Find the BGAPI packet length given its header"""
 
@@ -29,6 +48,12 @@ def packet_length(header):
     return (highbits << 8) | lowbits
 
 
+def _format_address(sender):
+    """Format a little endian 6 byte BLE address as a MAC string."""
+
+    return "%02X:%02X:%02X:%02X:%02X:%02X" % tuple(sender[::-1])
+
+
 class BLED112Adapter(DeviceAdapter):
     """Callback based BLED112 wrapper supporting multiple simultaneous connections.
 
@@ -38,6 +63,9 @@ class BLED112Adapter(DeviceAdapter):
             the worker thread checks for the signal.  It defaults to 0.5s but is set to
             a faster value like 10 ms during testing to make tests run faster.  Lower
             values increase CPU usage in production.
+        script_window (int): The number of 20 byte script chunks that are written
+            before other queued commands are allowed to run and progress is reported
+            while sending a script.  Defaults to 64.
     """
 
     ExpirationTime = 60  # Expire devices 60 seconds after seeing them
@@ -47,6 +75,7 @@ class BLED112Adapter(DeviceAdapter):
 
         # Get optional configuration flags
         stop_check_interval = kwargs.get('stop_check_interval', 0.1)
+        script_window = kwargs.get('script_window', 64)
 
         # Make sure that if someone tries to connect to a device immediately after creating the adapter
         # we tell them we need time to accumulate device advertising packets first
@@ -71,13 +100,15 @@ class BLED112Adapter(DeviceAdapter):
         self._throttle_broadcast = config.get('bled112:throttle-broadcast')
         self._throttle_scans = config.get('bled112:throttle-scan')
         self._throttle_timeout = config.get('bled112:throttle-timeout')
+        self._broadcast_cache_size = config.get('bled112:broadcast-cache-size')
 
         # Prepare internal state of scannable and in progress devices
         # Do this before spinning off the BLED112CommandProcessor
         # in case a scanned device is seen immediately.
         self.partial_scan_responses = {}
 
-        self._broadcast_state = {}
+        # Last broadcast seen from each (sender, channel), least recently seen first
+        self._broadcast_state = OrderedDict()
         self._connections = {}
 
         self.count_lock = threading.Lock()
@@ -89,6 +120,10 @@ class BLED112Adapter(DeviceAdapter):
         self._v1_scan_response_count = 0
         self._v2_scan_count = 0
         self._device_scan_counts = {}
+        self._duplicate_broadcast_count = 0
+        self._broadcast_eviction_count = 0
+        self._reported_scan_count = 0
+        self._reported_broadcast_count = 0
         self._last_reset_time = time.monotonic()
 
         self._logger = logging.getLogger(__name__)
@@ -96,7 +131,8 @@ class BLED112Adapter(DeviceAdapter):
         self._serial_port = open_bled112(port, self._logger)
         self._stream = AsyncPacketBuffer(self._serial_port, header_length=4, length_function=packet_length)
         self._commands = Queue()
-        self._command_task = BLED112CommandProcessor(self._stream, self._commands, stop_check_interval=stop_check_interval)
+        self._command_task = BLED112CommandProcessor(self._stream, self._commands, stop_check_interval=stop_check_interval,
+                                                     script_window=script_window)
         self._command_task.event_handler = self._handle_event
         self._command_task.start()
 
@@ -139,6 +175,33 @@ class BLED112Adapter(DeviceAdapter):
             self._v2_scan_count, self._device_scan_counts.copy(), \
             (time_spent - self._last_reset_time)
 
+    def get_scan_metrics(self):
+        """Return the scan event statistics for this adapter as named metrics.
+
+        Returns:
+            dict: The number of scan events, IOTile advertisements of each kind,
+                duplicate broadcasts, scans and broadcasts passed on to
+                callbacks and the state of the broadcast cache since the last
+                reset, along with the seconds since the last reset and the
+                resulting scan event rate.
+        """
+
+        elapsed = time.monotonic() - self._last_reset_time
+
+        return {
+            'scan_events': self._scan_event_count,
+            'v1_advertisements': self._v1_scan_count,
+            'v1_scan_responses': self._v1_scan_response_count,
+            'v2_advertisements': self._v2_scan_count,
+            'duplicate_broadcasts': self._duplicate_broadcast_count,
+            'reported_scans': self._reported_scan_count,
+            'reported_broadcasts': self._reported_broadcast_count,
+            'broadcast_cache_entries': len(self._broadcast_state),
+            'broadcast_cache_evictions': self._broadcast_eviction_count,
+            'elapsed': elapsed,
+            'scan_events_per_second': self._scan_event_count / elapsed if elapsed > 0 else 0.0
+        }
+
     def reset_scan_stats(self):
         """Clears the scan event statistics and updates the last reset time"""
         self._scan_event_count = 0
@@ -146,6 +209,10 @@ class BLED112Adapter(DeviceAdapter):
         self._v1_scan_response_count = 0
         self._v2_scan_count = 0
         self._device_scan_counts = {}
+        self._duplicate_broadcast_count = 0
+        self._broadcast_eviction_count = 0
+        self._reported_scan_count = 0
+        self._reported_broadcast_count = 0
         self._last_reset_time = time.monotonic()
 
     def can_connect(self):
@@ -544,90 +611,67 @@ class BLED112Adapter(DeviceAdapter):
         v1: There is both an advertisement and a scan response (if active scanning
             is enabled).
         v2: There is only an advertisement and no scan response.
-        """
 
-        info = None
-        reading_time = time.monotonic()
-        stream = None
-        reading = None
-        broadcast_toggle = None
-        counter = None
-        broadcast_multiplex = 0
+        Only the fields needed to identify the packet are decoded up front so
+        that non-IOTile advertisements and duplicate broadcasts are dropped
+        without building any objects.
+        """
 
         payload = response.payload
-        length = len(payload) - 10
 
-        if length < 0:
+        if len(payload) < _SCAN_HEADER.size - 1:
             return
 
-        rssi, packet_type, sender, _addr_type, _bond, data = unpack("<bB6sBB%ds" % length, payload)
-        string_address = ':'.join([format(x, "02X") for x in bytearray(sender[::-1])])
+        self._scan_event_count += 1
 
-        # Scan data is prepended with a length
-        if len(data) > 0:
-            data = bytearray(data[1:])
-        else:
-            data = bytearray([])
+        if len(payload) != _IOTILE_SCAN_EVENT_LENGTH:
+            return  # This just means the packet was from a non-IOTile device
 
-        self._scan_event_count += 1
+        rssi, packet_type, sender, _addr_type, _bond, _length = _SCAN_HEADER.unpack_from(payload)
 
         # If this is an advertisement packet, see if its an IOTile device
         # packet_type = 4 is scan_response, 0, 2 and 6 are advertisements
-        if packet_type in (0, 2, 6):
-            if len(data) != 31:
-                return
-
-            if data[22] == 0xFF and data[23] == 0xC0 and data[24] == 0x3:
-                self._v1_scan_count += 1
-                info = self._parse_v1_advertisement(rssi, string_address, data)
-            elif data[3] == 27 and data[4] == 0x16 and data[5] == 0xdd and data[6] == 0xfd:
-                self._v2_scan_count += 1
-                info, reading_time, stream, reading, \
-                    broadcast_toggle, counter, broadcast_multiplex = \
-                    self._parse_v2_advertisement(rssi, string_address, data)
-            else:
-                pass # This just means the advertisement was from a non-IOTile device
-        elif packet_type == 4:
+        if packet_type == 4:
             self._v1_scan_response_count += 1
             info, reading_time, stream, reading = \
-                self._parse_v1_scan_response(string_address, data)
-
-        if info:
-            drop_broadcast = self._check_update_seen_broadcast(
-                sender, reading_time, stream, reading,
-                broadcast_toggle, counter=counter, channel=broadcast_multiplex)
-
-            if not (self._throttle_scans and drop_broadcast):
-                self._trigger_callback('on_scan', self.id, info, self.ExpirationTime)
+                self._parse_v1_scan_response(_format_address(sender), bytearray(payload[_SCAN_HEADER.size:]))
 
-            # If there is a valid reading on the advertising data, broadcast it
-            if not (self._throttle_broadcast and drop_broadcast) and \
-                    stream and stream not in [0xFFFF, 0x7FFF]:
-                io_tile_reading = IOTileReading(reading_time, stream, reading, reading_time=datetime.datetime.utcnow())
-                report = BroadcastReport.FromReadings(info['uuid'], [io_tile_reading], reading_time)
-                self._trigger_callback('on_report', None, report)
-
-
-    def _parse_v2_advertisement(self, rssi, sender, data):
-        """ Parse the IOTile Specific advertisement packet"""
+            if info:
+                self._publish_scan(info, sender, reading_time, stream, reading)
+        elif packet_type not in (0, 2, 6):
+            return
+        elif payload.startswith(_V2_MARKER, _V2_MARKER_OFFSET):
+            self._v2_scan_count += 1
+            self._process_v2_advertisement(rssi, sender, payload)
+        elif payload.startswith(_V1_MARKER, _V1_MARKER_OFFSET):
+            self._v1_scan_count += 1
+            info = self._parse_v1_advertisement(rssi, _format_address(sender), bytearray(payload[_SCAN_HEADER.size:]))
 
-        if len(data) != 31:
-            return None, None, None, None, None, None, None
+            if info:
+                self._publish_scan(info, sender, time.monotonic(), None, None)
 
-        # We have already verified that the device is an IOTile device
-        # by checking its service data uuid in _process_scan_event so
-        # here we just parse out the required information
+    def _process_v2_advertisement(self, rssi, sender, payload):
+        """Decide whether to report an IOTile v2 advertisement before parsing it fully."""
 
         device_id, reboot_low, reboot_high_packed, flags, timestamp, \
         battery, counter_packed, broadcast_stream_packed, broadcast_value, \
-        _mac = unpack("<LHBBLBBHLL", data[7:])
+        _mac = _V2_ADVERTISEMENT.unpack_from(payload, _V2_ADVERTISEMENT_OFFSET)
 
-        reboots = (reboot_high_packed & 0xF) << 16 | reboot_low
         counter = counter_packed & ((1 << 5) - 1)
         broadcast_multiplex = counter_packed >> 5
         broadcast_toggle = broadcast_stream_packed >> 15
         broadcast_stream = broadcast_stream_packed & ((1 << 15) - 1)
 
+        counts = self._device_scan_counts.get(device_id)
+        if counts is None:
+            counts = self._device_scan_counts[device_id] = {'v1': 0, 'v2': 0}
+        counts['v2'] += 1
+
+        send_scan, send_report = self._filter_broadcast(sender, timestamp, broadcast_stream, broadcast_value,
+                                                        broadcast_toggle, counter, broadcast_multiplex)
+        if not (send_scan or send_report):
+            return
+
         # Flags for version 2 are:
         #   bit 0: Has pending data to stream
         #   bit 1: Low voltage indication
@@ -637,24 +681,56 @@ class BLED112Adapter(DeviceAdapter):
         #   bit 5: Encryption key is user key
         #   bit 6: broadcast data is time synchronized to avoid leaking
         #   information about when it changes
-
-        self._device_scan_counts.setdefault(device_id, {'v1': 0, 'v2': 0})['v2'] += 1
-
-        info = {'connection_string': sender,
+        info = {'connection_string': _format_address(sender),
                 'uuid': device_id,
                 'pending_data': bool(flags & (1 << 0)),
                 'low_voltage': bool(flags & (1 << 1)),
                 'user_connected': bool(flags & (1 << 2)),
                 'signal_strength': rssi,
-                'reboot_counter': reboots,
+                'reboot_counter': (reboot_high_packed & 0xF) << 16 | reboot_low,
                 'sequence': counter,
                 'broadcast_toggle': broadcast_toggle,
                 'timestamp': timestamp,
                 'battery': battery / 32.0,
-                'advertising_version':2}
+                'advertising_version': 2}
+
+        self._send_scan(info, send_scan, send_report, timestamp, broadcast_stream, broadcast_value)
+
+    def _publish_scan(self, info, sender, reading_time, stream, reading):
+        """Report a parsed v1 advertisement or scan response unless it is throttled."""
 
-        return info, timestamp, broadcast_stream, broadcast_value, \
-            broadcast_toggle, counter, broadcast_multiplex
+        send_scan, send_report = self._filter_broadcast(sender, reading_time, stream, reading)
+        self._send_scan(info, send_scan, send_report, reading_time, stream, reading)
+
+    def _filter_broadcast(self, sender, device_time, stream, value, toggle=None, counter=None, channel=0):
+        """Decide whether a scan and its broadcast reading should be reported.
+
+        Returns:
+            (bool, bool): Whether on_scan and on_report callbacks should be
+                triggered for this packet.
+        """
+
+        drop_broadcast = self._check_update_seen_broadcast(sender, device_time, stream, value, toggle,
+                                                           counter=counter, channel=channel)
+
+        send_scan = bool(self.callbacks['on_scan']) and not (self._throttle_scans and drop_broadcast)
+        send_report = bool(self.callbacks['on_report']) and not (self._throttle_broadcast and drop_broadcast) and \
+            bool(stream) and stream not in (0xFFFF, 0x7FFF)
+
+        return send_scan, send_report
+
+    def _send_scan(self, info, send_scan, send_report, reading_time, stream, reading):
+        if send_scan:
+            self._reported_scan_count += 1
+            self._trigger_callback('on_scan', self.id, info, self.ExpirationTime)
+
+        # If there is a valid reading on the advertising data, broadcast it
+        if send_report:
+            self._reported_broadcast_count += 1
+            raw_report = _BROADCAST_REPORT.pack(BroadcastReport.ReportType, 0, 16, info['uuid'], reading_time, 0,
+                                                stream, 0, IOTileReading.InvalidReadingID, reading_time, reading)
+            report = BroadcastReport(bytearray(raw_report))
+            self._trigger_callback('on_report', None, report)
 
     def _check_update_seen_broadcast(self, sender, device_time, stream, value, toggle=None, counter=None, channel=0):
         key = (sender, channel)
@@ -666,12 +742,21 @@ class BLED112Adapter(DeviceAdapter):
 
             if toggle is not None and counter is not None:
                 if old_toggle == toggle and old_counter == counter:
+                    self._duplicate_broadcast_count += 1
+                    self._broadcast_state.move_to_end(key)
                     return True
             else:
                 if old_value == value and old_stream == stream and \
                     (device_time - old_time) < self._throttle_timeout:
+                    self._duplicate_broadcast_count += 1
+                    self._broadcast_state.move_to_end(key)
                     return True
 
+            self._broadcast_state.move_to_end(key)
+        elif len(self._broadcast_state) >= self._broadcast_cache_size:
+            self._broadcast_state.popitem(last=False)
+            self._broadcast_eviction_count += 1
+
         self._broadcast_state[key] = (device_time, stream, value, toggle, counter)
         return False
 
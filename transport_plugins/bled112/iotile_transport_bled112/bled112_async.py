@@ -0,0 +1,735 @@
+"""An asyncio based BLED112 core that runs operations on many connections at once.
+
+BLED112CommandProcessor runs one operation at a time on its own thread and
+polls the event queue until the events that finish it arrive, so a slow
+operation on one connection blocks every other connection.
+
+AsyncBLED112Core instead holds a lock only while a command is written and
+its response is received.  The events that finish an operation are routed
+to futures registered under their (command class, command, connection
+handle) so operations on different connections only share the serial line
+and many devices can be served in parallel from a single dongle.  Operations
+on the same connection are serialized since a BLE connection only allows one
+ATT procedure at a time.
+"""
+
+import asyncio
+import functools
+import logging
+import struct
+from iotile.core.exceptions import HardwareError, TimeoutExpiredError
+from iotile.core.utilities.async_tools import SharedLoop
+from .async_packet import AsyncPacketBuffer
+from .bgapi_structures import process_gatt_service, process_attribute, process_read_handle, process_notification
+from .bgapi_structures import parse_characteristic_declaration
+from .bled112 import packet_length
+from .bled112_cmd import BGAPIPacket, ScriptPacer, OUT_OF_BUFFERS_ERROR
+from .tilebus import TileBusService, TileBusReceiveHeaderCharacteristic, TileBusReceivePayloadCharacteristic, \
+    TileBusSendHeaderCharacteristic, TileBusSendPayloadCharacteristic, TileBusStreamingCharacteristic, \
+    TileBusTracingCharacteristic, TileBusHighSpeedCharacteristic
+from .utilities import open_bled112
+
+# Event classes whose first payload byte is a connection handle: connection and attribute client
+_HANDLE_EVENT_CLASSES = (3, 4)
+_NOT_SCANNING_ERROR = 0x81
+
+
+class AsyncBLED112Core:
+    """Run BGAPI commands on a BLED112 dongle from coroutines.
+
+    All methods except stop() must be called from inside the event loop
+    passed to the constructor.  Events that no operation is waiting for,
+    such as advertisements, unexpected disconnections and streaming
+    notifications, are passed to the handlers registered with
+    add_event_handler().
+
+    Args:
+        port (str): The serial port of the BLED112 dongle.  If None, the
+            first BLED112 found is used.
+        loop (BackgroundEventLoop): The loop that all operations run in.
+    """
+
+    def __init__(self, port, loop=SharedLoop):
+        self._loop = loop
+        self._logger = logging.getLogger(__name__)
+        self._logger.addHandler(logging.NullHandler())
+
+        self._command_lock = loop.create_lock()
+        self._connect_lock = loop.create_lock()
+        self._gatt_locks = {}
+        self._response = None
+        self._waiters = {}
+        self._event_handlers = []
+
+        asyncio_loop = loop.get_loop()
+        self._serial_port = open_bled112(port, self._logger)
+        self._stream = AsyncPacketBuffer(self._serial_port, header_length=4, length_function=packet_length,
+                                         callback=functools.partial(asyncio_loop.call_soon_threadsafe,
+                                                                    self._on_packet))
+
+    def stop(self):
+        """Stop reading from the dongle and close its serial port.
+
+        This method must be called from outside of the event loop.
+        """
+
+        self._stream.stop()
+        self._serial_port.close()
+
+    def add_event_handler(self, callback):
+        """Call a function with every event that no operation is waiting for.
+
+        Args:
+            callback (callable): Called as callback(event) from inside the
+                event loop with a BGAPIPacket.
+        """
+
+        self._event_handlers.append(callback)
+
+    async def send_command(self, cmd_class, command, payload, timeout=3.0):
+        """Send a BGAPI command and wait for its response.
+
+        Args:
+            cmd_class (int): The BGAPI command class.
+            command (int): The BGAPI command id.
+            payload (bytes): The command payload, at most 60 bytes long.
+            timeout (float): How long to wait for the response.
+
+        Returns:
+            BGAPIPacket: The response to the command.
+        """
+
+        if len(payload) > 60:
+            raise HardwareError("Attempting to send a BGAPI packet with length > 60 is not allowed",
+                                actual_length=len(payload), command=command, command_class=cmd_class)
+
+        header = bytes([0, len(payload), cmd_class, command])
+
+        async with self._command_lock:
+            self._response = self._loop.create_future()
+
+            try:
+                self._stream.write(header + bytes(payload))
+                return await asyncio.wait_for(self._response, timeout)
+            except asyncio.TimeoutError:
+                raise TimeoutExpiredError("Timeout waiting for BGAPI response", command_class=cmd_class,
+                                          command=command, timeout=timeout)
+            finally:
+                self._response = None
+
+    async def query_systemstate(self):
+        """Query the maximum and currently active connections of the dongle.
+
+        Returns:
+            dict: The max_connections supported and a list of active_connections handles.
+        """
+
+        # Hold the connect lock so that a connection event is not taken by the collector
+        async with self._connect_lock:
+            statuses = self._collect(3, 0)
+            try:
+                response = await self.send_command(0, 6, b"")
+                maxconn, = struct.unpack("<B", response.payload)
+
+                # The dongle sends one connection status event per connection slot after its response
+                for _i in range(10):
+                    if len(statuses) >= maxconn:
+                        break
+
+                    await asyncio.sleep(0.05)
+            finally:
+                self._remove_waiter((3, 0, None), statuses)
+
+        conns = []
+        for event in statuses.events:
+            handle, flags = struct.unpack_from("<BB", event.payload)
+            if flags != 0:
+                conns.append(handle)
+
+        return {'max_connections': maxconn, 'active_connections': conns}
+
+    async def set_scan_parameters(self, interval=2100, window=2100, active=False):
+        """Set the scan interval and window in ms and whether scanning is active."""
+
+        payload = struct.pack("<HHB", int(interval*1000/625), int(window*1000/625), int(bool(active)))
+        response = await self.send_command(6, 7, payload)
+        _check_result(response.payload[0], "Could not set scanning parameters")
+
+    async def start_scan(self, active):
+        """Begin scanning forever, passing advertisements to the event handlers."""
+
+        await self.set_scan_parameters(active=active)
+        response = await self.send_command(6, 2, bytes([2]))
+        _check_result(response.payload[0], "Could not initiate scan for ble devices")
+
+    async def stop_scan(self):
+        """Stop scanning or connecting.
+
+        Returns:
+            bool: False if there was nothing to stop, otherwise True.
+        """
+
+        response = await self.send_command(6, 4, b"")
+        result, = struct.unpack("<H", response.payload)
+
+        if (result & 0xFF) == _NOT_SCANNING_ERROR:
+            return False
+
+        _check_result(result, "Could not stop scan for ble devices")
+        return True
+
+    async def connect(self, address, timeout=4.0):
+        """Connect to a device given its address.
+
+        Only one connection can be in progress at a time and the dongle must
+        not be scanning.
+
+        Args:
+            address (str or bytes): The device's address, either as a
+                XX:YY:ZZ:AA:BB:CC string or 6 little endian bytes.
+            timeout (float): How long to wait for the connection.
+
+        Returns:
+            int: The connection handle.
+        """
+
+        if isinstance(address, str):
+            address = bytes(bytearray.fromhex(address.replace(':', ''))[::-1])
+
+        # Allow simple determination of whether a device has a public or private address
+        # This is not foolproof
+        address_type = 1 if (bytearray(address)[-1] >> 6) == 0b11 else 0
+        payload = struct.pack("<6sBHHHH", address, address_type, 6, 100, 100, 0)
+
+        async with self._connect_lock:
+            # The connection event can arrive before we learn the handle from the
+            # command response, so hold on to every status event until then
+            early = self._collect(3, 0)
+
+            try:
+                response = await self.send_command(6, 3, payload)
+            finally:
+                self._remove_waiter((3, 0, None), early)
+
+            result, handle = struct.unpack("<HB", response.payload)
+
+            event = None
+            for status in early.events:
+                if event is None and status.payload[0] == handle and status.payload[1] & 1:
+                    event = status
+                else:
+                    self._dispatch_event(status)
+
+            _check_result(result, "Could not start connecting to device")
+
+            connected = self._expect(3, 0, handle, predicate=lambda status: status.payload[1] & 1)
+
+            try:
+                if event is None:
+                    event = await _wait(connected, timeout, "connection to device")
+
+                _handle, _flags, _addr, _addr_type, interval, conn_timeout, latency, _bond = \
+                    struct.unpack("<BB6sBHHHB", event.payload)
+            except TimeoutExpiredError:
+                # If there was nothing to stop, the connection finished as we gave up on it
+                if not await self.stop_scan():
+                    await self._abandon_connection(handle)
+                raise
+            except (HardwareError, struct.error, asyncio.CancelledError):
+                await self._abandon_connection(handle)
+                raise
+            finally:
+                connected.cancel()
+
+        self._logger.info('Connected to device with handle=%d, interval=%d, timeout=%d, latency=%d',
+                          handle, interval, conn_timeout, latency)
+
+        return handle
+
+    async def _abandon_connection(self, handle):
+        """Disconnect from a device after a connection attempt failed, logging any error."""
+
+        try:
+            await self.disconnect(handle)
+        except (HardwareError, TimeoutExpiredError):
+            self._logger.warning("Could not disconnect abandoned connection with handle=%d", handle, exc_info=True)
+
+    async def disconnect(self, handle, timeout=3.0):
+        """Disconnect from a device that we have previously connected to."""
+
+        disconnected = self._expect(3, 4, handle)
+
+        try:
+            response = await self.send_command(3, 0, struct.pack('<B', handle))
+            _conn, result = struct.unpack("<BH", response.payload)
+            _check_result(result, "Could not disconnect from device", handle=handle)
+
+            await _wait(disconnected, timeout, "disconnection")
+        finally:
+            disconnected.cancel()
+
+        self._gatt_locks.pop(handle, None)
+
+    async def probe_services(self, handle, timeout=5.0):
+        """Probe for all primary services of a connected device.
+
+        Returns:
+            dict: The services of the device, as expected by probe_characteristics().
+        """
+
+        async with self._gatt_lock(handle):
+            events = await self._run_procedure(handle, 4, 1, struct.pack('<BHHBH', handle, 1, 0xFFFF, 2, 0x2800),
+                                               (4, 2), timeout, "GATT services")
+
+        services = {}
+        for event in events:
+            process_gatt_service(services, event)
+
+        return services
+
+    async def probe_characteristics(self, handle, services, timeout=5.0):
+        """Probe all characteristics of the services of a connected device.
+
+        The characteristics are added to each service in services.
+
+        Returns:
+            dict: The services that were passed in.
+        """
+
+        for service in services.values():
+            attributes = await self.enumerate_handles(handle, service['start_handle'], service['end_handle'],
+                                                      timeout)
+
+            service['characteristics'] = {}
+
+            last_char = None
+            for char_handle, attribute in attributes.items():
+                if attribute['uuid'].hex[-4:] == '0328':
+                    _type, value = await self.read_handle(handle, char_handle, timeout)
+                    char = parse_characteristic_declaration(value)
+                    service['characteristics'][char['uuid']] = char
+                    last_char = char
+                elif attribute['uuid'].hex[-4:] == '0229':
+                    if last_char is None:
+                        raise HardwareError("Client configuration attribute found before its characteristic",
+                                            handle=handle, char_handle=char_handle)
+
+                    _type, value = await self.read_handle(handle, char_handle, timeout)
+                    value, = struct.unpack("<H", value)
+                    last_char['client_configuration'] = {'handle': char_handle, 'value': value}
+
+        return services
+
+    async def enumerate_handles(self, handle, start_handle, end_handle, timeout=5.0):
+        """Find all attributes between two handles on a connected device."""
+
+        async with self._gatt_lock(handle):
+            events = await self._run_procedure(handle, 4, 3, struct.pack("<BHH", handle, start_handle, end_handle),
+                                               (4, 4), timeout, "attribute enumeration")
+
+        attrs = {}
+        for event in events:
+            process_attribute(attrs, event)
+
+        return attrs
+
+    async def read_handle(self, handle, char_handle, timeout=5.0):
+        """Read the value of an attribute on a connected device.
+
+        Returns:
+            (int, bytes): The attribute's type and value.
+        """
+
+        async with self._gatt_lock(handle):
+            value = self._expect(4, 5, handle, predicate=lambda event: event.payload[3] == 0)
+            failed = self._expect(4, 1, handle)
+
+            try:
+                response = await self.send_command(4, 4, struct.pack("<BH", handle, char_handle))
+                _conn, result = struct.unpack("<BH", response.payload)
+                _check_result(result, "Error reading handle", handle=handle, char_handle=char_handle)
+
+                done, _pending = await asyncio.wait([value, failed], timeout=timeout,
+                                                    return_when=asyncio.FIRST_COMPLETED)
+                if len(done) == 0:
+                    raise TimeoutExpiredError("Timeout reading handle", handle=handle, char_handle=char_handle)
+
+                if failed in done:
+                    _conn, result, _char = struct.unpack("<BHH", failed.result().payload)
+                    raise HardwareError("Error reading handle", handle=handle, char_handle=char_handle,
+                                        error_code=result)
+
+                return process_read_handle(value.result())
+            finally:
+                value.cancel()
+                failed.cancel()
+
+    async def write_handle(self, handle, char_handle, value, ack=True, timeout=5.0):
+        """Write to an attribute on a connected device.
+
+        Args:
+            handle (int): The connection handle.
+            char_handle (int): The attribute handle to write.
+            value (bytes): The value to write, at most 20 bytes long.
+            ack (bool): Whether to wait for the device to acknowledge the write.
+            timeout (float): How long to wait for the acknowledgement.
+        """
+
+        async with self._gatt_lock(handle):
+            await self._write_handle(handle, char_handle, value, ack, timeout)
+
+    async def set_notification(self, handle, char, enabled, timeout=5.0):
+        """Enable or disable notifications on a characteristic.
+
+        Args:
+            handle (int): The connection handle.
+            char (dict): The characteristic, as found by probe_characteristics().
+            enabled (bool): Whether notifications should be enabled.
+            timeout (float): How long to wait for the acknowledgement.
+        """
+
+        async with self._gatt_lock(handle):
+            await self._set_notification(handle, char, enabled, timeout)
+
+    async def enable_rpcs(self, handle, services, timeout=5.0):
+        """Prepare a connected device to receive RPCs."""
+
+        chars = services[TileBusService]['characteristics']
+
+        async with self._gatt_lock(handle):
+            await self._set_notification(handle, chars[TileBusReceiveHeaderCharacteristic], True, timeout)
+            await self._set_notification(handle, chars[TileBusReceivePayloadCharacteristic], True, timeout)
+
+    async def enable_streaming(self, handle, services, timeout=5.0):
+        """Enable notifications of reports, which are passed to the event handlers."""
+
+        char = services[TileBusService]['characteristics'][TileBusStreamingCharacteristic]
+        await self.set_notification(handle, char, True, timeout)
+
+    async def enable_tracing(self, handle, services, timeout=5.0):
+        """Enable notifications of tracing data, which are passed to the event handlers."""
+
+        char = services[TileBusService]['characteristics'].get(TileBusTracingCharacteristic)
+        if char is None:
+            raise HardwareError("Tracing characteristic was not found in remote device's GATT table", handle=handle)
+
+        await self.set_notification(handle, char, True, timeout)
+
+    async def send_rpc(self, handle, services, address, rpc_id, payload, timeout=5.0):
+        """Send an RPC to a connected device and wait for its response.
+
+        Args:
+            handle (int): The connection handle.
+            services (dict): The device's services, with RPCs enabled.
+            address (int): The address of the tile to send the RPC to.
+            rpc_id (int): The 16-bit id of the RPC.
+            payload (bytes): The RPC payload, at most 20 bytes long.
+            timeout (float): How long to wait for the response.
+
+        Returns:
+            dict: The status, length and payload of the response and whether
+                the device disconnected instead of responding.
+        """
+
+        chars = services[TileBusService]['characteristics']
+        header_char = chars[TileBusSendHeaderCharacteristic]['handle']
+        payload_char = chars[TileBusSendPayloadCharacteristic]['handle']
+        receive_header = chars[TileBusReceiveHeaderCharacteristic]['handle']
+        receive_payload = chars[TileBusReceivePayloadCharacteristic]['handle']
+
+        length = len(payload)
+        if length > 20:
+            raise HardwareError("Payload is too long, must be at most 20 bytes", length=length)
+
+        padded = bytes(payload) + b'\x00'*(20 - length)
+        header = bytes([length, 0, rpc_id & 0xFF, (rpc_id >> 8) & 0xFF, address])
+
+        async with self._gatt_lock(handle):
+            notified_header = self._expect(4, 5, handle, predicate=_attribute_matcher(receive_header))
+            notified_payload = self._expect(4, 5, handle, predicate=_attribute_matcher(receive_payload))
+
+            try:
+                if length > 0:
+                    await self._write_handle(handle, payload_char, padded, False)
+
+                await self._write_handle(handle, header_char, header, False)
+
+                try:
+                    event = await _wait(notified_header, timeout, "notified RPC response header")
+                except HardwareError as err:
+                    if err.params.get('disconnected'):
+                        return {'status': 0xFF, 'length': 0, 'payload': b'\x00'*20, 'disconnected': True}
+
+                    raise
+
+                _, resp_header = process_notification(event)
+                status = resp_header[0]
+                resp_length = resp_header[3]
+
+                if resp_length > 0:
+                    event = await _wait(notified_payload, timeout, "notified RPC response payload")
+                    _, resp_payload = process_notification(event)
+                else:
+                    resp_payload = b'\x00'*20
+            finally:
+                notified_header.cancel()
+                notified_payload.cancel()
+
+        return {'status': status, 'length': resp_length, 'payload': resp_payload, 'disconnected': False}
+
+    async def send_script(self, handle, services, data, progress_callback=None, pacer=None):
+        """Send a script to a connected device over its high speed characteristic.
+
+        Writes that the dongle rejects because it has no free transmit
+        buffers are retried after a delay chosen by pacer.
+
+        Args:
+            handle (int): The connection handle.
+            services (dict): The device's services.
+            data (bytes): The script to send.
+            progress_callback (callable): Optional function called as
+                progress_callback(chunks_sent, total_chunks) after each chunk.
+            pacer (ScriptPacer): Optional pacer used to back off from
+                rejected writes.
+        """
+
+        hschar = services[TileBusService]['characteristics'][TileBusHighSpeedCharacteristic]['handle']
+
+        if pacer is None:
+            pacer = ScriptPacer()
+
+        async with self._gatt_lock(handle):
+            for curr_loc in range(0, len(data), 20):
+                chunk = data[curr_loc:curr_loc + 20]
+
+                while True:
+                    try:
+                        await self._write_handle(handle, hschar, chunk, False)
+                        break
+                    except HardwareError as err:
+                        if err.params.get('error_code') != OUT_OF_BUFFERS_ERROR:
+                            raise
+
+                        await asyncio.sleep(pacer.reject())
+
+                delay = pacer.accept()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+
+                if progress_callback is not None:
+                    progress_callback(curr_loc // 20, len(data) // 20)
+
+    async def _write_handle(self, handle, char_handle, value, ack, timeout=5.0):
+        if len(value) > 20:
+            raise HardwareError("Data too long to write", length=len(value))
+
+        payload = struct.pack("<BHB%ds" % len(value), handle, char_handle, len(value), bytes(value))
+
+        if not ack:
+            response = await self.send_command(4, 6, payload)
+            _conn, result = struct.unpack("<BH", response.payload)
+            _check_result(result, "Error writing to handle", handle=handle, char_handle=char_handle)
+            return
+
+        acked = self._expect(4, 1, handle, predicate=lambda event: event.payload[3:5] == payload[1:3])
+
+        try:
+            response = await self.send_command(4, 5, payload)
+            _conn, result = struct.unpack("<BH", response.payload)
+            _check_result(result, "Error writing to handle", handle=handle, char_handle=char_handle)
+
+            event = await _wait(acked, timeout, "acknowledgement of write")
+        finally:
+            acked.cancel()
+
+        _conn, result, _char = struct.unpack("<BHH", event.payload)
+        _check_result(result, "Error received during write to handle", handle=handle, char_handle=char_handle)
+
+    async def _set_notification(self, handle, char, enabled, timeout):
+        if 'client_configuration' not in char:
+            raise HardwareError("Cannot enable notification without a client configuration attribute "
+                                "for characteristic", handle=handle)
+
+        if not char['properties'].notify:
+            raise HardwareError("Cannot enable notification on a characteristic that does not support it",
+                                handle=handle)
+
+        value = char['client_configuration']['value']
+
+        if bool(value & (1 << 0)) == enabled:
+            return
+
+        if enabled:
+            value |= 1 << 0
+        else:
+            value &= ~(1 << 0)
+
+        await self._write_handle(handle, char['client_configuration']['handle'], struct.pack("<H", value), True,
+                                 timeout)
+        char['client_configuration']['value'] = value
+
+    async def _run_procedure(self, handle, cmd_class, command, payload, event_id, timeout, name):
+        """Send a GATT command and collect its events until the procedure completes."""
+
+        events = self._collect(event_id[0], event_id[1], handle)
+        completed = self._expect(4, 1, handle)
+
+        try:
+            response = await self.send_command(cmd_class, command, payload)
+            _conn, result = struct.unpack("<BH", response.payload)
+            _check_result(result, "Error starting GATT procedure", handle=handle, procedure=name)
+
+            event = await _wait(completed, timeout, name)
+        finally:
+            completed.cancel()
+            self._remove_waiter((event_id[0], event_id[1], handle), events)
+
+        _conn, result, _char = struct.unpack("<BHH", event.payload)
+        _check_result(result, "Error during GATT procedure", handle=handle, procedure=name)
+
+        return events.events
+
+    def _gatt_lock(self, handle):
+        lock = self._gatt_locks.get(handle)
+        if lock is None:
+            lock = self._gatt_locks[handle] = self._loop.create_lock()
+
+        return lock
+
+    def _expect(self, cmd_class, command, handle=None, predicate=None):
+        """Register a future for the next matching event.
+
+        The future must be registered before sending the command that
+        triggers the event since events can arrive immediately after the
+        command's response.  Cancel the future if it is no longer needed.
+        A handle of None matches events for any connection.
+        """
+
+        key = (cmd_class, command, handle)
+        future = self._loop.create_future()
+        entry = (predicate, future)
+
+        self._waiters.setdefault(key, []).append(entry)
+        future.add_done_callback(lambda _future: self._remove_waiter(key, entry))
+
+        return future
+
+    def _collect(self, cmd_class, command, handle=None):
+        """Collect all matching events until _remove_waiter is called."""
+
+        collector = _EventCollector()
+        self._waiters.setdefault((cmd_class, command, handle), []).append(collector)
+        return collector
+
+    def _remove_waiter(self, key, entry):
+        entries = self._waiters.get(key)
+        if entries is None or entry not in entries:
+            return
+
+        entries.remove(entry)
+        if len(entries) == 0:
+            del self._waiters[key]
+
+    def _on_packet(self, data):
+        packet = BGAPIPacket(is_event=(data[0] == 0x80), command_class=data[2], command=data[3], payload=data[4:])
+
+        if not packet.is_event:
+            if self._response is None or self._response.done():
+                self._logger.warning("Dropping unexpected BGAPI response: %s", packet)
+            else:
+                self._response.set_result(packet)
+
+            return
+
+        handle = None
+        if packet.command_class in _HANDLE_EVENT_CLASSES and len(packet.payload) > 0:
+            handle = packet.payload[0]
+
+        if packet.command_class == 3 and packet.command == 4:
+            self._fail_waiters(handle, packet)
+
+        if self._route(packet, (packet.command_class, packet.command, handle)):
+            return
+
+        if handle is not None and self._route(packet, (packet.command_class, packet.command, None)):
+            return
+
+        self._dispatch_event(packet)
+
+    def _dispatch_event(self, packet):
+        """Pass an event that no operation is waiting for to the event handlers."""
+
+        for callback in self._event_handlers:
+            try:
+                callback(packet)
+            except:  #pylint:disable=bare-except;We can't let a user callback break event processing
+                self._logger.exception("Error in BLED112 event handler for event %s", packet)
+
+    def _route(self, packet, key):
+        entries = self._waiters.get(key)
+        if entries is None:
+            return False
+
+        for entry in list(entries):
+            if isinstance(entry, _EventCollector):
+                entry.events.append(packet)
+                return True
+
+            predicate, future = entry
+            if future.done() or (predicate is not None and not predicate(packet)):
+                continue
+
+            future.set_result(packet)
+            return True
+
+        return False
+
+    def _fail_waiters(self, handle, packet):
+        """Fail every operation waiting on a connection that was just closed."""
+
+        _conn, reason = struct.unpack("<BH", packet.payload)
+
+        for key, entries in list(self._waiters.items()):
+            if key[2] != handle or key == (3, 4, handle):
+                continue
+
+            for entry in list(entries):
+                if isinstance(entry, _EventCollector):
+                    continue
+
+                _predicate, future = entry
+                if not future.done():
+                    future.set_exception(HardwareError("Device disconnected", handle=handle, reason=reason,
+                                                       disconnected=True))
+
+        self._gatt_locks.pop(handle, None)
+
+
+class _EventCollector:
+    """A waiter that accumulates every matching event."""
+
+    def __init__(self):
+        self.events = []
+
+    def __len__(self):
+        return len(self.events)
+
+
+async def _wait(future, timeout, name):
+    try:
+        return await asyncio.wait_for(future, timeout)
+    except asyncio.TimeoutError:
+        raise TimeoutExpiredError("Timeout waiting for %s" % name, timeout=timeout)
+
+
+def _attribute_matcher(char_handle):
+    def _matches(event):
+        _conn, att_handle = struct.unpack_from("<BH", event.payload)
+        return att_handle == char_handle
+
+    return _matches
+
+
+def _check_result(result, message, **kwargs):
+    if result != 0:
+        raise HardwareError(message, error_code=result, **kwargs)
@@ -14,9 +14,47 @@ from .async_packet import InternalTimeoutError, DeviceNotConfiguredError
 
 BGAPIPacket = namedtuple("BGAPIPacket", ["is_event", "command_class", "command", "payload"])
 
+# Error code returned by the BLED112 when it has no free buffers for a write
+OUT_OF_BUFFERS_ERROR = 0x182
+
+
+class ScriptPacer:
+    """Pace the writes of a script so that the BLED112 is not overrun.
+
+    The delay between writes grows multiplicatively each time the dongle
+    reports that it has no free buffers and shrinks additively after each
+    accepted write, so the write rate settles just below the rate at which
+    the dongle can send packets over the air.
+
+    Args:
+        min_delay (float): The delay to use after the first rejected write.
+        max_delay (float): The longest delay to ever use.
+        step (float): How much to shrink the delay after each accepted write.
+    """
+
+    def __init__(self, min_delay=0.001, max_delay=0.1, step=0.0001):
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.step = step
+        self.delay = 0.0
+        self.rejected = 0
+
+    def reject(self):
+        """Record a rejected write and return how long to wait before retrying."""
+
+        self.rejected += 1
+        self.delay = min(self.max_delay, max(self.min_delay, self.delay * 2))
+        return self.delay
+
+    def accept(self):
+        """Record an accepted write and return how long to wait before the next one."""
+
+        self.delay = max(0.0, self.delay - self.step)
+        return self.delay
+
 
 class BLED112CommandProcessor(threading.Thread):
-    def __init__(self, stream, commands, stop_check_interval=0.01):
+    def __init__(self, stream, commands, stop_check_interval=0.01, script_window=64):
         super(BLED112CommandProcessor, self).__init__()
 
         self._stream = stream
@@ -28,6 +66,7 @@ class BLED112CommandProcessor(threading.Thread):
         self._current_context = None
         self._current_callback = None
         self._stop_event_check_interval = stop_check_interval
+        self._script_window = script_window
 
     def run(self):
         while not self._stop_event.is_set():
@@ -419,28 +458,52 @@ class BLED112CommandProcessor(threading.Thread):
 
         return True, None
 
-    def _send_script(self, conn, services, data, curr_loc, progress_callback):
+    def _send_script(self, conn, services, data, curr_loc, progress_callback, pacer=None):
+        """Send part of a script over the high speed characteristic.
+
+        Up to script_window chunks are written before this command requeues
+        itself, so that commands for other connections are not starved while
+        a large script is sent.  A write rejected because the dongle is out
+        of buffers also ends the window early so that other commands can run
+        while the buffers drain.  Progress is reported once per window.
+
+        Chunks are written one at a time rather than pipelined since a write
+        rejected for lack of buffers could otherwise be overtaken by the next
+        one.  Instead the writes are paced by a ScriptPacer that backs off
+        whenever the dongle runs out of buffers.
+        """
+
         hschar = services[TileBusService]['characteristics'][TileBusHighSpeedCharacteristic]['handle']
 
-        chunk_size = 20
-        if len(data) - curr_loc < 20:
-            chunk_size = len(data) - curr_loc
+        if pacer is None:
+            pacer = ScriptPacer()
 
-        chunk = data[curr_loc:curr_loc+chunk_size]
-        success, reason = self._write_handle(conn, hschar, False, chunk)
+        total_length = len(data)
+        window_end = min(total_length, curr_loc + 20*self._script_window)
 
-        if not success:
-            if 'error_code' in reason and reason['error_code'] == 0x182: #If we are streaming too fast, back off and try again
-                time.sleep(0.1)
-                self.async_command(['_send_script', conn, services, data, curr_loc, progress_callback], self._current_callback, self._current_context)
-                return True, None, True
-            else:
-                return False, reason
+        while curr_loc < window_end:
+            chunk = data[curr_loc:curr_loc+20]
+            success, reason = self._write_handle(conn, hschar, False, chunk)
+
+            if not success:
+                if reason.get('error_code') != OUT_OF_BUFFERS_ERROR:
+                    return False, reason
+
+                # We are streaming too fast, back off and let other commands run before trying again
+                time.sleep(pacer.reject())
+                break
+
+            curr_loc += len(chunk)
+
+            delay = pacer.accept()
+            if delay > 0 and curr_loc < total_length:
+                time.sleep(delay)
 
-        progress_callback(curr_loc // 20, len(data) // 20)
+        progress_callback(curr_loc // 20, total_length // 20)
 
-        if curr_loc + chunk_size != len(data):
-            self.async_command(['_send_script', conn, services, data, curr_loc+chunk_size, progress_callback], self._current_callback, self._current_context)
+        if curr_loc != total_length:
+            self.async_command(['_send_script', conn, services, data, curr_loc, progress_callback, pacer],
+                               self._current_callback, self._current_context)
             return True, None, True
 
         return True, None
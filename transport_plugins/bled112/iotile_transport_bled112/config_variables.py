@@ -9,5 +9,6 @@ def get_variables():
     conf_vars.append(["throttle-broadcast", "bool", "Only report changing broadcast values, not all values", "false"])
     conf_vars.append(["throttle-scan", "bool", "Only report device_seen once in a timeout", "false"])
     conf_vars.append(["throttle-timeout", "int", "device_seen and report events timeout in seconds", 30])
+    conf_vars.append(["broadcast-cache-size", "int", "Maximum number of devices whose last broadcast is remembered for throttling", 4096])
 
     return prefix, conf_vars
@@ -54,9 +54,20 @@ def generate_random_clients(unique_number, update_value_probability):
 
 
 class MockAdvertisingBLED112(MockBLED112):
-    def __init__(self, max_connections):
+    """A mock BLED112 that generates advertisements from many random devices.
+
+    Args:
+        max_connections (int): The number of simultaneous connections supported.
+        advertising_version (int): Whether to generate v1 advertisements with
+            scan responses or v2 advertisements with broadcast readings.
+    """
+
+    def __init__(self, max_connections, advertising_version=1):
         super().__init__(max_connections)
 
+        self.advertising_version = advertising_version
+        self._v2_counters = {}
+
     def _start_scan(self, payload):
         if self.scanning is True:
             resp = {'type': bgapi_resp(6, 2), 'result': 0x181} #Device in wrong state
@@ -74,6 +85,31 @@ class MockAdvertisingBLED112(MockBLED112):
 
         return ble_flags + uuid_list + manu
 
+    def advertisement_v2(self, iotile_id, reading, counter, low_voltage=False, user_connected=False,
+                         device_reports=False, voltage=3.5):
+        flags = (int(low_voltage) << 1) | (int(user_connected) << 2) | (int(device_reports))
+        ble_flags = struct.pack("<BBB", 2, 1, 6)
+        header = struct.pack("<BBH", 27, 0x16, 0xfddd)
+        counter_packed = counter & 0x1F
+        stream_packed = (reading.stream & 0x7FFF) | ((counter & 0x20) << 10)
+        body = struct.pack("<LHBBLBBHLL", iotile_id, 0, 0, flags, reading.raw_time, int(voltage*32),
+                           counter_packed, stream_packed, reading.value, 0)
+
+        advert = ble_flags + header + body
+        assert len(advert) == 31
+
+        return advert
+
+    def _next_v2_counter(self, iotile_id, reading):
+        """Increment a device's broadcast counter whenever its reading changes."""
+
+        last_value, counter = self._v2_counters.get(iotile_id, (None, 0))
+        if last_value != reading.value:
+            counter = (counter + 1) & 0x3F
+
+        self._v2_counters[iotile_id] = (reading.value, counter)
+        return counter
+
     def scan_response(self, reading, voltage=3.5):
         header = struct.pack("<BBH", 19, 0xFF, MockBLEDevice.ArchManuID)
         voltage = struct.pack("<H", int(voltage*256))
@@ -102,12 +138,16 @@ class MockAdvertisingBLED112(MockBLED112):
         packet['address'] = next_mac
         packet['address_type'] = 1 #Random address
         packet['bond'] = 0xFF #No bond
-        packet['data'] = self.advertisement(next_iotile_id)
 
-        packets.append(packet)
+        if self.advertising_version == 2:
+            counter = self._next_v2_counter(next_iotile_id, next_reading)
+            packet['data'] = self.advertisement_v2(next_iotile_id, next_reading, counter)
+        else:
+            packet['data'] = self.advertisement(next_iotile_id)
 
+        packets.append(packet)
 
-        if self.active_scan:
+        if self.active_scan and self.advertising_version == 1:
             response = copy.deepcopy(packet)
             response['data'] = self.scan_response(next_reading)
             response['adv_type'] = MockBLEDevice.ScanResponsePacket
@@ -2,6 +2,8 @@ import struct
 import copy
 import binascii
 import logging
+import threading
+from time import monotonic
 
 def make_id(cmdclass, cmd, event, response=False):
     return (int(event) << 17 | int(response) << 16) | (cmdclass << 8) | cmd
@@ -171,7 +173,31 @@ class BGAPIPacket(object):
 
 
 class MockBLED112(object):
-    def __init__(self, max_connections):
+    """A mock BLED112 dongle that responds to BGAPI commands.
+
+    By default writes without response are delivered to the device
+    immediately.  If tx_buffers is given, the dongle's limited transmit
+    buffers are simulated instead: each write without response takes a
+    buffer until it is sent over the air at the next connection event and
+    writes are rejected with error 0x182 while all buffers are in use.
+
+    Notifications triggered by a write, such as RPC responses, are normally
+    returned along with the write's response.  If notification_delay is
+    given, they are instead passed to inject_callback after that many
+    seconds to simulate a device that takes time to respond.
+
+    Args:
+        max_connections (int): The maximum number of simultaneous connections.
+        tx_buffers (int): The number of transmit buffers per connection or None
+            to not simulate transmit buffers.
+        connection_interval (float): The time in seconds between connection events.
+        packets_per_interval (int): The number of packets sent per connection event.
+        notification_delay (float): The delay in seconds before notifications
+            triggered by a write are sent, or 0 to send them immediately.
+    """
+
+    def __init__(self, max_connections, tx_buffers=None, connection_interval=0.0075, packets_per_interval=4,
+                 notification_delay=0.0):
         self._register_handlers()
         self.devices = {}
         self.max_connections = max_connections
@@ -179,6 +205,13 @@ class MockBLED112(object):
         self.active_scan = False
         self.scanning = False
         self.connecting = False
+        self.tx_buffers = tx_buffers
+        self.connection_interval = connection_interval
+        self.packets_per_interval = packets_per_interval
+        self.rejected_writes = 0
+        self.notification_delay = notification_delay
+        self.inject_callback = None
+        self._tx_pending = {}
         self._logger = logging.getLogger(__name__)
 
     def add_device(self, device):
@@ -277,16 +310,7 @@ class MockBLED112(object):
 
         self._logger.info("Write on handle %d triggered %d notification(s)", char_handle, len(notifications))
 
-        #If this write triggered any notifications, inject them
-        for notification_handle, value in notifications:
-            event = {}
-            event['type'] = bgapi_event(4, 5)
-            event['handle'] = handle
-            event['char_handle'] = notification_handle
-            event['att_type'] = 1 # Notified
-            event['value'] = value
-            packets.append(event)
-
+        packets.extend(self._notify(handle, notifications))
         return packets
 
     def _write_command(self, payload):
@@ -296,6 +320,11 @@ class MockBLED112(object):
             resp = {'type': bgapi_resp(4, 6), 'handle': handle, 'result': 0x186} #0x186 is handle not connected
             return [resp]
 
+        if not self._reserve_tx_buffer(handle):
+            self.rejected_writes += 1
+            resp = {'type': bgapi_resp(4, 6), 'handle': handle, 'result': 0x182} #0x182 is out of memory
+            return [resp]
+
         packets = []
         resp = {'type': bgapi_resp(4, 6), 'handle': handle, 'result': 0}
         packets.append(resp)
@@ -305,7 +334,17 @@ class MockBLED112(object):
 
         success, notifications = dev.write_handle(char_handle, payload['value'])
 
-        #If this write triggered any notifications, inject them
+        packets.extend(self._notify(handle, notifications))
+        return packets
+
+    def _notify(self, handle, notifications):
+        """Build the notification events triggered by a write.
+
+        If notifications are delayed, they are injected later in a single
+        write so that their order is preserved and no packets are returned.
+        """
+
+        packets = []
         for notification_handle, value in notifications:
             event = {}
             event['type'] = bgapi_event(4, 5)
@@ -315,7 +354,36 @@ class MockBLED112(object):
             event['value'] = value
             packets.append(event)
 
-        return packets
+        if self.notification_delay <= 0 or self.inject_callback is None or len(packets) == 0:
+            return packets
+
+        data = b"".join([bytes(BGAPIPacket.GeneratePacket(x)) for x in packets])
+        timer = threading.Timer(self.notification_delay, self.inject_callback, args=(data,))
+        timer.daemon = True
+        timer.start()
+
+        return []
+
+    def _reserve_tx_buffer(self, handle):
+        """Take a transmit buffer for a write, returning False if none are free."""
+
+        if self.tx_buffers is None:
+            return True
+
+        now = monotonic()
+        pending, last_event = self._tx_pending.get(handle, (0, now))
+
+        events = int((now - last_event) / self.connection_interval)
+        if events > 0:
+            pending = max(0, pending - events * self.packets_per_interval)
+            last_event += events * self.connection_interval
+
+        if pending >= self.tx_buffers:
+            self._tx_pending[handle] = (pending, last_event)
+            return False
+
+        self._tx_pending[handle] = (pending + 1, last_event)
+        return True
 
     def _enumerate_handles(self, payload):
         handle = payload['handle']
@@ -424,6 +492,7 @@ class MockBLED112(object):
                      'interval': payload['interval_min'], 'timeout': payload['timeout'], 'latency': payload['latency'], 'bonding': 0xFF}
 
             self.connections.append(addr)
+            self.connecting = False
             packets.append(event)
 
         return packets
@@ -0,0 +1,177 @@
+"""Tests of AsyncBLED112Core against the mock BLED112."""
+
+import asyncio
+import time
+import pytest
+import serial
+from iotile.core.exceptions import HardwareError, TimeoutExpiredError
+from iotile.core.hw.virtual.virtualdevice_simple import SimpleVirtualDevice
+from iotile.core.utilities.async_tools import BackgroundEventLoop
+from iotile.mock.mock_ble import MockBLEDevice
+from iotile_transport_bled112.bled112_async import AsyncBLED112Core
+from iotile_transport_bled112.hardware.emulator.mock_bled112 import MockBLED112, make_command
+import util.dummy_serial
+
+MACS = ["00:11:22:33:44:5%d" % i for i in range(3)]
+
+
+@pytest.fixture
+def dongle():
+    old_serial = serial.Serial
+    serial.Serial = util.dummy_serial.Serial
+
+    mock = MockBLED112(3)
+    devices = []
+    for i, mac in enumerate(MACS):
+        device = SimpleVirtualDevice(100 + i, 'TestCN')
+        mock.add_device(MockBLEDevice(mac, device))
+        devices.append(device)
+
+    util.dummy_serial.RESPONSE_GENERATOR = mock.generate_response
+
+    # The mock device runs RPCs on the shared loop so the core needs its own loop
+    loop = BackgroundEventLoop()
+    core = AsyncBLED112Core('test', loop=loop)
+    mock.inject_callback = core._serial_port.inject
+
+    yield loop, core, mock, devices
+
+    core.stop()
+    loop.stop()
+    serial.Serial = old_serial
+
+
+async def _open_rpcs(core, mac):
+    handle = await core.connect(mac)
+    services = await core.probe_services(handle)
+    await core.probe_characteristics(handle, services)
+    await core.enable_rpcs(handle, services)
+
+    return handle, services
+
+
+def test_rpcs_in_parallel(dongle):
+    """Make sure RPCs to several devices are in flight at the same time."""
+
+    loop, core, mock, _devices = dongle
+    mock.notification_delay = 0.1
+
+    async def _run():
+        info = await core.query_systemstate()
+        assert info == {'max_connections': 3, 'active_connections': []}
+
+        conns = [await _open_rpcs(core, mac) for mac in MACS]
+
+        async def _rpcs(handle, services):
+            results = []
+            for _i in range(3):
+                results.append(await core.send_rpc(handle, services, 8, 0x0004, b'', timeout=1.0))
+
+            return results
+
+        start = time.monotonic()
+        results = await asyncio.gather(*[_rpcs(handle, services) for handle, services in conns])
+        elapsed = time.monotonic() - start
+
+        for handle, _services in conns:
+            await core.disconnect(handle)
+
+        return results, elapsed
+
+    results, elapsed = loop.run_coroutine(_run())
+
+    for device_results in results:
+        assert len(device_results) == 3
+        for result in device_results:
+            assert result['status'] == 0
+            assert result['disconnected'] is False
+            assert result['payload'][2:8] == b'TestCN'
+
+    # 9 RPCs taking 0.1 s each would take at least 0.9 s one at a time
+    assert elapsed < 0.6
+
+
+def test_send_script(dongle):
+    """Make sure scripts are sent to the right device."""
+
+    loop, core, _mock, devices = dongle
+    progress = []
+
+    async def _run():
+        handle = await core.connect(MACS[1])
+        services = await core.probe_services(handle)
+        await core.probe_characteristics(handle, services)
+
+        await core.send_script(handle, services, b'\xab'*1027, lambda current, total: progress.append(current))
+
+    loop.run_coroutine(_run())
+
+    assert devices[1].script == b'\xab'*1027
+    assert progress[-1] == 1027 // 20
+
+
+def test_disconnect_fails_waiters(dongle):
+    """Make sure operations on a connection fail when it disconnects."""
+
+    loop, core, mock, _devices = dongle
+    mock.notification_delay = 1.0
+
+    async def _run():
+        handle, services = await _open_rpcs(core, MACS[0])
+
+        rpc = asyncio.ensure_future(core.send_rpc(handle, services, 8, 0x0004, b'', timeout=5.0))
+        await asyncio.sleep(0.05)
+
+        core._serial_port.inject(bytes([0x80, 3, 3, 4, handle, 0x13, 0x02]))
+        return await rpc
+
+    result = loop.run_coroutine(_run())
+    assert result['disconnected'] is True
+
+
+def test_connect_timeout(dongle):
+    """Make sure connecting to a missing device times out."""
+
+    loop, core, _mock, _devices = dongle
+
+    with pytest.raises(TimeoutExpiredError):
+        loop.run_coroutine(core.connect("00:11:22:33:44:66", timeout=0.1))
+
+    with pytest.raises(HardwareError):
+        loop.run_coroutine(core.disconnect(2))
+
+
+def test_connect_ignores_other_connections(dongle):
+    """Make sure status events for other connections do not complete a connection attempt."""
+
+    loop, core, mock, _devices = dongle
+    unhandled = []
+    core.add_event_handler(unhandled.append)
+
+    original = mock._connect
+
+    def _connect(payload):
+        packets = original(payload)
+
+        # Report a parameter update on the first connection between the response and the connection event
+        update = dict(packets[-1], handle=0, flags=0x09, address=mock.connections[0])
+        return packets[:1] + [update] + packets[1:]
+
+    async def _run():
+        first = await core.connect(MACS[0])
+
+        mock.handlers[make_command(6, 3)] = _connect
+        second = await core.connect(MACS[1])
+
+        connections = len(mock.connections)
+
+        await core.disconnect(first)
+        await core.disconnect(second)
+
+        return first, second, connections
+
+    first, second, connections = loop.run_coroutine(_run())
+
+    assert (first, second) == (0, 1)
+    assert connections == 2
+    assert [(event.command_class, event.command, event.payload[0]) for event in unhandled] == [(3, 0, 0)]
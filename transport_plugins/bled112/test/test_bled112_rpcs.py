@@ -28,6 +28,7 @@ class TestBLED112RPCs(unittest.TestCase):
         self.bled = BLED112Adapter('test', self._on_scan_callback, self._on_disconnect_callback, stop_check_interval=0.01)
         self._current = None
         self._total = None
+        self._progress_count = 0
 
     def tearDown(self):
         self.bled.stop_sync()
@@ -59,9 +60,44 @@ class TestBLED112RPCs(unittest.TestCase):
         assert self._current == self._total
         assert self._total == (1027 // 20)
 
+    def test_send_script_backpressure(self):
+        """Make sure scripts arrive intact when the dongle runs out of buffers."""
+
+        result = self.bled.connect_sync(1, "00:11:22:33:44:55")
+        assert result['success'] is True
+
+        result = self.bled.open_interface_sync(1, 'script')
+        assert result['success'] is True
+
+        processor = self.bled._command_task
+        original = processor._send_script
+        windows = []
+
+        def _send_script(*args, **kwargs):
+            windows.append(self.adapter.rejected_writes)
+            return original(*args, **kwargs)
+
+        processor._send_script = _send_script
+
+        self.adapter.tx_buffers = 4
+        script = bytes(range(256))*20
+        result = self.bled.send_script_sync(1, script, self._script_progress)
+
+        assert result['success'] is True
+        assert self.dev1.script == script
+        assert self.adapter.rejected_writes > 0
+        assert self._current == self._total == len(script) // 20
+
+        # Every rejected write ends the window so other commands can run, and progress
+        # is reported once per window of at most 64 chunks
+        rejected = self.adapter.rejected_writes
+        assert rejected < len(windows) <= rejected + (len(script) // 20 + 63) // 64
+        assert self._progress_count == len(windows)
+
     def _script_progress(self, current, total):
         self._current = current
         self._total = total
+        self._progress_count += 1
 
     def _on_scan_callback(self, ad_id, info, expiry):
         pass
@@ -0,0 +1,104 @@
+import unittest
+import serial
+from iotile_transport_bled112.hardware.emulator.mock_adv_bled112 import MockAdvertisingBLED112
+from iotile_transport_bled112.bled112_cmd import BGAPIPacket
+import util.dummy_serial
+from iotile_transport_bled112.bled112 import BLED112Adapter, packet_length
+
+
+def split_packets(data):
+    """Split a stream of BGAPI packets generated by the mock into scan events."""
+
+    packets = []
+    while len(data) > 0:
+        length = packet_length(data[:4]) + 4
+        packets.append(BGAPIPacket(is_event=True, command_class=data[2], command=data[3], payload=bytes(data[4:length])))
+        data = data[length:]
+
+    return packets
+
+
+class TestBLED112Scanning(unittest.TestCase):
+    """
+    Test to make sure that the BLED112Adapter filters and counts advertisements
+    """
+
+    def setUp(self):
+        self.old_serial = serial.Serial
+        serial.Serial = util.dummy_serial.Serial
+        self.adapter = MockAdvertisingBLED112(3, advertising_version=2)
+
+        util.dummy_serial.RESPONSE_GENERATOR = self.adapter.generate_response
+
+        self.scanned_devices = []
+        self.reports = []
+        self.bled = BLED112Adapter('test', self._on_scan_callback, passive=True, stop_check_interval=0.01)
+        self.bled.add_callback('on_report', self._on_report_callback)
+        self.bled.reset_scan_stats()
+
+    def tearDown(self):
+        self.bled.stop_sync()
+        serial.Serial = self.old_serial
+
+    def _on_scan_callback(self, ad_id, info, expiry):
+        self.scanned_devices.append(info)
+
+    def _on_report_callback(self, conn_id, report):
+        self.reports.append(report)
+
+    def _process(self, count, unique, update_probability):
+        generator = self.adapter.generate_multiple_adv_packets(count, unique, update_probability)
+        for packet in split_packets(next(generator)):
+            self.bled._process_scan_event(packet)
+
+    def test_v2_throttling(self):
+        """Make sure repeated v2 broadcasts are dropped before being reported."""
+
+        self.bled._throttle_scans = True
+        self.bled._throttle_broadcast = True
+
+        self._process(100, 5, 0)
+
+        metrics = self.bled.get_scan_metrics()
+        assert metrics['scan_events'] == 100
+        assert metrics['v2_advertisements'] == 100
+        assert metrics['duplicate_broadcasts'] == 100 - len(self.scanned_devices)
+        assert metrics['reported_scans'] == len(self.scanned_devices) == 5
+        assert metrics['reported_broadcasts'] == len(self.reports) == 5
+        assert metrics['broadcast_cache_entries'] == 5
+
+        uuids = set(x['uuid'] for x in self.scanned_devices)
+        assert uuids == set(x.origin for x in self.reports)
+        assert all(x['advertising_version'] == 2 for x in self.scanned_devices)
+
+    def test_v2_unthrottled(self):
+        """Make sure every v2 advertisement is reported without throttling."""
+
+        self._process(100, 5, 0)
+
+        assert len(self.scanned_devices) == 100
+        assert len(self.reports) == 100
+        assert self.bled.get_scan_metrics()['duplicate_broadcasts'] == 95
+
+    def test_broadcast_cache_bounded(self):
+        """Make sure the broadcast cache evicts the least recently seen devices."""
+
+        self.bled._broadcast_cache_size = 4
+
+        self._process(20, 0, 100)
+
+        metrics = self.bled.get_scan_metrics()
+        assert metrics['broadcast_cache_entries'] == 4
+        assert metrics['broadcast_cache_evictions'] == 16
+
+    def test_non_iotile_ignored(self):
+        """Make sure advertisements from other devices are counted but not reported."""
+
+        payload = bytes([0xC0, 0, 1, 2, 3, 4, 5, 6, 1, 0xFF, 31]) + bytes(31)
+        self.bled._process_scan_event(BGAPIPacket(is_event=True, command_class=6, command=0, payload=payload))
+
+        metrics = self.bled.get_scan_metrics()
+        assert metrics['scan_events'] == 1
+        assert metrics['v1_advertisements'] == 0
+        assert metrics['v2_advertisements'] == 0
+        assert self.scanned_devices == []
@@ -29,7 +29,6 @@ __license__ = 'Apache License, Version 2.0'
 
 
 import sys
-import time
 import logging
 import threading
 
@@ -87,7 +86,7 @@ class Serial():
         except:
             self.baudrate = DEFAULT_BAUDRATE
 
-        self._data_lock = threading.Lock()
+        self._data_lock = threading.Condition()
         self._logger = logging.getLogger(__name__)
         if VERBOSE:
             _print_out('\nDummy_serial: Initializing')
@@ -124,7 +123,11 @@ class Serial():
         if not self._isOpen:
             raise IOError('Dummy_serial: The port is already closed')
 
-        self._isOpen = False
+        # Wake up any readers waiting for data so they see that the port is closed
+        with self._data_lock:
+            self._isOpen = False
+            self._data_lock.notify_all()
+
         self.port = None
 
     def inject(self, data):
@@ -136,6 +139,7 @@ class Serial():
 
         with self._data_lock:
             self._waiting_data += data
+            self._data_lock.notify_all()
 
     def write(self, inputdata):
         """Write to a port on dummy_serial.
@@ -170,6 +174,7 @@ class Serial():
 
         with self._data_lock:
             self._waiting_data += response
+            self._data_lock.notify_all()
 
 
     def read(self, numberOfBytes):
@@ -183,7 +188,8 @@ class Serial():
 
         Returns a **string** for Python2 and **bytes** for Python3.
 
-        If the response is shorter than numberOfBytes, it will sleep for timeout.
+        If the response is shorter than numberOfBytes, it will wait up to timeout for more data
+        like a real serial port.
         If the response is longer than numberOfBytes, it will return only numberOfBytes bytes.
 
         """
@@ -198,6 +204,9 @@ class Serial():
 
         # Do the actual reading from the waiting data, and simulate the influence of numberOfBytes
         with self._data_lock:
+            self._data_lock.wait_for(lambda: len(self._waiting_data) >= numberOfBytes or not self._isOpen,
+                                     timeout=self.timeout)
+
             if numberOfBytes == len(self._waiting_data):
                 returnstring = self._waiting_data
                 self._waiting_data = NO_DATA_PRESENT
@@ -211,9 +220,8 @@ class Serial():
             else: # Wait for timeout, as we have asked for more data than available
                 if VERBOSE:
                     _print_out('Dummy_serial: The numberOfBytes to read is larger than the available data. ' + \
-                        'Will sleep until timeout. Available  data: {!r} (length = {}), numberOfBytes: {}'.format( \
+                        'Returning what arrived before the timeout. Available data: {!r} (length = {}), numberOfBytes: {}'.format( \
                         self._waiting_data, len(self._waiting_data), numberOfBytes))
-                time.sleep(self.timeout)
                 returnstring = self._waiting_data
                 self._waiting_data = NO_DATA_PRESENT
 
@@ -53,13 +53,15 @@ class AsyncioSocketConnection:
         Returns:
             bytes: Encoded data object
         """
-        packed_header = await self.reader.read(struct.calcsize(self._HEADERFORMAT))
+        # read() may return less than a full message once messages are larger than the
+        # stream buffer, so always wait for exactly the header and payload length.
+        packed_header = await self.reader.readexactly(struct.calcsize(self._HEADERFORMAT))
         magic, encoded_len = struct.unpack(self._HEADERFORMAT, packed_header)
 
         if magic != self._ARCHMAGIC:
             raise struct.error
 
-        encoded = await self.reader.read(encoded_len)
+        encoded = await self.reader.readexactly(encoded_len)
         return encoded
 
 
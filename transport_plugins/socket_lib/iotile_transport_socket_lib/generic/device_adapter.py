@@ -1,17 +1,19 @@
 # This file is copyright Arch Systems, Inc.
 # Except as otherwise provided in the relevant LICENSE file, all rights are reserved.
 
-import base64
 import logging
 import asyncio
+import collections
 from iotile.core.hw.transport.adapter import StandardDeviceAdapter
 from iotile.core.utilities.schema_verify import NoneVerifier
 from iotile.core.utilities import SharedLoop
 from iotile.core.hw.virtual import unpack_rpc_response
 from iotile.core.hw.reports import IOTileReportParser
-from iotile.core.hw.exceptions import DeviceAdapterError
+from iotile.core.hw.exceptions import DeviceAdapterError, VALID_RPC_EXCEPTIONS
 from iotile.core.exceptions import ExternalError
 from iotile_transport_socket_lib.protocol import OPERATIONS, NOTIFICATIONS, COMMANDS
+from iotile_transport_socket_lib.protocol.versions import encode_bytes
+from .packing import script_hash
 from .socket_client import AsyncSocketClient
 
 class SocketDeviceAdapter(StandardDeviceAdapter):
@@ -33,11 +35,17 @@ class SocketDeviceAdapter(StandardDeviceAdapter):
         self.set_config('probe_required', True)
         self.set_config('probe_supported', True)
 
+        # Scripts larger than one chunk are sent as fragments with up to script_window unacknowledged
+        self.set_config('script_chunk_size', 32*1024)
+        self.set_config('script_window', 4)
+
         # Set logger
         self.logger = logging.getLogger(__name__)
         self.logger.addHandler(logging.NullHandler())
 
         self._report_parser = IOTileReportParser()
+        self._batch_rpcs = True
+        self._fragment_scripts = True
 
         self.client = AsyncSocketClient(implementation, loop=loop)
         self.client.register_event(OPERATIONS.NOTIFY_DEVICE_FOUND, self._on_device_found,
@@ -138,7 +146,7 @@ class SocketDeviceAdapter(StandardDeviceAdapter):
         self._ensure_connection(conn_id, True)
         connection_string = self._get_property(conn_id, "connection_string")
 
-        msg = dict(address=address, rpc_id=rpc_id, payload=base64.b64encode(payload),
+        msg = dict(address=address, rpc_id=rpc_id, payload=encode_bytes(payload, self.client.binary),
                    timeout=timeout, connection_string=connection_string)
 
         response = await self._send_command(OPERATIONS.SEND_RPC, msg, COMMANDS.SendRPCResponse,
@@ -147,9 +155,59 @@ class SocketDeviceAdapter(StandardDeviceAdapter):
         return unpack_rpc_response(response.get('status'), response.get('payload'),
                                    rpc_id=rpc_id, address=address)
 
+    async def send_rpcs(self, conn_id, rpcs, timeout):
+        """Send a batch of RPCs to a device in a single command.
+
+        Servers that do not support batched RPCs are detected on the first
+        batch and then each RPC is sent individually instead.
+
+        See :meth:`AbstractDeviceAdapter.send_rpcs`.
+        """
+
+        if not self._batch_rpcs:
+            return await super(SocketDeviceAdapter, self).send_rpcs(conn_id, rpcs, timeout)
+
+        self._ensure_connection(conn_id, True)
+        connection_string = self._get_property(conn_id, "connection_string")
+
+        rpcs = list(rpcs)
+        msg = dict(connection_string=connection_string, timeout=timeout,
+                   rpcs=[dict(address=address, rpc_id=rpc_id, payload=encode_bytes(payload, self.client.binary))
+                         for address, rpc_id, payload in rpcs])
+
+        try:
+            responses = await self._send_command(OPERATIONS.SEND_RPCS, msg, COMMANDS.SendRPCsResponse,
+                                                 timeout=timeout * max(len(rpcs), 1))
+        except DeviceAdapterError as err:
+            if err.reason != 'Command %s not found' % OPERATIONS.SEND_RPCS:
+                raise
+
+            self.logger.info("Server does not support batched RPCs, sending them individually")
+            self._batch_rpcs = False
+            return await super(SocketDeviceAdapter, self).send_rpcs(conn_id, rpcs, timeout)
+
+        results = []
+        for (address, rpc_id, _payload), response in zip(rpcs, responses):
+            try:
+                result = unpack_rpc_response(response.get('status'), response.get('payload'),
+                                             rpc_id=rpc_id, address=address)
+            except VALID_RPC_EXCEPTIONS as err:
+                result = err
+
+            results.append(result)
+
+        return results
+
     async def send_script(self, conn_id, data):
         """Send a a script to this IOTile device
 
+        Scripts larger than the ``script_chunk_size`` config are split into
+        fragments and up to ``script_window`` fragments are in flight at a
+        time.  A progress event is generated as each fragment is acknowledged,
+        followed by the progress of sending the reassembled script to the
+        device.  If a transfer is interrupted, sending the same script again
+        only sends the fragments that the server is missing.
+
         Args:
             conn_id (int): A unique identifier that will refer to this connection
             data (bytes): the script to send to the device
@@ -158,10 +216,75 @@ class SocketDeviceAdapter(StandardDeviceAdapter):
         self._ensure_connection(conn_id, True)
         connection_string = self._get_property(conn_id, "connection_string")
 
+        chunk_size = self.get_config('script_chunk_size')
+        if self._fragment_scripts and len(data) > chunk_size:
+            fragment_count = -(-len(data) // chunk_size)
+
+            try:
+                await self._send_script_fragments(connection_string, data, fragment_count)
+                return
+            except DeviceAdapterError as err:
+                if err.reason != 'Command %s not found' % OPERATIONS.QUERY_SCRIPT:
+                    raise
+
+                self.logger.info("Server does not support fragmented scripts, sending in one message")
+                self._fragment_scripts = False
+
         msg = dict(connection_string=connection_string, fragment_count=1, fragment_index=0,
-                   script=base64.b64encode(data))
+                   script=encode_bytes(data, self.client.binary))
         await self._send_command(OPERATIONS.SEND_SCRIPT, msg, COMMANDS.SendScriptResponse)
 
+    async def _send_script_fragments(self, connection_string, data, fragment_count):
+        binary = self.client.binary
+        fragment_size = -(-len(data) // fragment_count)
+        header = dict(connection_string=connection_string, fragment_count=fragment_count,
+                      total_length=len(data), script_hash=encode_bytes(script_hash(data), binary))
+
+        status = await self._send_command(OPERATIONS.QUERY_SCRIPT, header, COMMANDS.QueryScriptResponse)
+        received = set(status.get('received'))
+        if len(received) > 0:
+            self.logger.info("Resuming script transfer with %d of %d fragments already sent",
+                             len(received), fragment_count)
+
+        view = memoryview(data)
+        missing = collections.deque(i for i in range(fragment_count) if i not in received)
+        in_flight = set()
+        acked = len(received)
+        ack = None
+
+        async def _send_fragment(index):
+            fragment = view[index * fragment_size:(index + 1) * fragment_size]
+            msg = dict(header, fragment_index=index, script=encode_bytes(fragment, binary))
+            return await self._send_command(OPERATIONS.SEND_SCRIPT, msg, COMMANDS.SendScriptResponse)
+
+        try:
+            while len(missing) > 0 or len(in_flight) > 0:
+                while len(missing) > 0 and len(in_flight) < self.get_config('script_window'):
+                    # Hold back the last fragment until every other one is acknowledged, since
+                    # it starts sending the script to the device and its progress events
+                    if len(missing) == 1 and len(in_flight) > 0:
+                        break
+
+                    in_flight.add(asyncio.ensure_future(_send_fragment(missing.popleft())))
+
+                done, in_flight = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    ack = task.result()
+                    acked += 1
+
+                    # The last fragment is only acknowledged once the script is on the device
+                    if acked < fragment_count:
+                        await self.notify_progress(connection_string, 'script', acked, fragment_count, wait=True)
+        finally:
+            for task in in_flight:
+                task.cancel()
+
+        # If the server lost earlier fragments, the final ack shows an incomplete script that was never sent
+        if ack is None or ack.get('received_count') != fragment_count or ack.get('fragment_count') != fragment_count:
+            received_count = None if ack is None else ack.get('received_count')
+            raise DeviceAdapterError(None, OPERATIONS.SEND_SCRIPT,
+                                     'server only received %s of %d script fragments' % (received_count, fragment_count))
+
     async def _on_device_found(self, device):
         """Callback function called when a new device has been scanned by the probe.
 
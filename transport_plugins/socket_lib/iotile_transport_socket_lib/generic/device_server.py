@@ -1,17 +1,72 @@
 """Generic implementation of serving access to a device over websockets."""
 
 import logging
-import base64
+import struct
+import time
+from collections import OrderedDict
+from hmac import compare_digest
+from iotile.core.exceptions import ArgumentError
 from iotile.core.utilities import SharedLoop
 from iotile.core.hw.transport.server import StandardDeviceServer
 from iotile.core.hw.exceptions import VALID_RPC_EXCEPTIONS, DeviceServerError, DeviceAdapterError
 from iotile.core.hw.virtual import pack_rpc_response
+from iotile.core.hw.update import UpdateScript
 from iotile_transport_socket_lib.protocol import COMMANDS, OPERATIONS
+from iotile_transport_socket_lib.protocol.versions import encode_bytes
 from . import ServerCommandError
+from .packing import script_hash
 from .socket_server import AsyncSocketServer
 
 _MISSING = object()
 
+
+class _PartialScript:
+    """A script that is being received one fragment at a time."""
+
+    def __init__(self, total_length, fragment_count, expected_hash):
+        self.total_length = total_length
+        self.fragment_count = fragment_count
+        self.fragment_size = -(-total_length // fragment_count)
+        self.expected_hash = expected_hash
+        self.data = bytearray(total_length)
+        self.received = set()
+        self.last_used = time.monotonic()
+
+    def add_fragment(self, index, fragment):
+        """Store a fragment, returning False if it does not fit in the script."""
+
+        if index < 0 or index >= self.fragment_count:
+            return False
+
+        start = index * self.fragment_size
+        end = min(start + self.fragment_size, self.total_length)
+        if len(fragment) != end - start:
+            return False
+
+        self.data[start:end] = fragment
+        self.received.add(index)
+        return True
+
+    @property
+    def complete(self):
+        return len(self.received) == self.fragment_count
+
+    def verify(self):
+        """Check the reassembled script against its hash and any embedded UpdateScript hash."""
+
+        if not compare_digest(script_hash(self.data), self.expected_hash):
+            return False
+
+        if len(self.data) >= UpdateScript.SCRIPT_HEADER_LENGTH and \
+                struct.unpack_from("<L", self.data, 16)[0] == UpdateScript.SCRIPT_MAGIC:
+            try:
+                UpdateScript.ParseHeader(self.data)
+            except ArgumentError:
+                return False
+
+        return True
+
+
 class SocketDeviceServer(StandardDeviceServer):
     """A device server for connections to multiple devices over any socket implementation
 
@@ -23,11 +78,23 @@ class SocketDeviceServer(StandardDeviceServer):
             run in.  Defaults to the shared global loop.
     """
 
+    MAX_PARTIAL_SCRIPTS = 8
+    """The maximum number of in progress or interrupted script transfers to keep for resuming later."""
+
+    MAX_SCRIPT_LENGTH = 4*1024*1024
+    """The largest fragmented script in bytes that a client may send."""
+
+    PARTIAL_SCRIPT_IDLE_TIME = 60.0
+    """The seconds after its last fragment that a transfer is considered interrupted and may be evicted."""
+
     def __init__(self, adapter, implementation, args=None, *, loop=SharedLoop):
         StandardDeviceServer.__init__(self, adapter, args, loop=loop)
 
         self.server = AsyncSocketServer(implementation, loop=loop)
 
+        # Partial scripts are not tied to a client so that they can be resumed after a reconnect
+        self._partial_scripts = OrderedDict()
+
         self.chunk_size = 4*1024  # Config chunk size to be 4kb for traces and reports streaming
         self._logger = logging.getLogger(__name__)
 
@@ -39,7 +106,9 @@ class SocketDeviceServer(StandardDeviceServer):
         self.server.register_command(OPERATIONS.CLOSE_INTERFACE, self.close_interface_message,
                                      COMMANDS.CloseInterfaceCommand)
         self.server.register_command(OPERATIONS.SEND_RPC, self.send_rpc_message, COMMANDS.SendRPCCommand)
+        self.server.register_command(OPERATIONS.SEND_RPCS, self.send_rpcs_message, COMMANDS.SendRPCsCommand)
         self.server.register_command(OPERATIONS.SEND_SCRIPT, self.send_script_message, COMMANDS.SendScriptCommand)
+        self.server.register_command(OPERATIONS.QUERY_SCRIPT, self.query_script_message, COMMANDS.QueryScriptCommand)
         self.server.register_command(OPERATIONS.DEBUG, self.debug_command_message, COMMANDS.SendDebugCommand)
 
         # Setup our hooks whenever a client connects or disconnects
@@ -183,9 +252,44 @@ class SocketDeviceServer(StandardDeviceServer):
         status, response = pack_rpc_response(response, err)
         return {
             'status': status,
-            'payload': base64.b64encode(response)
+            'payload': encode_bytes(response, context.binary)
         }
 
+    async def send_rpcs_message(self, message, context):
+        """Handle a send_rpcs message.
+
+        See :meth:`AbstractDeviceAdapter.send_rpcs`.
+        """
+
+        conn_string = message.get('connection_string')
+        timeout = message.get('timeout')
+        rpcs = [(x.get('address'), x.get('rpc_id'), x.get('payload')) for x in message.get('rpcs')]
+        client_id = context.user_data
+
+        self._logger.debug("Calling %d RPCs on %s", len(rpcs), conn_string)
+
+        try:
+            responses = await self.send_rpcs(client_id, conn_string, rpcs, timeout=timeout)
+        except (DeviceAdapterError, DeviceServerError):
+            raise
+        except Exception as internal_err:
+            self._logger.warning("Unexpected exception calling RPCs", exc_info=True)
+            raise ServerCommandError('send_rpcs', str(internal_err)) from internal_err
+
+        results = []
+        for response in responses:
+            if isinstance(response, Exception):
+                status, response = pack_rpc_response(None, response)
+            else:
+                status, response = pack_rpc_response(response, None)
+
+            results.append({
+                'status': status,
+                'payload': encode_bytes(response, context.binary)
+            })
+
+        return results
+
     async def send_script_message(self, message, context):
         """Handle a send_script message.
 
@@ -194,12 +298,97 @@ class SocketDeviceServer(StandardDeviceServer):
 
         script = message.get('script')
         conn_string = message.get('connection_string')
+        fragment_count = message.get('fragment_count')
         client_id = context.user_data
 
-        if message.get('fragment_count') != 1:
-            raise DeviceServerError(client_id, conn_string, 'send_script', 'fragmented scripts are not yet supported')
+        if fragment_count == 1:
+            await self.send_script(client_id, conn_string, script)
+            return None
+
+        # Only the first fragment may start a transfer so that the rest of a transfer whose
+        # partial script was evicted is rejected instead of silently starting over
+        create = message.get('fragment_index') == 0
+        partial = self._get_partial_script(client_id, conn_string, message, 'send_script', create)
+        if not partial.add_fragment(message.get('fragment_index'), script):
+            raise DeviceServerError(client_id, conn_string, 'send_script',
+                                    'invalid fragment %d of %d' % (message.get('fragment_index'), fragment_count))
+
+        ack = dict(received_count=len(partial.received), fragment_count=fragment_count)
+        if not partial.complete:
+            return ack
+
+        # Only the handler for the last fragment to arrive gets here since there is no await above
+        del self._partial_scripts[(conn_string, partial.expected_hash)]
+
+        if not partial.verify():
+            raise DeviceServerError(client_id, conn_string, 'send_script', 'script hash mismatch after reassembly')
+
+        await self.send_script(client_id, conn_string, bytes(partial.data))
+        return ack
+
+    async def query_script_message(self, message, context):
+        """Handle a query_script message.
+
+        Returns the fragments of a multi-fragment script that have already
+        been received so that a client can resume an interrupted transfer.
+        """
+
+        conn_string = message.get('connection_string')
+        client_id = context.user_data
+
+        partial = self._get_partial_script(client_id, conn_string, message, 'query_script')
+        return dict(received=sorted(partial.received))
+
+    def _get_partial_script(self, client_id, conn_string, message, operation, create=True):
+        total_length = message.get('total_length')
+        fragment_count = message.get('fragment_count')
+        expected_hash = message.get('script_hash')
+
+        if total_length is None or expected_hash is None:
+            raise DeviceServerError(client_id, conn_string, operation,
+                                    'fragmented scripts must include total_length and script_hash')
+
+        if fragment_count < 1 or total_length < fragment_count:
+            raise DeviceServerError(client_id, conn_string, operation,
+                                    'invalid fragment count %d for a %d byte script' % (fragment_count, total_length))
+
+        if total_length > self.MAX_SCRIPT_LENGTH:
+            raise DeviceServerError(client_id, conn_string, operation,
+                                    'script of %d bytes is larger than the maximum of %d bytes'
+                                    % (total_length, self.MAX_SCRIPT_LENGTH))
+
+        key = (conn_string, expected_hash)
+        partial = self._partial_scripts.get(key)
+        if partial is not None and (partial.total_length != total_length or partial.fragment_count != fragment_count):
+            del self._partial_scripts[key]
+            partial = None
+
+        if partial is None:
+            if not create:
+                raise DeviceServerError(client_id, conn_string, operation,
+                                        'unknown script transfer, it must be restarted from its first fragment')
+
+            self._evict_partial_script(client_id, conn_string, operation)
+            partial = _PartialScript(total_length, fragment_count, expected_hash)
+            self._partial_scripts[key] = partial
+        else:
+            self._partial_scripts.move_to_end(key)
+            partial.last_used = time.monotonic()
+
+        return partial
+
+    def _evict_partial_script(self, client_id, conn_string, operation):
+        """Make room for a new partial script by evicting the least recently used interrupted one."""
+
+        if len(self._partial_scripts) < self.MAX_PARTIAL_SCRIPTS:
+            return
+
+        _key, oldest = next(iter(self._partial_scripts.items()))
+        if time.monotonic() - oldest.last_used < self.PARTIAL_SCRIPT_IDLE_TIME:
+            raise DeviceServerError(client_id, conn_string, operation,
+                                    'too many script transfers in progress, try again later')
 
-        await self.send_script(client_id, conn_string, script)
+        self._partial_scripts.popitem(last=False)
 
     async def debug_command_message(self, message, context):
         """Handle a debug message.
@@ -232,14 +421,15 @@ class SocketDeviceServer(StandardDeviceServer):
         #TODO: Support sending disconnection events
 
         conn_string, event_name, event = event_tuple
+        binary = self.server.is_binary(user_data)
 
         if event_name == 'report':
             report = event.serialize()
-            report['encoded_report'] = base64.b64encode(report['encoded_report'])
+            report['encoded_report'] = encode_bytes(report['encoded_report'], binary)
             msg_payload = dict(connection_string=conn_string, serialized_report=report)
             msg_name = OPERATIONS.NOTIFY_REPORT
         elif event_name == 'trace':
-            encoded_payload = base64.b64encode(event)
+            encoded_payload = encode_bytes(event, binary)
             msg_payload = dict(connection_string=conn_string, payload=encoded_payload)
             msg_name = OPERATIONS.NOTIFY_TRACE
         elif event_name == 'progress':
@@ -251,7 +441,7 @@ class SocketDeviceServer(StandardDeviceServer):
             msg_name = OPERATIONS.NOTIFY_DEVICE_FOUND
         elif event_name == 'broadcast':
             report = event.serialize()
-            report['encoded_report'] = base64.b64encode(report['encoded_report'])
+            report['encoded_report'] = encode_bytes(report['encoded_report'], binary)
             msg_payload = dict(connection_string=conn_string, serialized_report=report)
             msg_name = OPERATIONS.NOTIFY_BROADCAST
         else:
@@ -1,21 +1,57 @@
 """Helper functions for packing/unpacking msgpack messages."""
 
 import datetime
+import hashlib
+import struct
 import msgpack
 
+# Extension type code for datetimes packed by the binary protocol
+DATETIME_EXT_TYPE = 1
+
+_EPOCH = datetime.datetime(1970, 1, 1)
+_DATETIME_EXT = struct.Struct(">q")
+
 
 def unpack(message):
-    """Unpack a binary msgpacked message."""
+    """Unpack a binary msgpacked message.
+
+    Datetimes packed by either protocol version are decoded.
+    """
+
+    return msgpack.unpackb(message, raw=False, object_hook=_decode_datetime, ext_hook=_decode_ext)
+
 
-    return msgpack.unpackb(message, raw=False, object_hook=_decode_datetime)
+def pack(message, binary=False):
+    """Pack a message into a binary packed message with datetime handling.
 
+    Args:
+        message (object): The message to pack.
+        binary (bool): Pack datetimes as a compact extension type rather than
+            as a formatted string.  Only pass True if the other side has
+            negotiated the binary protocol.
 
-def pack(message):
-    """Pack a message into a binary packed message with datetime handling."""
+    Returns:
+        bytes: The packed message.
+    """
+
+    if binary:
+        return msgpack.packb(message, use_bin_type=True, default=_encode_datetime_ext)
 
     return msgpack.packb(message, use_bin_type=True, default=_encode_datetime)
 
 
+def script_hash(script):
+    """Calculate the hash used to check that a fragmented script was received intact.
+
+    This is a SHA-256 hash of the entire script truncated to 16 bytes.  It
+    uses the same truncation as the hash in an UpdateScript header but is not
+    the same value, since UpdateScript only hashes the data after its 16 byte
+    header.
+    """
+
+    return hashlib.sha256(script).digest()[:16]
+
+
 def _decode_datetime(obj):
     """Decode a msgpack'ed datetime."""
 
@@ -30,3 +66,29 @@ def _encode_datetime(obj):
     if isinstance(obj, datetime.datetime):
         obj = {'__datetime__': True, 'as_str': obj.strftime("%Y%m%dT%H:%M:%S.%f").encode()}
     return obj
+
+
+def _encode_datetime_ext(obj):
+    """Encode a datetime as microseconds since the epoch.
+
+    Naive datetimes are assumed to be in UTC and timezone aware datetimes
+    are converted to UTC, so all datetimes are decoded as naive UTC.
+    """
+
+    if isinstance(obj, datetime.datetime):
+        if obj.tzinfo is not None:
+            obj = obj.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+
+        delta = obj - _EPOCH
+        micros = (delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds
+        return msgpack.ExtType(DATETIME_EXT_TYPE, _DATETIME_EXT.pack(micros))
+
+    raise TypeError("Cannot serialize %r" % (obj,))
+
+
+def _decode_ext(code, data):
+    if code == DATETIME_EXT_TYPE:
+        micros, = _DATETIME_EXT.unpack(data)
+        return _EPOCH + datetime.timedelta(microseconds=micros)
+
+    return msgpack.ExtType(code, data)
@@ -6,8 +6,11 @@ from iotile.core.exceptions import ExternalError, ValidationError
 from iotile.core.utilities.async_tools import OperationManager, SharedLoop
 from iotile.core.utilities.schema_verify import Verifier
 from iotile_transport_socket_lib.generic.packing import pack, unpack
+from iotile_transport_socket_lib.protocol import COMMANDS
 from iotile_transport_socket_lib.protocol.messages import VALID_SERVER_MESSAGE
-from iotile_transport_socket_lib.protocol.operations import NOTIFY_SOCKET_DISCONNECT
+from iotile_transport_socket_lib.protocol.operations import NOTIFY_SOCKET_DISCONNECT, HELLO
+from iotile_transport_socket_lib.protocol.versions import LEGACY_PROTOCOL, BINARY_PROTOCOL, CURRENT_PROTOCOL, \
+    select_verifier
 
 class AsyncSocketClient:
     """An asynchronous socket client that validates messages received.
@@ -24,6 +27,11 @@ class AsyncSocketClient:
     Messages are packed using msgpack in a binary format and are decoded and
     validated automatically.
 
+    When the client connects it asks the server for the newest protocol
+    version that both sides support.  The negotiated version is stored in
+    ``protocol_version`` and servers that do not support negotiation use
+    the legacy protocol.
+
     Args:
         implementation (AbstractSocketClient): The implementation of the socket client
             that will be used for data transport
@@ -31,10 +39,14 @@ class AsyncSocketClient:
             run in, or None to use the default shared background loop.
         logger_name (str): Optional name for the logger we should use to
             log messages.
+        protocol_version (int): The newest protocol version that this client
+            should ask for.  Defaults to the newest version supported.
     """
 
-    def __init__(self, implementation, loop=SharedLoop, logger_name=__name__):
+    def __init__(self, implementation, loop=SharedLoop, logger_name=__name__, protocol_version=CURRENT_PROTOCOL):
         self._implementation = implementation
+        self._max_protocol_version = protocol_version
+        self.protocol_version = LEGACY_PROTOCOL
 
         self._connection_task = None
         self._logger = logging.getLogger(logger_name)
@@ -83,6 +95,27 @@ class AsyncSocketClient:
         await self._implementation.connect()
         self._connection_task = self._loop.add_task(self._manage_connection(), name=name)
 
+        self.protocol_version = LEGACY_PROTOCOL
+        if self._max_protocol_version > LEGACY_PROTOCOL:
+            await self._negotiate_protocol()
+
+    @property
+    def binary(self):
+        """Whether binary fields are sent as raw bytes to the server."""
+
+        return self.protocol_version >= BINARY_PROTOCOL
+
+    async def _negotiate_protocol(self):
+        try:
+            response = await self.send_command(HELLO, dict(protocol_version=self._max_protocol_version),
+                                               COMMANDS.HelloResponse)
+        except ExternalError:
+            self._logger.debug("Server does not support protocol negotiation, using legacy protocol")
+            return
+
+        self.protocol_version = response.get('protocol_version')
+        self._logger.debug("Negotiated protocol version %d", self.protocol_version)
+
     async def stop(self):
         """Stop this socket client and disconnect from the server.
 
@@ -128,7 +161,7 @@ class AsyncSocketClient:
         msg = dict(type='command', operation=command, uuid=cmd_uuid,
                    payload=args)
 
-        packed = pack(msg)
+        packed = pack(msg, self.binary)
 
         # Note: register future before sending to avoid race conditions
         response_future = self._manager.wait_for(type="response", uuid=cmd_uuid,
@@ -144,7 +177,7 @@ class AsyncSocketClient:
         if validator is None:
             return response.get('payload')
 
-        return validator.verify(response.get('payload'))
+        return select_verifier(validator, self.binary).verify(response.get('payload'))
 
     def _raise_error(self, command, response):
         exc_name = response.get('exception_class')
@@ -208,8 +241,9 @@ class AsyncSocketClient:
         async def _validate_and_call(message):
             payload = message.get('payload')
 
+            # Events are marked when binary fields are sent as raw bytes
             try:
-                payload = validator.verify(payload)
+                payload = select_verifier(validator, message.get('binary', False)).verify(payload)
             except ValidationError:
                 self._logger.warning("Dropping invalid payload for event %s, payload=%s",
                                      name, payload)
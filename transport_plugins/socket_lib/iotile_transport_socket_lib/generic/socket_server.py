@@ -6,7 +6,10 @@ import asyncio
 from iotile.core.exceptions import ValidationError
 
 from iotile.core.utilities.async_tools import SharedLoop
+from iotile_transport_socket_lib.protocol import OPERATIONS, COMMANDS
 from iotile_transport_socket_lib.protocol.messages import VALID_CLIENT_MESSAGE
+from iotile_transport_socket_lib.protocol.versions import LEGACY_PROTOCOL, BINARY_PROTOCOL, CURRENT_PROTOCOL, \
+    select_verifier
 from .packing import pack, unpack
 from .errors import ServerCommandError
 
@@ -17,6 +20,13 @@ class _ConnectionContext:
         self.connection = con
         self.operations = set()
         self.user_data = None
+        self.protocol_version = LEGACY_PROTOCOL
+
+    @property
+    def binary(self):
+        """Whether binary fields are sent as raw bytes on this connection."""
+
+        return self.protocol_version >= BINARY_PROTOCOL
 
 
 class AsyncSocketServer:
@@ -30,6 +40,11 @@ class AsyncSocketServer:
     The server can also, at any time, send an EVENT message to the client,
     which is able to register a callback for the event.
 
+    Each connection starts with the legacy protocol and switches to the
+    binary protocol if the client asks for it with a ``hello`` command.
+    Command handlers can check ``context.binary`` to see which protocol a
+    connection is using.
+
     This class is the server side implementation of AsyncSocketClient
     and is designed to be used with that class.
 
@@ -49,6 +64,7 @@ class AsyncSocketServer:
         self.implementation = implementation
 
         self._commands = {}
+        self._contexts = {}
         self._server_task = None
         self._loop = loop
         self._logger = logging.getLogger(__name__)
@@ -57,6 +73,8 @@ class AsyncSocketServer:
         logger.setLevel(logging.ERROR)
         logger.addHandler(logging.NullHandler())
 
+        self.register_command(OPERATIONS.HELLO, self._hello, COMMANDS.HelloCommand)
+
     async def prepare_conn(self, _con):
         """Called when a new connection is established.
 
@@ -117,7 +135,9 @@ class AsyncSocketServer:
             handler (coroutine function): A coroutine function that will be
                 called whenever this command is received.
             validator (SchemaVerifier): A validator object for checking the
-                command payload before calling this handler.
+                command payload before calling this handler.  If this is a
+                VersionedVerifier, the verifier for the connection's protocol
+                is used.
         """
 
         self._commands[name] = (handler, validator)
@@ -192,15 +212,40 @@ class AsyncSocketServer:
                 as the event's payload.
         """
 
+        binary = self.is_binary(con)
+
         message = dict(type="event", name=name, payload=payload)
-        encoded = pack(message)
+        if binary:
+            message['binary'] = True
+
+        encoded = pack(message, binary)
         try:
             await self.implementation.send(con, encoded)
         except Exception:
             self._logger.debug("Error sending data")
 
+    def is_binary(self, con):
+        """Check if a connection has negotiated the binary protocol.
+
+        Args:
+            con (a connection object): The connection to check.
+
+        Returns:
+            bool: Whether binary fields should be sent as raw bytes.
+        """
+
+        context = self._contexts.get(con)
+        return context is not None and context.binary
+
+    async def _hello(self, payload, context):
+        context.protocol_version = max(LEGACY_PROTOCOL, min(payload.get('protocol_version'), CURRENT_PROTOCOL))
+        self._logger.debug("Negotiated protocol version %d", context.protocol_version)
+
+        return dict(protocol_version=context.protocol_version)
+
     async def _manage_connection(self, con, _path):
         context = _ConnectionContext(self, con)
+        self._contexts[con] = context
 
         try:
             try:
@@ -226,6 +271,7 @@ class AsyncSocketServer:
         except Exception:
             self._logger.debug("Error sending data")
         finally:
+            self._contexts.pop(con, None)
             await _cancel_operations(context.operations)
 
             try:
@@ -258,11 +304,11 @@ class AsyncSocketServer:
             response = _error_response(reason, cmd_uuid, exc=type(err).__name__)
 
         try:
-            encoded_resp = pack(response)
+            encoded_resp = pack(response, context.binary)
         except:
             self._logger.exception("Unable to pack response message: %s", response)
             response = _error_response("Unable to pack response message", cmd_uuid)
-            encoded_resp = pack(response)
+            encoded_resp = pack(response, context.binary)
 
         self._logger.debug("Sending response: %s", response)
 
@@ -285,7 +331,7 @@ class AsyncSocketServer:
         handler, validator = handler_info
 
         try:
-            payload = validator.verify(payload)
+            payload = select_verifier(validator, context.binary).verify(payload)
         except ValidationError as err:
             raise ServerCommandError(name, 'Invalid payload: %s' % err.params.get('reason'))
 
@@ -1,5 +1,6 @@
 from . import notifications as NOTIFICATIONS
 from . import commands as COMMANDS
 from . import operations as OPERATIONS
+from .versions import LEGACY_PROTOCOL, BINARY_PROTOCOL, CURRENT_PROTOCOL
 
-__all__ = ['NOTIFICATIONS', 'COMMANDS', 'OPERATIONS']
\ No newline at end of file
+__all__ = ['NOTIFICATIONS', 'COMMANDS', 'OPERATIONS', 'LEGACY_PROTOCOL', 'BINARY_PROTOCOL', 'CURRENT_PROTOCOL']
\ No newline at end of file
@@ -1,8 +1,16 @@
 """List of known command and response payloads."""
 
-from iotile.core.utilities.schema_verify import BytesVerifier, DictionaryVerifier, \
+from iotile.core.utilities.schema_verify import DictionaryVerifier, \
     EnumVerifier, FloatVerifier, IntVerifier, StringVerifier, NoneVerifier, Verifier, \
-    OptionsVerifier
+    OptionsVerifier, ListVerifier
+from .versions import VersionedVerifier, bytes_verifier
+
+# Negotiate the protocol version, the server responds with the version that will be used
+HelloCommand = DictionaryVerifier()
+HelloCommand.add_required('protocol_version', IntVerifier())
+
+HelloResponse = DictionaryVerifier()
+HelloResponse.add_required('protocol_version', IntVerifier())
 
 # Connect Command
 ConnectCommand = DictionaryVerifier()
@@ -39,28 +47,84 @@ ProbeCommand = NoneVerifier()
 ProbeResponse = NoneVerifier()
 
 # Send RPC
-SendRPCCommand = DictionaryVerifier()
-SendRPCCommand.add_required('connection_string', StringVerifier())
-SendRPCCommand.add_required('address', IntVerifier())
-SendRPCCommand.add_required('rpc_id', IntVerifier())
-SendRPCCommand.add_required('timeout', FloatVerifier())
-SendRPCCommand.add_required('payload', BytesVerifier(encoding="base64"))
+def _send_rpc_schemas(binary):
+    command = DictionaryVerifier()
+    command.add_required('connection_string', StringVerifier())
+    command.add_required('address', IntVerifier())
+    command.add_required('rpc_id', IntVerifier())
+    command.add_required('timeout', FloatVerifier())
+    command.add_required('payload', bytes_verifier(binary))
+
+    response = DictionaryVerifier()
+    response.add_required('status', IntVerifier())
+    response.add_required('payload', bytes_verifier(binary))
+
+    # Send a batch of RPCs, executed in order
+    batched_rpc = DictionaryVerifier()
+    batched_rpc.add_required('address', IntVerifier())
+    batched_rpc.add_required('rpc_id', IntVerifier())
+    batched_rpc.add_required('payload', bytes_verifier(binary))
+
+    batch_command = DictionaryVerifier()
+    batch_command.add_required('connection_string', StringVerifier())
+    batch_command.add_required('timeout', FloatVerifier())
+    batch_command.add_required('rpcs', ListVerifier(batched_rpc))
+
+    return command, response, batch_command, ListVerifier(response)
+
+
+def _send_script_command(binary):
+    command = DictionaryVerifier()
+    command.add_required('connection_string', StringVerifier())
+    command.add_required('fragment_count', IntVerifier())
+    command.add_required('fragment_index', IntVerifier())
+    command.add_required('script', bytes_verifier(binary))
+
+    # Required when a script is sent in more than one fragment
+    command.add_optional('script_hash', bytes_verifier(binary))
+    command.add_optional('total_length', IntVerifier())
 
-SendRPCResponse = DictionaryVerifier()
-SendRPCResponse.add_required('status', IntVerifier())
-SendRPCResponse.add_required('payload', BytesVerifier(encoding="base64"))
+    return command
+
+
+def _query_script_command(binary):
+    command = DictionaryVerifier()
+    command.add_required('connection_string', StringVerifier())
+    command.add_required('fragment_count', IntVerifier())
+    command.add_required('script_hash', bytes_verifier(binary))
+    command.add_required('total_length', IntVerifier())
+
+    return command
+
+
+_LEGACY_RPC = _send_rpc_schemas(False)
+_BINARY_RPC = _send_rpc_schemas(True)
+
+SendRPCCommand = VersionedVerifier(_LEGACY_RPC[0], _BINARY_RPC[0])
+SendRPCResponse = VersionedVerifier(_LEGACY_RPC[1], _BINARY_RPC[1])
+SendRPCsCommand = VersionedVerifier(_LEGACY_RPC[2], _BINARY_RPC[2])
+SendRPCsResponse = VersionedVerifier(_LEGACY_RPC[3], _BINARY_RPC[3])
 
 # Send script
-SendScriptCommand = DictionaryVerifier()
-SendScriptCommand.add_required('connection_string', StringVerifier())
-SendScriptCommand.add_required('fragment_count', IntVerifier())
-SendScriptCommand.add_required('fragment_index', IntVerifier())
-SendScriptCommand.add_required('script', BytesVerifier(encoding="base64"))
+SendScriptCommand = VersionedVerifier(_send_script_command(False), _send_script_command(True))
+
+# Fragments of a multi-fragment script are acknowledged with the number of
+# fragments that the server has received so far
+ScriptFragmentAck = DictionaryVerifier()
+ScriptFragmentAck.add_required('received_count', IntVerifier())
+ScriptFragmentAck.add_required('fragment_count', IntVerifier())
+
+SendScriptResponse = OptionsVerifier(NoneVerifier(), ScriptFragmentAck)
+
+# Query which fragments of a multi-fragment script the server already has so
+# that an interrupted transfer can be resumed
+QueryScriptCommand = VersionedVerifier(_query_script_command(False), _query_script_command(True))
 
-SendScriptResponse = NoneVerifier()
+QueryScriptResponse = DictionaryVerifier()
+QueryScriptResponse.add_required('received', ListVerifier(IntVerifier()))
 
 SendDebugCommand = DictionaryVerifier()
-SendScriptCommand.add_required('connection_string', StringVerifier())
+SendDebugCommand.add_required('connection_string', StringVerifier())
 SendDebugCommand.add_required('command', StringVerifier())
 SendDebugCommand.add_required('args', Verifier())
 
@@ -1,7 +1,7 @@
 """The classes of messages supported by this socket impementation."""
 
 from iotile.core.utilities.schema_verify import Verifier, NoneVerifier, DictionaryVerifier, StringVerifier
-from iotile.core.utilities.schema_verify import LiteralVerifier, OptionsVerifier
+from iotile.core.utilities.schema_verify import LiteralVerifier, OptionsVerifier, BooleanVerifier
 
 # The prescribed schema of command response messages
 # Messages with this format are automatically processed inside the Client
@@ -30,6 +30,7 @@ EVENT = DictionaryVerifier()
 EVENT.add_required('type', LiteralVerifier('event'))
 EVENT.add_required('name', StringVerifier())
 EVENT.add_optional('payload', Verifier())
+EVENT.add_optional('binary', BooleanVerifier())
 
 VALID_SERVER_MESSAGE = OptionsVerifier(RESPONSE, EVENT)
 VALID_CLIENT_MESSAGE = OptionsVerifier(COMMAND)
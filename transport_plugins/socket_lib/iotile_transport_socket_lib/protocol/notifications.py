@@ -1,23 +1,37 @@
 """List of notifications handled by the Socket plugin."""
 
-from iotile.core.utilities.schema_verify import BytesVerifier, DictionaryVerifier, Verifier, BooleanVerifier, IntVerifier,\
+from iotile.core.utilities.schema_verify import DictionaryVerifier, Verifier, BooleanVerifier, IntVerifier,\
     StringVerifier
+from .versions import VersionedVerifier, bytes_verifier
 
 
 # Device found while scanning
 ScanEvent = Verifier()
 
 # Report
-SerializedReport = DictionaryVerifier()
-SerializedReport.add_required('encoded_report', BytesVerifier(encoding="base64"))
-SerializedReport.add_required('received_time', Verifier())
-SerializedReport.add_required('report_format', IntVerifier())
-SerializedReport.add_required('origin', IntVerifier())
+def _report_event(binary):
+    serialized_report = DictionaryVerifier()
+    serialized_report.add_required('encoded_report', bytes_verifier(binary))
+    serialized_report.add_required('received_time', Verifier())
+    serialized_report.add_required('report_format', IntVerifier())
+    serialized_report.add_required('origin', IntVerifier())
 
-ReportEvent = DictionaryVerifier()
-ReportEvent.add_required('connection_string', StringVerifier())
-ReportEvent.add_required('serialized_report', SerializedReport)
+    event = DictionaryVerifier()
+    event.add_required('connection_string', StringVerifier())
+    event.add_required('serialized_report', serialized_report)
 
+    return event
+
+
+def _trace_event(binary):
+    event = DictionaryVerifier()
+    event.add_required('connection_string', StringVerifier())
+    event.add_required('payload', bytes_verifier(binary))
+
+    return event
+
+
+ReportEvent = VersionedVerifier(_report_event(False), _report_event(True))
 
 DisconnectionEvent = DictionaryVerifier()
 DisconnectionEvent.add_required('connection_string', StringVerifier())
@@ -25,9 +39,7 @@ DisconnectionEvent.add_required('reason', StringVerifier())
 DisconnectionEvent.add_required('expected', BooleanVerifier())
 
 # Trace
-TraceEvent = DictionaryVerifier()
-TraceEvent.add_required('connection_string', StringVerifier())
-TraceEvent.add_required('payload', BytesVerifier(encoding="base64"))
+TraceEvent = VersionedVerifier(_trace_event(False), _trace_event(True))
 
 # Script and debug progress
 ProgressEvent = DictionaryVerifier()
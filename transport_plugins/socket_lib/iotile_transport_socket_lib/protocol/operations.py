@@ -1,17 +1,20 @@
 """List of defined commands and events."""
 
 # Commands
+HELLO = 'hello'
 CONNECT = 'connect'
 CLOSE_INTERFACE = 'close_interface'
 OPEN_INTERFACE = 'open_interface'
 PROBE = 'probe'
 SEND_RPC = 'send_rpc'
+SEND_RPCS = 'send_rpcs'
 SEND_SCRIPT = 'send_script'
+QUERY_SCRIPT = 'query_script'
 DEBUG = 'debug_command'
 DISCONNECT = 'disconnect'
 
-COMMANDS = frozenset([CONNECT, CLOSE_INTERFACE, OPEN_INTERFACE, PROBE, SEND_RPC,
-                      SEND_SCRIPT, DISCONNECT, DEBUG])
+COMMANDS = frozenset([HELLO, CONNECT, CLOSE_INTERFACE, OPEN_INTERFACE, PROBE, SEND_RPC,
+                      SEND_RPCS, SEND_SCRIPT, QUERY_SCRIPT, DISCONNECT, DEBUG])
 
 # Events
 NOTIFY_DEVICE_FOUND = 'device_found'
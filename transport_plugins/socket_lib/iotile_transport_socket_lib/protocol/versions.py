@@ -0,0 +1,97 @@
+"""Protocol versions that clients and servers can negotiate.
+
+Version 1 is the original protocol where every binary field is base64
+encoded before being packed and datetimes are packed as formatted strings.
+
+Version 2 sends binary fields as native msgpack ``bin`` objects and packs
+datetimes as a compact msgpack extension type.  Clients ask for version 2 by
+sending a ``hello`` command when they connect.  Clients that never send
+``hello`` and servers that do not understand it keep using version 1.
+"""
+
+import base64
+from iotile.core.utilities.schema_verify import Verifier, BytesVerifier
+
+LEGACY_PROTOCOL = 1
+BINARY_PROTOCOL = 2
+CURRENT_PROTOCOL = BINARY_PROTOCOL
+
+
+class VersionedVerifier(Verifier):
+    """A verifier for payloads that contain binary fields.
+
+    The binary fields in a payload are base64 encoded by the legacy protocol
+    and sent as raw bytes by the binary protocol, so a different verifier is
+    needed depending on which protocol was negotiated.  Calling verify()
+    directly uses the legacy verifier.
+
+    Args:
+        legacy (Verifier): The verifier to use with the legacy protocol.
+        binary (Verifier): The verifier to use with the binary protocol.
+    """
+
+    def __init__(self, legacy, binary, desc=None):
+        super(VersionedVerifier, self).__init__(desc)
+
+        self.legacy = legacy
+        self.binary = binary
+
+    def select(self, binary):
+        """Get the verifier to use for a protocol.
+
+        Args:
+            binary (bool): Whether binary fields are sent as raw bytes.
+
+        Returns:
+            Verifier: The verifier for that protocol.
+        """
+
+        if binary:
+            return self.binary
+
+        return self.legacy
+
+    def verify(self, obj):
+        return self.legacy.verify(obj)
+
+
+def select_verifier(verifier, binary):
+    """Get the verifier to use for a protocol from a possibly versioned verifier."""
+
+    if isinstance(verifier, VersionedVerifier):
+        return verifier.select(binary)
+
+    return verifier
+
+
+def bytes_verifier(binary):
+    """Create a verifier for a binary field sent with a protocol.
+
+    Args:
+        binary (bool): Whether binary fields are sent as raw bytes.
+
+    Returns:
+        BytesVerifier: The verifier, which always returns the decoded bytes.
+    """
+
+    if binary:
+        return BytesVerifier()
+
+    return BytesVerifier(encoding="base64")
+
+
+def encode_bytes(data, binary):
+    """Encode a binary field for sending with a protocol.
+
+    Args:
+        data (bytes): The data to encode.
+        binary (bool): Whether binary fields are sent as raw bytes.
+
+    Returns:
+        bytes: The encoded data.
+    """
+
+    if binary:
+        return bytes(data)
+
+    return base64.b64encode(data)
@@ -108,7 +108,7 @@ class TcpClientImplementation(AbstractSocketClientImplementation):
 
     async def close(self):
         """Close the connection"""
-        await self.con.writer.close()
+        self.con.writer.close()
         self.con = None
 
     def connected(self):
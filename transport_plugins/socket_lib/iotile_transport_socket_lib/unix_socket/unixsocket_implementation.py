@@ -101,7 +101,7 @@ class UnixClientImplementation(AbstractSocketClientImplementation):
 
     async def close(self):
         """Close the connection"""
-        await self.con.writer.close()
+        self.con.writer.close()
         self.con = None
 
     def connected(self):
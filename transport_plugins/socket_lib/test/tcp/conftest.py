@@ -6,6 +6,7 @@ from iotile.core.hw.transport import VirtualDeviceAdapter
 from iotile.core.utilities import BackgroundEventLoop
 from iotile_transport_socket_lib.tcp_socket.tcpsocket_adapter import TcpSocketDeviceAdapter
 from iotile_transport_socket_lib.tcp_socket.tcpsocket_server import TcpSocketDeviceServer
+from iotile_transport_socket_lib.protocol import LEGACY_PROTOCOL, BINARY_PROTOCOL
 
 logger = logging.getLogger(__name__)
 
@@ -59,11 +60,12 @@ def hw(server):
     hw.close()
 
 
-@pytest.fixture(scope="function")
-def device_adapter(server, loop):
+@pytest.fixture(scope="function", params=[LEGACY_PROTOCOL, BINARY_PROTOCOL], ids=['legacy', 'binary'])
+def device_adapter(request, server, loop):
     port, _ = server
 
     adapter = TcpSocketDeviceAdapter(port="127.0.0.1:{}".format(port), loop=loop)
+    adapter.client._max_protocol_version = request.param
     wrapper = SynchronousLegacyWrapper(adapter, loop=loop)
     yield wrapper
 
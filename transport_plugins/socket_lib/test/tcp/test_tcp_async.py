@@ -1,5 +1,7 @@
 """Test ValidateWSCient against ValidatingWSServer."""
 
+import base64
+import datetime
 import pytest
 import threading
 from iotile.core.exceptions import ExternalError
@@ -7,12 +9,17 @@ from iotile.core.utilities.async_tools import BackgroundEventLoop
 from iotile_transport_socket_lib.tcp_socket.tcpsocket_implementation import TcpServerImplementation
 from iotile_transport_socket_lib.tcp_socket.tcpsocket_implementation import TcpClientImplementation
 from iotile_transport_socket_lib.generic import AsyncSocketServer, AsyncSocketClient
-from iotile.core.utilities.schema_verify import Verifier, StringVerifier, IntVerifier
+from iotile_transport_socket_lib.generic.packing import pack, unpack
+from iotile_transport_socket_lib.protocol import LEGACY_PROTOCOL, BINARY_PROTOCOL, OPERATIONS
+from iotile_transport_socket_lib.protocol.versions import VersionedVerifier, bytes_verifier, encode_bytes
+from iotile.core.utilities.schema_verify import Verifier, StringVerifier, IntVerifier, DictionaryVerifier
 
 @pytest.fixture(scope="function")
-def client_server(tmp_path):
+def client_server(request, tmp_path):
     """Create a connected async ws client and server pair."""
 
+    protocol_version = getattr(request, 'param', BINARY_PROTOCOL)
+
     loop = BackgroundEventLoop()
     loop.start()
     socketfile = str((tmp_path / "socket").resolve())
@@ -26,7 +33,7 @@ def client_server(tmp_path):
         loop.run_coroutine(server.start())
 
         client_implementation = TcpClientImplementation('127.0.0.1', server.implementation.port, loop)
-        client = AsyncSocketClient(client_implementation, loop=loop)
+        client = AsyncSocketClient(client_implementation, loop=loop, protocol_version=protocol_version)
         loop.run_coroutine(client.start())
 
         yield loop, client, server
@@ -105,3 +112,67 @@ def test_event_sending(client_server):
 
     loop.run_coroutine(client.send_command('send_event', 'event2', Verifier()))
     assert shared[0] == 10
+
+
+def _bytes_payload(binary):
+    verifier = DictionaryVerifier()
+    verifier.add_required('data', bytes_verifier(binary))
+    return verifier
+
+
+BYTES_PAYLOAD = VersionedVerifier(_bytes_payload(False), _bytes_payload(True))
+
+
+@pytest.mark.parametrize('client_server', [LEGACY_PROTOCOL, BINARY_PROTOCOL], indirect=True)
+def test_protocol_negotiation(client_server):
+    """Make sure binary fields round trip with both protocol versions."""
+
+    loop, client, server = client_server
+    received = []
+
+    async def _echo(payload, context):
+        received.append(payload['data'])
+
+        encoded = dict(data=encode_bytes(payload['data'], context.binary))
+        await context.server.send_event(context.connection, 'bytes_event', encoded)
+        return encoded
+
+    server.register_command('echo', _echo, BYTES_PAYLOAD)
+    client.register_event('bytes_event', received.append, BYTES_PAYLOAD)
+
+    binary = client.protocol_version == BINARY_PROTOCOL
+    data = bytes(range(256))
+
+    encoded = data if binary else base64.b64encode(data)
+
+    response = loop.run_coroutine(client.send_command('echo', dict(data=encoded), BYTES_PAYLOAD))
+    assert response['data'] == data
+    assert received[0] == data
+    assert received[1] == {'data': data}
+    assert client.binary is binary
+
+
+def test_server_without_hello(client_server):
+    """Make sure clients fall back to the legacy protocol on old servers."""
+
+    loop, client, server = client_server
+
+    del server._commands[OPERATIONS.HELLO]
+    loop.run_coroutine(client.stop())
+    loop.run_coroutine(client.start())
+
+    assert client.protocol_version == LEGACY_PROTOCOL
+    assert client.binary is False
+
+
+def test_datetime_packing():
+    """Make sure datetimes survive both packing formats."""
+
+    now = datetime.datetime(2019, 5, 4, 3, 2, 1, 123456)
+    aware = datetime.datetime(2019, 5, 4, 5, 2, 1, 123456,
+                              tzinfo=datetime.timezone(datetime.timedelta(hours=2)))
+
+    assert unpack(pack({'time': now})) == {'time': now}
+    assert unpack(pack({'time': now}, binary=True)) == {'time': now}
+    assert unpack(pack({'time': aware}, binary=True)) == {'time': now}
+    assert len(pack(now, binary=True)) < len(pack(now))
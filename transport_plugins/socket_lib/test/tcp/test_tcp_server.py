@@ -7,6 +7,10 @@ import json
 import pytest
 import struct
 import threading
+from iotile.core.exceptions import ExternalError
+from iotile.core.hw.exceptions import DeviceAdapterError
+from iotile_transport_socket_lib.protocol import COMMANDS, OPERATIONS
+from iotile_transport_socket_lib.protocol.versions import encode_bytes
 from devices_factory import build_report_device, build_tracing_device, get_tracing_device_string
 
 
@@ -179,3 +183,171 @@ def test_send_script(device_adapter):
     flag = script_complete.wait(5.0)
     assert flag is True
     assert progress['done'] > 0
+
+
+@pytest.mark.parametrize('server', [build_report_device()], indirect=True)
+def test_send_script_fragmented(device_adapter, server):
+    """Make sure large scripts are sent in fragments with progress for each one."""
+
+    _, adapter = server
+    progress = []
+
+    device_adapter.set_config('script_chunk_size', 100)
+    device_adapter.set_config('script_window', 3)
+
+    script = bytes(range(256)) * 4
+    device_adapter.connect_sync(0, str(0x10))
+    result = device_adapter.send_script_sync(0, script, lambda done, total: progress.append((done, total)))
+
+    assert result['success'] is True
+    assert adapter.devices[0x10].script == script
+
+    # One progress event per acknowledged fragment, then the device's own progress
+    assert progress[:10] == [(i, 11) for i in range(1, 11)]
+    assert progress[-1] == (len(script), len(script))
+
+
+@pytest.mark.parametrize('server', [build_report_device()], indirect=True)
+def test_send_script_resume(device_adapter, server, loop):
+    """Make sure an interrupted script transfer only resends missing fragments."""
+
+    _, adapter = server
+    sent = []
+
+    device_adapter.set_config('script_chunk_size', 100)
+    device_adapter.connect_sync(0, str(0x10))
+
+    script = bytes(range(250)) * 4
+    async_adapter = device_adapter._adapter
+    original = async_adapter._send_command
+    fail_after = [4]
+
+    async def _send_command(name, args, verifier, timeout=10.0):
+        if name == OPERATIONS.SEND_SCRIPT:
+            if len(sent) == fail_after[0]:
+                raise DeviceAdapterError(None, name, 'simulated disconnection')
+
+            sent.append(args['fragment_index'])
+
+        return await original(name, args, verifier, timeout)
+
+    async_adapter._send_command = _send_command
+    device_adapter.set_config('script_window', 1)
+
+    result = device_adapter.send_script_sync(0, script, lambda done, total: None)
+    assert result['success'] is False
+    assert sent == [0, 1, 2, 3]
+
+    del sent[:]
+    fail_after[0] = None
+
+    result = device_adapter.send_script_sync(0, script, lambda done, total: None)
+    assert result['success'] is True
+    assert sent == list(range(4, 10))
+    assert adapter.devices[0x10].script == script
+
+
+@pytest.mark.parametrize('server', [build_report_device()], indirect=True)
+def test_send_script_hash_mismatch(device_adapter, server, loop):
+    """Make sure a script that does not match its hash is not sent to the device."""
+
+    _, adapter = server
+
+    device_adapter.connect_sync(0, str(0x10))
+    client = device_adapter._adapter.client
+    binary = client.binary
+
+    header = dict(connection_string=str(0x10), fragment_count=2, total_length=4,
+                  script_hash=encode_bytes(bytes(16), binary))
+
+    loop.run_coroutine(client.send_command(OPERATIONS.SEND_SCRIPT,
+                                           dict(header, fragment_index=0, script=encode_bytes(b'ab', binary)),
+                                           COMMANDS.SendScriptResponse))
+
+    with pytest.raises(ExternalError):
+        loop.run_coroutine(client.send_command(OPERATIONS.SEND_SCRIPT,
+                                               dict(header, fragment_index=1, script=encode_bytes(b'cd', binary)),
+                                               COMMANDS.SendScriptResponse))
+
+    assert adapter.devices[0x10].script != b'abcd'
+
+
+
+@pytest.mark.parametrize('server', [build_report_device()], indirect=True)
+def test_send_script_unknown_transfer(device_adapter, server, loop):
+    """Make sure later fragments of a transfer the server does not know about are rejected."""
+
+    _, adapter = server
+
+    device_adapter.connect_sync(0, str(0x10))
+    client = device_adapter._adapter.client
+    binary = client.binary
+
+    header = dict(connection_string=str(0x10), fragment_count=2, total_length=4,
+                  script_hash=encode_bytes(bytes(16), binary))
+
+    with pytest.raises(ExternalError):
+        loop.run_coroutine(client.send_command(OPERATIONS.SEND_SCRIPT,
+                                               dict(header, fragment_index=1, script=encode_bytes(b'cd', binary)),
+                                               COMMANDS.SendScriptResponse))
+
+    # Clients may not force the server to allocate an arbitrarily large script
+    header['total_length'] = 1 << 40
+    with pytest.raises(ExternalError):
+        loop.run_coroutine(client.send_command(OPERATIONS.QUERY_SCRIPT, header, COMMANDS.QueryScriptResponse))
+
+    assert len(adapter.devices[0x10].script) == 0
+
+
+@pytest.mark.parametrize('server', [build_report_device()], indirect=True)
+def test_send_script_incomplete_ack(device_adapter, server):
+    """Make sure a script is not reported as sent unless the server received every fragment."""
+
+    device_adapter.set_config('script_chunk_size', 100)
+    device_adapter.connect_sync(0, str(0x10))
+
+    async_adapter = device_adapter._adapter
+    original = async_adapter._send_command
+
+    async def _send_command(name, args, verifier, timeout=10.0):
+        result = await original(name, args, verifier, timeout)
+        if name == OPERATIONS.SEND_SCRIPT and args['fragment_index'] == args['fragment_count'] - 1:
+            return dict(received_count=1, fragment_count=args['fragment_count'])
+
+        return result
+
+    async_adapter._send_command = _send_command
+
+    result = device_adapter.send_script_sync(0, bytes(range(250)) * 4, lambda done, total: None)
+    assert result['success'] is False
+
+
+@pytest.mark.parametrize('server', [build_report_device()], indirect=True)
+def test_send_script_old_server(device_adapter, server):
+    """Make sure scripts are sent in one message to servers that cannot receive fragments."""
+
+    _, adapter = server
+    sent = []
+
+    device_adapter.set_config('script_chunk_size', 100)
+    device_adapter.connect_sync(0, str(0x10))
+
+    async_adapter = device_adapter._adapter
+    original = async_adapter._send_command
+
+    async def _send_command(name, args, verifier, timeout=10.0):
+        if name == OPERATIONS.QUERY_SCRIPT:
+            raise DeviceAdapterError(None, name, 'Command %s not found' % OPERATIONS.QUERY_SCRIPT)
+
+        sent.append(args['fragment_count'])
+        return await original(name, args, verifier, timeout)
+
+    async_adapter._send_command = _send_command
+
+    script = bytes(range(250)) * 4
+    result = device_adapter.send_script_sync(0, script, lambda done, total: None)
+
+    assert result['success'] is True
+    assert sent == [1]
+    assert async_adapter._fragment_scripts is False
+    assert adapter.devices[0x10].script == script
@@ -6,6 +6,8 @@ Also test that our WebSocketDeviceAdapter works well with the HardwareManager.
 import json
 import queue
 import pytest
+from iotile.core.hw.exceptions import RPCNotFoundError, TileNotFoundError
+from iotile_transport_socket_lib.protocol import OPERATIONS
 from devices_factory import build_report_device, build_tracing_device, get_tracing_device_string
 
 
@@ -121,3 +123,29 @@ def test_send_script(hw, server):
     assert prog_count > 0
 
     assert device.script == script
+
+
+@pytest.mark.parametrize('server', [build_report_device()], indirect=True)
+def test_send_rpcs(hw):
+    hw.connect(0x10)
+
+    results = hw.send_rpcs([(8, 0x0004, b'')] * 20 + [(8, 0x7FFF, b''), (12, 0x0004, b'')])
+
+    assert len(results) == 22
+    assert all(x == results[0] for x in results[:20])
+    assert isinstance(results[0], bytes)
+    assert isinstance(results[20], RPCNotFoundError)
+    assert isinstance(results[21], TileNotFoundError)
+
+
+@pytest.mark.parametrize('server', [build_report_device()], indirect=True)
+def test_send_rpcs_unsupported(hw, monkeypatch):
+    """Make sure we fall back to individual RPCs if the server cannot batch them."""
+
+    monkeypatch.setattr(OPERATIONS, 'SEND_RPCS', 'unknown_send_rpcs')
+    hw.connect(0x10)
+
+    results = hw.send_rpcs([(8, 0x0004, b''), (8, 0x7FFF, b'')])
+    assert isinstance(results[0], bytes)
+    assert isinstance(results[1], RPCNotFoundError)
+    assert hw.stream.adapter._batch_rpcs is False